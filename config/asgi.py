@@ -4,6 +4,7 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 import papermerge.notifications.routing
+import papermerge.wsignals.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.dev')
 
@@ -11,6 +12,7 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
+            papermerge.wsignals.routing.websocket_urlpatterns +
             papermerge.notifications.routing.websocket_urlpatterns
         )
     ),
@@ -23,4 +23,7 @@ app.conf.broker_transport_options = {
     'interval_start': 0,
     'interval_step': 0.2,
     'interval_max': 0.2,
+    # consume interactive/bulk queues according to PAPERMERGE_QUEUE_WEIGHTS
+    # (used by redis message broker only)
+    'queue_order_strategy': 'config.routing:WeightedCycle',
 }
@@ -0,0 +1,105 @@
+"""
+Routing of celery tasks to interactive/bulk queues.
+
+Interactive work (web uploads, manual OCR re-run) goes to
+``PAPERMERGE_INTERACTIVE_QUEUE``, work triggered by bulk importers
+(LOCAL, IMAP) goes to ``PAPERMERGE_BULK_QUEUE``.
+"""
+from django.conf import settings
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (see ``task_routes`` celery setting).
+
+    Task is routed to the bulk queue if it was scheduled on behalf
+    of a bulk processor i.e. it has ``processor`` keyword argument
+    listed in ``PAPERMERGE_BULK_PROCESSORS`` (same value as passed
+    to ``go_through_pipelines``), or if task itself is listed in
+    ``PAPERMERGE_BULK_TASKS``. Everything else goes to the interactive
+    queue.
+    """
+    processor = (kwargs or {}).get('processor', None)
+
+    if processor in settings.PAPERMERGE_BULK_PROCESSORS:
+        return {'queue': settings.PAPERMERGE_BULK_QUEUE}
+
+    if name in settings.PAPERMERGE_BULK_TASKS:
+        return {'queue': settings.PAPERMERGE_BULK_QUEUE}
+
+    return {'queue': settings.PAPERMERGE_INTERACTIVE_QUEUE}
+
+
+def weighted_schedule(weights):
+    """
+    Returns list of queue names in which each queue name
+    appears as many times as its weight. Queue names are interleaved
+    (smooth weighted round robin).
+
+    Example:
+
+        weighted_schedule({'a': 3, 'b': 1}) -> ['a', 'a', 'b', 'a']
+    """
+    weights = {
+        name: int(weight) for name, weight in weights.items()
+        if int(weight) > 0
+    }
+    total = sum(weights.values())
+    current = {name: 0 for name in weights}
+    schedule = []
+
+    for _ in range(total):
+        for name, weight in weights.items():
+            current[name] += weight
+        name = max(current, key=current.get)
+        current[name] -= total
+        schedule.append(name)
+
+    return schedule
+
+
+class WeightedCycle:
+    """
+    Queue order strategy for kombu's redis transport
+    (``queue_order_strategy`` broker transport option).
+
+    Worker asks redis for next message from all consumed queues
+    at once; redis returns message from first non empty queue in given
+    order. For every fetch, this cycle puts first the queue whose turn
+    it is according to ``PAPERMERGE_QUEUE_WEIGHTS``. Under load,
+    queues are thus served in proportion of their weights, while an idle
+    queue never blocks the others.
+    """
+
+    def __init__(self, it=None):
+        self.items = it if it is not None else []
+        self.turn = 0
+        self.update(self.items)
+
+    def update(self, it):
+        self.items[:] = it
+        weights = {
+            name: settings.PAPERMERGE_QUEUE_WEIGHTS.get(name, 1)
+            for name in self.items
+        }
+        self.schedule = weighted_schedule(weights)
+        # remaining queues are tried in order of their weights
+        self.by_weight = sorted(
+            self.items,
+            key=lambda name: weights[name],
+            reverse=True
+        )
+
+    def consume(self, n):
+        if not self.schedule:
+            return self.by_weight[:n]
+
+        first = self.schedule[self.turn % len(self.schedule)]
+        rest = [name for name in self.by_weight if name != first]
+
+        return [first, *rest][:n]
+
+    def rotate(self, last_used):
+        self.turn = (self.turn + 1) % max(len(self.schedule), 1)
+
+        return last_used
@@ -3,6 +3,7 @@ import os
 
 from pathlib import Path
 from corsheaders.defaults import default_headers as default_cors_headers
+from kombu import Exchange, Queue
 from configula import Configula
 
 
@@ -70,6 +71,81 @@ PAPERMERGE_IMPORTER_LOOP_TIME = cfg_papermerge.get_var(
     5
 )
 
+# Used by inotify based importer (./manage.py watch_importer): number of
+# files imported in parallel and journal of files being imported.
+# Default journal location is <MEDIA_ROOT>/importer_journal.jsonl
+PAPERMERGE_IMPORTER_WORKERS = cfg_papermerge.get_var(
+    "IMPORTER_WORKERS",
+    4
+)
+PAPERMERGE_IMPORTER_JOURNAL = cfg_papermerge.get_var(
+    "IMPORTER_JOURNAL",
+    None
+)
+
+PAPERMERGE_IMPORT_MAIL_HOST = cfg_papermerge.get_var("IMPORT_MAIL_HOST", "")
+PAPERMERGE_IMPORT_MAIL_USER = cfg_papermerge.get_var("IMPORT_MAIL_USER", "")
+PAPERMERGE_IMPORT_MAIL_PASS = cfg_papermerge.get_var("IMPORT_MAIL_PASS", "")
+PAPERMERGE_IMPORT_MAIL_BY_USER = cfg_papermerge.get_var(
+    "IMPORT_MAIL_BY_USER",
+    False
+)
+PAPERMERGE_IMPORT_MAIL_BY_SECRET = cfg_papermerge.get_var(
+    "IMPORT_MAIL_BY_SECRET",
+    False
+)
+PAPERMERGE_IMPORT_MAIL_DELETE = cfg_papermerge.get_var(
+    "IMPORT_MAIL_DELETE",
+    False
+)
+PAPERMERGE_IMPORT_MAIL_INBOX = cfg_papermerge.get_var(
+    "IMPORT_MAIL_INBOX",
+    "INBOX"
+)
+
+# Used by IMAP importer (./manage.py watch_imap): number of attachments
+# imported in parallel, seconds to wait for new messages with IDLE (or
+# between checks, if server does not support IDLE) and file with UID of
+# the last processed message of the mailbox.
+# Default checkpoint location is <MEDIA_ROOT>/imap_checkpoint.json
+PAPERMERGE_IMPORT_MAIL_WORKERS = cfg_papermerge.get_var(
+    "IMPORT_MAIL_WORKERS",
+    4
+)
+PAPERMERGE_IMPORT_MAIL_IDLE_TIMEOUT = cfg_papermerge.get_var(
+    "IMPORT_MAIL_IDLE_TIMEOUT",
+    300
+)
+PAPERMERGE_IMPORT_MAIL_CHECKPOINT = cfg_papermerge.get_var(
+    "IMPORT_MAIL_CHECKPOINT",
+    None
+)
+
+# Used by streaming backup (./manage.py stream_backup): number of
+# documents described by one manifest member (progress is saved in
+# checkpoint file after each of them) and the checkpoint file.
+# Default checkpoint location is <MEDIA_ROOT>/backup_checkpoint.json
+PAPERMERGE_BACKUP_CHUNK_SIZE = cfg_papermerge.get_var(
+    "BACKUP_CHUNK_SIZE",
+    100
+)
+PAPERMERGE_BACKUP_CHECKPOINT = cfg_papermerge.get_var(
+    "BACKUP_CHECKPOINT",
+    None
+)
+
+# Used by restore of streaming backups (./manage.py stream_restore):
+# number of files extracted in parallel and number of documents
+# committed at once.
+PAPERMERGE_RESTORE_WORKERS = cfg_papermerge.get_var(
+    "RESTORE_WORKERS",
+    4
+)
+PAPERMERGE_RESTORE_BATCH_SIZE = cfg_papermerge.get_var(
+    "RESTORE_BATCH_SIZE",
+    500
+)
+
 
 PAPERMERGE_OCR_DEFAULT_LANGUAGE = cfg_papermerge.get(
     'ocr',
@@ -104,6 +180,116 @@ PAPERMERGE_METADATA_NUMERIC_FORMATS = [
     'd.ddd'
 ]
 
+# Metadata keys changed on a folder are copied to its descendants (and
+# their pages) in chunks of METADATA_PROPAGATION_CHUNK_SIZE nodes (one
+# transaction per chunk). Folders with more than
+# METADATA_PROPAGATION_ASYNC_MIN_NODES descendants are updated in
+# background by celery worker (see papermerge.metadata.propagation).
+PAPERMERGE_METADATA_PROPAGATION_CHUNK_SIZE = cfg_papermerge.get_var(
+    'METADATA_PROPAGATION_CHUNK_SIZE',
+    default=1000
+)
+PAPERMERGE_METADATA_PROPAGATION_ASYNC_MIN_NODES = cfg_papermerge.get_var(
+    'METADATA_PROPAGATION_ASYNC_MIN_NODES',
+    default=10000
+)
+
+# Pipelines accept paths and file objects as payload and link imported
+# files into storage (papermerge.importers.pipelines.StreamingPipeline)
+PAPERMERGE_PIPELINES = [
+    'papermerge.importers.pipelines.StreamingPipeline'
+]
+
+# How many pages of the same document are OCRed by one worker task.
+# If set, OCR of each imported document is split into per-chunk subtasks
+# which run in parallel on all available workers and are joined in one
+# chord. Requires a result backend which supports chords (e.g. redis),
+# see RESULT_BACKEND below and ``papermerge.wsignals.tasks.check_chords``.
+# 0 (default) - one task per page, no chord.
+PAPERMERGE_OCR_PAGES_PER_TASK = cfg_papermerge.get_var(
+    "OCR_PAGES_PER_TASK",
+    0
+)
+
+if PAPERMERGE_OCR_PAGES_PER_TASK:
+    PAPERMERGE_PIPELINES = [
+        'papermerge.wsignals.pipelines.OcrChordPipeline'
+    ]
+
+# With OCR_PAGES_PER_TASK, run automates once per document, after all
+# its pages are OCRed (over text of all pages), instead of once for
+# every OCRed page. Documents OCRed page by page are not affected.
+PAPERMERGE_AUTOMATES_PER_DOCUMENT = cfg_papermerge.get_var(
+    "AUTOMATES_PER_DOCUMENT",
+    False
+)
+
+# Page events (OCR started/complete, automates) sent by the worker are
+# written to UI logs and pushed to websocket connections in batches of
+# EVENTS_BATCH_SIZE, at least every EVENTS_FLUSH_INTERVAL seconds.
+PAPERMERGE_EVENTS_BATCH_SIZE = cfg_papermerge.get_var(
+    "EVENTS_BATCH_SIZE",
+    100
+)
+PAPERMERGE_EVENTS_FLUSH_INTERVAL = cfg_papermerge.get_var(
+    "EVENTS_FLUSH_INTERVAL",
+    2
+)
+
+# OCR progress of user's documents is sent over websocket (ws/progress/)
+# at most once per PROGRESS_INTERVAL seconds; documents without progress
+# for PROGRESS_TIMEOUT seconds are dropped from it.
+PAPERMERGE_PROGRESS_INTERVAL = cfg_papermerge.get_var(
+    "PROGRESS_INTERVAL",
+    1
+)
+PAPERMERGE_PROGRESS_TIMEOUT = cfg_papermerge.get_var(
+    "PROGRESS_TIMEOUT",
+    3600
+)
+
+PAPERMERGE_SEARCH_BACKEND = cfg_papermerge.get_var(
+    "SEARCH_BACKEND",
+    "papermerge.search.backends.db.SearchBackend"
+)
+
+# Used by postgres search backend (papermerge.fulltext.backends):
+# page language (ISO-639-2/T, as in OCR_LANGUAGES) -> PostgreSQL text
+# search configuration used to stem words of the page (psql> \dF).
+# Pages in other languages use SEARCH_DEFAULT_CONFIG.
+PAPERMERGE_SEARCH_LANGUAGE_CONFIGS = cfg_papermerge.get_var(
+    "SEARCH_LANGUAGE_CONFIGS",
+    {
+        'dan': 'danish',
+        'deu': 'german',
+        'eng': 'english',
+        'fin': 'finnish',
+        'fra': 'french',
+        'hun': 'hungarian',
+        'ita': 'italian',
+        'nld': 'dutch',
+        'nor': 'norwegian',
+        'por': 'portuguese',
+        'ron': 'romanian',
+        'rus': 'russian',
+        'spa': 'spanish',
+        'swe': 'swedish',
+        'tur': 'turkish',
+    }
+)
+PAPERMERGE_SEARCH_DEFAULT_CONFIG = cfg_papermerge.get_var(
+    "SEARCH_DEFAULT_CONFIG",
+    "simple"
+)
+
+# Used by inverted index search backend (papermerge.fulltext.index_backend).
+# Directory must be shared by webapp and workers.
+# Default location is <MEDIA_ROOT>/search_index
+PAPERMERGE_SEARCH_INDEX_DIR = cfg_papermerge.get_var(
+    "SEARCH_INDEX_DIR",
+    None
+)
+
 PAPERMERGE_MIMETYPES = [
     'application/octet-stream',
     'application/pdf',
@@ -128,6 +314,30 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Django cache. It is shared by all papermerge processes (webapp, ASGI
+# server, workers, importers): versions of users' automates and of email
+# routing preferences (changed in the webapp, used by workers and
+# importers) and OCR progress (updated by workers, read by the ASGI
+# server) are kept there.
+# Default is a file based cache in <MEDIA_ROOT>/cache, which all processes
+# share anyway. With another backend (e.g. memcached), set CACHE_LOCATION
+# as well.
+PAPERMERGE_CACHE_BACKEND = cfg_papermerge.get_var(
+    "CACHE_BACKEND",
+    "django.core.cache.backends.filebased.FileBasedCache"
+)
+PAPERMERGE_CACHE_LOCATION = cfg_papermerge.get_var(
+    "CACHE_LOCATION",
+    os.path.join(MEDIA_ROOT, "cache")
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': PAPERMERGE_CACHE_BACKEND,
+        'LOCATION': PAPERMERGE_CACHE_LOCATION,
+    }
+}
+
 # defines extra URL conf to be included
 EXTRA_URLCONF = []
 
@@ -145,6 +355,13 @@ INSTALLED_APPS = [
     'papermerge.core.apps.CoreConfig',
     'papermerge.wsignals.apps.WsignalsConfig',
     'papermerge.notifications.apps.NotificationsConfig',
+    'papermerge.viewer.apps.ViewerConfig',
+    'papermerge.access.apps.AccessConfig',
+    'papermerge.metadata.apps.MetadataConfig',
+    'papermerge.automates.apps.AutomatesConfig',
+    'papermerge.importers.apps.ImportersConfig',
+    'papermerge.backups.apps.BackupsConfig',
+    'papermerge.fulltext.apps.FulltextConfig',
     'django.contrib.contenttypes',
     'dynamic_preferences',
     # comment the following line if you don't want to use user preferences
@@ -269,6 +486,39 @@ PDFTOPPM_MAX_HEIGHT = 1500
 # 1 - poorest quality jpeg image - uses smallest amount of space
 PDFTOPPM_JPEG_QUALITY = 90
 
+# Access entries changed on a folder are copied to its descendants
+# in chunks of ACCESS_PROPAGATION_CHUNK_SIZE nodes (one transaction per
+# chunk). Folders with more than ACCESS_PROPAGATION_ASYNC_MIN_NODES
+# descendants are updated in background by celery worker
+# (see papermerge.access.propagation).
+PAPERMERGE_ACCESS_PROPAGATION_CHUNK_SIZE = cfg_papermerge.get_var(
+    'ACCESS_PROPAGATION_CHUNK_SIZE',
+    default=1000
+)
+PAPERMERGE_ACCESS_PROPAGATION_ASYNC_MIN_NODES = cfg_papermerge.get_var(
+    'ACCESS_PROPAGATION_ASYNC_MIN_NODES',
+    default=10000
+)
+
+# Page images shown in document viewer are rendered on first request
+# and kept in a LRU disk cache of at most PREVIEW_CACHE_MAX_SIZE bytes.
+# Least recently viewed images are evicted first.
+# Default cache location is <MEDIA_ROOT>/preview_cache
+PAPERMERGE_PREVIEW_CACHE_DIR = cfg_papermerge.get_var(
+    'PREVIEW_CACHE_DIR',
+    default=None
+)
+PAPERMERGE_PREVIEW_CACHE_MAX_SIZE = cfg_papermerge.get_var(
+    'PREVIEW_CACHE_MAX_SIZE',
+    default=1024 * 1024 * 1024  # 1 GB
+)
+
+# Tiled page images (image pyramid): at zoom level N page is rendered
+# TILE_SIZE * 2^N pixels wide and served in square tiles of
+# TILE_SIZE pixels. Tiles share the preview cache.
+PAPERMERGE_TILE_SIZE = 256
+PAPERMERGE_TILE_MAX_LEVEL = 4
+
 # = 1 GB of space per tenant
 MAX_STORAGE_SIZE = 1 * 1024 * 1024
 
@@ -305,10 +555,27 @@ CELERY_BROKER_URL = "filesystem://"
 CELERY_BROKER_TRANSPORT_OPTIONS = {
     'data_folder_in': PAPERMERGE_TASK_QUEUE_DIR,
     'data_folder_out': PAPERMERGE_TASK_QUEUE_DIR,
+    # consume interactive/bulk queues according to PAPERMERGE_QUEUE_WEIGHTS
+    # (used by redis message broker only). Set here, because core's
+    # ``./manage.py worker`` configures its celery app from CELERY_*
+    # settings only (config.celery is not used by it).
+    'queue_order_strategy': 'config.routing:WeightedCycle',
 }
 
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
-CELERY_WORKER_CONCURENCY = 1
+# Number of worker processes. Default is the number of CPUs
+# available on the machine. Applies to workers started with
+# ``celery -A config worker``; core's ``./manage.py worker`` always
+# runs a single worker process.
+CELERY_WORKER_CONCURRENCY = cfg_papermerge.get_var(
+    'WORKER_CONCURRENCY',
+    default=None
+)
+# OCR tasks are long running. Each worker process reserves only
+# one task at time and acknowledges it only after it finished, so that
+# pending pages are distributed evenly among idle worker processes/nodes.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -316,9 +583,55 @@ CELERY_TASK_CREATE_MISSING_QUEUES = True
 CELERY_TASK_DEFAULT_EXCHANGE = 'papermerge'
 CELERY_TASK_DEFAULT_EXCHANGE_TYPE = 'direct'
 CELERY_TASK_DEFAULT_ROUTING_KEY = 'papermerge'
+CELERY_TASK_DEFAULT_QUEUE = 'papermerge'
+
+# Interactive work (web uploads, manual OCR re-run) and bulk work
+# (LOCAL/IMAP importers) are routed to separate queues, so that a large
+# import does not starve users waiting for their uploads to be OCRed.
+# See config.routing.route_task
+PAPERMERGE_INTERACTIVE_QUEUE = 'papermerge'
+PAPERMERGE_BULK_QUEUE = 'papermerge_bulk'
+# processors (as passed to go_through_pipelines) considered bulk
+PAPERMERGE_BULK_PROCESSORS = ['LOCAL', 'IMAP']
+# periodic importer tasks are bulk work as well
+PAPERMERGE_BULK_TASKS = [
+    'papermerge.core.management.commands.worker.import_from_email',
+    'papermerge.core.management.commands.worker.import_from_local_folder',
+    'papermerge.access.tasks.propagate_access_task',
+    'papermerge.metadata.tasks.propagate_kv_task',
+]
+# Relative share of worker fetches for each queue when both queues have
+# pending tasks. An idle queue never blocks the other one.
+# Applies only to redis message broker.
+PAPERMERGE_QUEUE_WEIGHTS = cfg_papermerge.get_var(
+    'QUEUE_WEIGHTS',
+    default={
+        PAPERMERGE_INTERACTIVE_QUEUE: 4,
+        PAPERMERGE_BULK_QUEUE: 1,
+    }
+)
+
+CELERY_TASK_QUEUES = (
+    Queue(
+        PAPERMERGE_INTERACTIVE_QUEUE,
+        Exchange(CELERY_TASK_DEFAULT_EXCHANGE, type='direct'),
+        routing_key=PAPERMERGE_INTERACTIVE_QUEUE
+    ),
+    Queue(
+        PAPERMERGE_BULK_QUEUE,
+        Exchange(CELERY_TASK_DEFAULT_EXCHANGE, type='direct'),
+        routing_key=PAPERMERGE_BULK_QUEUE
+    ),
+)
+CELERY_TASK_ROUTES = ('config.routing.route_task',)
 
 CELERY_INCLUDE = 'papermerge.core.tasks'
-CELERY_RESULT_BACKEND = 'rpc://'
+# rpc backend (default) does not support chords, which are used with
+# OCR_PAGES_PER_TASK; use e.g. "redis://localhost:6379/1" instead.
+CELERY_RESULT_BACKEND = cfg_papermerge.get_var(
+    'RESULT_BACKEND',
+    default='rpc://'
+)
 CELERY_TASK_RESULT_EXPIRES = 86400
 
 REST_FRAMEWORK = {
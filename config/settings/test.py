@@ -25,6 +25,13 @@ INSTALLED_APPS = (
     'papermerge.core',
     'papermerge.contrib.admin',
     'papermerge.test',
+    'papermerge.viewer',
+    'papermerge.access',
+    'papermerge.metadata',
+    'papermerge.automates',
+    'papermerge.importers',
+    'papermerge.backups',
+    'papermerge.fulltext',
     'allauth',
     'allauth.account',
     'allauth.socialaccount',
@@ -112,6 +119,9 @@ CACHES = {
     }
 }
 
+# tests run in one process
+SILENCED_SYSTEM_CHECKS = ['wsignals.W001']
+
 # guess where BINARY_STAPLER is located
 if not BINARY_STAPLER:  # if BINARY_STAPLER was not set in papermerge.conf.py
     try:  # maybe it is in virtual environment?
@@ -12,7 +12,13 @@ js_info_dict = {
 
 
 urlpatterns = [
+    # overrides some of core's endpoints, must be included before core
+    path('api/', include('papermerge.access.urls')),
+    path('api/', include('papermerge.metadata.urls')),
     path('api/', include('papermerge.core.urls')),
+    path('viewer/', include('papermerge.viewer.urls')),
+    path('fulltext/', include('papermerge.fulltext.urls')),
+    path('backups/', include('papermerge.backups.urls')),
 ]
 
 for extra_urls in settings.EXTRA_URLCONF:
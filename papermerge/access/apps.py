@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AccessConfig(AppConfig):
+    # Materialized effective permissions of nodes
+    name = 'papermerge.access'
+    label = 'access'
+
+    def ready(self):
+        from papermerge.access import signals  # noqa
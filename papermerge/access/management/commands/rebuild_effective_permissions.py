@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from papermerge.access.models import EffectivePermission
+
+
+class Command(BaseCommand):
+
+    help = """Recomputes effective permissions of all nodes.
+
+    Needed once after installing the access app; afterwards effective
+    permissions are kept up to date automatically.
+"""
+
+    def handle(self, *args, **options):
+        count = EffectivePermission.objects.rebuild()
+        self.stdout.write(
+            f"Effective permissions of {count} nodes updated."
+        )
@@ -0,0 +1,79 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from papermerge.access.models import BATCH_SIZE, effective_perms
+
+
+def fill_effective_permissions(apps, schema_editor):
+    Access = apps.get_model('core', 'Access')
+    EffectivePermission = apps.get_model('access', 'EffectivePermission')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    members = {}
+    for user_id, group_id in User.groups.through.objects.values_list(
+        'user_id', 'group_id'
+    ):
+        members.setdefault(group_id, []).append(user_id)
+
+    node_ids = sorted(
+        set(Access.objects.values_list('node_id', flat=True))
+    )
+    for index in range(0, len(node_ids), BATCH_SIZE):
+        access_rows = Access.objects.filter(
+            node_id__in=node_ids[index:index + BATCH_SIZE]
+        ).values_list(
+            'node_id',
+            'user_id',
+            'group_id',
+            'access_type',
+            'permissions__codename'
+        )
+        EffectivePermission.objects.bulk_create([
+            EffectivePermission(node_id=node_id, user_id=user_id, perms=mask)
+            for (node_id, user_id), mask in effective_perms(
+                access_rows, members
+            ).items()
+        ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0039_auto_20210216_1014'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID'
+                )),
+                ('perms', models.PositiveSmallIntegerField(default=0)),
+                ('node', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='effective_permissions',
+                    to='core.basetreenode'
+                )),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='effective_permissions',
+                    to=settings.AUTH_USER_MODEL
+                )),
+            ],
+            options={
+                'unique_together': {('user', 'node')},
+            },
+        ),
+        migrations.RunPython(
+            fill_effective_permissions,
+            migrations.RunPython.noop
+        ),
+    ]
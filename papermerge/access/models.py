@@ -0,0 +1,261 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import F, Q
+
+from papermerge.core.models import Access
+
+# bit of each permission in ``EffectivePermission.perms``
+PERM_BITS = {
+    Access.PERM_READ: 1,
+    Access.PERM_WRITE: 2,
+    Access.PERM_DELETE: 4,
+    Access.PERM_CHANGE_PERM: 8,
+    Access.PERM_TAKE_OWNERSHIP: 16,
+}
+
+# number of nodes refreshed at once
+BATCH_SIZE = 500
+
+# ids of nodes to refresh, collected by ``EffectivePermissionManager.deferred``
+_deferred = threading.local()
+
+
+def perms_mask(perms):
+    """
+    Returns bitmask of given permission codenames.
+    """
+    mask = 0
+    for perm in perms:
+        mask |= PERM_BITS[perm]
+
+    return mask
+
+
+def mask_perms(mask):
+    """
+    Returns set of permission codenames of given bitmask.
+    """
+    return {perm for perm, bit in PERM_BITS.items() if mask & bit}
+
+
+def effective_perms(access_rows, members):
+    """
+    Computes effective permissions from access entries.
+
+    ``access_rows`` is an iterable of
+    (node_id, user_id, group_id, access_type, permission codename)
+    tuples (one per permission of access entry); ``members`` maps
+    group_id -> list of ids of group's users.
+
+    Returns dictionary (node_id, user_id) -> bitmask; users without
+    any permission on the node are left out. Same rules as
+    ``papermerge.core.auth.NodeAuthBackend``: permissions allowed by
+    user's or its groups' access entries, except those denied by any
+    of them.
+    """
+    allow = defaultdict(int)
+    deny = defaultdict(int)
+
+    for node_id, user_id, group_id, access_type, codename in access_rows:
+        bit = PERM_BITS.get(codename, 0)
+        if not bit:
+            continue
+
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = members.get(group_id, ())
+
+        masks = deny if access_type == Access.DENY else allow
+        for principal_id in user_ids:
+            masks[(node_id, principal_id)] |= bit
+
+    result = {}
+    for key, mask in allow.items():
+        mask &= ~deny.get(key, 0)
+        if mask:
+            result[key] = mask
+
+    return result
+
+
+def group_members(group_ids, user_ids=None):
+    Membership = get_user_model().groups.through
+
+    memberships = Membership.objects.filter(group_id__in=group_ids)
+    if user_ids is not None:
+        memberships = memberships.filter(user_id__in=user_ids)
+
+    members = defaultdict(list)
+    for user_id, group_id in memberships.values_list('user_id', 'group_id'):
+        members[group_id].append(user_id)
+
+    return members
+
+
+class EffectivePermissionManager(models.Manager):
+
+    def refresh(self, node_ids, user_ids=None):
+        """
+        Recomputes effective permissions of given nodes from their
+        access entries; only of given users, if ``user_ids`` is
+        not None.
+        """
+        pending = getattr(_deferred, 'node_ids', None)
+        if pending is not None:
+            pending.update(node_ids)
+            return
+
+        node_ids = sorted(set(node_ids))
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            if not user_ids:
+                return
+
+        for index in range(0, len(node_ids), BATCH_SIZE):
+            self._refresh(node_ids[index:index + BATCH_SIZE], user_ids)
+
+    @contextmanager
+    def deferred(self):
+        """
+        Within this context, refreshes are only collected; all
+        collected nodes are refreshed at once on exit. Meant for bulk
+        changes of access entries, which would otherwise refresh
+        effective permissions once per changed entry.
+        """
+        if getattr(_deferred, 'node_ids', None) is not None:
+            # nested context, outermost one refreshes
+            yield
+            return
+
+        _deferred.node_ids = set()
+        try:
+            yield
+            node_ids = _deferred.node_ids
+        finally:
+            _deferred.node_ids = None
+
+        self.refresh(node_ids)
+
+    def _refresh(self, node_ids, user_ids):
+        access_rows = Access.objects.filter(
+            node_id__in=node_ids
+        ).values_list(
+            'node_id',
+            'user_id',
+            'group_id',
+            'access_type',
+            'permissions__codename'
+        )
+        existing = self.filter(node_id__in=node_ids)
+        if user_ids is not None:
+            access_rows = access_rows.filter(
+                Q(user_id__in=user_ids) | Q(group_id__isnull=False)
+            )
+            existing = existing.filter(user_id__in=user_ids)
+
+        access_rows = list(access_rows)
+        members = group_members(
+            {row[2] for row in access_rows if row[2] is not None},
+            user_ids
+        )
+        expected = effective_perms(access_rows, members)
+
+        to_delete = []
+        to_update = []
+        for pk, node_id, user_id, perms in existing.values_list(
+            'pk', 'node_id', 'user_id', 'perms'
+        ):
+            mask = expected.pop((node_id, user_id), None)
+            if mask is None:
+                to_delete.append(pk)
+            elif mask != perms:
+                to_update.append(self.model(pk=pk, perms=mask))
+
+        to_create = [
+            self.model(node_id=node_id, user_id=user_id, perms=mask)
+            for (node_id, user_id), mask in expected.items()
+        ]
+
+        with transaction.atomic():
+            if to_delete:
+                self.filter(pk__in=to_delete).delete()
+            if to_update:
+                self.bulk_update(to_update, ['perms'], batch_size=BATCH_SIZE)
+            if to_create:
+                self.bulk_create(to_create, batch_size=BATCH_SIZE)
+
+    def rebuild(self):
+        """
+        Recomputes effective permissions of all nodes. Returns number
+        of nodes with access entries.
+        """
+        node_ids = list(
+            Access.objects.values_list('node_id', flat=True).distinct()
+        )
+        with transaction.atomic():
+            self.exclude(node_id__in=Access.objects.values('node_id')).delete()
+            self.refresh(node_ids)
+
+        return len(node_ids)
+
+
+class EffectivePermission(models.Model):
+    """
+    Permissions the user has on the node, as resolved from the node's
+    access entries (of the user and of user's groups), stored as
+    bitmask of ``PERM_BITS``.
+
+    Kept up to date by signal handlers (see ``papermerge.access.signals``)
+    so that listing nodes a user can read is one indexed lookup per node
+    instead of evaluation of access entries.
+    """
+    node = models.ForeignKey(
+        'core.BaseTreeNode',
+        models.CASCADE,
+        related_name='effective_permissions'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        models.CASCADE,
+        related_name='effective_permissions'
+    )
+    perms = models.PositiveSmallIntegerField(default=0)
+
+    objects = EffectivePermissionManager()
+
+    class Meta:
+        # (user, node) index serves lookups of ``filter_by_perms``
+        unique_together = [('user', 'node')]
+
+    def __str__(self):
+        return f"EffectivePermission({self.node_id}, {self.user_id}, ...)"
+
+
+def filter_by_perms(
+    queryset,
+    user,
+    perms=(Access.PERM_READ,),
+    node_field='pk'
+):
+    """
+    Restricts queryset to objects whose node (given by ``node_field``,
+    e.g. 'document_id' for pages) the user has all given
+    permissions on.
+    """
+    mask = perms_mask(perms)
+    granted = EffectivePermission.objects.annotate(
+        granted=F('perms').bitand(mask)
+    ).filter(
+        user=user,
+        granted=mask
+    ).values('node_id')
+
+    # plain ``IN`` lookup, so that the filter is a lookup on
+    # ``node_field`` (as expected e.g. by search query compilers)
+    return queryset.filter(**{f"{node_field}__in": granted})
@@ -0,0 +1,276 @@
+"""
+Set based propagation of access entries to descendants of a node.
+
+Does what ``BaseTreeNode.propagate_changes`` does for access diffs,
+but instead of visiting descendants one by one (and saving every
+access entry, with its permissions, separately), descendants are
+selected by their MPTT range and changed with a few bulk queries per
+chunk of ``chunk_size`` nodes. Each chunk is changed in its own
+transaction, so that locks are held only for a short time.
+"""
+from itertools import chain
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.db.models import Q
+
+from papermerge.core.models import Access, BaseTreeNode, Diff
+
+from .models import EffectivePermission
+
+# number of nodes changed in one transaction
+CHUNK_SIZE = 1000
+
+
+def access_data(access):
+    """
+    Returns JSON serializable description of access entry
+    (to be passed to celery task).
+    """
+    return {
+        'user_id': access.user_id,
+        'group_id': access.group_id,
+        'access_type': access.access_type,
+        'permissions': sorted(access.perms_codenames()),
+    }
+
+
+def diffs_data(diffs):
+    """
+    Returns JSON serializable description of list of access diffs.
+    """
+    return [
+        {
+            'operation': diff.operation,
+            'access': [access_data(access) for access in diff],
+        }
+        for diff in diffs
+        if len(diff) > 0 and isinstance(diff.first(), Access)
+    ]
+
+
+def as_diffs_data(diffs):
+    """
+    ``diffs`` is a list of ``papermerge.core.models.Diff`` with access
+    entries or its ``diffs_data``.
+    """
+    diffs = list(diffs)
+    if diffs and isinstance(diffs[0], Diff):
+        return diffs_data(diffs)
+
+    return diffs
+
+
+def count_descendants(node):
+    return (node.rght - node.lft - 1) // 2
+
+
+def descendant_chunks(node, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of ids of node's descendants, in tree order
+    (by ``lft``). Each list has at most ``chunk_size`` ids.
+    """
+    lft = node.lft
+    while True:
+        rows = list(
+            BaseTreeNode.objects.filter(
+                tree_id=node.tree_id,
+                lft__gt=lft,
+                rght__lt=node.rght
+            ).order_by('lft').values_list('id', 'lft')[:chunk_size]
+        )
+        if not rows:
+            return
+        yield [node_id for node_id, _ in rows]
+        lft = rows[-1][1]
+
+
+def principal_q(entry):
+    if entry['user_id'] is not None:
+        return Q(user_id=entry['user_id'])
+
+    return Q(group_id=entry['group_id'])
+
+
+class AccessPropagation:
+
+    def __init__(self, diffs):
+        self.diffs = as_diffs_data(diffs)
+        self._permission_ids = {}
+
+    def permission_ids(self, codenames):
+        key = tuple(sorted(codenames))
+        if key not in self._permission_ids:
+            self._permission_ids[key] = list(
+                Permission.objects.filter(
+                    content_type__app_label='core',
+                    content_type__model='access',
+                    codename__in=key
+                ).values_list('id', flat=True)
+            )
+
+        return self._permission_ids[key]
+
+    def set_permissions(self, access_ids, codenames):
+        Through = Access.permissions.through
+
+        Through.objects.filter(access_id__in=access_ids).delete()
+        Through.objects.bulk_create([
+            Through(access_id=access_id, permission_id=permission_id)
+            for access_id in access_ids
+            for permission_id in self.permission_ids(codenames)
+        ])
+
+    def delete(self, access_ids):
+        access_ids = list(access_ids)
+        Access.permissions.through.objects.filter(
+            access_id__in=access_ids
+        ).delete()
+        Access.objects.filter(id__in=access_ids).delete()
+
+    def add(self, node_ids, entry):
+        """
+        Adds inherited copy of access entry to the nodes which
+        do not have an entry of the same user/group yet.
+        """
+        principal = principal_q(entry)
+        existing = set(
+            Access.objects.filter(
+                principal,
+                node_id__in=node_ids
+            ).values_list('node_id', flat=True)
+        )
+        new_node_ids = [
+            node_id for node_id in node_ids if node_id not in existing
+        ]
+        Access.objects.bulk_create([
+            Access(
+                node_id=node_id,
+                user_id=entry['user_id'],
+                group_id=entry['group_id'],
+                access_type=entry['access_type'],
+                access_inherited=True
+            )
+            for node_id in new_node_ids
+        ])
+        # (ids of bulk created rows are not returned by all databases)
+        self.set_permissions(
+            Access.objects.filter(
+                principal,
+                node_id__in=new_node_ids
+            ).values_list('id', flat=True),
+            entry['permissions']
+        )
+
+    def update(self, node_ids, entry):
+        """
+        Updates entries of the same user/group.
+        """
+        access_ids = list(
+            Access.objects.filter(
+                principal_q(entry),
+                node_id__in=node_ids
+            ).values_list('id', flat=True)
+        )
+        Access.objects.filter(id__in=access_ids).update(
+            access_type=entry['access_type']
+        )
+        self.set_permissions(access_ids, entry['permissions'])
+
+    def apply(self, node_ids):
+        for diff in self.diffs:
+            operation = diff['operation']
+            entries = diff['access']
+
+            if operation == Diff.REPLACE:
+                self.delete(
+                    Access.objects.filter(
+                        node_id__in=node_ids
+                    ).values_list('id', flat=True)
+                )
+
+            for entry in entries:
+                if operation in (Diff.ADD, Diff.REPLACE):
+                    self.add(node_ids, entry)
+                elif operation == Diff.UPDATE:
+                    self.update(node_ids, entry)
+                elif operation == Diff.DELETE:
+                    self.delete(
+                        Access.objects.filter(
+                            principal_q(entry),
+                            node_id__in=node_ids
+                        ).values_list('id', flat=True)
+                    )
+                else:
+                    raise ValueError(f"Unexpected diff operation {operation}")
+
+        EffectivePermission.objects.refresh(node_ids)
+
+
+def propagate_access(
+    node,
+    diffs,
+    apply_to_self=False,
+    chunk_size=CHUNK_SIZE,
+    progress=None
+):
+    """
+    Applies access diffs to all descendants of the node (and to the
+    node itself if ``apply_to_self`` is True).
+
+    ``progress`` is an optional callable, called with (done, total)
+    number of nodes after each chunk.
+
+    Returns number of changed nodes.
+    """
+    propagation = AccessPropagation(diffs)
+    total = count_descendants(node)
+    chunks = descendant_chunks(node, chunk_size)
+    if apply_to_self:
+        total += 1
+        chunks = chain([[node.id]], chunks)
+
+    done = 0
+    for node_ids in chunks:
+        with transaction.atomic():
+            with EffectivePermission.objects.deferred():
+                propagation.apply(node_ids)
+        done += len(node_ids)
+        if progress:
+            progress(done, total)
+
+    return done
+
+
+def propagate_access_changes(node, diffs, apply_to_self=False, user=None):
+    """
+    Same as ``propagate_access``, but if the node has more than
+    ``PAPERMERGE_ACCESS_PROPAGATION_ASYNC_MIN_NODES`` descendants,
+    propagation runs as background celery task (which reports progress
+    to the ``user``).
+
+    Returns True if propagation was done, False if it was scheduled.
+    """
+    from .tasks import propagate_access_task
+
+    threshold = settings.PAPERMERGE_ACCESS_PROPAGATION_ASYNC_MIN_NODES
+    if threshold is None or count_descendants(node) <= threshold:
+        propagate_access(
+            node,
+            diffs,
+            apply_to_self=apply_to_self,
+            chunk_size=settings.PAPERMERGE_ACCESS_PROPAGATION_CHUNK_SIZE
+        )
+        return True
+
+    propagate_access_task.apply_async(
+        kwargs={
+            'node_id': node.id,
+            'diffs': as_diffs_data(diffs),
+            'apply_to_self': apply_to_self,
+            'user_id': user.id if user else None,
+        }
+    )
+
+    return False
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from papermerge.core import signals as core_signals
+from papermerge.core.auth import create_access
+from papermerge.core.models import Access, Diff, Document, Folder
+
+from .models import EffectivePermission
+from .propagation import propagate_access_changes
+
+User = get_user_model()
+
+# Core's receivers replace access of saved node (and of all its
+# descendants) node by node, see ``node_post_save``. They are replaced
+# by ``node_saved_handler``, which does the same in bulk.
+post_save.disconnect(core_signals.save_node_folder, sender=Folder)
+post_save.disconnect(core_signals.save_node_doc, sender=Document)
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_save, sender=Document)
+def node_saved_handler(sender, instance, created, **kwargs):
+    """
+    Owner of new node gets full access to it. Node with a parent
+    (new, moved or just saved) and all its descendants inherit
+    access entries of the parent.
+    """
+    if created:
+        create_access(
+            node=instance,
+            model_type=Access.MODEL_USER,
+            name=instance.user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions=Access.OWNER_PERMS_MAP  # full access
+        )
+
+    if instance.parent_id:
+        propagate_access_changes(
+            instance,
+            [
+                Diff(
+                    operation=Diff.REPLACE,
+                    instances_set=instance.parent.access_set.all()
+                )
+            ],
+            apply_to_self=True,
+            user=instance.user
+        )
+
+
+@receiver(post_save, sender=Access)
+@receiver(post_delete, sender=Access)
+def access_changed_handler(sender, instance, **kwargs):
+    """
+    Access entry was created, changed (e.g. from allow to deny) or
+    deleted. Access entries are copied down the tree by core, so this
+    covers inheritance as well.
+    """
+    EffectivePermission.objects.refresh([instance.node_id])
+
+
+@receiver(m2m_changed, sender=Access.permissions.through)
+def access_permissions_changed_handler(
+    sender,
+    instance,
+    action,
+    reverse,
+    pk_set,
+    **kwargs
+):
+    """
+    Permissions were added to/removed from access entry
+    (``Access.set_perms``, ``Access.create``).
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            EffectivePermission.objects.refresh([instance.node_id])
+        return
+
+    # instance is a Permission and pk_set are ids of Access entries
+    if action == 'pre_clear':
+        instance._access_node_ids = list(
+            instance.access_set.values_list('node_id', flat=True)
+        )
+    elif action == 'post_clear':
+        EffectivePermission.objects.refresh(
+            getattr(instance, '_access_node_ids', [])
+        )
+    elif action in ('post_add', 'post_remove'):
+        EffectivePermission.objects.refresh(
+            Access.objects.filter(
+                pk__in=pk_set
+            ).values_list('node_id', flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def group_membership_changed_handler(
+    sender,
+    instance,
+    action,
+    reverse,
+    pk_set,
+    **kwargs
+):
+    """
+    User was added to/removed from group: permissions granted to the
+    group now apply/do not apply to the user.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        # instance is a User, pk_set are ids of groups
+        if action == 'post_clear':
+            # user can only lose permissions
+            node_ids = EffectivePermission.objects.filter(
+                user=instance
+            ).values_list('node_id', flat=True)
+        else:
+            node_ids = Access.objects.filter(
+                group_id__in=pk_set
+            ).values_list('node_id', flat=True)
+        EffectivePermission.objects.refresh(node_ids, [instance.pk])
+        return
+
+    # instance is a Group, pk_set are ids of users
+    node_ids = Access.objects.filter(
+        group=instance
+    ).values_list('node_id', flat=True)
+    if action == 'post_clear':
+        EffectivePermission.objects.refresh(node_ids)
+    else:
+        EffectivePermission.objects.refresh(node_ids, pk_set)
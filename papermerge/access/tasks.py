@@ -0,0 +1,42 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from papermerge.core.models import BaseTreeNode
+from papermerge.wsignals.groups import notify_progress
+
+from .propagation import propagate_access
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def propagate_access_task(node_id, diffs, apply_to_self=False, user_id=None):
+    """
+    Applies access diffs (``papermerge.access.propagation.diffs_data``)
+    to descendants of the node. Progress is sent to the user who
+    changed access of the node.
+    """
+    try:
+        node = BaseTreeNode.objects.get(id=node_id)
+    except BaseTreeNode.DoesNotExist:
+        logger.warning(f"Node {node_id} was deleted before access propagation")
+        return 0
+
+    def progress(done, total):
+        notify_progress(
+            'access.propagation',
+            user_id,
+            node_id,
+            done,
+            total
+        )
+
+    return propagate_access(
+        node,
+        diffs,
+        apply_to_self=apply_to_self,
+        chunk_size=settings.PAPERMERGE_ACCESS_PROPAGATION_CHUNK_SIZE,
+        progress=progress
+    )
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'access'
+
+urlpatterns = [
+    path(
+        'node/<int:id>/access', views.access_view, name="access"
+    ),
+]
@@ -0,0 +1,69 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden
+)
+from papermerge.core.auth import delete_access_perms, set_access_perms
+from papermerge.core.models import Access, BaseTreeNode
+from papermerge.core.views.access import access_view as core_access_view
+
+from .propagation import propagate_access_changes
+
+
+@login_required
+def access_view(request, id):
+    """
+    Same as core's ``access_view`` (and served under the same URL, see
+    ``config.urls``), but changed access entries are propagated to
+    descendants of the node with ``propagate_access_changes`` (in bulk,
+    in background for large subtrees) instead of node by node.
+    """
+    if request.method != 'POST':
+        return core_access_view(request, id)
+
+    try:
+        node = BaseTreeNode.objects.get(id=id)
+    except BaseTreeNode.DoesNotExist:
+        raise Http404("Node does not exists")
+
+    if not request.user.has_perm(Access.PERM_READ, node):
+        return HttpResponseForbidden()
+
+    # request.is_ajax is deprecated since Django 3.1
+    if request.headers.get('x-requested-with') != 'XMLHttpRequest':
+        return HttpResponseBadRequest()
+
+    if not request.user.has_perm(Access.PERM_CHANGE_PERM, node):
+        return HttpResponseForbidden()
+
+    access_data = json.loads(request.body)
+    access_diffs = []
+    if 'add' in access_data.keys():
+        access_diffs.extend(set_access_perms(node, access_data['add']))
+    if 'delete' in access_data.keys():
+        if len(access_data['delete']) > 0:
+            access_diffs.extend(
+                delete_access_perms(node, access_data['delete'])
+            )
+
+    if access_diffs:
+        propagate_access_changes(
+            node,
+            access_diffs,
+            apply_to_self=False,
+            user=request.user
+        )
+
+    return HttpResponse(
+        json.dumps(
+            {
+                'access': [],
+                'node_id': node.id
+            }
+        ),
+        content_type="application/json"
+    )
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AutomatesConfig(AppConfig):
+    # Compiled matching of automates
+    name = 'papermerge.automates'
+    label = 'automates'
+
+    def ready(self):
+        from papermerge.automates import signals  # noqa
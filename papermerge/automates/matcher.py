@@ -0,0 +1,233 @@
+"""
+Matching of page text against all automates of a user in one pass.
+
+``Automate.is_a_match`` searches the text once per word of each
+automate; with hundreds of automates per user, every OCRed page is
+scanned hundreds of times. ``AutomateMatcher`` compiles all automates
+of the user at once:
+
+    * words of MATCH_ANY/MATCH_ALL/MATCH_LITERAL automates which
+      consist of word characters only (most of them) are looked up in
+      the set of words of the text, collected with one scan of the text
+    * everything else (MATCH_REGEX automates, words with regular
+      expression syntax or quoted phrases) is searched with its own
+      regular expression, each one at most once per text and only if
+      outcome of some automate still depends on it
+
+Same matching rules as ``Automate.is_a_match``.
+"""
+import logging
+import re
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from papermerge.core.models import Automate
+
+logger = logging.getLogger(__name__)
+
+# process local cache of compiled matchers: user_id -> (version, matcher)
+_matchers = {}
+_lock = threading.Lock()
+
+WORDS_RE = re.compile(r"\w+")
+
+# ``\bword\b`` term of plain word
+WORD_TERM_RE = re.compile(r"\\b(\w+)\\b")
+
+
+def split_match(match):
+    """
+    Same as ``Automate._split_match``.
+    """
+    findterms = re.compile(r'"([^"]+)"|(\S+)').findall
+    normspace = re.compile(r"\s+").sub
+    return [
+        normspace(" ", (t[0] or t[1]).strip()).replace(" ", r"\s+")
+        for t in findterms(match)
+    ]
+
+
+def automate_terms(automate):
+    """
+    Returns list of regular expressions of automate's match, as
+    searched by ``Automate.is_a_match`` (empty list if automate
+    never matches).
+    """
+    if automate.match.strip() == "":
+        return []
+
+    algorithm = automate.matching_algorithm
+    if algorithm in (Automate.MATCH_ANY, Automate.MATCH_ALL):
+        return [
+            r"\b{}\b".format(word) for word in split_match(automate.match)
+        ]
+
+    if algorithm == Automate.MATCH_LITERAL:
+        return [r"\b{}\b".format(automate.match)]
+
+    if algorithm == Automate.MATCH_REGEX:
+        return [automate.match]
+
+    return []
+
+
+class TextTerms:
+    """
+    Terms found in one text; regular expressions are searched lazily.
+    """
+
+    def __init__(self, matcher, text):
+        self.matcher = matcher
+        self.text = text
+        self._words = {}
+        self._found = {}
+
+    def words(self, case_sensitive):
+        if case_sensitive not in self._words:
+            text = self.text if case_sensitive else self.text.lower()
+            self._words[case_sensitive] = set(WORDS_RE.findall(text))
+
+        return self._words[case_sensitive]
+
+    def is_found(self, index):
+        if index not in self._found:
+            self._found[index] = self.matcher.search(index, self)
+
+        return self._found[index]
+
+
+class AutomateMatcher:
+
+    def __init__(self, automates):
+        """
+        ``automates`` is an iterable of ``Automate`` instances.
+        """
+        # number of given automates
+        self.count = 0
+        # per automate: (id, needs all terms, list of term indexes)
+        self.rules = []
+        # per term: (word, is case sensitive) of plain word terms,
+        # compiled regular expression (or None if invalid) of others
+        self.terms = []
+        term_indexes = {}
+
+        for automate in automates:
+            self.count += 1
+            indexes = []
+            for term in automate_terms(automate):
+                key = (term, automate.is_case_sensitive)
+                if key not in term_indexes:
+                    term_indexes[key] = len(self.terms)
+                    self.terms.append(self._compile(*key))
+                indexes.append(term_indexes[key])
+            if indexes:
+                # plain words first, they are cheaper to check
+                indexes.sort(
+                    key=lambda index: not isinstance(self.terms[index], tuple)
+                )
+                self.rules.append((
+                    automate.id,
+                    automate.matching_algorithm == Automate.MATCH_ALL,
+                    indexes
+                ))
+
+    def _compile(self, term, case_sensitive):
+        word = WORD_TERM_RE.fullmatch(term)
+        if word:
+            word = word.group(1)
+            return (word if case_sensitive else word.lower(), case_sensitive)
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            return re.compile(term, flags)
+        except re.error as e:
+            # ``Automate.is_a_match`` would raise; such automate
+            # never matches here
+            logger.warning(f"Invalid automate expression {term}: {e}")
+            return None
+
+    def search(self, index, text_terms):
+        term = self.terms[index]
+        if term is None:
+            return False
+
+        if isinstance(term, tuple):
+            word, case_sensitive = term
+            return word in text_terms.words(case_sensitive)
+
+        return term.search(text_terms.text) is not None
+
+    def match(self, text):
+        """
+        Returns ids of automates matching the text, in order in which
+        automates were given.
+        """
+        text_terms = TextTerms(self, text)
+        matched = []
+        for automate_id, match_all, indexes in self.rules:
+            found = (text_terms.is_found(index) for index in indexes)
+            if all(found) if match_all else any(found):
+                matched.append(automate_id)
+
+        return matched
+
+
+def version_key(user_id):
+    return f"automates_version_{user_id}"
+
+
+def get_version(user_id):
+    """
+    Returns version of user's automates. Versions are random tokens,
+    so that a version evicted from the cache is never reused.
+    """
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # no version yet, or evicted
+        cache.add(version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(version_key(user_id))
+
+    return version
+
+
+def get_matcher(user_id):
+    """
+    Returns compiled matcher of all automates of the user.
+
+    Matchers are cached per process; cached matcher is used as long
+    as version of user's automates (kept in django cache, changed by
+    ``invalidate_matcher``) is unchanged. Automates are edited in the
+    webapp and matched in workers, so django cache must be shared by
+    all processes (see CACHES in settings).
+    """
+    version = get_version(user_id)
+    with _lock:
+        cached = _matchers.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    matcher = AutomateMatcher(
+        Automate.objects.filter(user_id=user_id).order_by('id')
+    )
+    with _lock:
+        _matchers[user_id] = (version, matcher)
+
+    return matcher
+
+
+def invalidate_matcher(user_id):
+    with _lock:
+        _matchers.pop(user_id, None)
+
+    cache.set(version_key(user_id), uuid.uuid4().hex, None)
+
+
+def matching_automates(user_id, text):
+    """
+    Returns queryset of user's automates matching the text.
+    """
+    return Automate.objects.filter(
+        pk__in=get_matcher(user_id).match(text)
+    ).order_by('id')
@@ -0,0 +1,209 @@
+import logging
+
+from django.utils.translation import gettext as _
+
+from mglib.path import DocumentPath, PagePath
+from mglib.pdfinfo import get_pagecount
+from mglib.step import Step
+
+from papermerge.core.models import Automate, Document
+from papermerge.core.signal_definitions import automates_matching
+from papermerge.core.storage import default_storage
+from papermerge.wsignals.context import get_document
+
+from .matcher import AutomateMatcher, get_matcher
+
+logger = logging.getLogger(__name__)
+
+
+def matching_message(matched, total):
+    message = _(
+        "%(count)s of %(total)s Automate(s) matched. ") % {
+        'count': len(matched),
+        'total': total
+    }
+
+    if len(matched) > 0:
+        message += _("List of matched Automates: %(matched_automates)s") % {
+            'matched_automates': matched
+        }
+
+    return message
+
+
+def page_text_paths(document, page_nums, version=0):
+    """
+    Yields (page_num, path of page's .txt file) of given pages.
+    """
+    # use text files from the original version of the document
+    doc_path = DocumentPath.copy_from(
+        document.path(version=version)
+    )
+    page_count = get_pagecount(
+        default_storage.abspath(doc_path.url())
+    )
+    for page_num in page_nums:
+        page_path = PagePath(
+            document_path=doc_path,
+            page_num=page_num,
+            page_count=page_count,
+            step=Step(),
+        )
+        yield page_num, default_storage.abspath(page_path.txt_url())
+
+
+def read_text(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def apply_automates(document_id, page_num, **kwargs):
+    """
+    Same as ``papermerge.core.automate.apply_automates``, but page
+    text is matched against compiled matcher of all automates of
+    document's user (one scan of the text); only matching automates
+    are loaded from database.
+    """
+    version = kwargs.get('version', 0)
+    try:
+        document = get_document(document_id)
+    except Document.DoesNotExist:
+        logger.error(f"Provided document_id={document_id}, does not exists")
+        return
+
+    matcher = get_matcher(document.user_id)
+    # are there automates for the user?
+    if matcher.count == 0:
+        logger.debug(
+            f"No automates for user {document.user_id}. Quit."
+        )
+        return
+
+    _, text_path = next(page_text_paths(document, [page_num], version))
+    text = read_text(text_path)
+
+    matched = list(
+        Automate.objects.filter(
+            pk__in=matcher.match(text)
+        ).order_by('id')
+    )
+    for automate in matched:
+        logger.debug(f"Automate {automate} matched document={document}")
+        automate.apply(
+            document=document,
+            page_num=page_num,
+            text=text,
+        )
+
+    automates_matching.send(
+        sender="papermerge.core.automate",
+        user_id=document.user_id,
+        document_id=document_id,
+        level=logging.INFO,
+        message=matching_message(matched, matcher.count),
+        page_num=page_num,
+        text=text,
+        **kwargs
+    )
+
+
+def apply_document_automates(document_id, version=0):
+    """
+    Runs automates once for the whole document, after all its pages
+    were OCRed (instead of ``apply_automates`` for every page).
+
+    Page texts are read and matched one by one; each automate which
+    matches at least one page is applied once, with the first page it
+    matched. One ``automates_matching`` signal is sent per document
+    (with ``page_num`` of None).
+
+    Returns list of applied automates.
+    """
+    try:
+        document = get_document(document_id)
+    except Document.DoesNotExist:
+        logger.error(f"Provided document_id={document_id}, does not exists")
+        return []
+
+    matcher = get_matcher(document.user_id)
+    if matcher.count == 0:
+        logger.debug(
+            f"No automates for user {document.user_id}. Quit."
+        )
+        return []
+
+    # automate id -> (page_num, text) of first matching page
+    first_match = {}
+    page_nums = range(1, document.page_count + 1)
+    for page_num, text_path in page_text_paths(document, page_nums, version):
+        try:
+            text = read_text(text_path)
+        except OSError as e:
+            logger.warning(
+                f"No text of doc_id={document_id} page {page_num}: {e}"
+            )
+            continue
+        for automate_id in matcher.match(text):
+            first_match.setdefault(automate_id, (page_num, text))
+        if len(first_match) == len(matcher.rules):
+            # all automates matched already
+            break
+
+    matched = list(
+        Automate.objects.filter(pk__in=first_match).order_by('id')
+    )
+    for automate in matched:
+        page_num, text = first_match[automate.id]
+        logger.debug(f"Automate {automate} matched document={document}")
+        automate.apply(
+            document=document,
+            page_num=page_num,
+            text=text,
+        )
+
+    automates_matching.send(
+        sender="papermerge.core.automate",
+        user_id=document.user_id,
+        document_id=document_id,
+        level=logging.INFO,
+        message=matching_message(matched, matcher.count),
+        page_num=None,
+        text=None
+    )
+
+    return matched
+
+
+def run_automates(automates, pages):
+    """
+    Same as ``Automate.objects.run(pages)``: runs given automates
+    (e.g. selected by the user) over given pages, but each page text
+    is scanned once for all automates.
+
+    Returns queryset of automates which matched at least one page.
+    """
+    automates = {automate.id: automate for automate in automates}
+    matcher = AutomateMatcher(automates.values())
+    total_matched = set()
+
+    for page in pages:
+        document = page.document
+        matched = [
+            automates[automate_id]
+            for automate_id in matcher.match(page.text)
+        ]
+        for automate in matched:
+            automate.apply(document, page.number, page.text)
+            total_matched.add(automate.id)
+
+        automates_matching.send(
+            sender="papermerge.core.automate",
+            user_id=document.user_id,
+            document_id=document.id,
+            level=logging.INFO,
+            message=matching_message(matched, len(matched)),
+            page_num=page.number,
+            text=page.text
+        )
+
+    return Automate.objects.filter(pk__in=total_matched)
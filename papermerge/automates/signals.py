@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from papermerge.core.models import Automate
+
+from .matcher import invalidate_matcher
+
+
+@receiver(post_save, sender=Automate)
+@receiver(post_delete, sender=Automate)
+def automate_changed_handler(sender, instance, **kwargs):
+    """
+    Automate was created, changed or deleted: compiled matcher of
+    its user is outdated.
+    """
+    invalidate_matcher(instance.user_id)
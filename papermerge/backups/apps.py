@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BackupsConfig(AppConfig):
+    # Streaming and incremental backup and restore of documents
+    name = 'papermerge.backups'
+    label = 'backups'
+
+    def ready(self):
+        from papermerge.backups import signals  # noqa
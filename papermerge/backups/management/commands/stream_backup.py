@@ -0,0 +1,126 @@
+import logging
+import os
+import sys
+import tarfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from papermerge.core.models import User
+from papermerge.backups.stream import (
+    MB,
+    BackupCheckpoint,
+    StreamingBackup,
+    read_header
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """Backups documents as tar archive written to a file or,
+    as it is generated, to standard output (e.g. a pipe). Manifest is
+    written incrementally, as newline-delimited JSON. Progress is kept in
+    a checkpoint file; interrupted backup is continued with --resume,
+    as next part of the archive. With --since, backup is incremental:
+    only documents and folders changed (or deleted) after the given
+    backup are archived.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'location',
+            nargs='?',
+            default='-',
+            help="Archive file ('-' for standard output). With --resume,"
+            " part number is added to file name."
+        )
+        parser.add_argument(
+            '--user',
+            help="Username of the user whose documents are archived"
+            " (by default documents of all users)."
+        )
+        parser.add_argument(
+            '--include-user-password',
+            action='store_true',
+            help="Add digest of users' password to the archive."
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=settings.PAPERMERGE_BACKUP_CHECKPOINT,
+            help="Checkpoint file."
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help="Continue backup recorded in checkpoint file."
+        )
+        parser.add_argument(
+            '--since',
+            help="Previous backup archive (full or incremental);"
+            " archive only changes made after it."
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.PAPERMERGE_BACKUP_CHUNK_SIZE,
+            help="Number of documents described by one manifest member."
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        username = options.get('user')
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"Username {username} not found.")
+
+        checkpoint = options.get('checkpoint') or os.path.join(
+            settings.MEDIA_ROOT,
+            "backup_checkpoint.json"
+        )
+        resume = options.get('resume')
+        if resume and BackupCheckpoint(checkpoint).load().complete:
+            raise CommandError("Backup in checkpoint file is complete.")
+
+        since = None
+        if options.get('since'):
+            with tarfile.open(options.get('since')) as previous:
+                try:
+                    since = read_header(previous)['watermark']
+                except ValueError as e:
+                    raise CommandError(str(e))
+
+        backup = StreamingBackup(
+            user=user,
+            include_user_password=options.get('include_user_password'),
+            checkpoint=checkpoint,
+            resume=resume,
+            since=since,
+            chunk_size=options.get('chunk_size')
+        )
+
+        location = options.get('location')
+        if location == '-':
+            stats = backup.write(sys.stdout.buffer, progress=self.progress)
+        else:
+            if backup.part > 1:
+                base, ext = os.path.splitext(location)
+                location = f"{base}.{backup.part:04d}{ext}"
+            with open(location, 'wb') as f:
+                stats = backup.write(f, progress=self.progress)
+
+        # stdout may be the archive
+        self.stderr.write(
+            f"Part {stats['part']}: {stats['documents']} documents,"
+            f" {stats['bytes'] / MB:.1f} MB in {stats['seconds']:.1f}s"
+            f" ({stats['mb_per_second']:.2f} MB/s)"
+        )
+
+    def progress(self, stats):
+        logger.info(
+            f"{stats['documents']} documents,"
+            f" {stats['bytes'] / MB:.1f} MB"
+            f" ({stats['mb_per_second']:.2f} MB/s)"
+        )
@@ -0,0 +1,103 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from papermerge.core.models import User
+from papermerge.backups.restore import (
+    BackupChain,
+    BackupChainError,
+    RestoreEngine
+)
+from papermerge.backups.stream import MB
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """Restores documents and their folder structure from archives
+    written by stream_backup: a full backup followed by incremental
+    backups (and parts of resumed backups), in the order they were made.
+    If you don't pass username with --user it is assumed that you want
+    to restore "all users" backup.
+    Files are extracted by --workers threads, documents are committed
+    in batches of --batch-size. OCR is skipped for documents with
+    archived OCR text. With --dry-run nothing is restored, only
+    estimated restore time is reported.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'locations',
+            nargs='+',
+            help="Backup archives."
+        )
+        parser.add_argument(
+            '--user',
+            help="user (username of) the restored documents should belong to"
+        )
+        parser.add_argument(
+            '--skip-ocr',
+            action='store_true',
+            help="Do not OCR restored documents."
+        )
+        parser.add_argument(
+            '--workers',
+            '-w',
+            type=int,
+            default=settings.PAPERMERGE_RESTORE_WORKERS,
+            help="Number of files extracted in parallel."
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.PAPERMERGE_RESTORE_BATCH_SIZE,
+            help="Number of documents committed at once."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report what would be restored and estimated time."
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        username = options.get('user')
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"Username {username} not found.")
+
+        chain = BackupChain()
+        try:
+            for location in options.get('locations'):
+                chain.add(location)
+        except (BackupChainError, ValueError) as e:
+            raise CommandError(str(e))
+
+        engine = RestoreEngine(
+            chain,
+            user=user,
+            skip_ocr=options.get('skip_ocr'),
+            workers=options.get('workers'),
+            batch_size=options.get('batch_size')
+        )
+        if options.get('dry_run'):
+            stats = engine.estimate()
+            self.stdout.write(
+                f"{stats['users']} users, {stats['folders']} folders,"
+                f" {stats['documents']} documents"
+                f" ({stats['bytes'] / MB:.1f} MB, {stats['pages']} pages,"
+                f" {stats['ocr_pages']} pages to OCR)."
+                f" Estimated time: {stats['estimated_seconds']:.0f}s"
+                f" (archive read at {stats['mb_per_second']:.1f} MB/s)"
+            )
+            return
+
+        stats = engine.run()
+        self.stdout.write(
+            f"{stats['documents']} documents restored"
+            f" in {stats['seconds']:.1f}s,"
+            f" {stats['ocr_pages']} pages sent to OCR"
+        )
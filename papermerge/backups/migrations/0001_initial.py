@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0039_auto_20210216_1014'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedNode',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID'
+                )),
+                ('node_id', models.IntegerField(unique=True)),
+                ('user_id', models.IntegerField(db_index=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
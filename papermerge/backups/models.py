@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class DeletedNode(models.Model):
+    """
+    Document or folder deleted from the database. Incremental backups
+    list nodes deleted since the previous backup, i.e. with id greater
+    than ``deleted_id`` of its watermark.
+    """
+    node_id = models.IntegerField(unique=True)
+    user_id = models.IntegerField(null=True, db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,831 @@
+"""
+Restore of streaming backups.
+
+Full backup followed by a chain of incremental backups (each made
+``since`` watermark of the previous one) is replayed by ``BackupChain``
+in memory, from manifests only: a later entry of a user, folder or
+document replaces the earlier one and deleted nodes are dropped. Only
+the final state is restored, so each document is extracted once, from
+the last archive which contains it.
+
+``papermerge.core.backup_restore.restore_documents`` creates folders and
+documents one at a time; every insert into the MPTT tree shifts
+``lft``/``rght`` of all following nodes of the tree. ``RestoreEngine``
+instead computes tree fields of restored nodes upfront:
+
+    * archived folders are mapped onto existing folders of the same
+      owner, title and parent (e.g. ``.inbox`` created by core for
+      each user), as core's restore does
+    * missing folders are laid out by ``tree_layout`` and bulk
+      inserted, one query per tree level; subtrees under an existing
+      folder are placed into space made after its last child
+    * documents are created with MPTT updates disabled and get their
+      tree fields with one ``bulk_update`` per batch, after space for
+      them was made in their parent folders (one query per folder)
+
+Folders of the restored user must not be changed while restore is
+running.
+
+Documents are restored in batches of ``batch_size``, each committed in
+its own transaction. Files of a batch are extracted from the archive
+(and their pages counted) by a pool of threads, which also copy them
+into the storage once the batch is committed. Documents with archived
+OCR text of all pages get the text from the archive and are not OCRed.
+"""
+import json
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Max
+from mglib.pdfinfo import get_pagecount
+
+from papermerge.access.models import EffectivePermission
+from papermerge.access.propagation import AccessPropagation
+from papermerge.core.models import (
+    Access,
+    BaseTreeNode,
+    Document,
+    Folder,
+    Tag,
+    User
+)
+from papermerge.core.storage import default_storage
+from papermerge.core.tasks import ocr_page
+from papermerge.core.utils import remove_backup_filename_id
+
+from .stream import (
+    MANIFEST_DIR,
+    MB,
+    READ_SIZE,
+    RESULTS_SUFFIX,
+    read_header,
+    results_dirname
+)
+
+logger = logging.getLogger(__name__)
+
+TREE_FIELDS = ['tree_id', 'lft', 'rght', 'level']
+# number of rows inserted/updated by one query
+BATCH_SIZE = 500
+
+# rough cost of creating one document (node, pages, access entries),
+# used by dry run to estimate restore time
+SECONDS_PER_DOCUMENT = 0.05
+# bytes read from the archive by dry run to measure its throughput
+SAMPLE_SIZE = 64 * MB
+
+
+class BackupChainError(Exception):
+    pass
+
+
+def open_archive(path):
+    """
+    Opens backup archive at ``path``. Archived files are copied from
+    their offsets in the archive file (see ``copy_member``), so the
+    archive must not be compressed.
+    """
+    try:
+        return tarfile.open(path, 'r:')
+    except tarfile.ReadError:
+        try:
+            # readable with (transparent) decompression?
+            tarfile.open(path).close()
+        except tarfile.ReadError:
+            raise BackupChainError(f"{path} is not a tar archive")
+        raise BackupChainError(
+            f"{path} is compressed, decompress it before restore"
+            " (e.g. with gunzip)"
+        )
+
+
+def read_manifest(archive):
+    """
+    Entries of all manifest members of an open ``tarfile.TarFile``.
+    """
+    names = sorted(
+        name for name in archive.getnames()
+        if name.startswith(f"{MANIFEST_DIR}/") and name.endswith('.ndjson')
+    )
+    entries = []
+    for name in names:
+        for line in archive.extractfile(name):
+            entries.append(json.loads(line))
+
+    return entries
+
+
+class BackupChain:
+
+    def __init__(self):
+        # username -> user entry
+        self.users = {}
+        # backup id -> folder entry
+        self.folders = {}
+        # backup id -> (archive path, document entry)
+        self.documents = {}
+        self.username = None
+        self.watermark = None
+        self.since = None
+
+    def add(self, path):
+        """
+        Replays backup archive (or part of it) at ``path``, which must
+        follow previously added ones.
+        """
+        with open_archive(path) as archive:
+            header = read_header(archive)
+            self._check(path, header)
+            entries = read_manifest(archive)
+
+        if header['part'] == 1:
+            self.since = header.get('since')
+            self.watermark = header.get('watermark')
+            self.username = header.get('username')
+
+        deleted = []
+        for entry in entries:
+            kind = entry['type']
+            if kind == 'user':
+                self.users[entry['username']] = entry
+            elif kind == 'folder':
+                self.folders[entry['id']] = entry
+            elif kind == 'document':
+                self.documents[entry['id']] = (path, entry)
+            elif kind == 'deleted':
+                deleted.append(entry['id'])
+
+        for node_id in deleted:
+            self.folders.pop(node_id, None)
+            self.documents.pop(node_id, None)
+
+    def _check(self, path, header):
+        since = header.get('since')
+        if header['part'] > 1:
+            # parts of one backup: watermark of the first part is
+            # valid for the whole backup
+            if self.watermark is None or since != self.since:
+                raise BackupChainError(
+                    f"{path} is part {header['part']} of another backup"
+                )
+        elif since is None:
+            if self.watermark is not None:
+                raise BackupChainError(
+                    f"{path} is a full backup, expected incremental one"
+                )
+        elif since != self.watermark:
+            raise BackupChainError(
+                f"{path} does not follow the previous backup"
+            )
+
+    def restore(self, user=None, skip_ocr=False, **kwargs):
+        """
+        Recreates users (when ``user`` is None), folders and documents.
+        Returns number of restored documents.
+        """
+        engine = RestoreEngine(self, user=user, skip_ocr=skip_ocr, **kwargs)
+
+        return engine.run()['documents']
+
+
+def tree_layout(parents, first_tree_id):
+    """
+    MPTT fields of restored nodes. ``parents`` is a dictionary
+    {node_id: parent_id}; nodes whose parent is not restored are roots
+    of new trees, numbered from ``first_tree_id``. Children are ordered
+    by id.
+
+    Returns {node_id: (tree_id, lft, rght, level)}.
+    """
+    children = {}
+    roots = []
+    for node_id in sorted(parents):
+        parent_id = parents[node_id]
+        if parent_id in parents:
+            children.setdefault(parent_id, []).append(node_id)
+        else:
+            roots.append(node_id)
+
+    layout = {}
+
+    def visit(node_id, tree_id, left, level):
+        right = left + 1
+        for child_id in children.get(node_id, ()):
+            right = visit(child_id, tree_id, right, level + 1) + 1
+        layout[node_id] = (tree_id, left, right, level)
+
+        return right
+
+    for tree_id, root_id in enumerate(roots, start=first_tree_id):
+        visit(root_id, tree_id, 1, 0)
+
+    return layout
+
+
+def make_room(requests):
+    """
+    ``requests`` is a list of (parent_id, size) tuples. For each of them,
+    shifts nodes of parent's tree to make room for ``size`` // 2 new
+    nodes after the last child of node ``parent_id``.
+
+    Returns list of (tree_id, lft, level) of the first new child, one
+    for each request.
+    """
+    rooms = []
+    for parent_id, size in requests:
+        tree_id, rght, level = BaseTreeNode.objects.filter(
+            id=parent_id
+        ).values_list('tree_id', 'rght', 'level').get()
+        BaseTreeNode.objects._create_space(size, rght - 1, tree_id)
+        # rooms made before are empty, nodes in the database were
+        # shifted only
+        rooms = [
+            (room_tree_id, lft + size, room_level)
+            if room_tree_id == tree_id and lft >= rght else
+            (room_tree_id, lft, room_level)
+            for room_tree_id, lft, room_level in rooms
+        ]
+        rooms.append((tree_id, rght, level + 1))
+
+    return rooms
+
+
+def copy_member(archive_path, member, dst):
+    """
+    Copies content of tar ``member`` to ``dst`` file. Archive is opened
+    by each caller, so that members can be copied by several threads.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with open(archive_path, 'rb') as src, open(dst, 'wb') as out:
+        src.seek(member.offset_data)
+        remaining = member.size
+        while remaining > 0:
+            chunk = src.read(min(READ_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"{archive_path} is truncated")
+            remaining -= len(chunk)
+            out.write(chunk)
+
+
+def has_text(results, page_count):
+    """
+    True if OCR text of all pages is among archived OCR ``results``.
+    """
+    return all(
+        f"page_{page_num}.txt" in results
+        for page_num in range(1, page_count + 1)
+    )
+
+
+class Extracted:
+    """
+    Document file and OCR results extracted to temporary directory.
+    """
+
+    def __init__(self, entry, file_path, page_count, results_dir, results):
+        self.entry = entry
+        self.file_path = file_path
+        self.page_count = page_count
+        self.results_dir = results_dir
+        self.results = results
+
+    @property
+    def has_text(self):
+        return has_text(self.results, self.page_count)
+
+
+class RestoreEngine:
+
+    def __init__(
+        self,
+        chain,
+        user=None,
+        skip_ocr=False,
+        workers=None,
+        batch_size=None
+    ):
+        self.chain = chain
+        self.user = user
+        self.skip_ocr = skip_ocr
+        self.workers = workers or settings.PAPERMERGE_RESTORE_WORKERS
+        self.batch_size = batch_size or settings.PAPERMERGE_RESTORE_BATCH_SIZE
+        # username -> user
+        self.owners = {}
+        # backup id -> id of restored (or existing) node
+        self.node_ids = {}
+        # backup ids of folders which exist already
+        self.existing = set()
+        # archive path -> {member name: TarInfo}
+        self.members = {}
+        self.layout = {}
+
+    def owner(self, entry):
+        return self.user or self.owners[entry['user']]
+
+    def documents(self):
+        """
+        Document entries, grouped by archive and ordered by their
+        position in it.
+        """
+        return sorted(
+            self.chain.documents.values(),
+            key=lambda item: (item[0], item[1]['id'])
+        )
+
+    def plan(self):
+        documents = [entry for _, entry in self.chain.documents.values()]
+        pages = sum(entry.get('page_count', 0) for entry in documents)
+        ocr_pages = sum(
+            entry.get('page_count', 0) for entry in documents
+            if not has_text(
+                entry.get('results', []),
+                entry.get('page_count', 0)
+            )
+        )
+
+        return {
+            'users': len(self.chain.users) if self.user is None else 0,
+            'folders': len(self.chain.folders),
+            'documents': len(documents),
+            'bytes': sum(entry['size'] for entry in documents),
+            'pages': pages,
+            'ocr_pages': 0 if self.skip_ocr else ocr_pages,
+        }
+
+    def estimate(self):
+        """
+        Plan of the restore with estimated time; nothing is restored.
+        Throughput of extraction is measured by reading a sample of
+        archived documents.
+        """
+        stats = self.plan()
+        throughput = self.read_throughput()
+        seconds = stats['documents'] * SECONDS_PER_DOCUMENT
+        if throughput:
+            # documents are extracted and then copied into the storage
+            seconds += 2 * stats['bytes'] / MB / throughput
+        stats['mb_per_second'] = round(throughput, 3)
+        stats['estimated_seconds'] = round(seconds, 3)
+
+        return stats
+
+    def read_throughput(self):
+        read = 0
+        started = time.monotonic()
+        for path, entry in self.documents():
+            member = self.archive_members(path).get(entry['path'])
+            if member is None:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(member.offset_data)
+                remaining = min(member.size, SAMPLE_SIZE - read)
+                while remaining > 0:
+                    chunk = f.read(min(READ_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    read += len(chunk)
+            if read >= SAMPLE_SIZE:
+                break
+
+        seconds = time.monotonic() - started
+        if not read or not seconds:
+            return 0
+
+        return read / MB / seconds
+
+    def archive_members(self, path):
+        if path not in self.members:
+            with open_archive(path) as archive:
+                self.members[path] = {
+                    member.name: member for member in archive.getmembers()
+                }
+
+        return self.members[path]
+
+    def run(self):
+        started = time.monotonic()
+        stats = self.plan()
+
+        if self.user is None:
+            for entry in self.chain.users.values():
+                self.owners[entry['username']] = restore_user(entry)
+
+        with transaction.atomic():
+            self.match_folders()
+            self.layout = self.folders_layout()
+            self.restore_folders()
+
+        restored = 0
+        ocr_pages = 0
+        documents = self.documents()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for index in range(0, len(documents), self.batch_size):
+                batch = documents[index:index + self.batch_size]
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    docs, pages = self.restore_batch(executor, batch, tmp_dir)
+                restored += len(docs)
+                ocr_pages += pages
+                logger.info(f"{restored}/{len(documents)} documents restored")
+
+        stats['folders'] = len(self.layout)
+        stats['documents'] = restored
+        stats['ocr_pages'] = ocr_pages
+        stats['seconds'] = round(time.monotonic() - started, 3)
+
+        return stats
+
+    def depth(self, folder_id):
+        depth = 0
+        parent_id = self.chain.folders[folder_id].get('parent_id')
+        while parent_id in self.chain.folders:
+            depth += 1
+            parent_id = self.chain.folders[parent_id].get('parent_id')
+
+        return depth
+
+    def match_folders(self):
+        """
+        Maps archived folders onto existing folders with the same owner,
+        title and parent, one query per tree level.
+        """
+        levels = {}
+        for folder_id in self.chain.folders:
+            levels.setdefault(self.depth(folder_id), []).append(folder_id)
+
+        for level in sorted(levels):
+            candidates = {}
+            for folder_id in levels[level]:
+                entry = self.chain.folders[folder_id]
+                parent_id = entry.get('parent_id')
+                if level > 0 and parent_id not in self.existing:
+                    # parent is restored => folder is missing too
+                    continue
+                key = (
+                    self.owner(entry).id,
+                    entry['title'],
+                    self.parent_id(entry)
+                )
+                candidates[key] = folder_id
+            if not candidates:
+                break
+
+            if level == 0:
+                folders = Folder.objects.filter(parent_id=None)
+            else:
+                folders = Folder.objects.filter(
+                    parent_id__in={key[2] for key in candidates}
+                )
+            # oldest folder wins, if there are several of the same title
+            for user_id, title, parent_id, node_id in folders.filter(
+                user_id__in={key[0] for key in candidates},
+                title__in={key[1] for key in candidates}
+            ).order_by('-id').values_list(
+                'user_id', 'title', 'parent_id', 'id'
+            ):
+                folder_id = candidates.get((user_id, title, parent_id))
+                if folder_id is not None:
+                    self.node_ids[folder_id] = node_id
+                    self.existing.add(folder_id)
+
+    def folders_layout(self):
+        """
+        MPTT fields of missing folders. Subtrees which are laid out as
+        new trees by ``tree_layout``, but whose parent exists, are moved
+        into space made in parent's tree.
+        """
+        parents = {
+            folder_id: entry.get('parent_id')
+            for folder_id, entry in self.chain.folders.items()
+            if folder_id not in self.existing
+        }
+        layout = tree_layout(parents, first_tree_id=self.next_tree_id())
+
+        trees = {}
+        for folder_id, (tree_id, _, _, _) in layout.items():
+            trees.setdefault(tree_id, []).append(folder_id)
+        roots = {}
+        for folder_id, parent_id in parents.items():
+            if parent_id in self.existing:
+                roots.setdefault(parent_id, []).append(folder_id)
+
+        rooms = make_room([
+            (
+                self.node_ids[parent_id],
+                sum(layout[root_id][2] for root_id in root_ids)
+            )
+            for parent_id, root_ids in roots.items()
+        ])
+        for root_ids, (tree_id, lft, level) in zip(roots.values(), rooms):
+            offset = lft - 1
+            for root_id in sorted(root_ids):
+                # root of a new tree spans 1..rght
+                size = layout[root_id][2]
+                for folder_id in trees[layout[root_id][0]]:
+                    _, left, right, depth = layout[folder_id]
+                    layout[folder_id] = (
+                        tree_id,
+                        left + offset,
+                        right + offset,
+                        depth + level
+                    )
+                offset += size
+
+        return layout
+
+    def next_tree_id(self):
+        max_tree_id = BaseTreeNode.objects.aggregate(
+            max_tree_id=Max('tree_id')
+        )['max_tree_id']
+
+        return (max_tree_id or 0) + 1
+
+    def parent_id(self, entry):
+        parent_id = entry.get('parent_id')
+        if parent_id not in self.chain.folders:
+            return None
+
+        return self.node_ids[parent_id]
+
+    def restore_folders(self):
+        """
+        Bulk inserts folders level by level, parents first.
+        """
+        content_type = ContentType.objects.get_for_model(
+            Folder,
+            for_concrete_model=False
+        )
+        levels = {}
+        for folder_id in self.layout:
+            levels.setdefault(self.layout[folder_id][3], []).append(folder_id)
+
+        for level in sorted(levels):
+            folder_ids = levels[level]
+            nodes = []
+            for folder_id in folder_ids:
+                entry = self.chain.folders[folder_id]
+                tree_id, lft, rght, _ = self.layout[folder_id]
+                nodes.append(BaseTreeNode(
+                    title=entry['title'],
+                    user=self.owner(entry),
+                    parent_id=self.parent_id(entry),
+                    polymorphic_ctype=content_type,
+                    tree_id=tree_id,
+                    lft=lft,
+                    rght=rght,
+                    level=level
+                ))
+            BaseTreeNode.objects.bulk_create(nodes, batch_size=BATCH_SIZE)
+
+            # (ids of bulk created rows are not returned by all
+            # databases); position in tree identifies the node
+            positions = {
+                self.layout[folder_id][:2]: folder_id
+                for folder_id in folder_ids
+            }
+            for tree_id, lft, node_id in BaseTreeNode.objects.filter(
+                tree_id__in={position[0] for position in positions},
+                lft__in={position[1] for position in positions},
+                level=level
+            ).values_list('tree_id', 'lft', 'id'):
+                folder_id = positions.get((tree_id, lft))
+                if folder_id is not None:
+                    self.node_ids[folder_id] = node_id
+
+        new_ids = [self.node_ids[folder_id] for folder_id in self.layout]
+        insert_folder_rows(new_ids)
+        create_owner_access([
+            (
+                self.node_ids[folder_id],
+                self.owner(self.chain.folders[folder_id]).id,
+                self.layout[folder_id][3] > 0
+            )
+            for folder_id in self.layout
+        ])
+
+    def extract(self, path, entry, tmp_dir):
+        members = self.members[path]
+        name = remove_backup_filename_id(os.path.basename(entry['path']))
+        _, ext = os.path.splitext(name)
+        file_path = os.path.join(tmp_dir, f"{entry['id']}{ext}")
+        copy_member(path, members[entry['path']], file_path)
+
+        results_dir = os.path.join(tmp_dir, f"{entry['id']}.pages")
+        results = []
+        for result in entry.get('results', []):
+            member = members.get(f"{entry['path']}{RESULTS_SUFFIX}{result}")
+            if member is not None:
+                copy_member(path, member, os.path.join(results_dir, result))
+                results.append(result)
+
+        return Extracted(
+            entry,
+            file_path,
+            get_pagecount(file_path),
+            results_dir,
+            results
+        )
+
+    def restore_batch(self, executor, batch, tmp_dir):
+        """
+        Returns restored documents and number of pages sent to OCR.
+        """
+        for path, _ in batch:
+            self.archive_members(path)
+        extracted = list(executor.map(
+            lambda item: self.extract(item[0], item[1], tmp_dir),
+            batch
+        ))
+
+        with transaction.atomic():
+            with BaseTreeNode.objects.disable_mptt_updates():
+                docs = [self.create_document(item) for item in extracted]
+            BaseTreeNode.objects.bulk_update(
+                [
+                    BaseTreeNode(pk=doc.pk, **dict(zip(TREE_FIELDS, fields)))
+                    for doc, fields in zip(docs, documents_layout(docs))
+                ],
+                TREE_FIELDS,
+                batch_size=BATCH_SIZE
+            )
+
+        list(executor.map(store_files, docs, extracted))
+
+        ocr_pages = 0
+        for doc, item in zip(docs, extracted):
+            if item.has_text:
+                for page in doc.pages.all():
+                    page.update_text_field()
+            elif not self.skip_ocr:
+                ocr_pages += doc.page_count
+                for page_num in range(1, doc.page_count + 1):
+                    ocr_page.apply_async(kwargs={
+                        'user_id': doc.user_id,
+                        'document_id': doc.id,
+                        'file_name': doc.file_name,
+                        'page_num': page_num,
+                        'lang': doc.lang}
+                    )
+
+        return docs, ocr_pages
+
+    def create_document(self, item):
+        entry = item.entry
+        user = self.owner(entry)
+        doc = Document.objects.create_document(
+            user=user,
+            title=entry['title'],
+            size=entry['size'],
+            lang=entry['lang'],
+            file_name=remove_backup_filename_id(
+                os.path.basename(entry['path'])
+            ),
+            parent_id=self.parent_id(entry),
+            notes="",
+            page_count=item.page_count
+        )
+        for attrs in entry.get('tags', []):
+            tag, _ = Tag.objects.get_or_create(user=user, **attrs)
+            doc.tags.add(tag)
+        self.node_ids[entry['id']] = doc.id
+
+        return doc
+
+
+def documents_layout(docs):
+    """
+    MPTT fields (tree_id, lft, rght, level) of new documents, in order
+    of ``docs``. Documents become last children of their parents;
+    documents without parent are single node trees.
+    """
+    children = {}
+    for index, doc in enumerate(docs):
+        children.setdefault(doc.parent_id, []).append(index)
+
+    layout = [None] * len(docs)
+    tree_id = BaseTreeNode.objects.aggregate(
+        max_tree_id=Max('tree_id')
+    )['max_tree_id'] or 0
+    for index in children.pop(None, []):
+        tree_id += 1
+        layout[index] = (tree_id, 1, 2, 0)
+
+    rooms = make_room([
+        (parent_id, 2 * len(indexes))
+        for parent_id, indexes in children.items()
+    ])
+    for indexes, (tree_id, lft, level) in zip(children.values(), rooms):
+        for index in indexes:
+            layout[index] = (tree_id, lft, lft + 1, level)
+            lft += 2
+
+    return layout
+
+
+def insert_folder_rows(node_ids):
+    """
+    Rows of multi-table inherited ``Folder`` model (bulk_create does
+    not support such models); the folder table has no other columns.
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {qn(Folder._meta.db_table)}"
+        f" ({qn(Folder._meta.pk.column)}) VALUES (%s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(node_id,) for node_id in node_ids])
+
+
+def create_owner_access(nodes):
+    """
+    Full access of the owner to each of ``nodes``, a list of
+    (node_id, user_id, inherited); same entries as created by core when
+    a node is created (inherited from parent, in case of child nodes).
+    """
+    Access.objects.bulk_create(
+        [
+            Access(
+                node_id=node_id,
+                user_id=user_id,
+                access_type=Access.ALLOW,
+                access_inherited=inherited
+            )
+            for node_id, user_id, inherited in nodes
+        ],
+        batch_size=BATCH_SIZE
+    )
+    node_ids = [node_id for node_id, _, _ in nodes]
+    codenames = [
+        codename for codename, value in Access.OWNER_PERMS_MAP.items()
+        if value
+    ]
+    propagation = AccessPropagation([])
+    for index in range(0, len(node_ids), BATCH_SIZE):
+        propagation.set_permissions(
+            Access.objects.filter(
+                node_id__in=node_ids[index:index + BATCH_SIZE]
+            ).values_list('id', flat=True),
+            codenames
+        )
+    EffectivePermission.objects.refresh(node_ids)
+
+
+def store_files(doc, item):
+    """
+    Copies extracted document file and its OCR results into the
+    storage.
+    """
+    default_storage.copy_doc(
+        src=item.file_path,
+        dst=doc.path().url()
+    )
+    if not item.results:
+        return
+
+    dirname = default_storage.abspath(results_dirname(doc))
+    for name in item.results:
+        dst = os.path.join(dirname, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy(os.path.join(item.results_dir, name), dst)
+
+
+def restore_user(entry):
+    user = User.objects.filter(username=entry['username']).first()
+    if user is not None:
+        return user
+
+    user = User.objects.create(
+        username=entry['username'],
+        email=entry['email'],
+        is_active=entry['is_active'],
+        is_superuser=entry['is_superuser']
+    )
+    # in case --include-user-password switch was used
+    # update user (raw digest of) password field
+    password = entry.get('password')
+    if password:
+        user.password = password
+        user.save()
+
+    return user
+
+
+def restore_chain(paths, user=None, skip_ocr=False, **kwargs):
+    """
+    Restores full backup followed by incremental backups, archives at
+    ``paths`` in the order they were made. Returns number of restored
+    documents.
+    """
+    chain = BackupChain()
+    for path in paths:
+        chain.add(path)
+
+    return chain.restore(user=user, skip_ocr=skip_ocr, **kwargs)
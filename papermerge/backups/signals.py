@@ -0,0 +1,75 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from papermerge.core.models import (
+    BaseTreeNode,
+    ColoredTag,
+    Document,
+    Folder,
+    Tag
+)
+
+from .models import DeletedNode
+
+# models of nodes as stored in content types of ``ColoredTag``
+NODE_MODELS = ('basetreenode', 'document', 'folder')
+
+
+def touch_nodes(node_ids):
+    """
+    Tags are not fields of nodes, their changes do not update
+    ``updated_at`` of tagged nodes (incremental backups contain
+    nodes updated since the previous backup).
+    """
+    BaseTreeNode.objects.filter(id__in=node_ids).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_delete, sender=BaseTreeNode)
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=Folder)
+def record_deleted_node_handler(sender, instance, **kwargs):
+    """
+    Deleted node is seen once per model of its hierarchy
+    (BaseTreeNode and Document/Folder), but recorded only once.
+    """
+    DeletedNode.objects.bulk_create(
+        [DeletedNode(node_id=instance.pk, user_id=instance.user_id)],
+        ignore_conflicts=True
+    )
+
+
+@receiver(m2m_changed, sender=ColoredTag)
+def node_tags_changed_handler(sender, instance, action, **kwargs):
+    """
+    Tags were added to/removed from the node (``node.tags.add``,
+    ``node.tags.set`` etc.). Tags of automates are ignored.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if isinstance(instance, BaseTreeNode):
+        touch_nodes([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed_handler(sender, instance, **kwargs):
+    """
+    Tag was changed (e.g. renamed) or is about to be deleted, along with
+    its ``ColoredTag`` entries.
+    """
+    touch_nodes(
+        ColoredTag.objects.filter(
+            tag=instance,
+            content_type__app_label='core',
+            content_type__model__in=NODE_MODELS
+        ).values('object_id')
+    )
@@ -0,0 +1,594 @@
+"""
+Streaming backup of documents.
+
+``papermerge.core.backup_restore.backup_documents`` writes all documents
+with ``tarfile`` and adds the ``backup.json`` manifest, with an entry
+for every document, once all documents are written. ``StreamingBackup``
+instead generates the archive as a sequence of byte chunks, which can be
+written to a pipe or returned as HTTP response as they are produced:
+
+    manifest/backup.json             header (version, part, after_id)
+    [<username>/]<folders>/<file_name>__<id>
+    [<username>/]<folders>/<file_name>__<id>.pages/<OCR text/hOCR>
+    ...
+    manifest/<part>-<seq>.ndjson     one JSON line per user/document
+
+Documents are archived in order of their id, ``chunk_size`` documents
+at a time, each group followed by a manifest member describing it.
+Only one chunk of file data and manifest entries of one group are kept
+in memory.
+
+After each manifest member, id of the last archived document is saved
+in the checkpoint (``BackupCheckpoint``); a resumed backup produces next
+part of the archive, with documents archived after that id. Documents
+of an interrupted part which are not listed in its manifest are ignored
+by restore.
+
+Header of each backup contains its watermark: time when the backup was
+started and id of the last ``DeletedNode``. Incremental backup, made
+``since`` watermark of the previous backup, contains only documents and
+folders updated after it, and ids of nodes deleted after it.
+"""
+import datetime
+import json
+import logging
+import os
+import tarfile
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mglib.path import AUX_DIR_RESULTS, DocumentPath
+
+from papermerge.core import __version__ as PAPERMERGE_VERSION
+from papermerge.core.models import Document, Folder, User
+from papermerge.core.storage import default_storage
+
+from .models import DeletedNode
+
+logger = logging.getLogger(__name__)
+
+HEADER_NAME = "manifest/backup.json"
+MANIFEST_DIR = "manifest"
+FORMAT = "ndjson"
+# OCR results of document <path> are archived as <path>.pages/<name>
+RESULTS_SUFFIX = ".pages/"
+# archived OCR results: text and hOCR of pages (images are re-generated)
+RESULTS_EXTENSIONS = ('.txt', '.hocr')
+
+# size of chunks in which files are read
+READ_SIZE = 1024 * 1024
+
+MB = 1024 * 1024
+
+
+def manifest_name(part, seq):
+    return f"{MANIFEST_DIR}/{part:04d}-{seq:06d}.ndjson"
+
+
+def tar_header(name, size, mtime):
+    info = tarfile.TarInfo(name=name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+
+def tar_padding(size):
+    remainder = size % tarfile.BLOCKSIZE
+    if remainder:
+        return tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+
+    return b''
+
+
+def tar_end(archive_size):
+    """
+    Two empty blocks, padded to tar record size.
+    """
+    size = archive_size + 2 * tarfile.BLOCKSIZE
+    remainder = size % tarfile.RECORDSIZE
+    if remainder:
+        size += tarfile.RECORDSIZE - remainder
+
+    return tarfile.NUL * (size - archive_size)
+
+
+def bytes_member(name, data):
+    return b''.join([
+        tar_header(name, len(data), time.time()),
+        data,
+        tar_padding(len(data))
+    ])
+
+
+def file_member(name, f):
+    """
+    Yields tar member with content of open file ``f`` in chunks of
+    ``READ_SIZE`` bytes.
+    """
+    stat = os.fstat(f.fileno())
+    yield tar_header(name, stat.st_size, stat.st_mtime)
+
+    remaining = stat.st_size
+    while remaining > 0:
+        chunk = f.read(min(READ_SIZE, remaining))
+        if not chunk:
+            # size in already sent header cannot change anymore
+            raise IOError(f"{name} was truncated while archived")
+        remaining -= len(chunk)
+        yield chunk
+
+    yield tar_padding(stat.st_size)
+
+
+def results_dirname(document):
+    """
+    Directory (relative to storage) with OCR results of the current
+    version of the document.
+    """
+    return DocumentPath.copy_from(
+        document.path(),
+        aux_dir=AUX_DIR_RESULTS
+    ).pages_dirname()
+
+
+def result_files(dirname):
+    """
+    Sorted paths (relative to ``dirname``) of OCR text and hOCR files.
+    """
+    names = []
+    for root, _, files in os.walk(dirname):
+        for name in files:
+            if name.endswith(RESULTS_EXTENSIONS):
+                names.append(
+                    os.path.relpath(os.path.join(root, name), dirname)
+                )
+
+    return sorted(names)
+
+
+def target_path(document, folders, include_user_in_path=False):
+    """
+    Same as ``papermerge.core.backup_restore._createTargetPath``, with
+    titles of parent folders taken from ``folders``, a dictionary
+    {folder_id: (title, parent_id)}.
+    """
+    parts = [f"{document.file_name}__{document.id}"]
+    parent_id = document.parent_id
+    while parent_id is not None:
+        title, parent_id = folders[parent_id]
+        parts.append(title)
+
+    if include_user_in_path:
+        parts.append(document.user.username)
+
+    return os.path.join(*reversed(parts))
+
+
+def user_entry(user, include_user_password=False):
+    entry = {
+        'type': 'user',
+        'username': user.username,
+        'email': user.email,
+        'is_superuser': user.is_superuser,
+        'is_active': user.is_active,
+    }
+    if include_user_password:
+        # raw digest of user's password
+        entry['password'] = user.password
+
+    return entry
+
+
+def folder_entry(folder_id, title, parent_id, username=None):
+    entry = {
+        'type': 'folder',
+        'id': folder_id,
+        'title': title,
+        'parent_id': parent_id,
+    }
+    if username is not None:
+        entry['user'] = username
+
+    return entry
+
+
+def document_entry(
+    document,
+    path,
+    size,
+    results=(),
+    include_user_in_path=False
+):
+    entry = {
+        'type': 'document',
+        'id': document.id,
+        'parent_id': document.parent_id,
+        'version': document.version,
+        'path': path,
+        'lang': document.lang,
+        'title': document.title,
+        'size': size,
+        'page_count': document.page_count,
+        'results': list(results),
+        'tags': [tag.to_dict() for tag in document.tags.all()],
+    }
+    if include_user_in_path:
+        entry['user'] = document.user.username
+
+    return entry
+
+
+def read_header(archive):
+    """
+    Header of backup archive, a just opened ``tarfile.TarFile``. Header
+    is the first member, rest of the archive is not read.
+    """
+    member = archive.next()
+    if member is None or member.name != HEADER_NAME:
+        raise ValueError(f"{archive.name} is not a streaming backup")
+
+    return json.load(archive.extractfile(member))
+
+
+def current_watermark():
+    deleted_id = DeletedNode.objects.aggregate(
+        deleted_id=Max('id')
+    )['deleted_id']
+
+    return {
+        'updated_at': timezone.now().isoformat(),
+        'deleted_id': deleted_id or 0,
+    }
+
+
+class BackupCheckpoint:
+    """
+    Progress of a backup, kept in a JSON file:
+
+        {"part": .., "last_id": .., "documents": .., "bytes": ..,
+         "complete": .., "watermark": .., "since": ..}
+
+    ``last_id`` is id of the last document listed in manifest of an
+    already written part of the archive. Resumed parts keep
+    ``watermark`` and ``since`` of the first one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part = 0
+        self.last_id = 0
+        self.documents = 0
+        self.bytes = 0
+        self.complete = False
+        self.watermark = None
+        self.since = None
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                self.__dict__.update(json.load(f))
+
+        return self
+
+    def to_dict(self):
+        return {
+            'part': self.part,
+            'last_id': self.last_id,
+            'documents': self.documents,
+            'bytes': self.bytes,
+            'complete': self.complete,
+            'watermark': self.watermark,
+            'since': self.since,
+        }
+
+    def save(self):
+        if not self.path:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class StreamingBackup:
+    """
+    Iterating over ``StreamingBackup`` yields bytes of tar archive with
+    documents of ``user`` (or of all users, if ``user`` is None).
+
+    Progress is saved in ``checkpoint`` file; with ``resume`` the
+    archive is the next part of the backup recorded there. With
+    ``after_id`` only documents with greater id are archived, as
+    ``part`` of the backup.
+
+    With ``since`` (watermark from header of the previous backup) the
+    backup is incremental.
+    """
+
+    def __init__(
+        self,
+        user=None,
+        include_user_password=False,
+        checkpoint=None,
+        resume=False,
+        after_id=None,
+        part=None,
+        since=None,
+        chunk_size=None
+    ):
+        self.user = user
+        self.include_user_password = include_user_password
+        self.checkpoint = BackupCheckpoint(checkpoint)
+        if resume:
+            self.checkpoint.load()
+        else:
+            self.checkpoint.since = since
+        if after_id is not None:
+            self.checkpoint.last_id = after_id
+        if part is None:
+            part = self.checkpoint.part + 1
+        self.checkpoint.part = part
+        self.chunk_size = chunk_size or settings.PAPERMERGE_BACKUP_CHUNK_SIZE
+        # bytes and documents of this part
+        self.bytes = 0
+        self.documents = 0
+        self.started = None
+        self.finished = None
+        # user id -> username, when backing up all users
+        self.usernames = {}
+        # documents and bytes already added to checkpoint
+        self._saved = (0, 0)
+
+    @property
+    def part(self):
+        return self.checkpoint.part
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0
+
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self):
+        """
+        MB/s written so far.
+        """
+        seconds = self.seconds
+        if not seconds:
+            return 0
+
+        return self.bytes / MB / seconds
+
+    def stats(self):
+        return {
+            'part': self.part,
+            'documents': self.documents,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'mb_per_second': round(self.throughput, 3),
+        }
+
+    def __iter__(self):
+        self.started = time.monotonic()
+        for chunk in self._archive():
+            if chunk:
+                self.bytes += len(chunk)
+                yield chunk
+
+        self.finished = time.monotonic()
+
+    def write(self, fileobj, progress=None):
+        """
+        Writes the archive to ``fileobj``; ``progress`` is called with
+        stats after each manifest member.
+        """
+        documents = 0
+        for chunk in self:
+            fileobj.write(chunk)
+            if progress and self.documents != documents:
+                documents = self.documents
+                progress(self.stats())
+        fileobj.flush()
+
+        return self.stats()
+
+    @property
+    def include_user_in_path(self):
+        return self.user is None
+
+    @property
+    def since(self):
+        return self.checkpoint.since
+
+    @property
+    def updated_since(self):
+        if self.since is None:
+            return None
+
+        return parse_datetime(self.since['updated_at'])
+
+    def header(self):
+        return {
+            'created': datetime.datetime.now(),
+            'version': PAPERMERGE_VERSION,
+            'format': FORMAT,
+            'part': self.part,
+            'after_id': self.checkpoint.last_id,
+            'username': self.user.username if self.user else None,
+            'watermark': self.checkpoint.watermark,
+            'since': self.since,
+        }
+
+    def users(self):
+        if self.user is not None:
+            return []
+
+        entries = []
+        for user in User.objects.order_by('id'):
+            self.usernames[user.id] = user.username
+            entries.append(user_entry(user, self.include_user_password))
+
+        return entries
+
+    def folders(self):
+        """
+        Returns ({folder_id: (title, parent_id)} of all folders, entries
+        of folders updated since the previous backup).
+        """
+        folders = Folder.objects.order_by('id')
+        if self.user is not None:
+            folders = folders.filter(user=self.user)
+
+        updated_since = self.updated_since
+        titles = {}
+        entries = []
+        for folder_id, title, parent_id, user_id, updated_at in (
+            folders.values_list(
+                'id', 'title', 'parent_id', 'user_id', 'updated_at'
+            )
+        ):
+            titles[folder_id] = (title, parent_id)
+            if updated_since is None or updated_at >= updated_since:
+                entries.append(folder_entry(
+                    folder_id,
+                    title,
+                    parent_id,
+                    username=self.usernames.get(user_id)
+                ))
+
+        return titles, entries
+
+    def deleted(self):
+        if self.since is None:
+            return []
+
+        deleted = DeletedNode.objects.filter(
+            id__gt=self.since['deleted_id'],
+            id__lte=self.checkpoint.watermark['deleted_id']
+        )
+        if self.user is not None:
+            deleted = deleted.filter(user_id=self.user.id)
+
+        return [
+            {'type': 'deleted', 'id': node_id}
+            for node_id in deleted.values_list('node_id', flat=True)
+        ]
+
+    def document_batches(self):
+        documents = Document.objects.select_related(
+            'user'
+        ).prefetch_related('tags').order_by('id')
+        if self.user is not None:
+            documents = documents.filter(user=self.user)
+        if self.since is not None:
+            documents = documents.filter(updated_at__gte=self.updated_since)
+
+        last_id = self.checkpoint.last_id
+        while True:
+            batch = list(documents.filter(id__gt=last_id)[:self.chunk_size])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def _manifest(self, seq, entries):
+        data = b''.join(
+            json.dumps(entry, default=str).encode('utf-8') + b'\n'
+            for entry in entries
+        )
+        return bytes_member(manifest_name(self.part, seq), data)
+
+    def _archive(self):
+        if self.checkpoint.watermark is None:
+            self.checkpoint.watermark = current_watermark()
+        header = json.dumps(self.header(), default=str).encode('utf-8')
+        yield bytes_member(HEADER_NAME, header)
+
+        entries = self.users()
+        folders, folder_entries = self.folders()
+        entries.extend(folder_entries)
+        entries.extend(self.deleted())
+        seq = 0
+        for batch in self.document_batches():
+            for document in batch:
+                path = target_path(
+                    document,
+                    folders,
+                    include_user_in_path=self.include_user_in_path
+                )
+                try:
+                    f = open(document.absfilepath, 'rb')
+                except OSError:
+                    # Log error, but continue backup process
+                    logger.exception(f"Cannot archive document {path}")
+                    continue
+
+                with f:
+                    size = os.fstat(f.fileno()).st_size
+                    yield from file_member(path, f)
+
+                results = []
+                yield from self._results(document, path, results)
+
+                entries.append(document_entry(
+                    document,
+                    path,
+                    size,
+                    results=results,
+                    include_user_in_path=self.include_user_in_path
+                ))
+
+            seq += 1
+            yield self._manifest(seq, entries)
+            # consumer asked for more, manifest is written
+            self.documents += len([
+                entry for entry in entries if entry['type'] == 'document'
+            ])
+            entries = []
+            self._save_checkpoint(batch[-1].id)
+
+        if entries:
+            # users, folders and deleted nodes, when there are
+            # no documents
+            seq += 1
+            yield self._manifest(seq, entries)
+
+        yield tar_end(self.bytes)
+        self._save_checkpoint(self.checkpoint.last_id, complete=True)
+
+    def _results(self, document, path, results):
+        """
+        Yields members with OCR results of the document; names of
+        archived ones are appended to ``results``.
+        """
+        dirname = default_storage.abspath(results_dirname(document))
+        for name in result_files(dirname):
+            try:
+                f = open(os.path.join(dirname, name), 'rb')
+            except OSError:
+                logger.warning(f"Cannot archive OCR result {name} of {path}")
+                continue
+
+            with f:
+                yield from file_member(f"{path}{RESULTS_SUFFIX}{name}", f)
+            results.append(name)
+
+    def _save_checkpoint(self, last_id, complete=False):
+        checkpoint = self.checkpoint
+        checkpoint.last_id = last_id
+        checkpoint.complete = complete
+        saved_documents, saved_bytes = self._saved
+        checkpoint.documents += self.documents - saved_documents
+        checkpoint.bytes += self.bytes - saved_bytes
+        self._saved = (self.documents, self.bytes)
+        checkpoint.save()
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'backups'
+
+urlpatterns = [
+    path(
+        'download', views.download, name="download"
+    ),
+]
@@ -0,0 +1,47 @@
+from django.contrib.auth.decorators import login_required
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    StreamingHttpResponse
+)
+
+from .stream import StreamingBackup
+
+
+@login_required
+def download(request):
+    """
+    Streams backup archive of user's documents (or, for superusers
+    with ``all`` parameter, of all users) as it is generated.
+
+    Parameters:
+        after - archive only documents with greater id, e.g. id of the
+            last document in manifest of an interrupted download
+        part - number of the archive part, when resuming
+        all - backup documents of all users
+    """
+    backup_all = bool(request.GET.get('all'))
+    if backup_all and not request.user.is_superuser:
+        return HttpResponseForbidden()
+
+    try:
+        after_id = int(request.GET.get('after', 0))
+        part = int(request.GET.get('part', 1))
+    except ValueError:
+        return HttpResponseBadRequest("after and part must be integers")
+
+    backup = StreamingBackup(
+        user=None if backup_all else request.user,
+        after_id=after_id,
+        part=part
+    )
+
+    response = StreamingHttpResponse(
+        backup,
+        content_type='application/x-tar'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="backup-{part:04d}.tar"'
+    )
+
+    return response
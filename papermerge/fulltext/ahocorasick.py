@@ -0,0 +1,137 @@
+"""
+Aho-Corasick multi pattern string matching.
+
+Finds all occurrences of any number of patterns in one pass over
+the text; time is proportional to the length of scanned text plus
+number of matches, regardless of the number of patterns.
+"""
+import re
+from collections import deque
+
+# text is lower cased in chunks of this many characters
+CHUNK_SIZE = 4096
+
+
+def is_word_char(char):
+    # same as \w of python's re module
+    return char.isalnum() or char == '_'
+
+
+def lower(text):
+    """
+    Lower cased text of the same length as given text (some characters
+    e.g. 'İ' become two characters when lower cased; in such case
+    only first character is kept), so that offsets in lower cased
+    text are offsets in the original text.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+
+    return ''.join(char.lower()[0] for char in text)
+
+
+class Automaton:
+
+    def __init__(self, patterns, ignore_case=True):
+        """
+        ``patterns`` is a list of strings. Matches are reported by
+        index of the pattern in this list.
+        """
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+        # per state: transitions, failure link, matched pattern indexes
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._add(lower(pattern) if ignore_case else pattern, index)
+        self._link()
+        first_chars = ''.join(self.goto[0]) or '\x00'
+        self.skip_re = re.compile('[%s]' % re.escape(first_chars))
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(index)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = link if link != next_state else 0
+                self.output[next_state] = (
+                    self.output[next_state] + self.output[self.fail[next_state]]
+                )
+
+    def iter(self, text, start=0, end=None):
+        """
+        Yields (start, end, pattern_index) of all (possibly overlapping)
+        occurrences of patterns in text[start:end], in order of their
+        end offset.
+        """
+        if end is None:
+            end = len(text)
+
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        lengths = [len(pattern) for pattern in self.patterns]
+        state = 0
+
+        skip = self.skip_re.search
+
+        for chunk_start in range(start, end, CHUNK_SIZE):
+            chunk = text[chunk_start:min(chunk_start + CHUNK_SIZE, end)]
+            if self.ignore_case:
+                chunk = lower(chunk)
+            pos = 0
+            while pos < len(chunk):
+                if not state:
+                    # in initial state: jump (at C speed) to the next
+                    # character any pattern starts with
+                    match = skip(chunk, pos)
+                    if match is None:
+                        break
+                    pos = match.start()
+                char = chunk[pos]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for index in output[state]:
+                    offset = chunk_start + pos + 1
+                    yield offset - lengths[index], offset, index
+                pos += 1
+
+    def iter_words(self, text, start=0, end=None):
+        """
+        Same as ``iter``, but yields only occurrences delimited by word
+        boundaries (as ``\\b`` of regular expressions does) i.e. 'are'
+        is not found in 'care'.
+        """
+        for match_start, match_end, index in self.iter(text, start, end):
+            if is_boundary(text, match_start) and is_boundary(text, match_end):
+                yield match_start, match_end, index
+
+
+def is_boundary(text, offset):
+    before = offset > 0 and is_word_char(text[offset - 1])
+    after = offset < len(text) and is_word_char(text[offset])
+
+    return before != after
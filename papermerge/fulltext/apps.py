@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class FulltextConfig(AppConfig):
+    # Full text search backends (PostgreSQL, inverted index)
+    name = 'papermerge.fulltext'
+    label = 'fulltext'
+
+    def ready(self):
+        from papermerge.fulltext import signals  # noqa
@@ -0,0 +1,208 @@
+"""
+PostgreSQL full text search backend.
+
+Pages are matched against their precomputed search vectors
+(see ``papermerge.fulltext.models.PageSearchVector``) using GIN index
+and ordered by ``ts_rank``. Each page's vector is built with the text
+search configuration of the page's language, and query terms are parsed
+with the very same configuration.
+
+Enable it in papermerge.conf.py:
+
+    SEARCH_BACKEND = "papermerge.fulltext.backends.SearchBackend"
+
+and fill search vectors of already existing pages with:
+
+    ./manage.py update_search_vectors
+
+Searches of other models (e.g. folders) or searches restricted to
+specific fields are served by the database backend.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorExact
+)
+from django.db import models
+from django.db.models import F
+from django.db.models.expressions import Value
+from django.db.models.functions import Cast
+from django.db.models.query import QuerySet
+
+from papermerge.core.models import Page
+from papermerge.search.backends.db import (
+    DatabaseSearchBackend,
+    DatabaseSearchQueryCompiler,
+    DatabaseSearchResults
+)
+from papermerge.search.query import And, Boost, MatchAll, Not, Or, PlainText
+
+from .fields import TsVectorField
+from .models import is_enabled, tsquery_term
+from .search import KeysetSearchResults, keyset_filter
+
+RANK_FIELD = 'search_rank'
+
+TsVectorField.register_lookup(SearchVectorExact)
+
+
+class PostgresSearchQueryCompiler(DatabaseSearchQueryCompiler):
+
+    def build_term_query(self, term):
+        return SearchQuery(
+            tsquery_term(term, prefix=self.partial_match),
+            search_type='raw',
+            # parse term with the configuration of the matched page
+            config=F('search_vector__config')
+        )
+
+    def build_tsquery(self, query=None, boost=1.0):
+        """
+        Translates search query into tsquery. Returns None
+        if query matches everything.
+        """
+        if query is None:
+            query = self.query
+
+        if isinstance(query, PlainText):
+            self.check_boost(query, boost=boost)
+            return self._combine(
+                [
+                    self.build_term_query(term)
+                    for term in query.query_string.split()
+                ],
+                query.operator
+            )
+
+        if isinstance(query, Boost):
+            boost *= query.boost
+            return self.build_tsquery(query.subquery, boost=boost)
+
+        if isinstance(query, MatchAll):
+            return None
+
+        if isinstance(query, Not):
+            subquery = self.build_tsquery(query.subquery, boost=boost)
+            if subquery is None:
+                return None
+            return ~subquery
+
+        if isinstance(query, (And, Or)):
+            return self._combine(
+                [
+                    self.build_tsquery(subquery, boost=boost)
+                    for subquery in query.subqueries
+                ],
+                'and' if isinstance(query, And) else 'or'
+            )
+
+        raise NotImplementedError(
+            '`%s` is not supported by the postgres search backend.'
+            % query.__class__.__name__)
+
+    def _combine(self, tsqueries, operator):
+        result = None
+        for tsquery in tsqueries:
+            if tsquery is None:
+                continue
+            if result is None:
+                result = tsquery
+            elif operator == 'or':
+                result = result | tsquery
+            else:
+                result = result & tsquery
+
+        return result
+
+
+class PostgresSearchResults(KeysetSearchResults, DatabaseSearchResults):
+
+    def get_queryset(self, rank=True):
+        self.query_compiler._get_filters_from_queryset()
+
+        queryset = self.restricted_queryset()
+
+        tsquery = self.query_compiler.build_tsquery()
+        if tsquery is not None:
+            queryset = queryset.filter(search_vector__vector=tsquery)
+            if rank:
+                queryset = queryset.annotate(**{
+                    # double precision, so that rank values round trip
+                    # exactly through keyset pagination cursors
+                    RANK_FIELD: Cast(
+                        SearchRank(F('search_vector__vector'), tsquery),
+                        models.FloatField()
+                    )
+                })
+                if self.query_compiler.order_by_relevance:
+                    queryset = queryset.order_by(f"-{RANK_FIELD}", 'pk')
+                if self._after:
+                    queryset = queryset.filter(
+                        keyset_filter(RANK_FIELD, *self._after)
+                    )
+        elif self.query_compiler.order_by_relevance:
+            # all pages are equally relevant
+            queryset = queryset.order_by('pk')
+            if self._after:
+                queryset = queryset.filter(pk__gt=self._after[1])
+
+        return queryset[self.start:self.stop]
+
+    def _do_search(self):
+        queryset = self.get_queryset()
+        if self._score_field:
+            if RANK_FIELD in queryset.query.annotations:
+                score = F(RANK_FIELD)
+            else:
+                score = Value(None, output_field=models.FloatField())
+            queryset = queryset.annotate(**{self._score_field: score})
+
+        return queryset.iterator()
+
+    def _do_count(self):
+        return self.get_queryset(rank=self._after is not None).count()
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    query_compiler_class = PostgresSearchQueryCompiler
+    results_class = PostgresSearchResults
+
+    def __init__(self):
+        super().__init__()
+        self.fallback = DatabaseSearchBackend()
+
+    def _search(
+        self,
+        query_compiler_class,
+        query,
+        model_or_queryset,
+        fields,
+        *args,
+        **kwargs
+    ):
+        if isinstance(model_or_queryset, QuerySet):
+            model = model_or_queryset.model
+        else:
+            model = model_or_queryset
+
+        if fields or not is_enabled() or not issubclass(model, Page):
+            return self.fallback._search(
+                self.fallback.query_compiler_class,
+                query,
+                model_or_queryset,
+                fields,
+                *args,
+                **kwargs
+            )
+
+        return super()._search(
+            query_compiler_class,
+            query,
+            model_or_queryset,
+            fields,
+            *args,
+            **kwargs
+        )
+
+
+SearchBackend = PostgresSearchBackend
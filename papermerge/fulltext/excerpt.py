@@ -0,0 +1,247 @@
+"""
+Search excerpts and highlighting of matched phrases.
+
+Drop in replacements for ``search_excerpt`` and ``highlight`` functions of
+``papermerge.core.templatetags.search_tags`` (same results, except that
+highlighted text is html escaped), which:
+
+    * accept offsets of matches precomputed by the search backend; or
+    * find all phrases with one pass of multi pattern matcher, stopping
+      as soon as first occurrence of every phrase is found;
+
+and then look only at words around the matches, instead of splitting
+whole text once per phrase.
+"""
+import re
+from functools import lru_cache
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .ahocorasick import Automaton, lower
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=128)
+def get_automaton(phrases):
+    return Automaton(phrases)
+
+
+def _phrases_tuple(phrases):
+    if isinstance(phrases, str):
+        phrases = [phrases]
+
+    return tuple(phrase for phrase in phrases if phrase)
+
+
+def _non_overlapping(matches):
+    """
+    From (start, end) tuples keeps leftmost (and on same position
+    longest) non overlapping matches, sorted by start.
+    """
+    result = []
+    last_end = -1
+    for start, end in sorted(matches, key=lambda item: (item[0], -item[1])):
+        if start >= last_end:
+            result.append((start, end))
+            last_end = end
+
+    return result
+
+
+def find_matches(text, phrases, first_only=False):
+    """
+    Returns sorted list of (start, end) offsets of whole word, case
+    insensitive occurrences of phrases in text.
+
+    With ``first_only=True`` returns only first occurrence of each
+    phrase and stops scanning as soon as all of them were found.
+    """
+    phrases = _phrases_tuple(phrases)
+    if not phrases or not text:
+        return []
+
+    if first_only:
+        # phrases which do not occur in the text at all would make
+        # the scan below go through the whole text; drop them
+        # (substring test runs at C speed)
+        lowered = lower(text)
+        phrases = tuple(
+            phrase for phrase in phrases if lower(phrase) in lowered
+        )
+        if not phrases:
+            return []
+
+    automaton = get_automaton(phrases)
+    if not first_only:
+        return _non_overlapping(
+            (start, end) for start, end, _ in automaton.iter_words(text)
+        )
+
+    first = {}
+    for start, end, index in automaton.iter_words(text):
+        # case insensitive duplicates share the first occurrence
+        key = lower(phrases[index])
+        if key not in first:
+            first[key] = (start, end)
+            if len(first) == len(set(map(lower, phrases))):
+                break
+
+    return _non_overlapping(first.values())
+
+
+def first_matches(text, offsets):
+    """
+    Same as ``find_matches(..., first_only=True)`` but for
+    offsets given by the search backend.
+    """
+    first = {}
+    for start, end in sorted(offsets):
+        first.setdefault(lower(text[start:end]), (start, end))
+
+    return _non_overlapping(first.values())
+
+
+def split_head(text, start, stop, count):
+    """
+    Returns first ``count`` items of ``re.split(r"\\s+", text[start:stop])``
+    and True if the split has more items.
+    """
+    items = []
+    pos = start
+    for match in WHITESPACE_RE.finditer(text, start, stop):
+        items.append(text[pos:match.start()])
+        pos = match.end()
+        if len(items) == count:
+            return items, True
+    items.append(text[pos:stop])
+
+    return items, False
+
+
+def split_tail(text, start, stop, count):
+    """
+    Returns last ``count`` items of ``re.split(r"\\s+", text[start:stop])``
+    and True if the split has more items. Text is scanned backwards,
+    from ``stop``.
+    """
+    items = []
+    item_end = stop
+    pos = stop
+    while pos > start:
+        if not text[pos - 1].isspace():
+            pos -= 1
+            continue
+        items.append(text[pos:item_end])
+        while pos > start and text[pos - 1].isspace():
+            pos -= 1
+        item_end = pos
+        if len(items) == count:
+            return items[::-1], True
+    items.append(text[start:item_end])
+
+    return items[::-1], False
+
+
+def excerpt_from_matches(text, matches, context_words_count=5):
+    """
+    Builds excerpt from given (start, end) non overlapping matches,
+    sorted by start. Each match is shown with ``context_words_count``
+    words around it, omitted text is replaced by "...".
+    """
+    count = context_words_count + 1
+    output = []
+
+    if not matches:
+        words, more = split_head(
+            text, 0, len(text), 2 * context_words_count + 1
+        )
+        if more:
+            words.append("...")
+        return " ".join(words)
+
+    # text before first match
+    words, more = split_tail(text, 0, matches[0][0], count)
+    if more:
+        words.insert(0, "...")
+    output.append(" ".join(words))
+
+    for index, (start, end) in enumerate(matches):
+        output.append(" ".join(WHITESPACE_RE.split(text[start:end])))
+
+        if index == len(matches) - 1:
+            # text after last match
+            words, more = split_head(text, end, len(text), count)
+            if more:
+                words.append("...")
+        else:
+            # text between two matches
+            next_start = matches[index + 1][0]
+            words, more = split_head(text, end, next_start, 2 * count)
+            if more:
+                tail, _ = split_tail(text, end, next_start, count)
+                words = words[:count] + ["..."] + tail
+        output.append(" ".join(words))
+
+    return "".join(output)
+
+
+def search_excerpt(
+    text,
+    phrases,
+    context_words_count=5,
+    offsets=None
+):
+    """
+    Returns dict with ``excerpt`` of the text around first occurrence
+    of each phrase.
+
+    ``offsets`` is an optional list of (start, end) offsets of matches in
+    text, as found by the search backend. If not given, phrases are
+    searched in text.
+    """
+    if offsets is None:
+        matches = find_matches(text, phrases, first_only=True)
+    else:
+        matches = first_matches(text, offsets)
+
+    return dict(
+        original=text,
+        excerpt=excerpt_from_matches(
+            text,
+            matches,
+            context_words_count=context_words_count
+        )
+    )
+
+
+def highlight(
+    text,
+    phrases,
+    class_name='success',
+    offsets=None
+):
+    """
+    Returns dict with ``highlighted`` text, in which all occurrences
+    of phrases (or given (start, end) offsets) are wrapped in a span
+    with given css class.
+    """
+    if offsets is None:
+        matches = find_matches(text, phrases)
+    else:
+        matches = _non_overlapping(offsets)
+
+    template = '<span class="%s">%%s</span>' % escape(class_name)
+    output = []
+    pos = 0
+    for start, end in matches:
+        output.append(escape(text[pos:start]))
+        output.append(template % escape(text[start:end]))
+        pos = end
+    output.append(escape(text[pos:]))
+
+    return dict(
+        original=text,
+        highlighted=mark_safe("".join(output)),
+    )
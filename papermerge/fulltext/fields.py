@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class TsVectorField(models.Field):
+    """
+    PostgreSQL ``tsvector`` column.
+
+    Same as ``django.contrib.postgres.search.SearchVectorField``,
+    which however cannot be imported without psycopg2 i.e. on
+    installations with SQLite or MySQL database. Full text lookup
+    (``@@``) is registered by ``papermerge.fulltext.backends``.
+
+    On other databases the column is plain text and stays empty (search
+    vectors are maintained only on PostgreSQL).
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+
+        return 'text'
@@ -0,0 +1,462 @@
+"""
+Embedded on-disk inverted index.
+
+For every term index keeps its postings: ids of pages containing the
+term together with positions of the term within the page. Positions
+make phrase queries possible ("power are weak" matches only pages where
+these three words follow each other). Along with each position, offset
+of the word in page's text is stored, so that matches can be shown
+(see ``papermerge.fulltext.excerpt``) without searching the text again.
+
+Index is stored in a single file managed by python's sqlite3 module
+(no database server, no extra dependency). Postings are clustered by
+term, so that all postings of a term (or of all terms starting with
+given prefix) are read with one range scan. File can be shared by
+several processes (web app, workers), writers are serialized by
+sqlite's file locking.
+"""
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+# positions of consecutive fields of the same page are this
+# far apart, so that phrases do not match across fields
+FIELD_GAP = 100
+# greatest code point; all terms with given prefix sort before
+# prefix + PREFIX_END
+PREFIX_END = '\U0010ffff'
+BATCH_SIZE = 500
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS postings (
+        term TEXT NOT NULL,
+        page_id INTEGER NOT NULL,
+        positions BLOB NOT NULL,
+        PRIMARY KEY (term, page_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS postings_page_id ON postings (page_id);
+    CREATE TABLE IF NOT EXISTS pages (
+        page_id INTEGER PRIMARY KEY,
+        length INTEGER NOT NULL,
+        checksum INTEGER NOT NULL
+    );
+"""
+
+
+def tokenize(text):
+    """
+    Splits text into lower case words. Position of each word
+    is its index in returned list.
+    """
+    return [match.group().casefold() for match in TOKEN_RE.finditer(text)]
+
+
+def parse_query(query_string):
+    """
+    Splits query string into clauses. Each clause is a tuple of terms;
+    clause with more than one term is a phrase. Double quoted
+    parts of query are phrases, as are words joined by punctuation.
+
+    Example:
+
+        parse_query('"power are weak" slavish') ->
+            [('power', 'are', 'weak'), ('slavish',)]
+    """
+    clauses = []
+    for match in QUERY_RE.finditer(query_string):
+        phrase, word = match.groups()
+        terms = tuple(tokenize(phrase if phrase is not None else word))
+        if terms:
+            clauses.append(terms)
+
+    return clauses
+
+
+def page_terms(fields):
+    """
+    Returns dictionary term -> list of occurrences of given page
+    fields (list of strings), and total number of words.
+
+    Occurrences are stored flat: position of the word followed by
+    offset of the word in "\\n".join(fields), for each occurrence.
+    """
+    terms = {}
+    position = 0
+    char_offset = 0
+    for text in fields:
+        text = text or ''
+        for match in TOKEN_RE.finditer(text):
+            terms.setdefault(match.group().casefold(), []).extend(
+                (position, char_offset + match.start())
+            )
+            position += 1
+        position += FIELD_GAP
+        char_offset += len(text) + 1
+
+    return terms, max(position - FIELD_GAP, 0)
+
+
+def fields_checksum(fields):
+    return zlib.crc32(
+        '\x00'.join(text or '' for text in fields).encode('utf-8')
+    )
+
+
+def encode_occurrences(occurrences):
+    return array('I', occurrences).tobytes()
+
+
+def decode_occurrences(blob):
+    occurrences = array('I')
+    occurrences.frombytes(blob)
+    return occurrences
+
+
+def decode_positions(blob):
+    return decode_occurrences(blob)[::2]
+
+
+def phrase_count(positions_list):
+    """
+    Number of occurrences of the phrase in a page, given
+    positions of each of phrase's terms in that page.
+    """
+    first, *rest = positions_list
+    rest = [set(positions) for positions in rest]
+
+    return sum(
+        1 for start in first
+        if all(
+            start + offset in positions
+            for offset, positions in enumerate(rest, start=1)
+        )
+    )
+
+
+class InvertedIndex:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        """
+        Each thread (and each process, e.g. forked celery worker)
+        uses its own connection.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            local.conn = conn
+            local.pid = os.getpid()
+
+        return local.conn
+
+    def add_pages(self, pages):
+        """
+        Adds (or replaces) pages in the index.
+
+        ``pages`` is an iterable of (page_id, fields) tuples, where
+        fields is a list of strings (e.g. title and text of the page).
+        Pages whose content did not change since they were last
+        indexed are skipped.
+
+        Returns number of (re)indexed pages.
+        """
+        conn = self.connection()
+        indexed = 0
+        with conn:
+            for page_id, fields in pages:
+                checksum = fields_checksum(fields)
+                row = conn.execute(
+                    "SELECT checksum FROM pages WHERE page_id = ?",
+                    (page_id,)
+                ).fetchone()
+                if row and row[0] == checksum:
+                    continue
+
+                terms, length = page_terms(fields)
+                conn.execute(
+                    "DELETE FROM postings WHERE page_id = ?",
+                    (page_id,)
+                )
+                conn.executemany(
+                    "INSERT INTO postings (term, page_id, positions)"
+                    " VALUES (?, ?, ?)",
+                    (
+                        (term, page_id, encode_occurrences(occurrences))
+                        for term, occurrences in terms.items()
+                    )
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (page_id, length, checksum)"
+                    " VALUES (?, ?, ?)",
+                    (page_id, length, checksum)
+                )
+                indexed += 1
+
+        return indexed
+
+    def delete_pages(self, page_ids):
+        conn = self.connection()
+        page_ids = list(page_ids)
+        with conn:
+            for index in range(0, len(page_ids), BATCH_SIZE):
+                batch = page_ids[index:index + BATCH_SIZE]
+                placeholders = ", ".join("?" for _ in batch)
+                conn.execute(
+                    f"DELETE FROM postings WHERE page_id IN ({placeholders})",
+                    batch
+                )
+                conn.execute(
+                    f"DELETE FROM pages WHERE page_id IN ({placeholders})",
+                    batch
+                )
+
+    def rebuild(self, pages):
+        """
+        Replaces whole content of the index with given pages (same
+        format as for ``add_pages``) in one transaction; until it is
+        committed, searches see the old index.
+
+        Postings are accumulated in memory for ``BATCH_SIZE`` pages
+        and written in term order; secondary index is created only
+        after all postings were written.
+
+        Returns number of indexed pages.
+        """
+        conn = self.connection()
+        count = 0
+        with conn:
+            # also DROP/CREATE INDEX must be part of the transaction
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP INDEX IF EXISTS postings_page_id")
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM pages")
+            batch = []
+            for page in pages:
+                batch.append(page)
+                if len(batch) >= BATCH_SIZE:
+                    count += self._insert_batch(conn, batch)
+                    batch = []
+            count += self._insert_batch(conn, batch)
+            conn.execute(
+                "CREATE INDEX postings_page_id ON postings (page_id)"
+            )
+
+        return count
+
+    def _insert_batch(self, conn, batch):
+        postings = []
+        rows = []
+        for page_id, fields in batch:
+            terms, length = page_terms(fields)
+            rows.append((page_id, length, fields_checksum(fields)))
+            postings.extend(
+                (term, page_id, encode_occurrences(occurrences))
+                for term, occurrences in terms.items()
+            )
+        postings.sort()
+        conn.executemany(
+            "INSERT INTO postings (term, page_id, positions) VALUES (?, ?, ?)",
+            postings
+        )
+        conn.executemany(
+            "INSERT INTO pages (page_id, length, checksum) VALUES (?, ?, ?)",
+            rows
+        )
+        logger.debug(f"Indexed batch of {len(batch)} pages")
+
+        return len(batch)
+
+    def clear(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM pages")
+
+    def page_count(self):
+        return self.connection().execute(
+            "SELECT count(*) FROM pages"
+        ).fetchone()[0]
+
+    def page_ids(self):
+        return {
+            row[0] for row in
+            self.connection().execute("SELECT page_id FROM pages")
+        }
+
+    def _select_postings(self, term, prefix=False, page_id=None):
+        sql = "SELECT page_id, positions FROM postings"
+        if prefix:
+            sql += " WHERE term >= ? AND term < ?"
+            params = [term, term + PREFIX_END]
+        else:
+            sql += " WHERE term = ?"
+            params = [term]
+        if page_id is not None:
+            sql += " AND page_id = ?"
+            params.append(page_id)
+
+        return self.connection().execute(sql, params)
+
+    def postings(self, term, prefix=False):
+        """
+        Returns dictionary page_id -> positions of given term. With
+        ``prefix=True``, positions of all terms starting with
+        given term are merged.
+        """
+        cursor = self._select_postings(term, prefix=prefix)
+        result = {}
+        for page_id, blob in cursor:
+            positions = decode_positions(blob)
+            if page_id in result:
+                result[page_id] = array(
+                    'I', sorted(result[page_id] + positions)
+                )
+            else:
+                result[page_id] = positions
+
+        return result
+
+    def match_clause(self, terms, prefix=False):
+        """
+        Returns dictionary page_id -> number of occurrences
+        of given clause (a term or a phrase).
+
+        Only single terms are matched by prefix; terms of
+        a phrase must match exactly.
+        """
+        if len(terms) == 1:
+            return {
+                page_id: len(positions)
+                for page_id, positions in
+                self.postings(terms[0], prefix=prefix).items()
+            }
+
+        postings = []
+        for term in terms:
+            term_postings = self.postings(term)
+            if not term_postings:
+                return {}
+            postings.append(term_postings)
+
+        page_ids = set.intersection(*(set(item) for item in postings))
+        result = {}
+        for page_id in page_ids:
+            count = phrase_count([item[page_id] for item in postings])
+            if count:
+                result[page_id] = count
+
+        return result
+
+    def occurrences(self, term, page_id, prefix=False):
+        """
+        Returns dictionary position -> offset of given term
+        (of all terms starting with it, if ``prefix=True``)
+        in given page.
+        """
+        result = {}
+        for _, blob in self._select_postings(term, prefix, page_id):
+            occurrences = decode_occurrences(blob)
+            result.update(zip(occurrences[::2], occurrences[1::2]))
+
+        return result
+
+    def match_offsets(self, query_string, page_id, prefix=True):
+        """
+        Returns sorted list of (start, last_start) offsets of matches of
+        given query in given page: ``start`` is offset of the first
+        word of matched term/phrase and ``last_start`` is offset of its
+        last word (same as ``start`` for single terms). Offsets are in
+        "\\n".join(fields) of the page.
+        """
+        matches = set()
+        for clause in parse_query(query_string):
+            if len(clause) == 1:
+                matches.update(
+                    (start, start) for start in
+                    self.occurrences(clause[0], page_id, prefix).values()
+                )
+                continue
+
+            terms = [self.occurrences(term, page_id) for term in clause]
+            first, *rest = terms
+            for position, start in first.items():
+                if all(
+                    position + offset in term
+                    for offset, term in enumerate(rest, start=1)
+                ):
+                    matches.add((start, rest[-1][position + len(rest)]))
+
+        return sorted(matches)
+
+    def search(self, query_string, operator='and', prefix=True):
+        """
+        Returns dictionary page_id -> relevance score of pages
+        matching given query string.
+
+        With ``operator='and'`` pages must match all clauses of the
+        query, with ``operator='or'`` at least one. Score of a page is
+        sum over matched clauses of tf * idf.
+        """
+        clauses = parse_query(query_string)
+        if not clauses:
+            return {}
+
+        total = max(self.page_count(), 1)
+        scores = None
+        for clause in clauses:
+            matches = self.match_clause(clause, prefix=prefix)
+            idf = math.log(1 + total / max(len(matches), 1))
+            clause_scores = {
+                page_id: idf * count / (count + 1.2)
+                for page_id, count in matches.items()
+            }
+            if scores is None:
+                scores = clause_scores
+            elif operator == 'or':
+                for page_id, score in clause_scores.items():
+                    scores[page_id] = scores.get(page_id, 0) + score
+            else:
+                scores = {
+                    page_id: score + clause_scores[page_id]
+                    for page_id, score in scores.items()
+                    if page_id in clause_scores
+                }
+
+            if not scores and operator != 'or':
+                break
+
+        return scores
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path):
+    """
+    Returns (per process) shared InvertedIndex instance
+    for given file.
+    """
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = InvertedIndex(path)
+
+        return _indexes[path]
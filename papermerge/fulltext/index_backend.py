@@ -0,0 +1,364 @@
+"""
+Inverted index search backend.
+
+Full text search for installations without PostgreSQL (SQLite, MySQL).
+Pages are looked up in an embedded on-disk inverted index (see
+``papermerge.fulltext.index``) instead of scanning ``Page.text`` of
+all pages. Double quoted parts of the query are matched as phrases.
+
+Enable it in papermerge.conf.py:
+
+    SEARCH_BACKEND = "papermerge.fulltext.index_backend.SearchBackend"
+
+and build the index of already existing pages with:
+
+    ./manage.py rebuild_search_index
+
+Searches of other models (e.g. folders) or searches restricted to
+specific fields are served by the database backend.
+"""
+import os
+
+from django.conf import settings
+from django.db import models
+from django.db.models.expressions import Value
+from django.db.models.query import QuerySet
+from django.utils.module_loading import import_string
+
+from papermerge.core.models import Page
+from papermerge.search.backends.base import BaseSearchResults
+from papermerge.search.backends.db import (
+    DatabaseSearchBackend,
+    DatabaseSearchQueryCompiler
+)
+from papermerge.search.query import And, Boost, MatchAll, Not, Or, PlainText
+
+from .index import BATCH_SIZE, TOKEN_RE, get_index
+from .search import KeysetSearchResults, keyset_matches
+
+# Page fields stored in the index, in order
+INDEXED_FIELDS = ('norm_doc_title', 'norm_folder_title', 'text')
+
+
+def index_path():
+    index_dir = settings.PAPERMERGE_SEARCH_INDEX_DIR or os.path.join(
+        settings.MEDIA_ROOT,
+        "search_index"
+    )
+
+    return os.path.join(index_dir, "index.sqlite3")
+
+
+def search_index():
+    return get_index(index_path())
+
+
+def is_enabled():
+    """
+    Index is maintained only if this backend is configured
+    as search backend.
+    """
+    backend_cls = import_string(settings.PAPERMERGE_SEARCH_BACKEND)
+
+    return issubclass(backend_cls, IndexSearchBackend)
+
+
+def page_fields(page):
+    return [getattr(page, field) for field in INDEXED_FIELDS]
+
+
+def text_offsets(fields, matches):
+    """
+    Translates matches as returned by ``InvertedIndex.match_offsets``
+    into (start, end) offsets in the last of given fields (page text).
+    """
+    base = sum(len(text or '') + 1 for text in fields[:-1])
+    text = fields[-1] or ''
+    offsets = []
+    for start, last_start in matches:
+        if start < base:
+            continue
+        word = TOKEN_RE.match(text, last_start - base)
+        if word:
+            offsets.append((start - base, word.end()))
+
+    return offsets
+
+
+def plain_text_queries(query):
+    """
+    Yields PlainText subqueries of given query, except negated ones
+    """
+    if isinstance(query, PlainText):
+        yield query
+    elif isinstance(query, Boost):
+        yield from plain_text_queries(query.subquery)
+    elif isinstance(query, (And, Or)):
+        for subquery in query.subqueries:
+            yield from plain_text_queries(subquery)
+
+
+class IndexSearchQueryCompiler(DatabaseSearchQueryCompiler):
+
+    def search_index(self, index, query=None, boost=1.0):
+        """
+        Returns dictionary page_id -> score of matching pages or
+        None if query matches everything.
+        """
+        if query is None:
+            query = self.query
+
+        if isinstance(query, PlainText):
+            scores = index.search(
+                query.query_string,
+                operator=query.operator,
+                prefix=self.partial_match
+            )
+            return {
+                page_id: score * boost * query.boost
+                for page_id, score in scores.items()
+            }
+
+        if isinstance(query, Boost):
+            boost *= query.boost
+            return self.search_index(index, query.subquery, boost=boost)
+
+        if isinstance(query, MatchAll):
+            return None
+
+        if isinstance(query, Not):
+            excluded = self.search_index(index, query.subquery, boost=boost)
+            if excluded is None:
+                return {}
+            return {
+                page_id: 0.0
+                for page_id in index.page_ids()
+                if page_id not in excluded
+            }
+
+        if isinstance(query, And):
+            result = None
+            for subquery in query.subqueries:
+                scores = self.search_index(index, subquery, boost=boost)
+                if scores is None:
+                    continue
+                if result is None:
+                    result = scores
+                else:
+                    result = {
+                        page_id: score + scores[page_id]
+                        for page_id, score in result.items()
+                        if page_id in scores
+                    }
+            return result
+
+        if isinstance(query, Or):
+            result = {}
+            for subquery in query.subqueries:
+                scores = self.search_index(index, subquery, boost=boost)
+                if scores is None:
+                    return None
+                for page_id, score in scores.items():
+                    result[page_id] = result.get(page_id, 0) + score
+            return result
+
+        raise NotImplementedError(
+            '`%s` is not supported by the index search backend.'
+            % query.__class__.__name__)
+
+
+class IndexSearchResults(KeysetSearchResults, BaseSearchResults):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._matches_cache = None
+        self._offsets_field = None
+
+    def _clone(self):
+        new = super()._clone()
+        # all slices share the same (expensive) index lookup
+        new._matches_cache = self._matches_cache
+        new._offsets_field = self._offsets_field
+        return new
+
+    def annotate_offsets(self, field_name):
+        """
+        Each returned page will have attribute of given name with list
+        of (start, end) offsets of matches in page's text; to be passed
+        to ``papermerge.fulltext.excerpt`` functions.
+        """
+        clone = self._clone()
+        clone._offsets_field = field_name
+        return clone
+
+    def _page_offsets(self, page):
+        fields = page_fields(page)
+        offsets = []
+        for query in plain_text_queries(self.query_compiler.query):
+            offsets.extend(text_offsets(
+                fields,
+                self.backend.index.match_offsets(
+                    query.query_string,
+                    page.id,
+                    prefix=self.query_compiler.partial_match
+                )
+            ))
+
+        return sorted(offsets)
+
+    def _matches(self):
+        """
+        Returns list of (page_id, score) of all matching pages in order
+        of relevance, restricted to pages of searched queryset; or
+        None if query matches everything.
+        """
+        if self._matches_cache is not None:
+            return self._matches_cache
+
+        compiler = self.query_compiler
+        # test that no fields that are not a FilterField were used
+        compiler._get_filters_from_queryset()
+
+        scores = compiler.search_index(self.backend.index)
+        if scores is None:
+            return None
+
+        queryset = self.restricted_queryset()
+        page_ids = list(scores)
+        if queryset.query.has_filters():
+            allowed = set()
+            for index in range(0, len(page_ids), BATCH_SIZE):
+                allowed.update(
+                    queryset.filter(
+                        pk__in=page_ids[index:index + BATCH_SIZE]
+                    ).values_list('pk', flat=True)
+                )
+            page_ids = [page_id for page_id in page_ids if page_id in allowed]
+
+        if compiler.order_by_relevance:
+            page_ids.sort(key=lambda page_id: (-scores[page_id], page_id))
+        else:
+            page_ids.sort()
+
+        self._matches_cache = [
+            (page_id, scores[page_id]) for page_id in page_ids
+        ]
+
+        return self._matches_cache
+
+    def _keyset_matches(self):
+        matches = self._matches()
+        if matches is None or self._after is None:
+            return matches
+
+        return keyset_matches(matches, *self._after)
+
+    def _match_all_queryset(self):
+        queryset = self.restricted_queryset()
+        if self.query_compiler.order_by_relevance:
+            # all pages are equally relevant
+            queryset = queryset.order_by('pk')
+            if self._after:
+                queryset = queryset.filter(pk__gt=self._after[1])
+
+        return queryset
+
+    def _do_search(self):
+        matches = self._keyset_matches()
+        queryset = self.restricted_queryset()
+        if matches is None:
+            queryset = self._match_all_queryset()[self.start:self.stop]
+            if self._score_field:
+                queryset = queryset.annotate(**{
+                    self._score_field: Value(
+                        None,
+                        output_field=models.FloatField()
+                    )
+                })
+            return queryset.iterator()
+
+        matches = matches[self.start:self.stop]
+        pages = queryset.in_bulk([page_id for page_id, _ in matches])
+        results = []
+        for page_id, score in matches:
+            # page deleted in meantime
+            if page_id not in pages:
+                continue
+            page = pages[page_id]
+            if self._score_field:
+                setattr(page, self._score_field, score)
+            if self._offsets_field:
+                setattr(page, self._offsets_field, self._page_offsets(page))
+            results.append(page)
+
+        return results
+
+    def _do_count(self):
+        matches = self._keyset_matches()
+        if matches is None:
+            return self._match_all_queryset()[self.start:self.stop].count()
+
+        return len(matches[self.start:self.stop])
+
+
+class IndexSearchBackend(DatabaseSearchBackend):
+    query_compiler_class = IndexSearchQueryCompiler
+    results_class = IndexSearchResults
+
+    def __init__(self):
+        super().__init__()
+        self.index = search_index()
+        self.fallback = DatabaseSearchBackend()
+
+    def reset_index(self):
+        self.index.clear()
+
+    def add(self, obj):
+        if isinstance(obj, Page):
+            self.index.add_pages([(obj.id, page_fields(obj))])
+
+    def add_bulk(self, model, obj_list):
+        if issubclass(model, Page):
+            self.index.add_pages(
+                (obj.id, page_fields(obj)) for obj in obj_list
+            )
+
+    def delete(self, obj):
+        if isinstance(obj, Page):
+            self.index.delete_pages([obj.id])
+
+    def _search(
+        self,
+        query_compiler_class,
+        query,
+        model_or_queryset,
+        fields,
+        *args,
+        **kwargs
+    ):
+        if isinstance(model_or_queryset, QuerySet):
+            model = model_or_queryset.model
+        else:
+            model = model_or_queryset
+
+        if fields or not issubclass(model, Page):
+            return self.fallback._search(
+                self.fallback.query_compiler_class,
+                query,
+                model_or_queryset,
+                fields,
+                *args,
+                **kwargs
+            )
+
+        return super()._search(
+            query_compiler_class,
+            query,
+            model_or_queryset,
+            fields,
+            *args,
+            **kwargs
+        )
+
+
+SearchBackend = IndexSearchBackend
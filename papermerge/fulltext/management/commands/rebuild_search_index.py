@@ -0,0 +1,38 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from papermerge.core.models import Page
+from papermerge.fulltext.index_backend import INDEXED_FIELDS, search_index
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """Builds inverted search index from text of all pages.
+
+    Needed once after switching to the inverted index search backend;
+    afterwards index is kept up to date automatically.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            '-c',
+            type=int,
+            default=2000,
+            help="Number of pages read from the database at once"
+        )
+
+    def handle(self, *args, **options):
+        pages = Page.objects.order_by('id').values_list(
+            'id',
+            *INDEXED_FIELDS
+        ).iterator(chunk_size=max(options['chunk_size'], 1))
+
+        count = search_index().rebuild(
+            (page_id, list(fields)) for page_id, *fields in pages
+        )
+
+        self.stdout.write(f"{count} pages indexed.")
@@ -0,0 +1,57 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from papermerge.core.models import Page
+from papermerge.fulltext.models import PageSearchVector, is_enabled
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """(Re)builds full text search vectors of pages.
+
+    Needed once after switching to the postgres search backend
+    (or after changing SEARCH_LANGUAGE_CONFIGS); afterwards vectors are
+    kept up to date automatically.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--document-id',
+            '-d',
+            help="Limit update only for specified document_id"
+        )
+        parser.add_argument(
+            '--batch-size',
+            '-b',
+            type=int,
+            default=1000,
+            help="Number of pages updated in one SQL statement"
+        )
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            raise CommandError(
+                "Full text search vectors require PostgreSQL database"
+                " and papermerge.fulltext.backends.SearchBackend"
+                " as SEARCH_BACKEND."
+            )
+
+        pages = Page.objects.order_by('id')
+        document_id = options.get('document_id', None)
+        if document_id:
+            pages = pages.filter(document_id=document_id)
+
+        page_ids = list(pages.values_list('id', flat=True))
+        batch_size = max(options['batch_size'], 1)
+        updated = 0
+
+        for index in range(0, len(page_ids), batch_size):
+            updated += PageSearchVector.objects.refresh(
+                page_ids=page_ids[index:index + batch_size]
+            )
+            logger.debug(f"{updated}/{len(page_ids)} search vectors updated")
+
+        self.stdout.write(f"{updated} search vectors updated.")
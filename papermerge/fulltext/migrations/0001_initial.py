@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+import papermerge.fulltext.fields
+
+INDEX_NAME = 'fulltext_pagesearchvector_vector_gin'
+
+
+def create_gin_index(apps, schema_editor):
+    # GIN indexes exist only in PostgreSQL; on other databases
+    # the table is created but never filled.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        f"CREATE INDEX {INDEX_NAME}"
+        " ON fulltext_pagesearchvector USING gin (vector)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSearchVector',
+            fields=[
+                ('page', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='search_vector',
+                    serialize=False,
+                    to='core.page'
+                )),
+                ('config', models.CharField(default='simple', max_length=64)),
+                ('vector', papermerge.fulltext.fields.TsVectorField(
+                    null=True
+                )),
+            ],
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
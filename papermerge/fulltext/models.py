@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db import connection, models
+from django.utils.module_loading import import_string
+
+from papermerge.core.models import Page
+
+from .fields import TsVectorField
+
+# Page field -> weight of its lexemes in page's search vector.
+# Same order of importance as boosts of ``Page.search_fields``.
+WEIGHTED_FIELDS = (
+    ('norm_doc_title', 'A'),
+    ('text', 'B'),
+    ('norm_folder_title', 'C'),
+)
+
+
+def is_enabled():
+    """
+    Search vectors are maintained only on PostgreSQL and only if
+    postgres search backend is configured as search backend.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    # backends module requires psycopg2, available only on PostgreSQL
+    from .backends import PostgresSearchBackend
+
+    backend_cls = import_string(settings.PAPERMERGE_SEARCH_BACKEND)
+
+    return issubclass(backend_cls, PostgresSearchBackend)
+
+
+def tsquery_term(term, prefix=True):
+    """
+    Returns ``to_tsquery`` input which matches given term as is.
+    Term is quoted, so that characters with special meaning in
+    tsquery syntax (& | ! : etc) are not interpreted.
+
+    With ``prefix=True`` also words starting with given term match
+    (e.g. 'inv' matches 'invoice').
+    """
+    lexeme = term.replace('\\', '\\\\').replace("'", "''")
+    if prefix:
+        return f"'{lexeme}':*"
+
+    return f"'{lexeme}'"
+
+
+def config_case_sql(column):
+    """
+    Returns (sql, params) of SQL expression which maps page language
+    in given column (ISO-639-2/T e.g. 'deu') to the name of PostgreSQL
+    text search configuration (e.g. 'german') according to
+    ``PAPERMERGE_SEARCH_LANGUAGE_CONFIGS``.
+
+    Languages without configuration use the 'simple' configuration
+    (no stemming, no stop words).
+    """
+    configs = settings.PAPERMERGE_SEARCH_LANGUAGE_CONFIGS
+    default = settings.PAPERMERGE_SEARCH_DEFAULT_CONFIG
+
+    if not configs:
+        return "%s", [default]
+
+    whens = " ".join("WHEN %s THEN %s" for _ in configs)
+    params = []
+    for lang, config in configs.items():
+        params.extend([lang.lower(), config])
+    params.append(default)
+
+    return f"(CASE lower({column}) {whens} ELSE %s END)", params
+
+
+class PageSearchVectorManager(models.Manager):
+
+    def refresh(self, page_ids=None):
+        """
+        (Re)computes search vectors of given pages (of all pages if
+        ``page_ids`` is None) in one INSERT ... SELECT statement, so that
+        text of the pages never travels to python and back.
+
+        Returns number of updated vectors.
+        """
+        if not is_enabled():
+            return 0
+
+        pages_table = Page._meta.db_table
+        config_sql, params = config_case_sql('lang')
+        vector_sql = " || ".join(
+            f"setweight(to_tsvector(page.config::regconfig,"
+            f" coalesce(page.{field}, '')), '{weight}')"
+            for field, weight in WEIGHTED_FIELDS
+        )
+        columns = ", ".join(field for field, _ in WEIGHTED_FIELDS)
+        where = ""
+        if page_ids is not None:
+            where = "WHERE id = ANY(%s)"
+            params.append(list(page_ids))
+
+        sql = f"""
+            INSERT INTO {self.model._meta.db_table}
+                (page_id, config, vector)
+            SELECT page.id, page.config, {vector_sql}
+            FROM (
+                SELECT id, {columns}, {config_sql} AS config
+                FROM {pages_table}
+                {where}
+            ) AS page
+            ON CONFLICT (page_id) DO UPDATE SET
+                config = EXCLUDED.config,
+                vector = EXCLUDED.vector
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+class PageSearchVector(models.Model):
+    """
+    Full text search vector of a page.
+
+    Kept in its own table (one row per page) as ``Page`` model
+    is part of papermerge core. Indexed with GIN index, see migrations.
+    """
+    page = models.OneToOneField(
+        Page,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_vector'
+    )
+    # PostgreSQL text search configuration used to build the vector
+    # (derived from ``Page.lang``); queries against this page
+    # must be parsed with the same configuration.
+    config = models.CharField(max_length=64, default='simple')
+    vector = TsVectorField(null=True)
+
+    objects = PageSearchVectorManager()
@@ -0,0 +1,188 @@
+"""
+Search restricted to nodes the user has access to, with keyset
+pagination.
+
+Access rules are applied by the database, as lookup of the user's
+effective permissions (``papermerge.access``) of each node, before
+results are ranked and sliced, so that only readable pages/folders are
+ever fetched and every page of results holds ``limit`` items. Search
+backends accept filters only on indexed fields (``index.FilterField``),
+so the access filter is not part of the searched queryset; it is applied
+to the queryset the backend builds (see ``KeysetSearchResults.restrict``).
+
+Results are paginated by keyset (seek method): the cursor of the next
+page is (score, pk) of the last returned result and the next page
+starts right after it, instead of skipping rows with an offset. Page N
+of results costs the same as the first one.
+"""
+import base64
+import json
+from collections import namedtuple
+from itertools import dropwhile
+
+from django.db import models
+from django.db.models import Q, Value
+
+from papermerge.access.models import filter_by_perms
+from papermerge.core.models import Access, Page
+from papermerge.search.backends import get_search_backend
+from papermerge.search.backends.base import EmptySearchResults
+
+# number of results per page
+PAGE_SIZE = 25
+
+# name of the attribute with result's score
+SCORE_FIELD = 'search_score'
+
+SearchPage = namedtuple('SearchPage', ['results', 'next_cursor'])
+
+
+def filter_readable(queryset, user, node_field='pk', perm=Access.PERM_READ):
+    """
+    Restricts queryset to objects whose node (given by ``node_field``,
+    e.g. 'document_id' for pages) the user has ``perm`` on.
+    """
+    return filter_by_perms(queryset, user, [perm], node_field)
+
+
+def encode_cursor(score, pk):
+    value = json.dumps([score, pk]).encode('utf-8')
+
+    return base64.urlsafe_b64encode(value).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Returns (score, pk) tuple. Raises ValueError if cursor is not
+    valid.
+    """
+    try:
+        score, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+
+    if not isinstance(pk, int):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+
+    if score is not None and not isinstance(score, (int, float)):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+
+    return score, pk
+
+
+def keyset_filter(score_field, score, pk):
+    """
+    Filter for results ordered after (score, pk) in ``-score, pk`` order.
+    """
+    if score is None:
+        return Q(pk__gt=pk)
+
+    return Q(**{f"{score_field}__lt": score}) | Q(
+        **{score_field: score, 'pk__gt': pk}
+    )
+
+
+def keyset_matches(matches, score, pk):
+    """
+    Same as ``keyset_filter`` for list of (pk, score) tuples sorted
+    in ``-score, pk`` order.
+    """
+    if score is None:
+        return list(dropwhile(lambda match: match[0] <= pk, matches))
+
+    return list(dropwhile(
+        lambda match: (-match[1], match[0]) <= (-score, pk),
+        matches
+    ))
+
+
+class KeysetSearchResults:
+    """
+    Search results which support keyset pagination. Results must be
+    ordered by relevance (score descending, then pk).
+    """
+    _after = None
+    _restrict = None
+
+    def _clone(self):
+        new = super()._clone()
+        new._after = self._after
+        new._restrict = self._restrict
+        return new
+
+    def restrict(self, func):
+        """
+        Returns results restricted by ``func``, which takes the queryset
+        of searched objects and returns it filtered. Must be called
+        before results are evaluated.
+        """
+        clone = self._clone()
+        clone._restrict = func
+        return clone
+
+    def restricted_queryset(self):
+        queryset = self.query_compiler.queryset
+        if self._restrict is not None:
+            queryset = self._restrict(queryset)
+
+        return queryset
+
+    def after(self, score, pk):
+        """
+        Returns only results ordered after the one with given
+        score and primary key.
+        """
+        clone = self._clone()
+        clone._after = (score, pk)
+        return clone
+
+
+def search(user, query, model, cursor=None, limit=PAGE_SIZE, backend=None):
+    """
+    Searches pages or folders (``model``) readable by the user.
+
+    Returns ``SearchPage`` with at most ``limit`` results and cursor
+    to be passed to get the next page (None if there are no more
+    results). Raises ValueError if cursor is not valid.
+    """
+    if backend is None:
+        backend = get_search_backend()
+
+    queryset = model.objects.all()
+    if issubclass(model, Page):
+        node_field = 'document_id'
+        queryset = queryset.select_related('document')
+    else:
+        node_field = 'pk'
+
+    def readable(queryset):
+        return filter_readable(queryset, user, node_field)
+
+    score, pk = decode_cursor(cursor) if cursor else (None, None)
+
+    results = backend.search(query, queryset)
+    if isinstance(results, EmptySearchResults):
+        return SearchPage([], None)
+
+    if isinstance(results, KeysetSearchResults):
+        results = results.restrict(readable)
+        if pk is not None:
+            results = results.after(score, pk)
+        results = results.annotate_score(SCORE_FIELD)
+    else:
+        # no ranking (e.g. database backend), keyset by primary key only
+        results = readable(results.get_queryset()).order_by('pk')
+        if pk is not None:
+            results = results.filter(pk__gt=pk)
+        results = results.annotate(**{
+            SCORE_FIELD: Value(None, output_field=models.FloatField())
+        })
+
+    items = list(results[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, SCORE_FIELD), last.pk)
+
+    return SearchPage(items, next_cursor)
@@ -0,0 +1,60 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from papermerge.core.models import Page
+
+from . import index_backend
+from .models import PageSearchVector, WEIGHTED_FIELDS, is_enabled
+
+logger = logging.getLogger(__name__)
+
+# fields of Page which search vector depends on
+VECTOR_FIELDS = {field for field, _ in WEIGHTED_FIELDS} | {'lang'}
+
+
+@receiver(post_save, sender=Page)
+def update_search_vector_handler(sender, instance, **kwargs):
+    """
+    Keeps search vector of the page up to date. Page is saved
+    e.g. when its OCRed text is moved into the database
+    (``Page.update_text_field``) or when its document is renamed/moved
+    (``Page.norm``).
+    """
+    if not is_enabled():
+        return
+
+    update_fields = kwargs.get('update_fields', None)
+    if update_fields and not VECTOR_FIELDS.intersection(update_fields):
+        return
+
+    PageSearchVector.objects.refresh(page_ids=[instance.id])
+
+
+@receiver(post_save, sender=Page)
+def update_search_index_handler(sender, instance, **kwargs):
+    """
+    Same as ``update_search_vector_handler``, but for
+    the inverted index search backend.
+    """
+    if not index_backend.is_enabled():
+        return
+
+    update_fields = kwargs.get('update_fields', None)
+    if update_fields and not set(index_backend.INDEXED_FIELDS).intersection(
+        update_fields
+    ):
+        return
+
+    index_backend.search_index().add_pages(
+        [(instance.id, index_backend.page_fields(instance))]
+    )
+
+
+@receiver(post_delete, sender=Page)
+def delete_from_search_index_handler(sender, instance, **kwargs):
+    if not index_backend.is_enabled():
+        return
+
+    index_backend.search_index().delete_pages([instance.id])
@@ -0,0 +1,166 @@
+"""
+Replaces ``search_tags`` template tag library of papermerge core
+(library of an app listed later in INSTALLED_APPS takes precedence),
+so that search results page uses ``papermerge.fulltext.excerpt``.
+Tags have the same syntax as in core.
+"""
+import re
+
+from django import template
+from django.template import TemplateSyntaxError
+
+from papermerge.fulltext.excerpt import highlight, search_excerpt
+
+register = template.Library()
+
+
+class SearchExcerptNode(template.Node):
+
+    def __init__(
+        self,
+        content,
+        search_terms,
+        context_words_count,
+        var_name,
+        offsets=None
+    ):
+        self._content = template.Variable(content)
+        self._search_terms = template.Variable(search_terms)
+        self._context_words_count = context_words_count
+        self._var_name = var_name
+        self._offsets = template.Variable(offsets) if offsets else None
+
+    def render(self, context):
+        try:
+            content = self._content.resolve(context)
+            search_terms = self._search_terms.resolve(context)
+            offsets = None
+            if self._offsets:
+                offsets = self._offsets.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+
+        result = search_excerpt(
+            text=content,
+            phrases=search_terms,
+            context_words_count=self._context_words_count,
+            offsets=offsets
+        )
+        if self._var_name:
+            context[self._var_name] = result
+            return ""
+
+        return result
+
+
+class HighlightNode(template.Node):
+
+    def __init__(
+        self,
+        content,
+        search_terms,
+        class_name,
+        var_name
+    ):
+        self._content = template.Variable(content)
+        self._search_terms = template.Variable(search_terms)
+        self._class_name = class_name
+        self._var_name = var_name
+
+    def render(self, context):
+        try:
+            content = self._content.resolve(context)
+            search_terms = self._search_terms.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+
+        result = highlight(
+            text=content,
+            phrases=search_terms,
+            class_name=self._class_name
+        )
+        if self._var_name:
+            context[self._var_name] = result
+            return ""
+
+        return result
+
+
+@register.tag
+def search_excerpt_tag(parser, token):
+    """
+        {% search_excerpt_tag content search_terms [word_count] [offsets]
+            as name %}
+
+    ``offsets`` - optional list of (start, end) offsets of matches
+    in content, see ``IndexSearchResults.annotate_offsets``.
+    """
+    try:
+        # Splitting by None == splitting by spaces.
+        tag_name, arg = token.contents.split(None, 1)
+    except ValueError:
+        raise TemplateSyntaxError(
+            "%r tag requires arguments" % token.contents.split()[0]
+        )
+
+    m = re.search(r'(.*?) as (\w+)', arg)
+    if not m:
+        raise TemplateSyntaxError(
+            "%r tag had invalid arguments" % tag_name
+        )
+
+    before_var, var_name = m.groups()
+    bits = before_var.split(None)
+
+    if len(bits) > 2:
+        context_words_count = bits[2]
+    else:
+        context_words_count = 5
+
+    if len(bits) > 3:
+        offsets = bits[3]
+    else:
+        offsets = None
+
+    return SearchExcerptNode(
+        content=bits[0],
+        search_terms=bits[1],
+        context_words_count=int(context_words_count),
+        var_name=var_name,
+        offsets=offsets
+    )
+
+
+@register.tag
+def highlight_tag(parser, token):
+    """
+        {% highlight_tag text search_terms [class_name] [as name] %}
+    """
+    try:
+        # Splitting by None == splitting by spaces.
+        tag_name, arg = token.contents.split(None, 1)
+    except ValueError:
+        raise TemplateSyntaxError(
+            "%r tag requires arguments" % token.contents.split()[0]
+        )
+
+    m = re.search(r'(.*?) as (\w+)', arg)
+    if not m:
+        raise TemplateSyntaxError(
+            "%r tag had invalid arguments" % tag_name
+        )
+
+    before_var, var_name = m.groups()
+    bits = before_var.split(None)
+
+    if len(bits) > 2:
+        class_name = bits[2]
+    else:
+        class_name = 'text-success'
+
+    return HighlightNode(
+        content=bits[0],
+        search_terms=bits[1],
+        class_name=class_name,
+        var_name=var_name
+    )
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'fulltext'
+
+urlpatterns = [
+    path(
+        'search', views.search, name="search"
+    ),
+]
@@ -0,0 +1,67 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, JsonResponse
+
+from papermerge.core.models import Folder, Page
+
+from .excerpt import search_excerpt
+from .search import PAGE_SIZE, SCORE_FIELD, search as search_nodes
+
+# upper limit of ``limit`` parameter
+MAX_PAGE_SIZE = 100
+
+
+def page_item(page, query):
+    return {
+        'id': page.id,
+        'number': page.number,
+        'document_id': page.document_id,
+        'title': page.document.title,
+        'score': getattr(page, SCORE_FIELD),
+        'excerpt': search_excerpt(page.text, query.split())['excerpt'],
+    }
+
+
+def folder_item(folder):
+    return {
+        'id': folder.id,
+        'title': folder.title,
+    }
+
+
+@login_required
+def search(request):
+    """
+    Same as ``admin:search`` view, but returns only pages and folders
+    the user can read, one page of results at a time.
+
+    Parameters:
+        q - search term
+        cursor - ``next`` value of previous response
+        limit - number of results per page
+
+    Folders are returned only with the first page of results.
+    """
+    query = request.GET.get('q', '')
+    cursor = request.GET.get('cursor', None)
+    try:
+        limit = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid limit")
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        pages = search_nodes(request.user, query, Page, cursor, limit)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor")
+
+    folders = []
+    if not cursor:
+        folders = search_nodes(request.user, query, Folder, limit=limit)
+        folders = folders.results
+
+    return JsonResponse({
+        'pages': [page_item(page, query) for page in pages.results],
+        'folders': [folder_item(folder) for folder in folders],
+        'next': pages.next_cursor,
+    })
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ImportersConfig(AppConfig):
+    # Event driven importers of local folder and email
+    name = 'papermerge.importers'
+    label = 'importers'
+
+    def ready(self):
+        from papermerge.importers import signals  # noqa
@@ -0,0 +1,528 @@
+"""
+IMAP importer which keeps up with busy mailboxes.
+
+``papermerge.core.importers.imap.import_attachment`` logs in every
+``IMPORTER_LOOP_TIME`` seconds, fetches BODYSTRUCTURE of all UNSEEN
+messages, downloads whole messages with attachments (RFC822) and
+imports their attachments one after another. ``MailboxConsumer``
+instead:
+
+    * stays connected and waits for new messages with IDLE (polls
+      servers without IDLE capability)
+    * fetches only BODYSTRUCTURE and few header fields of new messages,
+      then downloads just the attachment parts (and the text part, if
+      it is needed to find mail secret)
+    * hands attachments to a pool of ``IMPORT_MAIL_WORKERS`` threads
+      running import pipelines
+    * records UID of the last processed message per mailbox (see
+      ``Checkpoint``), so that after restart only messages which
+      arrived meanwhile are fetched
+
+Users are matched (see ``papermerge.importers.routing``) and messages
+are flagged/deleted as by core importer.
+"""
+import base64
+import email
+import email.header
+import email.policy
+import email.utils
+import io
+import json
+import logging
+import os
+import quopri
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.temp import NamedTemporaryFile
+from django.db import connection
+from imapclient.exceptions import IMAPClientError
+from imapclient.response_types import BodyData
+
+from papermerge.core.import_pipeline import IMAP, go_through_pipelines
+from papermerge.core.importers.imap import login
+
+from .pipelines import accepts_files
+from .routing import get_matching_user
+
+logger = logging.getLogger(__name__)
+
+# number of messages whose BODYSTRUCTURE is fetched with one command
+FETCH_BATCH_SIZE = 100
+# IDLE must be renewed at least every 29 minutes (RFC 2177)
+IDLE_RENEW = 25 * 60
+# header fields needed to match user (response key of HEADER_FETCH)
+HEADER_FETCH = 'BODY.PEEK[HEADER.FIELDS (FROM TO SUBJECT)]'
+HEADER_FIELDS = b'BODY[HEADER.FIELDS (FROM TO SUBJECT)]'
+# seconds to wait before reconnecting after failure
+RECONNECT_DELAY = 10
+
+
+def decode_header_value(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace')
+
+    return str(email.header.make_header(email.header.decode_header(value)))
+
+
+def part_params(params):
+    """
+    ``(b'name', b'value', ...)`` of BODYSTRUCTURE as dictionary
+    with lowercase string keys.
+    """
+    if not isinstance(params, tuple):
+        return {}
+
+    return {
+        key.decode('ascii', errors='replace').lower(): value
+        for key, value in zip(params[0::2], params[1::2])
+        if isinstance(key, bytes)
+    }
+
+
+def part_filename(part):
+    for params in (disposition(part)[1], part_params(part[2])):
+        if 'filename*' in params:
+            # RFC 2231 encoded filename
+            value = params['filename*'].decode('ascii', errors='replace')
+            return email.utils.collapse_rfc2231_value(
+                email.utils.decode_rfc2231(value)
+            )
+        for key in ('filename', 'name'):
+            if params.get(key):
+                return decode_header_value(params[key])
+
+    return None
+
+
+def disposition(part):
+    """
+    Returns (disposition, params) of non-multipart body part, e.g.
+    (b'attachment', {'filename': b'invoice.pdf'}).
+
+    Same as ``papermerge.core.importers.imap.contains_attachments``,
+    disposition is looked up in all extension fields of the part.
+    """
+    for item in part[7:]:
+        if isinstance(item, tuple) and len(item) == 2 and (
+            isinstance(item[0], bytes)
+        ):
+            if item[0].lower() in (b'attachment', b'inline'):
+                return item[0].lower(), part_params(item[1])
+
+    return None, {}
+
+
+def iter_parts(structure, prefix=""):
+    """
+    Yields (part number, part) of all non-multipart parts of
+    BODYSTRUCTURE; part number is as expected by BODY[<part>].
+    """
+    if not isinstance(structure, BodyData):
+        return
+
+    if structure.is_multipart:
+        for index, part in enumerate(structure[0], start=1):
+            yield from iter_parts(part, f"{prefix}{index}.")
+        return
+
+    yield (prefix.rstrip(".") or "1"), structure
+
+
+def attachment_parts(structure):
+    """
+    Returns list of (part number, filename, encoding) of attachments.
+    """
+    attachments = []
+    for number, part in iter_parts(structure):
+        if disposition(part)[0] != b'attachment':
+            continue
+        encoding = part[5].lower() if isinstance(part[5], bytes) else b''
+        attachments.append((number, part_filename(part), encoding))
+
+    return attachments
+
+
+def text_part(structure):
+    """
+    Returns (part number, encoding) of first text/plain part which is
+    not an attachment, or None.
+    """
+    for number, part in iter_parts(structure):
+        if not isinstance(part[0], bytes) or not isinstance(part[1], bytes):
+            continue
+        if (part[0].lower(), part[1].lower()) != (b'text', b'plain'):
+            continue
+        if disposition(part)[0] == b'attachment':
+            continue
+        encoding = part[5].lower() if isinstance(part[5], bytes) else b''
+        return number, encoding
+
+    return None
+
+
+def decode_part(data, encoding, output):
+    """
+    Writes content transfer decoded ``data`` to ``output`` file object
+    (line by line, without another copy of the whole part in memory).
+    """
+    source = io.BytesIO(data)
+    if encoding == b'base64':
+        base64.decode(source, output)
+    elif encoding == b'quoted-printable':
+        quopri.decode(source, output)
+    else:
+        output.write(data)
+
+
+class Checkpoint:
+    """
+    UID of the last processed message of each mailbox, kept in a JSON
+    file:
+
+        {"<user>@<host>/<mailbox>": {"uidvalidity": .., "uid": ..}}
+
+    UIDs are valid only as long as UIDVALIDITY of mailbox is unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.mailboxes = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.mailboxes = json.load(f)
+
+    def get(self, mailbox, uidvalidity):
+        entry = self.mailboxes.get(mailbox)
+        if entry is None or entry['uidvalidity'] != uidvalidity:
+            return 0
+
+        return entry['uid']
+
+    def set(self, mailbox, uidvalidity, uid):
+        with self._lock:
+            self.mailboxes[mailbox] = {'uidvalidity': uidvalidity, 'uid': uid}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.mailboxes, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+
+class UidTracker:
+    """
+    Messages are imported concurrently; checkpoint may advance only to
+    the highest UID below which all messages are processed.
+    """
+
+    def __init__(self, last_uid=0):
+        # checkpoint: all messages up to this UID are processed
+        self.last_uid = last_uid
+        # highest UID of messages fetched so far
+        self.fetched_uid = last_uid
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        # processed UIDs above an UID still in flight
+        self._processed = set()
+
+    def start(self, uid):
+        """
+        Message was fetched and handed over for import.
+        """
+        with self._lock:
+            self._in_flight.add(uid)
+            self.fetched_uid = max(self.fetched_uid, uid)
+
+    def rewind(self):
+        """
+        Messages above the checkpoint which were not handed over for
+        import (e.g. connection failed while they were fetched) are
+        fetched again.
+        """
+        with self._lock:
+            self.fetched_uid = max(
+                [self.last_uid, *self._in_flight, *self._processed]
+            )
+
+    def finish(self, uid):
+        """
+        Returns new checkpoint UID, or None if it did not change.
+        """
+        with self._lock:
+            self._in_flight.discard(uid)
+            self._processed.add(uid)
+            limit = min(self._in_flight) if self._in_flight else None
+            done = [
+                processed for processed in self._processed
+                if limit is None or processed < limit
+            ]
+            if not done:
+                return None
+            self._processed.difference_update(done)
+            if max(done) <= self.last_uid:
+                return None
+            self.last_uid = max(done)
+
+            return self.last_uid
+
+
+class MailboxConsumer:
+
+    def __init__(
+        self,
+        imap_server,
+        username,
+        password,
+        checkpoint_path,
+        inbox_name="INBOX",
+        by_user=False,
+        by_secret=False,
+        delete=False,
+        workers=None,
+        skip_ocr=False
+    ):
+        self.imap_server = imap_server
+        self.username = username
+        self.password = password
+        self.inbox_name = inbox_name
+        self.by_user = by_user
+        self.by_secret = by_secret
+        self.delete = delete
+        self.skip_ocr = skip_ocr
+        if workers is None:
+            workers = settings.PAPERMERGE_IMPORT_MAIL_WORKERS
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.mailbox = f"{username}@{imap_server}/{inbox_name}"
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="imap-importer"
+        )
+        # limits number of fetched messages waiting for the pool
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._lock = threading.Lock()
+        # UIDs of imported messages to be flagged (or deleted)
+        self._processed = []
+        self.client = None
+        self.uidvalidity = None
+        self.tracker = None
+
+    def connect(self):
+        self.client = login(
+            imap_server=self.imap_server,
+            username=self.username,
+            password=self.password
+        )
+        if self.client is None:
+            raise IMAPClientError(f"Login to {self.imap_server} failed")
+
+        folder = self.client.select_folder(self.inbox_name)
+        uidvalidity = folder[b'UIDVALIDITY']
+        if self.tracker is None or uidvalidity != self.uidvalidity:
+            self.uidvalidity = uidvalidity
+            self.tracker = UidTracker(
+                self.checkpoint.get(self.mailbox, uidvalidity)
+            )
+        else:
+            self.tracker.rewind()
+
+    def new_uids(self):
+        fetched_uid = self.tracker.fetched_uid
+        criteria = ['UNSEEN']
+        if fetched_uid:
+            # "<n>:*" matches the last message even if its UID < n
+            criteria += ['UID', f"{fetched_uid + 1}:*"]
+
+        return sorted(
+            uid for uid in self.client.search(criteria)
+            if uid > fetched_uid
+        )
+
+    def process_new(self):
+        """
+        Fetches new messages and submits their attachments to the pool.
+        Returns number of new messages.
+        """
+        uids = self.new_uids()
+        logger.debug(f"{IMAP} importer: {len(uids)} new messages")
+        for index in range(0, len(uids), FETCH_BATCH_SIZE):
+            batch = uids[index:index + FETCH_BATCH_SIZE]
+            fetched = self.client.fetch(batch, ['BODYSTRUCTURE', HEADER_FETCH])
+            for uid in batch:
+                if uid in fetched:
+                    self.process_message(uid, fetched[uid])
+
+        return len(uids)
+
+    def process_message(self, uid, data):
+        """
+        Fetches attachments of the message and submits them to the
+        pool. UID is tracked only once the message is handed over, so
+        that a message which failed to be fetched is fetched again.
+        """
+        structure = data[b'BODYSTRUCTURE']
+        attachments = attachment_parts(structure)
+        if not attachments:
+            self.tracker.start(uid)
+            self.processed(uid, imported=False)
+            return
+
+        files = []
+        try:
+            user = self.matching_user(
+                uid,
+                data.get(HEADER_FIELDS, b''),
+                structure
+            )
+            parts = [
+                f"BODY.PEEK[{number}]".encode()
+                for number, _filename, _encoding in attachments
+            ]
+            response = self.client.fetch([uid], parts).get(uid, {})
+            for number, filename, encoding in attachments:
+                content = response.get(f"BODY[{number}]".encode())
+                if content is None:
+                    continue
+                temp = NamedTemporaryFile()
+                files.append((filename, temp))
+                decode_part(content, encoding, temp)
+                temp.flush()
+            del response
+        except Exception:
+            for _filename, temp in files:
+                temp.close()
+            raise
+
+        self.tracker.start(uid)
+        self._slots.acquire()
+        self.executor.submit(self.import_attachments, uid, user, files)
+
+    def matching_user(self, uid, header, structure):
+        if not (self.by_user or self.by_secret):
+            return None
+
+        body = b""
+        part = text_part(structure) if self.by_secret else None
+        if part is not None:
+            number, encoding = part
+            response = self.client.fetch(
+                [uid], [f"BODY.PEEK[{number}]".encode()]
+            )
+            data = response.get(uid, {}).get(f"BODY[{number}]".encode())
+            if data:
+                decoded = io.BytesIO()
+                decode_part(data, encoding, decoded)
+                body = decoded.getvalue()
+
+        # only header fields and text needed by get_matching_user
+        email_message = email.message_from_bytes(
+            header.rstrip(b"\r\n") + b"\r\n\r\n" + body,
+            policy=email.policy.default
+        )
+
+        return get_matching_user(
+            email_message,
+            by_user=self.by_user,
+            by_secret=self.by_secret
+        )
+
+    def import_attachments(self, uid, user, files):
+        imported = False
+        try:
+            for filename, temp in files:
+                if accepts_files():
+                    payload = temp
+                else:
+                    temp.seek(0)
+                    payload = temp.read()
+                try:
+                    doc = go_through_pipelines(
+                        {'payload': payload, 'processor': IMAP},
+                        {
+                            'user': user,
+                            'name': filename,
+                            'skip_ocr': self.skip_ocr
+                        }
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"{IMAP} importer: exception {e} while importing"
+                        f" {filename} of message {uid}"
+                    )
+                    continue
+                imported = imported or doc is not None
+        finally:
+            for _filename, temp in files:
+                temp.close()
+            connection.close()
+            self._slots.release()
+            self.processed(uid, imported)
+
+    def processed(self, uid, imported):
+        checkpoint_uid = self.tracker.finish(uid)
+        if checkpoint_uid is not None:
+            self.checkpoint.set(self.mailbox, self.uidvalidity, checkpoint_uid)
+        if imported:
+            with self._lock:
+                self._processed.append(uid)
+
+    def flag_processed(self):
+        """
+        Marks imported messages as seen (deletes them with
+        ``delete``); IMAP connection is used by this thread only.
+        """
+        with self._lock:
+            uids, self._processed = self._processed, []
+        if not uids:
+            return
+
+        self.client.add_flags(uids, [br'\Seen'])
+        if self.delete:
+            self.client.delete_messages(uids)
+            self.client.expunge()
+
+    def wait_for_messages(self, timeout):
+        """
+        Waits up to ``timeout`` seconds for new messages.
+        """
+        if not self.client.has_capability('IDLE'):
+            time.sleep(timeout)
+            return
+
+        self.client.idle()
+        try:
+            self.client.idle_check(timeout=timeout)
+        finally:
+            self.client.idle_done()
+
+    def run(self, stop_event=None):
+        """
+        Imports attachments until ``stop_event`` is set (forever if
+        None).
+        """
+        idle_timeout = min(settings.PAPERMERGE_IMPORT_MAIL_IDLE_TIMEOUT,
+                           IDLE_RENEW)
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    if self.client is None:
+                        self.connect()
+                    self.process_new()
+                    self.flag_processed()
+                    self.wait_for_messages(idle_timeout)
+                except (IMAPClientError, OSError) as e:
+                    logger.error(
+                        f"{IMAP} importer: {e}, reconnecting"
+                        f" in {RECONNECT_DELAY} seconds"
+                    )
+                    self.client = None
+                    time.sleep(RECONNECT_DELAY)
+        finally:
+            self.executor.shutdown(wait=True)
+            if self.client is not None:
+                self.flag_processed()
+                self.client.logout()
@@ -0,0 +1,107 @@
+"""
+Minimal inotify(7) binding (Linux only), via ctypes, so that importer
+does not depend on an extra package.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event: int wd; uint32 mask, cookie, len; char name[]
+EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+        _libc = libc
+
+    return _libc
+
+
+def is_available():
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except (OSError, TypeError):
+        return False
+
+
+class Inotify:
+
+    def __init__(self):
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # wd -> watched directory
+        self.watches = {}
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+
+        return wd
+
+    def read_events(self, timeout=None):
+        """
+        Waits up to ``timeout`` seconds (forever if None) for events and
+        returns list of (mask, path) tuples; path is None for
+        ``IN_Q_OVERFLOW``.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                events.append((mask, None))
+            else:
+                events.append(
+                    (mask, os.path.join(directory, os.fsdecode(name)))
+                )
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
@@ -0,0 +1,92 @@
+"""
+Journal of files being imported by the local importer.
+
+Each state change of a file is appended (and fsynced) to the journal
+file as one JSON line:
+
+    {"path": ..., "digest": ..., "state": ..., "time": ...,
+     "document_id": ...}
+
+States are ``importing`` (pipelines started), ``imported`` (document
+created, file not removed yet) and ``done`` (file removed or skipped).
+After restart, files which were in flight are either removed (their
+document exists) or imported again; see
+``papermerge.importers.local.LocalWatcher.recover``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IMPORTING = 'importing'
+IMPORTED = 'imported'
+DONE = 'done'
+
+
+class Journal:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # path of imported file -> last entry
+        self.entries = self._load()
+        self._compact()
+        self._file = open(self.path, 'a')
+
+    def _load(self):
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of journal written during crash
+                    logger.warning(f"Skipping invalid journal line {line!r}")
+                    continue
+                if entry['state'] == DONE:
+                    entries.pop(entry['path'], None)
+                else:
+                    entries[entry['path']] = entry
+
+        return entries
+
+    def _compact(self):
+        # rewrite journal with files in flight only
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def in_flight(self):
+        with self._lock:
+            return list(self.entries.values())
+
+    def write(self, path, state, digest=None, document_id=None):
+        entry = {
+            'path': path,
+            'digest': digest,
+            'state': state,
+            'time': time.time(),
+            'document_id': document_id,
+        }
+        with self._lock:
+            if state == DONE:
+                self.entries.pop(path, None)
+            else:
+                self.entries[path] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,252 @@
+"""
+Event driven importer of local folder.
+
+``papermerge.core.importers.local.import_documents`` rescans the
+folder every ``IMPORTER_LOOP_TIME`` seconds and sleeps
+``FILES_MIN_UNMODIFIED_DURATION`` seconds before comparing hashes of
+all files. ``LocalWatcher`` instead waits for inotify events: a file is
+ready once it was closed after writing (or moved into the folder) and
+not modified for ``FILES_MIN_UNMODIFIED_DURATION`` seconds. Ready files
+go through import pipelines in a bounded pool of threads; pipelines
+create documents one at a time and OCR them in parallel (see
+``papermerge.importers.pipelines.StreamingPipeline.apply``).
+
+Files in flight are recorded in a journal (``Journal``), so that after
+restart they are neither lost nor imported twice.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db import connection
+
+from papermerge.core.import_pipeline import LOCAL, go_through_pipelines
+from papermerge.core.models import Document
+
+from . import inotify
+from .journal import DONE, IMPORTED, IMPORTING, Journal
+from .pipelines import accepts_files
+
+logger = logging.getLogger(__name__)
+
+# seconds after which busy files are submitted again
+RETRY_DELAY = 1
+
+WATCH_MASK = (
+    inotify.IN_MODIFY |
+    inotify.IN_CLOSE_WRITE |
+    inotify.IN_MOVED_TO |
+    inotify.IN_MOVED_FROM |
+    inotify.IN_DELETE
+)
+
+
+def file_digest(path):
+    file_hash = blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+class LocalWatcher:
+
+    def __init__(
+        self,
+        directory,
+        journal_path,
+        workers=None,
+        min_unmodified=None,
+        skip_ocr=False
+    ):
+        if not directory:
+            raise ValueError("Import directory value is None")
+
+        self.directory = directory
+        self.skip_ocr = skip_ocr
+        if workers is None:
+            workers = settings.PAPERMERGE_IMPORTER_WORKERS
+        self.workers = workers
+        if min_unmodified is None:
+            min_unmodified = settings.PAPERMERGE_FILES_MIN_UNMODIFIED_DURATION
+        self.min_unmodified = float(min_unmodified)
+        self.journal = Journal(journal_path)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="local-importer"
+        )
+        self._lock = threading.Lock()
+        # path -> time when file is considered ready, None while it
+        # is open for writing
+        self.pending = {}
+        # paths submitted to the pool
+        self.running = set()
+        # path -> digest of files pipelines could not import; they are
+        # retried only when modified
+        self.skipped = {}
+
+    def recover(self):
+        """
+        Finishes imports interrupted by restart: removes files whose
+        document was already created; other files are imported again.
+        """
+        for entry in self.journal.in_flight():
+            path = entry['path']
+            if not os.path.exists(path):
+                self.journal.write(path, DONE)
+                continue
+
+            if entry['state'] == IMPORTING:
+                started = datetime.datetime.fromtimestamp(
+                    entry['time'], tz=datetime.timezone.utc
+                )
+                exists = Document.objects.filter(
+                    file_name=os.path.basename(path),
+                    created_at__gte=started
+                ).exists()
+                if not exists:
+                    # pipelines did not finish, import again
+                    continue
+
+            if file_digest(path) == entry['digest']:
+                logger.info(f"Removing already imported {path}")
+                os.remove(path)
+            self.journal.write(path, DONE)
+
+    def scan(self):
+        """
+        Files already in the folder (e.g. copied while importer was
+        not running) are handled as if they were just written.
+        """
+        now = time.monotonic()
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                self.pending.setdefault(entry.path, now + self.min_unmodified)
+            else:
+                logger.warning(
+                    "Skipping %s as it is not a file",
+                    entry.path
+                )
+
+    def handle_event(self, mask, path):
+        if path is None:
+            if mask & inotify.IN_Q_OVERFLOW:
+                # events were lost
+                logger.warning("inotify queue overflow, rescanning")
+                self.scan()
+            return
+
+        if mask & inotify.IN_ISDIR:
+            return
+
+        if mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+            self.pending.pop(path, None)
+            self.skipped.pop(path, None)
+        elif mask & (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO):
+            self.pending[path] = time.monotonic() + self.min_unmodified
+        elif mask & inotify.IN_MODIFY:
+            self.pending[path] = None
+
+    def submit_ready(self):
+        """
+        Submits ready files to the pool; returns seconds until the next
+        file gets ready (None if there is no such file).
+        """
+        now = time.monotonic()
+        next_ready = None
+        for path, ready_at in list(self.pending.items()):
+            if ready_at is None:
+                continue
+            if ready_at > now:
+                next_ready = min(next_ready or ready_at, ready_at)
+                continue
+            with self._lock:
+                if path in self.running:
+                    # modified while being imported; try again later
+                    next_ready = min(next_ready or now + RETRY_DELAY,
+                                     now + RETRY_DELAY)
+                    continue
+                if len(self.running) >= self.workers * 2:
+                    # pool is busy, keep ready files pending
+                    next_ready = now + RETRY_DELAY
+                    break
+                self.running.add(path)
+            del self.pending[path]
+            self.executor.submit(self.import_file, path)
+
+        if next_ready is None:
+            return None
+
+        return max(next_ready - now, 0)
+
+    def import_file(self, path):
+        try:
+            self._import_file(path)
+        except Exception as e:
+            logger.error(f"Exception {e} while importing {path}")
+        finally:
+            with self._lock:
+                self.running.discard(path)
+            connection.close()
+
+    def _import_file(self, path):
+        try:
+            digest = file_digest(path)
+        except FileNotFoundError:
+            return
+
+        if self.skipped.get(path) == digest:
+            return
+
+        if accepts_files():
+            # file is linked into storage, never read into memory
+            payload = path
+        else:
+            with open(path, 'rb') as f:
+                payload = f.read()
+
+        self.journal.write(path, IMPORTING, digest=digest)
+        doc = go_through_pipelines(
+            {'payload': payload, 'processor': LOCAL},
+            {
+                'user': None,
+                'name': os.path.basename(path),
+                'skip_ocr': self.skip_ocr
+            }
+        )
+        if doc is None:
+            logger.warning(f"{path} was not imported (not supported)")
+            self.skipped[path] = digest
+            self.journal.write(path, DONE)
+            return
+
+        self.journal.write(path, IMPORTED, digest=digest, document_id=doc.id)
+        os.remove(path)
+        self.journal.write(path, DONE)
+
+    def run(self, stop_event=None):
+        """
+        Imports files until ``stop_event`` is set (forever if None).
+        """
+        watcher = inotify.Inotify()
+        try:
+            watcher.add_watch(self.directory, WATCH_MASK)
+            self.recover()
+            self.scan()
+            while stop_event is None or not stop_event.is_set():
+                timeout = self.submit_ready()
+                if stop_event is not None:
+                    # wake up regularly to check stop_event
+                    timeout = min(timeout or 1, 1)
+                for mask, path in watcher.read_events(timeout):
+                    self.handle_event(mask, path)
+        finally:
+            watcher.close()
+            self.executor.shutdown(wait=True)
+            self.journal.close()
@@ -0,0 +1,62 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from papermerge.importers.imap import MailboxConsumer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """Imports attachments of email messages as soon as they
+    arrive (uses IMAP IDLE). Attachments are imported in parallel, by
+    IMPORT_MAIL_WORKERS threads.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            "-w",
+            default=settings.PAPERMERGE_IMPORT_MAIL_WORKERS,
+            type=int,
+            help="Number of attachments imported in parallel."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=settings.PAPERMERGE_IMPORT_MAIL_CHECKPOINT,
+            help="File with UID of the last processed message."
+        )
+        parser.add_argument(
+            "--skip-ocr",
+            action="store_true",
+            help="Do not OCR imported documents."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.PAPERMERGE_IMPORT_MAIL_HOST:
+            logger.info("IMPORT_MAIL_HOST is not set, nothing to import")
+            return
+
+        checkpoint_path = options.get('checkpoint') or os.path.join(
+            settings.MEDIA_ROOT,
+            "imap_checkpoint.json"
+        )
+        consumer = MailboxConsumer(
+            imap_server=settings.PAPERMERGE_IMPORT_MAIL_HOST,
+            username=settings.PAPERMERGE_IMPORT_MAIL_USER,
+            password=settings.PAPERMERGE_IMPORT_MAIL_PASS,
+            checkpoint_path=checkpoint_path,
+            inbox_name=settings.PAPERMERGE_IMPORT_MAIL_INBOX,
+            by_user=settings.PAPERMERGE_IMPORT_MAIL_BY_USER,
+            by_secret=settings.PAPERMERGE_IMPORT_MAIL_BY_SECRET,
+            delete=settings.PAPERMERGE_IMPORT_MAIL_DELETE,
+            workers=options.get('workers'),
+            skip_ocr=options.get('skip_ocr')
+        )
+        try:
+            consumer.run()
+        except KeyboardInterrupt:
+            logger.info("Exiting")
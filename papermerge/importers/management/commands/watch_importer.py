@@ -0,0 +1,69 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from papermerge.importers import inotify
+from papermerge.importers.local import LocalWatcher
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = """Imports documents from local folder as soon as they are
+    written to it (Linux only, uses inotify). Files are imported in
+    parallel, by IMPORTER_WORKERS threads.
+    On other systems falls back to polling local_importer.
+"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "directory",
+            default=settings.PAPERMERGE_IMPORTER_DIR,
+            nargs="?",
+            help="The importer directory."
+        )
+        parser.add_argument(
+            "--workers",
+            "-w",
+            default=settings.PAPERMERGE_IMPORTER_WORKERS,
+            type=int,
+            help="Number of files imported in parallel."
+        )
+        parser.add_argument(
+            "--journal",
+            default=settings.PAPERMERGE_IMPORTER_JOURNAL,
+            help="Journal of files being imported (must be outside"
+            " of importer directory)."
+        )
+        parser.add_argument(
+            "--skip-ocr",
+            action="store_true",
+            help="Do not OCR imported documents."
+        )
+
+    def handle(self, *args, **options):
+        directory = options.get('directory')
+
+        if not inotify.is_available():
+            logger.warning("inotify is not available, polling instead")
+            call_command('local_importer', directory)
+            return
+
+        journal_path = options.get('journal') or os.path.join(
+            settings.MEDIA_ROOT,
+            "importer_journal.jsonl"
+        )
+        watcher = LocalWatcher(
+            directory,
+            journal_path=journal_path,
+            workers=options.get('workers'),
+            skip_ocr=options.get('skip_ocr')
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            logger.info("Exiting")
@@ -0,0 +1,241 @@
+import logging
+import os
+import shutil
+import threading
+from tempfile import _TemporaryFileWrapper
+
+from django.conf import settings
+from django.core.files.temp import NamedTemporaryFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.utils import module_loading
+
+from papermerge.core.import_pipeline import WEB, DefaultPipeline
+from papermerge.core.models import BaseTreeNode
+from papermerge.core.storage import default_storage
+from papermerge.core.tasks import ocr_page
+
+logger = logging.getLogger(__name__)
+
+# size of chunks in which file objects are written to disk
+CHUNK_SIZE = 1024 * 1024
+
+# Serializes creation of documents by threads of the process (importers
+# import files in parallel, all of them into user's inbox). django-mptt
+# computes lft/rght of a new node from the parent row read before the
+# insert, so concurrent inserts into one tree would overlap.
+_create_lock = threading.Lock()
+
+
+class FilePayload:
+    """
+    Payload given as path of the file; the file is owned by the caller
+    (e.g. local importer removes it once document is created).
+
+    With ``link=False`` the file is copied into storage, as the caller
+    may still change it (e.g. payload given as open file object).
+    """
+
+    def __init__(self, path, link=True):
+        self.name = path
+        self.link = link
+
+    def close(self):
+        pass
+
+
+def current_umask():
+    """
+    Returns umask of the process. ``os.umask`` can read it only by
+    changing it (for a moment, in all threads), so it is read from
+    /proc when possible.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    umask = os.umask(0o022)
+    os.umask(umask)
+
+    return umask
+
+
+def link_or_copy(src, dst, link=True):
+    """
+    Hard links ``src`` to ``dst``; copies it (in chunks) if ``link`` is
+    False, if ``src`` is owned by another user or if both are not on the
+    same filesystem.
+
+    Linked file gets the same mode as copied one (e.g. temporary files
+    are created with mode 0600).
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    if link and os.stat(src).st_uid == os.geteuid():
+        try:
+            os.link(src, dst)
+        except OSError as e:
+            logger.debug(f"Cannot link {src} to {dst} ({e}), copying")
+        else:
+            os.chmod(dst, 0o666 & ~current_umask())
+            return
+
+    shutil.copyfile(src, dst)
+
+
+def lock_tree(node_id):
+    """
+    Locks root node of the tree of given node until the end of the
+    transaction, so that nodes are inserted into the tree by one
+    process at a time (no-op on SQLite, which locks whole database).
+    """
+    tree_ids = BaseTreeNode.objects.filter(pk=node_id).values('tree_id')
+    list(
+        BaseTreeNode.objects.select_for_update().filter(
+            tree_id__in=tree_ids,
+            parent=None
+        ).values_list('pk', flat=True)
+    )
+
+
+class StreamingPipeline(DefaultPipeline):
+    """
+    Same as ``DefaultPipeline``, but payload is never held in memory.
+    Besides bytes and uploaded files, payload can be:
+
+        * path of the file (str or ``os.PathLike``)
+        * binary file object; if it is not a file on disk, it is
+          written to a temporary file in chunks
+
+    Mimetype is sniffed from the header of the file (libmagic) and the
+    file is hard linked into storage instead of copied (except files of
+    file objects, which stay open in the caller).
+    """
+
+    def __init__(
+        self,
+        payload=None,
+        doc=None,
+        processor=WEB,
+        **kwargs
+    ):
+        if isinstance(payload, (str, os.PathLike)):
+            payload = FilePayload(os.fspath(payload))
+        elif is_file_object(payload):
+            name = getattr(payload, 'name', None)
+            if isinstance(name, str) and os.path.isfile(name):
+                # caller may write to the file later
+                payload = FilePayload(name, link=False)
+            else:
+                payload = self.spool(payload, processor)
+
+        if not isinstance(payload, FilePayload):
+            super().__init__(
+                payload=payload,
+                doc=doc,
+                processor=processor,
+                **kwargs
+            )
+            return
+
+        self.processor = processor
+        self.doc = doc
+        self.payload = payload
+        self.path = payload.name
+        self.check_mimetype()
+
+    @staticmethod
+    def spool(payload, processor):
+        logger.debug(f"{processor} importer: spooling payload to disk")
+        if hasattr(payload, 'seekable') and payload.seekable():
+            # same payload is given to each pipeline
+            payload.seek(0)
+        temp = NamedTemporaryFile()
+        shutil.copyfileobj(payload, temp, CHUNK_SIZE)
+        temp.flush()
+
+        return temp
+
+    @staticmethod
+    def get_user_properties(user):
+        user, lang, inbox = DefaultPipeline.get_user_properties(user)
+        lock_tree(inbox.id)
+
+        return user, lang, inbox
+
+    def apply(self, skip_ocr=False, apply_async=False, **kwargs):
+        """
+        Same as ``DefaultPipeline.apply``, but only creation of the
+        document is serialized (see ``_create_lock`` and ``lock_tree``);
+        OCR runs in parallel.
+        """
+        parent = kwargs.get('parent', None)
+        with _create_lock, transaction.atomic():
+            if parent is not None:
+                lock_tree(parent)
+            doc = super().apply(skip_ocr=True, **kwargs)
+
+        if not skip_ocr:
+            self.ocr(doc, apply_async)
+
+        return doc
+
+    def ocr(self, doc, apply_async):
+        """
+        OCR of the document, as scheduled by ``DefaultPipeline.apply``.
+        """
+        namespace = default_storage.upload(doc_path_url=doc.path().url())
+        if not apply_async:
+            self.ocr_document(
+                document=doc,
+                page_count=doc.page_count,
+                lang=doc.lang
+            )
+            return
+
+        for page_num in range(1, doc.page_count + 1):
+            ocr_page.apply_async(kwargs={
+                'user_id': doc.user_id,
+                'document_id': doc.id,
+                'file_name': doc.file_name,
+                'page_num': page_num,
+                'lang': doc.lang,
+                'namespace': namespace
+            })
+
+    def move_tempfile(self, doc):
+        link_or_copy(
+            self.path,
+            default_storage.abspath(doc.path()),
+            link=getattr(self.payload, 'link', True)
+        )
+        return None
+
+
+def is_file_object(payload):
+    return hasattr(payload, 'read') and not isinstance(
+        payload,
+        (TemporaryUploadedFile, _TemporaryFileWrapper)
+    )
+
+
+def accepts_files():
+    """
+    True if all import pipelines accept paths and file objects as
+    payload (otherwise payload must be passed as bytes).
+    """
+    for pipeline in settings.PAPERMERGE_PIPELINES:
+        try:
+            pipeline_class = module_loading.import_string(pipeline)
+        except ImportError:
+            # go_through_pipelines skips it as well
+            continue
+        if not issubclass(pipeline_class, StreamingPipeline):
+            return False
+
+    return True
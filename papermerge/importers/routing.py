@@ -0,0 +1,181 @@
+"""
+In-memory index of email routing preferences of all users.
+
+``papermerge.core.importers.imap.get_matching_user`` queries users by
+email address and by ``email_routing__mail_secret`` preference, then
+reads their ``email_routing__by_user``/``by_secret`` preferences, for
+every imported message. ``RoutingIndex`` is built from users and their
+email routing preferences with two queries and matches messages
+without hitting the database, with same rules:
+
+    * by user: first user (by id) whose email is the From or To
+      address of the message, if that user routes by user
+    * by secret: first user (by id) whose mail secret is found in body
+      or subject of the message, if that user routes by secret
+
+The index is cached per process, as long as version of routing
+preferences (kept in django cache, changed by ``invalidate_index`` when
+a user or user preference is saved) is unchanged. Preferences are saved
+in the webapp and messages are imported by ``watch_imap``, so django
+cache must be shared by all processes (see CACHES in settings).
+"""
+import email.utils
+import threading
+import uuid
+
+from django.core.cache import cache
+from dynamic_preferences.users.models import UserPreferenceModel
+
+from papermerge.core.importers.imap import get_secret
+from papermerge.core.models import User
+
+SECTION = 'email_routing'
+VERSION_KEY = 'email_routing_version'
+
+# process local cache: (version, index)
+_index = None
+_lock = threading.Lock()
+
+
+class RoutingIndex:
+
+    def __init__(self, users, preferences):
+        """
+        ``users`` is an iterable of users, ``preferences`` of
+        (user_id, name, value) of their email routing preferences.
+        """
+        # email address -> first user with that address
+        self.addresses = {}
+        # mail secret -> id of first user with that secret
+        self.secrets = {}
+        self.users = {}
+        by_user = set()
+        by_secret = set()
+
+        for user in sorted(users, key=lambda user: user.id):
+            self.users[user.id] = user
+            if user.email:
+                self.addresses.setdefault(user.email, user.id)
+
+        for user_id, name, value in sorted(preferences):
+            if name == 'by_user' and value:
+                by_user.add(user_id)
+            elif name == 'by_secret' and value:
+                by_secret.add(user_id)
+            elif name == 'mail_secret' and value:
+                self.secrets.setdefault(value, user_id)
+
+        self.by_user = by_user
+        self.by_secret = by_secret
+
+    @classmethod
+    def build(cls):
+        return cls(
+            User.objects.only('id', 'email'),
+            [
+                (pref.instance_id, pref.name, pref.value)
+                for pref in UserPreferenceModel.objects.filter(
+                    section=SECTION
+                )
+            ]
+        )
+
+    def match_by_user(self, to_field, from_field):
+        user_ids = [
+            self.addresses[address]
+            for address in (to_field, from_field)
+            if address in self.addresses
+        ]
+        if not user_ids:
+            return None
+
+        user_id = min(user_ids)
+        if user_id not in self.by_user:
+            return None
+
+        return self.users[user_id]
+
+    def match_by_secret(self, message_secret):
+        user_id = self.secrets.get(message_secret)
+        if user_id is None or user_id not in self.by_secret:
+            return None
+
+        return self.users[user_id]
+
+    def match(self, email_message, by_user=False, by_secret=False):
+        """
+        Same as ``papermerge.core.importers.imap.get_matching_user``.
+        """
+        if by_user:
+            user = self.match_by_user(
+                to_field=email.utils.parseaddr(email_message.get('To'))[1],
+                from_field=email.utils.parseaddr(
+                    email_message.get('From')
+                )[1]
+            )
+            if user is not None:
+                return user
+
+        if not by_secret:
+            return None
+
+        body = email_message.get_body()
+        texts = [
+            text for text in (
+                body.as_string() if body is not None else None,
+                email_message.get('Subject')
+            )
+            if text is not None
+        ]
+        message_secret = get_secret(texts)
+        if not message_secret:
+            return None
+
+        return self.match_by_secret(message_secret)
+
+
+def get_version():
+    """
+    Returns version of routing preferences. Versions are random tokens,
+    so that a version evicted from the cache is never reused.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # no version yet, or evicted
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+
+    return version
+
+
+def get_index():
+    global _index
+
+    version = get_version()
+    with _lock:
+        cached = _index
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    index = RoutingIndex.build()
+    with _lock:
+        _index = (version, index)
+
+    return index
+
+
+def invalidate_index():
+    global _index
+
+    with _lock:
+        _index = None
+
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_matching_user(email_message, by_user=False, by_secret=False):
+    return get_index().match(
+        email_message,
+        by_user=by_user,
+        by_secret=by_secret
+    )
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from dynamic_preferences.users.models import UserPreferenceModel
+
+from papermerge.core.models import User
+
+from .routing import SECTION, invalidate_index
+
+
+@receiver(post_save, sender=UserPreferenceModel)
+@receiver(post_delete, sender=UserPreferenceModel)
+def preference_changed_handler(sender, instance, **kwargs):
+    """
+    Email routing preference was changed: routing index is outdated.
+    """
+    if instance.section == SECTION:
+        invalidate_index()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed_handler(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and 'email' not in update_fields:
+        # e.g. last_login updated on each login
+        return
+
+    invalidate_index()
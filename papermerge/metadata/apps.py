@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MetadataConfig(AppConfig):
+    # Bulk operations on metadata (KV) of nodes and pages, typed values
+    name = 'papermerge.metadata'
+    label = 'metadata'
+
+    def ready(self):
+        from papermerge.metadata import signals  # noqa
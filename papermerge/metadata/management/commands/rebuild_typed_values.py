@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from papermerge.core.models import KVStoreNode, KVStorePage
+from papermerge.metadata.models import typed_value_model
+
+
+class Command(BaseCommand):
+
+    help = """Recomputes typed values of all date, money and numeric
+    metadata keys (e.g. after change of their format).
+"""
+
+    def handle(self, *args, **options):
+        for kvstore_model in (KVStoreNode, KVStorePage):
+            kvstores = kvstore_model.objects.all()
+            typed_value_model(kvstore_model).objects.refresh(kvstores)
+            self.stdout.write(
+                f"Typed values of {kvstores.count()}"
+                f" {kvstore_model.__name__} keys updated."
+            )
@@ -0,0 +1,127 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from papermerge.core.models.kvstore import TEXT, TypedKey
+from papermerge.metadata.models import BATCH_SIZE, typed_value
+
+
+def fill_typed_values(apps, schema_editor):
+    for kvstore_name, typed_value_name in (
+        ('KVStoreNode', 'NodeTypedValue'),
+        ('KVStorePage', 'PageTypedValue'),
+    ):
+        KVStore = apps.get_model('core', kvstore_name)
+        TypedValue = apps.get_model('metadata', typed_value_name)
+
+        rows = KVStore.objects.exclude(kv_type=TEXT).values_list(
+            'id', 'key', 'kv_type', 'kv_format', 'value'
+        )
+        to_create = []
+        for kvstore_id, key, kv_type, kv_format, value in rows.iterator():
+            columns = typed_value(TypedKey(key, kv_type, kv_format), value)
+            if columns:
+                to_create.append(
+                    TypedValue(
+                        kvstore_id=kvstore_id,
+                        key=key,
+                        kv_type=kv_type,
+                        **columns
+                    )
+                )
+        TypedValue.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+
+
+def typed_value_fields():
+    return [
+        ('key', models.CharField(max_length=200)),
+        ('kv_type', models.CharField(max_length=16)),
+        ('value_date', models.DateField(null=True)),
+        ('value_decimal', models.DecimalField(
+            decimal_places=4,
+            max_digits=20,
+            null=True
+        )),
+        ('value_int', models.BigIntegerField(null=True)),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0039_auto_20210216_1014'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeTypedValue',
+            fields=[
+                ('kvstore', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='typed_value',
+                    serialize=False,
+                    to='core.kvstorenode'
+                )),
+            ] + typed_value_fields(),
+        ),
+        migrations.CreateModel(
+            name='PageTypedValue',
+            fields=[
+                ('kvstore', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='typed_value',
+                    serialize=False,
+                    to='core.kvstorepage'
+                )),
+            ] + typed_value_fields(),
+        ),
+        migrations.AddIndex(
+            model_name='nodetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_date'],
+                name='metadata_node_date_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='nodetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_decimal'],
+                name='metadata_node_decimal_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='nodetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_int'],
+                name='metadata_node_int_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='pagetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_date'],
+                name='metadata_page_date_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='pagetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_decimal'],
+                name='metadata_page_decimal_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='pagetypedvalue',
+            index=models.Index(
+                fields=['key', 'value_int'],
+                name='metadata_page_int_idx'
+            ),
+        ),
+        migrations.RunPython(
+            fill_typed_values,
+            migrations.RunPython.noop
+        ),
+    ]
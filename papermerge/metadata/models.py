@@ -0,0 +1,298 @@
+import logging
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from papermerge.core.models import KVStoreNode, KVStorePage, Page
+from papermerge.core.models.kvstore import (
+    DATE,
+    MONEY,
+    NUMERIC,
+    TypedKey
+)
+
+logger = logging.getLogger(__name__)
+
+# number of typed values refreshed at once
+BATCH_SIZE = 500
+
+# maps PAPERMERGE_METADATA_DATE_FORMATS to strptime format codes
+DATE_FORMATS = {
+    'dd.mm.yy': '%d.%m.%y',
+    'dd.mm.yyyy': '%d.%m.%Y',
+    'dd.M.yyyy': '%d.%B.%Y',
+    'month': '%B'
+}
+
+# decimal separator of PAPERMERGE_METADATA_CURRENCY_FORMATS
+DECIMAL_SEPARATORS = {
+    'dd.cc': '.',
+    'dd,cc': ','
+}
+
+# precision of money values (TypedValue.value_decimal)
+MONEY_MAX_DIGITS = 20
+MONEY_DECIMAL_PLACES = 4
+# range of numeric values (TypedValue.value_int, 64 bit integer)
+NUMERIC_MIN = -2 ** 63
+NUMERIC_MAX = 2 ** 63 - 1
+
+# filter_by_kv lookups
+LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'range')
+
+
+def parse_date(kv_format, value):
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMATS[kv_format]).date()
+    except (KeyError, ValueError):
+        return None
+
+
+def parse_money(kv_format, value):
+    """
+    E.g. '1.234,50' with format 'dd,cc' => Decimal('1234.50').
+    Separator other than the decimal one is a thousands separator.
+    Values which do not fit ``TypedValue.value_decimal`` (and NaN,
+    Infinity) are not parsed.
+    """
+    separator = DECIMAL_SEPARATORS.get(kv_format, '.')
+    thousands = ',' if separator == '.' else '.'
+    value = value.strip().replace(' ', '').replace(thousands, '')
+    try:
+        parsed = Decimal(value.replace(separator, '.'))
+        if not parsed.is_finite():
+            return None
+        # as stored by the database
+        parsed = parsed.quantize(Decimal(1).scaleb(-MONEY_DECIMAL_PLACES))
+    except InvalidOperation:
+        return None
+
+    if abs(parsed) >= 10 ** (MONEY_MAX_DIGITS - MONEY_DECIMAL_PLACES):
+        return None
+
+    return parsed
+
+
+def parse_numeric(kv_format, value):
+    """
+    E.g. '1.200' with format 'd.ddd' => 1200. Same as core's
+    ``number_2int``, all separators are removed. Values out of range
+    of ``TypedValue.value_int`` are not parsed.
+    """
+    value = value.strip().replace(' ', '').replace(',', '').replace('.', '')
+    try:
+        parsed = int(value)
+    except ValueError:
+        return None
+
+    if not NUMERIC_MIN <= parsed <= NUMERIC_MAX:
+        return None
+
+    return parsed
+
+
+def typed_value(typed_key, value):
+    """
+    Returns dictionary with value of ``TypedValue`` column matching
+    the type of ``typed_key`` (a ``papermerge.core.models.kvstore
+    .TypedKey``) e.g. {'value_date': date(2020, 6, 3)} for date key and
+    value '03.06.2020'; None if value is empty, of text type or cannot
+    be parsed according to the key's format.
+    """
+    if not value:
+        return None
+
+    if typed_key.ktype == DATE:
+        column, parsed = 'value_date', parse_date(typed_key.kformat, value)
+    elif typed_key.ktype == MONEY:
+        column, parsed = 'value_decimal', parse_money(typed_key.kformat, value)
+    elif typed_key.ktype == NUMERIC:
+        column, parsed = 'value_int', parse_numeric(typed_key.kformat, value)
+    else:
+        return None
+
+    if parsed is None:
+        # expected, automated extraction of metadata may fail
+        logger.debug(f"Value {value!r} does not match {typed_key}")
+        return None
+
+    return {column: parsed}
+
+
+class TypedValueManager(models.Manager):
+
+    def refresh(self, kvstores):
+        """
+        Recomputes typed values of given KVStore rows (queryset of
+        ``KVStoreNode`` or ``KVStorePage``, matching the model).
+        """
+        rows = list(
+            kvstores.values_list('id', 'key', 'kv_type', 'kv_format', 'value')
+        )
+        for index in range(0, len(rows), BATCH_SIZE):
+            self._refresh(rows[index:index + BATCH_SIZE])
+
+    def _refresh(self, rows):
+        to_create = []
+        for kvstore_id, key, kv_type, kv_format, value in rows:
+            columns = typed_value(TypedKey(key, kv_type, kv_format), value)
+            if columns:
+                to_create.append(
+                    self.model(
+                        kvstore_id=kvstore_id,
+                        key=key,
+                        kv_type=kv_type,
+                        **columns
+                    )
+                )
+
+        with transaction.atomic():
+            self.filter(kvstore_id__in=[row[0] for row in rows]).delete()
+            self.bulk_create(to_create, batch_size=BATCH_SIZE)
+
+
+class TypedValue(models.Model):
+    """
+    Value of date, money or numeric metadata key, parsed according to
+    the key's format (e.g. '1.234,50' of 'dd,cc' money key).
+
+    KVStore keeps values as formatted text which can not be compared
+    by database; typed values are indexed per key for range and
+    equality queries (see ``filter_by_kv``). Kept up to date by signal
+    handlers (see ``papermerge.metadata.signals``).
+    """
+    key = models.CharField(max_length=200)
+    kv_type = models.CharField(max_length=16)
+    value_date = models.DateField(null=True)
+    value_decimal = models.DecimalField(
+        max_digits=MONEY_MAX_DIGITS,
+        decimal_places=MONEY_DECIMAL_PLACES,
+        null=True
+    )
+    value_int = models.BigIntegerField(null=True)
+
+    objects = TypedValueManager()
+
+    class Meta:
+        abstract = True
+
+
+class NodeTypedValue(TypedValue):
+    kvstore = models.OneToOneField(
+        KVStoreNode,
+        models.CASCADE,
+        primary_key=True,
+        related_name='typed_value'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['key', 'value_date'],
+                name='metadata_node_date_idx'
+            ),
+            models.Index(
+                fields=['key', 'value_decimal'],
+                name='metadata_node_decimal_idx'
+            ),
+            models.Index(
+                fields=['key', 'value_int'],
+                name='metadata_node_int_idx'
+            ),
+        ]
+
+
+class PageTypedValue(TypedValue):
+    kvstore = models.OneToOneField(
+        KVStorePage,
+        models.CASCADE,
+        primary_key=True,
+        related_name='typed_value'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['key', 'value_date'],
+                name='metadata_page_date_idx'
+            ),
+            models.Index(
+                fields=['key', 'value_decimal'],
+                name='metadata_page_decimal_idx'
+            ),
+            models.Index(
+                fields=['key', 'value_int'],
+                name='metadata_page_int_idx'
+            ),
+        ]
+
+
+def typed_value_model(kvstore_model):
+    if issubclass(kvstore_model, KVStorePage):
+        return PageTypedValue
+
+    return NodeTypedValue
+
+
+def kv_lookup_q(lookup, value):
+    """
+    Returns Q object of lookup on typed value (or on KVStore text
+    value, if value is a string).
+    """
+    if lookup not in LOOKUPS:
+        raise ValueError(f"Unsupported metadata lookup {lookup}")
+
+    sample = value[0] if lookup == 'range' else value
+    if isinstance(sample, str):
+        return Q(**{f'value__{lookup}': value})
+
+    if isinstance(sample, date):
+        return Q(typed_value__kv_type=DATE) & Q(
+            **{f'typed_value__value_date__{lookup}': value}
+        )
+
+    if isinstance(sample, (int, float, Decimal)) and not isinstance(
+        sample, bool
+    ):
+        return (
+            Q(typed_value__kv_type=MONEY) & Q(
+                **{f'typed_value__value_decimal__{lookup}': value}
+            )
+        ) | (
+            Q(typed_value__kv_type=NUMERIC) & Q(
+                **{f'typed_value__value_int__{lookup}': value}
+            )
+        )
+
+    raise ValueError(f"Unsupported metadata value {value!r}")
+
+
+def filter_by_kv(queryset, key, **lookups):
+    """
+    Restricts queryset of nodes (e.g. ``Document.objects``) or pages
+    (``Page.objects``) to those with metadata ``key`` matching all
+    lookups, e.g.:
+
+        filter_by_kv(Document.objects.all(), 'price', gt=1000)
+        filter_by_kv(
+            Page.objects.all(),
+            'date',
+            range=(date(2020, 7, 1), date(2020, 9, 30))
+        )
+
+    Dates, numbers and decimals are compared with typed values of
+    date, numeric and money keys; strings with (text) values as they
+    are stored.
+    """
+    if issubclass(queryset.model, Page):
+        kvstores = KVStorePage.objects.filter(page_id=OuterRef('pk'))
+    else:
+        kvstores = KVStoreNode.objects.filter(node_id=OuterRef('pk'))
+
+    kvstores = kvstores.filter(key=key)
+    for lookup, value in lookups.items():
+        kvstores = kvstores.filter(kv_lookup_q(lookup, value))
+
+    return queryset.filter(Exists(kvstores))
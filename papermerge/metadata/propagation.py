@@ -0,0 +1,238 @@
+"""
+Set based propagation of metadata keys to descendants of a node.
+
+Does what ``KV.update`` does when metadata keys of a folder change,
+but instead of visiting descendants (and pages of descendant
+documents) one by one and saving each key separately, descendants are
+selected by their MPTT range and their keys are inserted, updated and
+deleted with a few bulk queries per chunk of ``chunk_size`` nodes.
+Each chunk is changed in its own transaction.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from papermerge.access.propagation import (
+    count_descendants,
+    descendant_chunks
+)
+from papermerge.core.models import KV, KVStoreNode, KVStorePage, Page
+from papermerge.core.models.kvstore import TEXT
+
+from .models import typed_value_model
+
+# number of nodes changed in one transaction
+CHUNK_SIZE = 1000
+
+# number of rows inserted with one query
+BATCH_SIZE = 500
+
+# KVStore fields which can be given in ``KV.update`` data
+KV_FIELDS = ('key', 'kv_type', 'kv_format', 'value', 'kv_inherited')
+
+
+def kv_fields(item):
+    return {name: item[name] for name in KV_FIELDS if name in item}
+
+
+def apply_to_node(node, data):
+    """
+    Applies ``KV.update`` data to metadata keys of the node itself,
+    without propagation.
+
+    Returns changes to propagate to descendants of the node
+    (JSON serializable, to be passed to celery task), a dictionary with:
+
+        * KV.UPDATE - list of {'old', 'new', 'kv_type', 'kv_format',
+          'value'} dictionaries
+        * KV.ADD - list of {'key', 'kv_type', 'kv_format'} dictionaries
+        * KV.REMOVE - list of keys
+    """
+    kv_diff = node.kv.get_diff(data)
+    changes = {KV.UPDATE: [], KV.ADD: [], KV.REMOVE: []}
+
+    for item in kv_diff[KV.UPDATE]:
+        kvstore = node.kvstore.filter(id=item['id']).first()
+        if not kvstore:
+            continue
+        changes[KV.UPDATE].append({
+            'old': kvstore.key,
+            'new': item['key'],
+            'kv_type': item.get('kv_type', kvstore.kv_type),
+            'kv_format': item.get('kv_format', kvstore.kv_format),
+            'value': item.get('value', None)
+        })
+        kvstore.key = item['key']
+        kvstore.kv_type = item.get('kv_type', kvstore.kv_type)
+        kvstore.kv_format = item.get('kv_format', kvstore.kv_format)
+        if item.get('value', False):
+            kvstore.value = item['value']
+        kvstore.save()
+
+    present_keys = set(node.kvstore.values_list('key', flat=True))
+    for item in kv_diff[KV.ADD]:
+        if item['key'] not in present_keys:
+            node.kvstore.create(**kv_fields(item))
+            present_keys.add(item['key'])
+        changes[KV.ADD].append({
+            'key': item['key'],
+            'kv_type': item.get('kv_type', TEXT),
+            'kv_format': item.get('kv_format', None)
+        })
+
+    removed_keys = [item['key'] for item in kv_diff[KV.REMOVE]]
+    if removed_keys:
+        node.kvstore.filter(key__in=removed_keys).delete()
+        changes[KV.REMOVE] = removed_keys
+
+    return changes
+
+
+class KVPropagation:
+    """
+    Applies metadata changes (as returned by ``apply_to_node``) to
+    chunks of nodes and to pages of documents among them.
+    """
+
+    def __init__(self, changes):
+        self.updates = changes.get(KV.UPDATE, [])
+        self.additions = changes.get(KV.ADD, [])
+        self.removals = changes.get(KV.REMOVE, [])
+
+    def update(self, kvstores):
+        for item in self.updates:
+            fields = {
+                'key': item['new'],
+                'kv_type': item['kv_type'],
+                'kv_format': item['kv_format'],
+            }
+            if item.get('value', None):
+                fields['value'] = item['value']
+            kvstores.filter(key=item['old']).update(**fields)
+            # bulk update does not send post_save
+            typed_value_model(kvstores.model).objects.refresh(
+                kvstores.filter(key=item['new'])
+            )
+
+    def add(self, model, owner_field, owner_ids, kvstores):
+        """
+        Adds inherited keys to the owners (nodes or pages) which
+        do not have a key of the same name yet.
+        """
+        if not self.additions or not owner_ids:
+            return
+
+        existing = set(
+            kvstores.filter(
+                key__in=[item['key'] for item in self.additions]
+            ).values_list(owner_field, 'key')
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    key=item['key'],
+                    kv_type=item['kv_type'],
+                    kv_format=item['kv_format'],
+                    kv_inherited=True,
+                    **{owner_field: owner_id}
+                )
+                for owner_id in owner_ids
+                for item in self.additions
+                if (owner_id, item['key']) not in existing
+            ],
+            batch_size=BATCH_SIZE
+        )
+
+    def apply_to_pages(self, document_ids):
+        kvstores = KVStorePage.objects.filter(
+            page__document_id__in=document_ids
+        )
+        self.update(kvstores)
+        if self.additions:
+            self.add(
+                KVStorePage,
+                'page_id',
+                list(
+                    Page.objects.filter(
+                        document_id__in=document_ids
+                    ).values_list('id', flat=True)
+                ),
+                kvstores
+            )
+        # same as ``Page._apply_diff_delete``: keys removed from the
+        # document are kept on its pages
+
+    def apply(self, node_ids):
+        kvstores = KVStoreNode.objects.filter(node_id__in=node_ids)
+        self.update(kvstores)
+        self.add(KVStoreNode, 'node_id', node_ids, kvstores)
+        if self.removals:
+            kvstores.filter(key__in=self.removals).delete()
+
+        self.apply_to_pages(node_ids)
+
+
+def propagate_kv(node, changes, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Applies metadata changes (as returned by ``apply_to_node``) to
+    all descendants of the node and to pages of all documents in the
+    subtree (including the node itself, if it is a document).
+
+    ``progress`` is an optional callable, called with (done, total)
+    number of nodes after each chunk.
+
+    Returns number of changed descendants.
+    """
+    propagation = KVPropagation(changes)
+    total = count_descendants(node)
+
+    with transaction.atomic():
+        propagation.apply_to_pages([node.id])
+
+    done = 0
+    for node_ids in descendant_chunks(node, chunk_size):
+        with transaction.atomic():
+            propagation.apply(node_ids)
+        done += len(node_ids)
+        if progress:
+            progress(done, total)
+
+    return done
+
+
+def update_kv(node, data, user=None):
+    """
+    Bulk counterpart of ``node.kv.update(data)``.
+
+    Metadata keys of the node are changed right away; if the node
+    has more than ``PAPERMERGE_METADATA_PROPAGATION_ASYNC_MIN_NODES``
+    descendants, changes are propagated to them by background celery
+    task (which reports progress to the ``user``).
+
+    Returns True if propagation was done, False if it was scheduled.
+    """
+    from .tasks import propagate_kv_task
+
+    if len(data) == 0:
+        return True
+
+    with transaction.atomic():
+        changes = apply_to_node(node, data)
+
+    threshold = settings.PAPERMERGE_METADATA_PROPAGATION_ASYNC_MIN_NODES
+    if threshold is None or count_descendants(node) <= threshold:
+        propagate_kv(
+            node,
+            changes,
+            chunk_size=settings.PAPERMERGE_METADATA_PROPAGATION_CHUNK_SIZE
+        )
+        return True
+
+    propagate_kv_task.apply_async(
+        kwargs={
+            'node_id': node.id,
+            'changes': changes,
+            'user_id': user.id if user else None,
+        }
+    )
+
+    return False
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from papermerge.core.models import KVStoreNode, KVStorePage
+
+from .models import typed_value_model
+
+
+@receiver(post_save, sender=KVStoreNode)
+@receiver(post_save, sender=KVStorePage)
+def kvstore_saved_handler(sender, instance, **kwargs):
+    """
+    Value, type or format of metadata key changed (e.g. ``doc.kv[key] =
+    value``). Deleted keys take their typed values along (cascade).
+    """
+    typed_value_model(sender).objects.refresh(
+        sender.objects.filter(pk=instance.pk)
+    )
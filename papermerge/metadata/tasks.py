@@ -0,0 +1,43 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from papermerge.core.models import BaseTreeNode
+from papermerge.wsignals.groups import notify_progress
+
+from .propagation import propagate_kv
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def propagate_kv_task(node_id, changes, user_id=None):
+    """
+    Applies metadata changes (``papermerge.metadata.propagation
+    .apply_to_node``) to descendants of the node. Progress is sent to
+    the user who changed metadata of the node.
+    """
+    try:
+        node = BaseTreeNode.objects.get(id=node_id)
+    except BaseTreeNode.DoesNotExist:
+        logger.warning(
+            f"Node {node_id} was deleted before metadata propagation"
+        )
+        return 0
+
+    def progress(done, total):
+        notify_progress(
+            'metadata.propagation',
+            user_id,
+            node_id,
+            done,
+            total
+        )
+
+    return propagate_kv(
+        node,
+        changes,
+        chunk_size=settings.PAPERMERGE_METADATA_PROPAGATION_CHUNK_SIZE,
+        progress=progress
+    )
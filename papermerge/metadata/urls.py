@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'metadata'
+
+urlpatterns = [
+    path('node/<int:node_id>', views.node_view, name="node"),
+    path(
+        'metadata/<model>/<int:id>', views.metadata, name="metadata"
+    ),
+]
@@ -0,0 +1,111 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from papermerge.core.models import Access, BaseTreeNode, Tag
+from papermerge.core.models.kvstore import (
+    get_currency_formats,
+    get_date_formats,
+    get_kv_types,
+    get_numeric_formats
+)
+from papermerge.core.views.decorators import json_response
+from papermerge.core.views.metadata import metadata as core_metadata
+from papermerge.core.views.nodes import node_view as core_node_view
+from papermerge.core.views.utils import sanitize_kvstore_list
+
+from .propagation import update_kv
+
+
+def get_kvstore_data(request):
+    data = json.loads(request.body)
+    kvstore = data.get('kvstore', None)
+    if isinstance(kvstore, list):
+        return sanitize_kvstore_list(kvstore)
+
+    return None
+
+
+@login_required
+def metadata(request, model, id):
+    """
+    Same as core's ``metadata`` view (and served under the same URL,
+    see ``config.urls``), but metadata changes of a folder are
+    propagated to its descendants with ``update_kv``. Metadata of
+    documents is kept on their pages, which have no descendants, so
+    those requests are left to core.
+    """
+    if request.method == 'GET' or model != 'node':
+        return core_metadata(request, model, id)
+
+    try:
+        node = BaseTreeNode.objects.get(id=id)
+    except BaseTreeNode.DoesNotExist:
+        raise Http404("Node does not exists")
+
+    if node.is_document():
+        return core_metadata(request, model, id)
+
+    if not request.user.has_perm(Access.PERM_READ, node):
+        return HttpResponseForbidden()
+
+    if not request.user.has_perm(Access.PERM_WRITE, node):
+        return HttpResponseForbidden()
+
+    kv_data = get_kvstore_data(request)
+    if kv_data is not None:
+        update_kv(node, kv_data, user=request.user)
+
+    return HttpResponse(
+        json.dumps(
+            {
+                'kvstore': [],
+                'currency_formats': get_currency_formats(),
+                'date_formats': get_date_formats(),
+                'numeric_formats': get_numeric_formats(),
+                'kv_types': get_kv_types()
+            }
+        ),
+        content_type="application/json"
+    )
+
+
+@login_required
+def node_view(request, node_id):
+    """
+    Same as core's ``node_view``, but metadata changes (PUT or POST)
+    are propagated to descendants of the node with ``update_kv``.
+    """
+    if request.method not in ("PUT", "POST"):
+        return core_node_view(request, node_id)
+
+    return update_node(request, node_id)
+
+
+@json_response
+def update_node(request, node_id):
+    try:
+        node = BaseTreeNode.objects.get(id=node_id)
+    except BaseTreeNode.DoesNotExist:
+        raise Http404("Node does not exists")
+
+    if not request.user.has_perm(Access.PERM_WRITE, node):
+        return "Permission denied", HttpResponseForbidden.status_code
+
+    kv_data = get_kvstore_data(request)
+    if kv_data is not None:
+        update_kv(node, kv_data, user=request.user)
+
+    if not request.user.has_perm(Access.PERM_READ, node):
+        return "Permission denied", HttpResponseForbidden.status_code
+
+    node_dict = node.to_dict()
+    # enables autocomplete for tag editor in document view
+    node_dict['alltags'] = [
+        tag.to_dict()
+        for tag in Tag.objects.filter(user=request.user)
+    ]
+
+    return {
+        'node': node_dict
+    }
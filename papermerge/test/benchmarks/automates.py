@@ -0,0 +1,108 @@
+"""
+Compares ``Automate.is_a_match`` of every automate with
+``papermerge.automates.matcher.AutomateMatcher`` on OCRed pages
+matched against hundreds of automates of one user.
+
+Automates are not saved, so no database is needed; settings module is
+needed for django setup only.
+
+Usage:
+
+    DJANGO_SETTINGS_MODULE=config.settings.test \\
+        python -m papermerge.test.benchmarks.automates \\
+        [--automates 300] [--pages 20] [--words 500]
+"""
+import argparse
+import random
+import time
+
+import django
+
+
+def random_words(count, rnd):
+    return [
+        "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(
+            rnd.randint(4, 10)
+        ))
+        for _ in range(count)
+    ]
+
+
+def make_automates(count, vocabulary, rnd):
+    from papermerge.core.models import Automate
+
+    algorithms = [
+        Automate.MATCH_ANY,
+        Automate.MATCH_ALL,
+        Automate.MATCH_LITERAL,
+        Automate.MATCH_ANY,
+        Automate.MATCH_ALL,
+        Automate.MATCH_REGEX,
+    ]
+    automates = []
+    for index in range(count):
+        algorithm = algorithms[index % len(algorithms)]
+        if algorithm == Automate.MATCH_REGEX:
+            match = rnd.choice(vocabulary) + r"\s+\d+"
+        elif algorithm == Automate.MATCH_LITERAL:
+            match = rnd.choice(vocabulary)
+        else:
+            match = " ".join(rnd.sample(vocabulary, 3))
+        automates.append(
+            Automate(
+                id=index + 1,
+                name=f"automate_{index}",
+                match=match,
+                matching_algorithm=algorithm,
+                is_case_sensitive=index % 2 == 0
+            )
+        )
+
+    return automates
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--automates', type=int, default=300)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--words', type=int, default=500)
+    args = parser.parse_args()
+
+    django.setup()
+
+    from papermerge.automates.matcher import AutomateMatcher
+
+    rnd = random.Random(0)
+    vocabulary = random_words(5000, rnd)
+    automates = make_automates(args.automates, vocabulary, rnd)
+    pages = [
+        " ".join(rnd.choice(vocabulary) for _ in range(args.words))
+        for _ in range(args.pages)
+    ]
+
+    start = time.perf_counter()
+    expected = [
+        [automate.id for automate in automates if automate.is_a_match(text)]
+        for text in pages
+    ]
+    is_a_match_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = AutomateMatcher(automates)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = [matcher.match(text) for text in pages]
+    matcher_time = time.perf_counter() - start
+
+    assert matched == expected
+    print(
+        f"is_a_match: {is_a_match_time * 1000:.1f}ms"
+        f" matcher: {matcher_time * 1000:.1f}ms"
+        f" (compiled in {compile_time * 1000:.1f}ms)"
+        f" matches={sum(len(ids) for ids in matched)}"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares ``search_excerpt`` of ``papermerge.core.templatetags.search_tags``
+with the one of ``papermerge.fulltext.excerpt`` on a results page of
+long OCRed pages.
+
+Usage:
+
+    python -m papermerge.test.benchmarks.excerpt [--pages 50] [--scale 400]
+"""
+import argparse
+import time
+
+from papermerge.core.templatetags import search_tags
+from papermerge.fulltext import excerpt
+
+from ..test_search_excerpt import TEXT
+
+PHRASES = (
+    ["weak", "free", "others"],
+    # one phrase is not found, whole text is scanned
+    ["weak", "free", "missing"],
+)
+
+
+def measure(search_excerpt, text, phrases, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(pages):
+            search_excerpt(text, list(phrases), 5)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--scale', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    text = TEXT * args.scale
+    for phrases in PHRASES:
+        for module in (search_tags, excerpt):
+            best_time = measure(
+                module.search_excerpt,
+                text,
+                phrases,
+                args.pages,
+                args.repeat
+            )
+            print(
+                f"{module.__name__:>40}: phrases={phrases}"
+                f" text={len(text)} chars time={best_time * 1000:.1f}ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares ``papermerge.core.lib.hocr.Hocr`` with
+``papermerge.viewer.hocr.CompactHocr`` on page-1.hocr test file
+scaled up to a dense page.
+
+Usage:
+
+    python -m papermerge.test.benchmarks.hocr [--scale 30] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from papermerge.core.lib.hocr import Hocr
+from papermerge.viewer.hocr import CompactHocr
+
+BASE_DIR = Path(__file__).parent.parent
+
+LINE_RE = re.compile(
+    r"(<span class='ocr_line'.*?</span>\s*</span>)",
+    re.DOTALL
+)
+
+
+def scaled_hocr(scale):
+    """
+    Returns path to temporary hocr file with all lines of page-1.hocr
+    repeated ``scale`` times (page-1.hocr has ~150 words).
+    """
+    with open(BASE_DIR / "data" / "page-1.hocr") as f:
+        content = f.read()
+
+    lines = "\n".join(LINE_RE.findall(content))
+    body_end = content.rindex("</body>")
+    scaled = "".join([
+        content[:body_end],
+        "<div class='ocr_carea'><p class='ocr_par'>",
+        "\n".join([lines] * (scale - 1)),
+        "</p></div>",
+        content[body_end:]
+    ])
+    fd, path = tempfile.mkstemp(suffix=".hocr")
+    with os.fdopen(fd, "w") as f:
+        f.write(scaled)
+
+    return path
+
+
+def measure(klass, path, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hocr = klass(hocr_file_path=path)
+        hocr.good_json_words()
+        hocr.get_meta()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    hocr = klass(hocr_file_path=path)
+    retained, parse_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'words': len(hocr.ocrx_words),
+        'best_time': min(timings),
+        'parse_peak': parse_peak,
+        'retained': retained
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = scaled_hocr(args.scale)
+    try:
+        for klass in (Hocr, CompactHocr):
+            result = measure(klass, path, args.repeat)
+            print(
+                f"{klass.__name__:>12}: words={result['words']}"
+                f" time={result['best_time'] * 1000:.1f}ms"
+                f" parse_peak={result['parse_peak'] / 1024:.0f}KiB"
+                f" retained={result['retained'] / 1024:.0f}KiB"
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
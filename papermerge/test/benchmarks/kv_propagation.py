@@ -0,0 +1,123 @@
+"""
+Compares ``KV.update`` of ``papermerge.core.models.kvstore`` with
+``papermerge.metadata.propagation.update_kv`` on a folder with
+10k documents (in subfolders of 100 documents each).
+
+Runs against a test database created from given settings module.
+Building of the tree takes a while; it is done once and both
+implementations add, rename and remove the same key on it.
+
+Usage:
+
+    DJANGO_SETTINGS_MODULE=config.settings.test \\
+        python -m papermerge.test.benchmarks.kv_propagation \\
+        [--documents 10000] [--pages 2] [--skip-core]
+"""
+import argparse
+import time
+
+import django
+
+
+def build_tree(user, documents, pages, per_folder=100):
+    from papermerge.core.models import Document, Folder
+
+    root = Folder.objects.create(title="benchmark", user=user)
+    folder = None
+    for index in range(documents):
+        if index % per_folder == 0:
+            folder = Folder.objects.create(
+                title=f"folder_{index // per_folder}",
+                user=user,
+                parent=root
+            )
+        Document.objects.create_document(
+            title=f"doc_{index}.pdf",
+            file_name=f"doc_{index}.pdf",
+            size='1989',
+            lang='DEU',
+            user=user,
+            parent_id=folder.id,
+            page_count=pages,
+        )
+
+    root.refresh_from_db()
+    return root
+
+
+def measure(update, root):
+    from papermerge.core.models import Folder, KVStoreNode, KVStorePage
+    from papermerge.core.models.kvstore import MONEY
+
+    timings = {}
+
+    start = time.perf_counter()
+    update(root, [{'key': 'price', 'kv_type': MONEY, 'kv_format': 'dd,cc'}])
+    timings['add'] = time.perf_counter() - start
+
+    root = Folder.objects.get(id=root.id)
+    kvstore = root.kvstore.get(key='price')
+    start = time.perf_counter()
+    update(root, [{
+        'id': kvstore.id,
+        'key': 'amount',
+        'kv_type': MONEY,
+        'kv_format': 'dd.cc'
+    }])
+    timings['update'] = time.perf_counter() - start
+
+    root = Folder.objects.get(id=root.id)
+    start = time.perf_counter()
+    update(root, [{'key': 'shop'}])
+    timings['remove'] = time.perf_counter() - start
+
+    KVStoreNode.objects.all().delete()
+    KVStorePage.objects.all().delete()
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--skip-core', action='store_true')
+    args = parser.parse_args()
+
+    django.setup()
+
+    from django.db import connection
+
+    from papermerge.metadata.propagation import update_kv
+    from papermerge.test.utils import create_root_user
+
+    def core_update(node, data):
+        node.kv.update(data)
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        start = time.perf_counter()
+        root = build_tree(create_root_user(), args.documents, args.pages)
+        print(
+            f"tree of {args.documents} documents built in"
+            f" {time.perf_counter() - start:.1f}s"
+        )
+        implementations = [('update_kv', update_kv)]
+        if not args.skip_core:
+            implementations.insert(0, ('KV.update', core_update))
+
+        for name, update in implementations:
+            timings = measure(update, root)
+            print(
+                f"{name:>10}: " + " ".join(
+                    f"{operation}={seconds * 1000:.0f}ms"
+                    for operation, seconds in timings.items()
+                )
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
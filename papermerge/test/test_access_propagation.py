@@ -0,0 +1,230 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from papermerge.access.models import filter_by_perms
+from papermerge.access.propagation import (
+    descendant_chunks,
+    diffs_data,
+    propagate_access,
+    propagate_access_changes
+)
+from papermerge.access.tasks import propagate_access_task
+from papermerge.core.auth import create_access
+from papermerge.core.models import Access, Diff, Folder
+from papermerge.test.utils import (
+    create_margaret_user,
+    create_uploader_user
+)
+
+READ = Access.PERM_READ
+WRITE = Access.PERM_WRITE
+
+
+class TestAccessPropagation(TestCase):
+
+    def setUp(self):
+        """
+        F1 -> L1a -> L2a -> L3a
+        F1 -> L1b -> L2b
+        """
+        self.uploader_user = create_uploader_user()
+        self.margaret_user = create_margaret_user()
+        self.F1 = self._folder("F1")
+        L1a = self._folder("L1a", self.F1)
+        L2a = self._folder("L2a", L1a)
+        self._folder("L3a", L2a)
+        L1b = self._folder("L1b", self.F1)
+        self._folder("L2b", L1b)
+        self.F1.refresh_from_db()
+        self.access = create_access(
+            node=self.F1,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={READ: True}
+        )
+
+    def _folder(self, title, parent=None):
+        return Folder.objects.create(
+            title=title,
+            user=self.uploader_user,
+            parent=parent
+        )
+
+    def titles(self, perms=(READ,)):
+        return set(
+            filter_by_perms(
+                Folder.objects.all(),
+                self.margaret_user,
+                perms
+            ).values_list('title', flat=True)
+        )
+
+    def test_descendant_chunks(self):
+        chunks = list(descendant_chunks(self.F1, chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            set(
+                Folder.objects.filter(
+                    id__in=sum(chunks, [])
+                ).values_list('title', flat=True)
+            ),
+            {"L1a", "L2a", "L3a", "L1b", "L2b"}
+        )
+
+    def test_add(self):
+        progress = []
+
+        done = propagate_access(
+            self.F1,
+            [Diff(operation=Diff.ADD, instances_set=[self.access])],
+            apply_to_self=True,
+            chunk_size=2,
+            progress=lambda done, total: progress.append((done, total))
+        )
+
+        self.assertEqual(done, 6)
+        self.assertEqual(progress, [(1, 6), (3, 6), (5, 6), (6, 6)])
+        self.assertEqual(
+            self.titles(),
+            {"F1", "L1a", "L2a", "L3a", "L1b", "L2b"}
+        )
+        for folder in Folder.objects.all():
+            self.assertTrue(self.margaret_user.has_perm(READ, folder))
+            self.assertFalse(self.margaret_user.has_perm(WRITE, folder))
+
+    def test_add_twice_does_not_duplicate_access(self):
+        diffs = [Diff(operation=Diff.ADD, instances_set=[self.access])]
+
+        propagate_access(self.F1, diffs)
+        propagate_access(self.F1, diffs)
+
+        self.assertEqual(
+            Access.objects.filter(user=self.margaret_user).count(),
+            6
+        )
+
+    def test_update_and_delete(self):
+        propagate_access(
+            self.F1,
+            [Diff(operation=Diff.ADD, instances_set=[self.access])]
+        )
+        self.access.set_perms({READ: True, WRITE: True})
+
+        propagate_access(
+            self.F1,
+            [Diff(operation=Diff.UPDATE, instances_set=[self.access])]
+        )
+
+        self.assertEqual(
+            self.titles([READ, WRITE]),
+            {"F1", "L1a", "L2a", "L3a", "L1b", "L2b"}
+        )
+
+        propagate_access(
+            self.F1,
+            [Diff(operation=Diff.DELETE, instances_set=[self.access])],
+            apply_to_self=True
+        )
+
+        self.assertEqual(self.titles(), set())
+        self.assertFalse(Access.objects.filter(user=self.margaret_user))
+
+    @override_settings(PAPERMERGE_ACCESS_PROPAGATION_ASYNC_MIN_NODES=2)
+    @mock.patch('papermerge.access.tasks.propagate_access_task.apply_async')
+    def test_large_subtree_is_propagated_in_background(self, apply_async):
+        diffs = [Diff(operation=Diff.ADD, instances_set=[self.access])]
+
+        done = propagate_access_changes(
+            self.F1,
+            diffs,
+            user=self.uploader_user
+        )
+
+        self.assertFalse(done)
+        apply_async.assert_called_once_with(
+            kwargs={
+                'node_id': self.F1.id,
+                'diffs': diffs_data(diffs),
+                'apply_to_self': False,
+                'user_id': self.uploader_user.id,
+            }
+        )
+        self.assertEqual(self.titles(), {"F1"})
+
+    @mock.patch('papermerge.access.tasks.notify_progress')
+    def test_task_reports_progress(self, notify_progress):
+        diffs = [Diff(operation=Diff.ADD, instances_set=[self.access])]
+
+        propagate_access_task(
+            self.F1.id,
+            diffs_data(diffs),
+            user_id=self.uploader_user.id
+        )
+
+        notify_progress.assert_called_with(
+            'access.propagation',
+            self.uploader_user.id,
+            self.F1.id,
+            5,
+            5
+        )
+        self.assertEqual(
+            self.titles(),
+            {"F1", "L1a", "L2a", "L3a", "L1b", "L2b"}
+        )
+
+    @override_settings(PAPERMERGE_ACCESS_PROPAGATION_ASYNC_MIN_NODES=2)
+    @mock.patch('papermerge.access.tasks.propagate_access_task.apply_async')
+    def test_access_view_propagates_in_background(self, apply_async):
+        self.client.login(testcase_user=self.uploader_user)
+
+        resp = self.client.post(
+            reverse('core:access', args=(self.F1.id, )),
+            json.dumps({
+                'add': [{
+                    'model': 'user',
+                    'name': self.margaret_user.username,
+                    'access_type': 'allow',
+                    'permissions': {READ: True, WRITE: True}
+                }]
+            }),
+            content_type="application/json",
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        apply_async.assert_called_once()
+        self.assertEqual(
+            apply_async.call_args.kwargs['kwargs']['user_id'],
+            self.uploader_user.id
+        )
+        self.assertEqual(self.titles([READ, WRITE]), {"F1"})
+
+    def test_moved_node_inherits_access_of_new_parent(self):
+        propagate_access(
+            self.F1,
+            [Diff(operation=Diff.ADD, instances_set=[self.access])]
+        )
+        F2 = self._folder("F2")
+        L1a = Folder.objects.get(title="L1a")
+
+        L1a.refresh_from_db()
+        L1a.parent = F2
+        L1a.save()
+
+        self.assertEqual(self.titles(), {"F1", "L1b", "L2b"})
+        self.assertEqual(
+            Access.objects.filter(
+                node__title__in=["L1a", "L2a", "L3a"],
+                user=self.uploader_user,
+                access_inherited=True
+            ).count(),
+            3
+        )
@@ -0,0 +1,164 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.automates import matcher as matcher_module
+from papermerge.automates.matcher import (
+    AutomateMatcher,
+    get_matcher,
+    matching_automates
+)
+from papermerge.automates.run import run_automates
+from papermerge.core.models import Automate, Document, Folder
+
+from .test_automate import TEXT
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class TestAutomateMatcher(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('admin')
+
+    def _create_am(self, name, match, alg, is_case_sensitive=False):
+        return Automate.objects.create(
+            name=name,
+            match=match,
+            matching_algorithm=alg,
+            user=self.user,
+            is_case_sensitive=is_case_sensitive
+        )
+
+    def test_same_matches_as_is_a_match(self):
+        automates = [
+            self._create_am("1", "Paulinus", Automate.MATCH_LITERAL),
+            self._create_am("2", "Cesar", Automate.MATCH_LITERAL),
+            self._create_am("3", "granted life rushes", Automate.MATCH_ALL),
+            self._create_am("4", "granted quality", Automate.MATCH_ALL),
+            self._create_am("5", "what if granted", Automate.MATCH_ANY),
+            self._create_am("6", "what if usecase", Automate.MATCH_ANY),
+            self._create_am("7", r"l..e", Automate.MATCH_ANY),
+            self._create_am("8", r"\d\d", Automate.MATCH_REGEX),
+            self._create_am("9", '"brief   span"', Automate.MATCH_ANY),
+            self._create_am("10", "NATURE", Automate.MATCH_ANY, True),
+            self._create_am("11", "Nature", Automate.MATCH_ANY, True),
+            self._create_am("12", "  ", Automate.MATCH_ANY),
+        ]
+        matcher = AutomateMatcher(automates)
+
+        self.assertEqual(
+            matcher.match(TEXT),
+            [
+                automate.id for automate in automates
+                if automate.is_a_match(TEXT)
+            ]
+        )
+        self.assertEqual(
+            [Automate.objects.get(id=pk).name for pk in matcher.match(TEXT)],
+            ["1", "3", "5", "7", "9", "11"]
+        )
+
+    def test_word_boundaries(self):
+        automate = self._create_am("1", "spite", Automate.MATCH_ANY)
+
+        self.assertEqual(AutomateMatcher([automate]).match(TEXT), [])
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_matcher_is_cached_until_automates_change(self):
+        self._create_am("1", "Paulinus", Automate.MATCH_LITERAL)
+        matcher = get_matcher(self.user.id)
+
+        self.assertIs(get_matcher(self.user.id), matcher)
+
+        automate = self._create_am("2", "Seneca", Automate.MATCH_ANY)
+
+        self.assertIsNot(get_matcher(self.user.id), matcher)
+        self.assertEqual(
+            list(
+                matching_automates(self.user.id, TEXT).values_list(
+                    'name', flat=True
+                )
+            ),
+            ["1", "2"]
+        )
+
+        automate.delete()
+
+        self.assertEqual(
+            matching_automates(self.user.id, TEXT).count(),
+            1
+        )
+
+    def test_automates_changed_by_other_process(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        file_cache = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                'FileBasedCache',
+                'LOCATION': cache_dir,
+            }
+        }
+        with override_settings(CACHES=file_cache):
+            self._create_am("1", "Paulinus", Automate.MATCH_LITERAL)
+            # worker process compiles the matcher
+            matcher = get_matcher(self.user.id)
+
+            # webapp process (with its own process local matchers)
+            # adds an automate
+            with mock.patch.dict(matcher_module._matchers, clear=True):
+                self._create_am("2", "Seneca", Automate.MATCH_ANY)
+
+            self.assertIn(self.user.id, matcher_module._matchers)
+            self.assertIsNot(get_matcher(self.user.id), matcher)
+            self.assertEqual(
+                matching_automates(self.user.id, TEXT).count(),
+                2
+            )
+
+            # version evicted from the cache
+            cache.clear()
+            matcher = get_matcher(self.user.id)
+            with mock.patch.dict(matcher_module._matchers, clear=True):
+                self._create_am("3", "Lucilius", Automate.MATCH_ANY)
+
+            self.assertIsNot(get_matcher(self.user.id), matcher)
+
+    def test_run_automates(self):
+        inbox, _ = Folder.objects.get_or_create(
+            title=Folder.INBOX_NAME,
+            user=self.user
+        )
+        doc = Document.objects.create_document(
+            title="document_c",
+            file_name="document_c.pdf",
+            size='1212',
+            lang='DEU',
+            user=self.user,
+            parent_id=inbox.id,
+            page_count=2,
+        )
+        page = doc.pages.first()
+        page.text = TEXT
+        page.save()
+        self._create_am("1", "Paulinus", Automate.MATCH_ANY)
+        self._create_am("2", "Cesar", Automate.MATCH_ANY)
+
+        matched = run_automates(Automate.objects.all(), doc.pages.all())
+
+        self.assertEqual(
+            list(matched.values_list('name', flat=True)),
+            ["1"]
+        )
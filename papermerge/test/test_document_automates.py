@@ -0,0 +1,130 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.automates.run import apply_document_automates
+from papermerge.core.models import Automate, Document, Folder
+from papermerge.core.ocr import COMPLETE
+from papermerge.wsignals.context import (
+    get_document,
+    task_context,
+    whole_document_ocr
+)
+from papermerge.wsignals.signals import apply_automates_handler
+from papermerge.wsignals.tasks import ocr_document_complete
+
+User = get_user_model()
+
+
+class TestDocumentAutomates(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('admin')
+        inbox, _ = Folder.objects.get_or_create(
+            title=Folder.INBOX_NAME,
+            user=self.user
+        )
+        self.doc = Document.objects.create_document(
+            title="receipt.pdf",
+            file_name="receipt.pdf",
+            size='1212',
+            lang='DEU',
+            user=self.user,
+            parent_id=inbox.id,
+            page_count=3,
+        )
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.tmp_dir):
+            os.remove(os.path.join(self.tmp_dir, name))
+        os.rmdir(self.tmp_dir)
+
+    def _page_texts(self, texts):
+        paths = []
+        for page_num, text in enumerate(texts, start=1):
+            path = os.path.join(self.tmp_dir, f"page_{page_num}.txt")
+            with open(path, "w") as f:
+                f.write(text)
+            paths.append((page_num, path))
+
+        return mock.patch(
+            'papermerge.automates.run.page_text_paths',
+            return_value=iter(paths)
+        )
+
+    def _create_am(self, name, match, tag):
+        automate = Automate.objects.create(
+            name=name,
+            match=match,
+            matching_algorithm=Automate.MATCH_ANY,
+            user=self.user,
+            is_case_sensitive=False
+        )
+        automate.tags.set(tag, tag_kwargs={'user': self.user})
+
+        return automate
+
+    def test_get_document_is_cached_within_task(self):
+        with task_context():
+            with self.assertNumQueries(1):
+                get_document(self.doc.id)
+                get_document(self.doc.id)
+
+            with self.assertRaises(Document.DoesNotExist):
+                get_document(-1)
+
+        with self.assertNumQueries(2):
+            get_document(self.doc.id)
+            get_document(self.doc.id)
+
+    @mock.patch('papermerge.automates.run.automates_matching')
+    def test_automates_are_applied_once_per_document(self, signal):
+        self._create_am("lidl", "lidl", "groceries")
+        self._create_am("bank", "transfer", "bank")
+
+        with self._page_texts(["LIDL", "nothing", "lidl again"]):
+            matched = apply_document_automates(self.doc.id)
+
+        self.assertEqual([automate.name for automate in matched], ["lidl"])
+        self.assertEqual(
+            [tag.name for tag in self.doc.tags.all()],
+            ["groceries"]
+        )
+        signal.send.assert_called_once()
+        self.assertIsNone(signal.send.call_args.kwargs['page_num'])
+
+    @override_settings(PAPERMERGE_AUTOMATES_PER_DOCUMENT=True)
+    @mock.patch('papermerge.wsignals.signals.apply_automates')
+    def test_page_automates_are_skipped_for_whole_document(
+        self,
+        apply_automates
+    ):
+        kwargs = {
+            'document_id': self.doc.id,
+            'page_num': 1,
+            'status': COMPLETE
+        }
+
+        with whole_document_ocr():
+            apply_automates_handler(sender=None, **kwargs)
+
+        apply_automates.assert_not_called()
+
+        apply_automates_handler(sender=None, **kwargs)
+
+        apply_automates.assert_called_once_with(
+            document_id=self.doc.id,
+            page_num=1
+        )
+
+    @override_settings(PAPERMERGE_AUTOMATES_PER_DOCUMENT=True)
+    @mock.patch('papermerge.wsignals.tasks.apply_document_automates')
+    def test_document_complete_runs_automates(self, apply_document_automates):
+        ocr_document_complete([[1, 2, 3]], document_id=self.doc.id)
+
+        apply_document_automates.assert_called_once_with(self.doc.id)
@@ -0,0 +1,165 @@
+import io
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase
+
+from papermerge.access.models import (
+    EffectivePermission,
+    effective_perms,
+    filter_by_perms,
+    mask_perms,
+    perms_mask
+)
+from papermerge.core.auth import create_access
+from papermerge.core.models import Access, Folder
+from papermerge.test.utils import (
+    create_margaret_user,
+    create_uploader_user
+)
+
+READ = Access.PERM_READ
+WRITE = Access.PERM_WRITE
+
+FULL_ACCESS = [
+    Access.PERM_READ,
+    Access.PERM_WRITE,
+    Access.PERM_DELETE,
+    Access.PERM_CHANGE_PERM,
+    Access.PERM_TAKE_OWNERSHIP,
+]
+
+
+class TestEffectivePerms(TestCase):
+
+    def test_perms_mask(self):
+        self.assertEqual(mask_perms(perms_mask([READ, WRITE])), {READ, WRITE})
+        self.assertEqual(mask_perms(perms_mask([])), set())
+
+    def test_deny_overrides_allow(self):
+        rows = [
+            (1, 10, None, Access.ALLOW, READ),
+            (1, 10, None, Access.ALLOW, WRITE),
+            (1, None, 5, Access.DENY, WRITE),
+            (1, None, 5, Access.ALLOW, READ),
+            (2, None, 5, Access.DENY, READ),
+        ]
+
+        self.assertEqual(
+            effective_perms(rows, {5: [10, 11]}),
+            {
+                (1, 10): perms_mask([READ]),
+                (1, 11): perms_mask([READ]),
+            }
+        )
+
+
+class TestEffectivePermission(TestCase):
+
+    def setUp(self):
+        self.uploader_user = create_uploader_user()
+        self.margaret_user = create_margaret_user()
+        self.folder = Folder.objects.create(
+            title="shared",
+            user=self.uploader_user
+        )
+
+    def perms_of(self, user, node):
+        perms = EffectivePermission.objects.filter(
+            user=user,
+            node=node
+        ).values_list('perms', flat=True).first()
+
+        return mask_perms(perms or 0)
+
+    def readable_folders(self, user):
+        return list(
+            filter_by_perms(Folder.objects.all(), user).values_list(
+                'title', flat=True
+            )
+        )
+
+    def test_owner_has_full_access(self):
+        self.assertEqual(
+            self.perms_of(self.uploader_user, self.folder),
+            set(FULL_ACCESS)
+        )
+        self.assertEqual(self.perms_of(self.margaret_user, self.folder), set())
+
+    def test_access_changes_are_applied(self):
+        access = create_access(
+            node=self.folder,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={READ: True}
+        )
+
+        self.assertEqual(self.perms_of(self.margaret_user, self.folder), {READ})
+        self.assertEqual(self.readable_folders(self.margaret_user), ["shared"])
+
+        access.set_perms({READ: True, WRITE: True})
+
+        self.assertEqual(
+            self.perms_of(self.margaret_user, self.folder),
+            {READ, WRITE}
+        )
+
+        access.delete()
+
+        self.assertEqual(self.perms_of(self.margaret_user, self.folder), set())
+        self.assertEqual(self.readable_folders(self.margaret_user), [])
+
+    def test_inherited_access(self):
+        create_access(
+            node=self.folder,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={READ: True}
+        )
+        sub_folder = Folder.objects.create(
+            title="sub",
+            user=self.uploader_user,
+            parent=self.folder
+        )
+
+        self.assertEqual(self.perms_of(self.margaret_user, sub_folder), {READ})
+
+    def test_group_membership_changes_are_applied(self):
+        group = Group.objects.create(name="accounting")
+        create_access(
+            node=self.folder,
+            model_type=Access.MODEL_GROUP,
+            name=group.name,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={READ: True}
+        )
+
+        self.assertEqual(self.readable_folders(self.margaret_user), [])
+
+        self.margaret_user.groups.add(group)
+
+        self.assertEqual(self.readable_folders(self.margaret_user), ["shared"])
+
+        group.user_set.remove(self.margaret_user)
+
+        self.assertEqual(self.readable_folders(self.margaret_user), [])
+
+        group.user_set.add(self.margaret_user)
+        self.margaret_user.groups.clear()
+
+        self.assertEqual(self.readable_folders(self.margaret_user), [])
+
+    def test_rebuild_command(self):
+        EffectivePermission.objects.all().delete()
+
+        call_command('rebuild_effective_permissions', stdout=io.StringIO())
+
+        self.assertEqual(
+            self.perms_of(self.uploader_user, self.folder),
+            set(FULL_ACCESS)
+        )
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.core.importers.imap import get_matching_user
+from papermerge.importers import routing
+from papermerge.importers.routing import get_index
+
+from .test_imap_import import _create_email, _set_email_routing_pref
+from .utils import (
+    create_elizabet_user,
+    create_margaret_user,
+    create_root_user
+)
+
+
+class TestRoutingIndex(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.margaret = create_margaret_user()
+        self.elizabet = create_elizabet_user()
+
+    def assertSameMatch(self, email_message, **kwargs):
+        expected = get_matching_user(email_message, **kwargs)
+        index = get_index()
+        with self.assertNumQueries(0):
+            user = index.match(email_message, **kwargs)
+
+        self.assertEqual(user, expected)
+
+        return user
+
+    def test_match_by_user(self):
+        _set_email_routing_pref(self.elizabet, "by_user", True)
+
+        user = self.assertSameMatch(
+            _create_email(from_field=self.elizabet.email),
+            by_user=True
+        )
+        self.assertEqual(user, self.elizabet)
+
+        self.assertSameMatch(
+            _create_email(to_field=self.margaret.email),
+            by_user=True
+        )
+        self.assertSameMatch(
+            _create_email(from_field=self.elizabet.email),
+            by_user=False
+        )
+
+    def test_match_by_secret(self):
+        _set_email_routing_pref(self.margaret, "mail_secret", "xyz")
+        _set_email_routing_pref(self.margaret, "by_secret", True)
+        _set_email_routing_pref(self.elizabet, "mail_secret", "abc")
+
+        user = self.assertSameMatch(
+            _create_email(body="Some text SECRET{ xyz } more text"),
+            by_secret=True
+        )
+        self.assertEqual(user, self.margaret)
+
+        self.assertSameMatch(
+            _create_email(subject="SECRET{abc}"),
+            by_secret=True
+        )
+        self.assertSameMatch(
+            _create_email(body="SECRET{unknown}"),
+            by_user=True,
+            by_secret=True
+        )
+
+    def test_index_is_rebuilt_on_preference_change(self):
+        email_message = _create_email(from_field=self.margaret.email)
+        index = get_index()
+
+        self.assertIs(get_index(), index)
+        self.assertIsNone(index.match(email_message, by_user=True))
+
+        _set_email_routing_pref(self.margaret, "by_user", True)
+
+        self.assertIsNot(get_index(), index)
+        self.assertEqual(
+            get_index().match(email_message, by_user=True),
+            self.margaret
+        )
+
+    def test_preference_changed_by_other_process(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        file_cache = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                'FileBasedCache',
+                'LOCATION': cache_dir,
+            }
+        }
+        email_message = _create_email(from_field=self.margaret.email)
+        with override_settings(CACHES=file_cache):
+            # importer process builds the index
+            index = get_index()
+
+            # webapp process (with its own process local index)
+            # changes the preference
+            with mock.patch.object(routing, '_index', None):
+                _set_email_routing_pref(self.margaret, "by_user", True)
+
+            self.assertIsNotNone(routing._index)
+            self.assertIsNot(get_index(), index)
+            self.assertEqual(
+                get_index().match(email_message, by_user=True),
+                self.margaret
+            )
+
+            # version evicted from the cache
+            cache.clear()
+            index = get_index()
+            with mock.patch.object(routing, '_index', None):
+                _set_email_routing_pref(self.margaret, "by_user", False)
+
+            self.assertIsNone(
+                get_index().match(email_message, by_user=True)
+            )
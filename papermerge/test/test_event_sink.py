@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from papermerge.contrib.admin.models import LogEntry
+from papermerge.core.models import Document, Folder
+from papermerge.core.ocr import COMPLETE, STARTED
+from papermerge.wsignals.signals import (
+    automates_matching_handler,
+    page_ocr_handler,
+    task_postrun_handler
+)
+from papermerge.wsignals.sink import PAGE_OCR, Event, EventSink, sink
+
+User = get_user_model()
+
+
+class TestEventSink(TestCase):
+
+    def setUp(self):
+        # events left by other tests
+        sink.flush()
+        LogEntry.objects.all().delete()
+        self.user = User.objects.create_user('admin')
+        inbox, _ = Folder.objects.get_or_create(
+            title=Folder.INBOX_NAME,
+            user=self.user
+        )
+        self.doc = Document.objects.create_document(
+            title="invoice.pdf",
+            file_name="invoice.pdf",
+            size='1212',
+            lang='DEU',
+            user=self.user,
+            parent_id=inbox.id,
+            page_count=3,
+        )
+
+    def _event(self, page_num, document_id=None, status=COMPLETE):
+        return Event(
+            kind=PAGE_OCR,
+            user_id=self.user.id,
+            document_id=document_id or self.doc.id,
+            page_num=page_num,
+            status=status
+        )
+
+    @mock.patch('papermerge.wsignals.sink.notifier')
+    def test_handlers_do_not_hit_database(self, notifier):
+        with self.assertNumQueries(0):
+            page_ocr_handler(
+                sender=None,
+                user_id=self.user.id,
+                document_id=self.doc.id,
+                page_num=1,
+                status=STARTED
+            )
+            automates_matching_handler(
+                sender=None,
+                user_id=self.user.id,
+                document_id=self.doc.id,
+                page_num=1,
+                message="1 automate matched"
+            )
+
+        self.assertEqual(LogEntry.objects.count(), 0)
+
+        task_postrun_handler()
+
+        self.assertEqual(
+            sorted(LogEntry.objects.values_list('message', flat=True)),
+            [
+                "Running automates for document invoice.pdf, page=1,"
+                f" doc_id={self.doc.id}. 1 automate matched",
+                "STARTED OCR for invoice.pdf, page 1.",
+            ]
+        )
+
+    @mock.patch('papermerge.wsignals.sink.notifier')
+    def test_flush_in_batches(self, notifier):
+        batched = EventSink(batch_size=3, flush_interval=1)
+
+        for page_num in (1, 2):
+            batched.emit(self._event(page_num))
+
+        self.assertEqual(LogEntry.objects.count(), 0)
+
+        # one query for titles, one insert
+        with self.assertNumQueries(2):
+            batched.emit(self._event(3))
+
+        self.assertEqual(LogEntry.objects.count(), 3)
+        notifier.notify.assert_called_once_with({self.user.id})
+
+    @mock.patch('papermerge.wsignals.sink.notifier')
+    def test_deleted_document_is_logged(self, notifier):
+        batched = EventSink(batch_size=10, flush_interval=1)
+        batched.emit(self._event(1, document_id=-1))
+
+        self.assertEqual(batched.flush(), 1)
+        self.assertIn(
+            "probably was deleted",
+            LogEntry.objects.get().message
+        )
+
+    @mock.patch('papermerge.wsignals.sink.notifier')
+    @mock.patch('papermerge.wsignals.sink.LogEntry.objects.bulk_create')
+    def test_failed_flush_is_not_raised(self, bulk_create, notifier):
+        bulk_create.side_effect = Exception("database is gone")
+        batched = EventSink(batch_size=10, flush_interval=1)
+        batched.emit(self._event(1))
+
+        self.assertEqual(batched.flush(), 1)
+        self.assertEqual(batched.flush(), 0)
@@ -0,0 +1,159 @@
+from django.template import Context, Template
+from django.test import TestCase
+
+from papermerge.fulltext.ahocorasick import Automaton
+from papermerge.fulltext.excerpt import (
+    find_matches,
+    highlight,
+    search_excerpt
+)
+
+from .test_search_excerpt import TEXT
+
+
+class TestAutomaton(TestCase):
+
+    def test_all_occurrences_are_found(self):
+        automaton = Automaton(["he", "she", "his", "hers"])
+
+        self.assertEqual(
+            list(automaton.iter("ushers")),
+            [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+        )
+
+    def test_ignore_case(self):
+        automaton = Automaton(["Power"])
+
+        self.assertEqual(
+            list(automaton.iter("POWER power")),
+            [(0, 5, 0), (6, 11, 0)]
+        )
+
+    def test_whole_words(self):
+        automaton = Automaton(["are"])
+
+        self.assertEqual(
+            list(automaton.iter_words("care are, bare")),
+            [(5, 8, 0)]
+        )
+
+
+class TestExcerpt(TestCase):
+    """
+    Same cases as in test_search_excerpt, plus precomputed offsets.
+    """
+
+    def test_search_excerpt_basic(self):
+        result = search_excerpt(
+            text=TEXT,
+            phrases="weak",
+            context_words_count=2
+        )
+
+        self.assertEqual(
+            result['excerpt'],
+            "... power are weak, slavish, subject ..."
+        )
+
+    def test_search_excerpt_two_phrases(self):
+        result = search_excerpt(
+            text=TEXT,
+            phrases=["weak", "free"],
+            context_words_count=2
+        )
+
+        self.assertEqual(
+            result['excerpt'],
+            "... by nature free, not subject ..."
+            " power are weak, slavish, subject ..."
+        )
+
+    def test_search_excerpt_phrase_occurs_twice(self):
+        result = search_excerpt(
+            text=TEXT,
+            phrases=["others"],
+            context_words_count=2
+        )
+
+        self.assertEqual(
+            result['excerpt'],
+            "... power, and others are not. ..."
+        )
+
+    def test_search_excerpt_no_match(self):
+        result = search_excerpt(
+            text="one two three four five six",
+            phrases=["seven"],
+            context_words_count=1
+        )
+
+        self.assertEqual(result['excerpt'], "one two three ...")
+
+    def test_search_excerpt_with_offsets(self):
+        start = TEXT.index("weak")
+        offsets = [(start, start + len("weak"))]
+
+        result = search_excerpt(
+            text=TEXT,
+            # phrases are not used when offsets are given
+            phrases=[],
+            context_words_count=2,
+            offsets=offsets
+        )
+
+        self.assertEqual(
+            result['excerpt'],
+            "... power are weak, slavish, subject ..."
+        )
+
+    def test_find_matches_first_only(self):
+        text = "power is power of Power"
+
+        self.assertEqual(
+            find_matches(text, ["power"]),
+            [(0, 5), (9, 14), (18, 23)]
+        )
+        self.assertEqual(
+            find_matches(text, ["power"], first_only=True),
+            [(0, 5)]
+        )
+
+    def test_highlight(self):
+        result = highlight(
+            text="this is a weak match",
+            phrases=["weak"],
+            class_name="highlighted"
+        )
+
+        self.assertEqual(
+            result['highlighted'],
+            'this is a <span class="highlighted">weak</span> match'
+        )
+
+    def test_highlight_with_offsets_escapes_text(self):
+        result = highlight(
+            text="<b>weak</b> match",
+            phrases=[],
+            offsets=[(3, 7)]
+        )
+
+        self.assertEqual(
+            result['highlighted'],
+            '&lt;b&gt;<span class="success">weak</span>&lt;/b&gt; match'
+        )
+
+    def test_template_tags(self):
+        template = Template(
+            "{% load search_tags %}"
+            "{% search_excerpt_tag text q 2 as matched %}"
+            "{% highlight_tag matched.excerpt q as highlighted %}"
+            "{{ highlighted.highlighted }}"
+        )
+
+        output = template.render(Context({'text': TEXT, 'q': 'weak'}))
+
+        self.assertEqual(
+            output,
+            '... power are <span class="text-success">weak</span>,'
+            ' slavish, subject ...'
+        )
@@ -0,0 +1,190 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.core.models import Document, Folder, Page
+from papermerge.fulltext.models import (
+    PageSearchVector,
+    config_case_sql,
+    tsquery_term
+)
+
+User = get_user_model()
+
+POSTGRES_BACKEND = "papermerge.fulltext.backends.SearchBackend"
+
+
+class TestTsVectorField(TestCase):
+
+    def test_column_type(self):
+        expected = 'text'
+        if connection.vendor == 'postgresql':
+            expected = 'tsvector'
+
+        self.assertEqual(
+            PageSearchVector._meta.get_field('vector').db_type(connection),
+            expected
+        )
+
+
+class TestTsqueryTerm(TestCase):
+
+    def test_prefix_match(self):
+        self.assertEqual(tsquery_term("invoice"), "'invoice':*")
+        self.assertEqual(
+            tsquery_term("invoice", prefix=False),
+            "'invoice'"
+        )
+
+    def test_special_characters_are_quoted(self):
+        self.assertEqual(tsquery_term("o'neil"), "'o''neil':*")
+        self.assertEqual(tsquery_term("a\\b"), "'a\\\\b':*")
+        self.assertEqual(tsquery_term("a&!b|c"), "'a&!b|c':*")
+
+
+class TestConfigCaseSql(TestCase):
+
+    @override_settings(
+        PAPERMERGE_SEARCH_LANGUAGE_CONFIGS={'deu': 'german', 'ENG': 'english'},
+        PAPERMERGE_SEARCH_DEFAULT_CONFIG='simple'
+    )
+    def test_languages_are_mapped_to_configs(self):
+        sql, params = config_case_sql('lang')
+
+        self.assertEqual(
+            sql,
+            "(CASE lower(lang) WHEN %s THEN %s WHEN %s THEN %s ELSE %s END)"
+        )
+        self.assertEqual(
+            params,
+            ['deu', 'german', 'eng', 'english', 'simple']
+        )
+
+    @override_settings(
+        PAPERMERGE_SEARCH_LANGUAGE_CONFIGS={},
+        PAPERMERGE_SEARCH_DEFAULT_CONFIG='simple'
+    )
+    def test_no_configured_languages(self):
+        sql, params = config_case_sql('lang')
+
+        self.assertEqual(sql, "%s")
+        self.assertEqual(params, ['simple'])
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    "Full text search requires PostgreSQL"
+)
+@override_settings(
+    PAPERMERGE_SEARCH_BACKEND=POSTGRES_BACKEND,
+    PAPERMERGE_SEARCH_LANGUAGE_CONFIGS={'deu': 'german', 'eng': 'english'}
+)
+class TestPostgresSearchBackend(TestCase):
+
+    def setUp(self):
+        # backend module requires psycopg2
+        from papermerge.fulltext.backends import SearchBackend
+
+        self.user = User.objects.create_user(username='test')
+        self.backend = SearchBackend()
+
+    def _create_doc(self, title, lang, texts):
+        doc = Document.objects.create_document(
+            title=title,
+            file_name=f"{title}.pdf",
+            size='1212',
+            lang=lang,
+            user=self.user,
+            page_count=len(texts),
+        )
+        for page, text in zip(doc.pages.all(), texts):
+            page.text = text
+            page.save()
+
+        return doc
+
+    def test_vector_is_updated_when_text_is_saved(self):
+        doc = self._create_doc("doc_a", "eng", ["first text"])
+        page = doc.pages.first()
+
+        self.assertEqual(page.search_vector.config, 'english')
+        self.assertEqual(
+            self.backend.search("second", Page).count(), 0
+        )
+
+        page.text = "second text"
+        page.save()
+
+        self.assertEqual(
+            self.backend.search("second", Page).count(), 1
+        )
+
+    @override_settings(
+        PAPERMERGE_SEARCH_BACKEND="papermerge.search.backends.db.SearchBackend"
+    )
+    def test_vectors_are_not_maintained_for_other_backends(self):
+        doc = self._create_doc("doc_a", "eng", ["first text"])
+
+        self.assertFalse(
+            PageSearchVector.objects.filter(page__document=doc).exists()
+        )
+
+    def test_search_is_not_case_sensitive(self):
+        self._create_doc(
+            "document_c", "DEU", ["search for TESTX text", "", ""]
+        )
+
+        self.assertEqual(self.backend.search("TESTX", Page).count(), 1)
+        self.assertEqual(self.backend.search("testX", Page).count(), 1)
+        self.assertEqual(self.backend.search("tst", Page).count(), 0)
+
+    def test_query_is_stemmed_with_page_language(self):
+        self._create_doc("doc_en", "eng", ["unpaid invoices"])
+        self._create_doc("doc_de", "deu", ["offene Rechnungen"])
+
+        self.assertEqual(self.backend.search("invoice", Page).count(), 1)
+        self.assertEqual(self.backend.search("Rechnung", Page).count(), 1)
+
+    def test_results_are_ranked(self):
+        self._create_doc("doc_x", "eng", ["apple banana cherry"])
+        self._create_doc("doc_y", "eng", ["apple apple banana apple"])
+
+        results = list(
+            self.backend.search("apple", Page).annotate_score('score')
+        )
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].document.title, "doc_y")
+        self.assertGreater(results[0].score, results[1].score)
+
+    def test_operators(self):
+        self._create_doc("doc_x", "eng", ["apple banana"])
+        self._create_doc("doc_y", "eng", ["apple cherry"])
+
+        self.assertEqual(
+            self.backend.search("apple banana", Page).count(), 1
+        )
+        self.assertEqual(
+            self.backend.search(
+                "banana cherry", Page, operator='or'
+            ).count(),
+            2
+        )
+
+    def test_pages_are_removed_from_index_with_document(self):
+        doc = self._create_doc("doc_x", "eng", ["apple"])
+        self.assertEqual(PageSearchVector.objects.count(), 1)
+
+        doc.delete()
+
+        self.assertEqual(PageSearchVector.objects.count(), 0)
+
+    def test_folders_are_searched_by_database_backend(self):
+        Folder.objects.create(title="Invoices", user=self.user)
+
+        self.assertEqual(
+            self.backend.search("voice", Folder).count(), 1
+        )
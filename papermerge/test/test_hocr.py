@@ -5,6 +5,7 @@ from pathlib import Path
 
 from django.test import TestCase
 from papermerge.core.lib.hocr import Hocr, OcrxWord, extract_size
+from papermerge.viewer.hocr import CompactHocr, OcrxWords
 
 BASE_DIR = Path(__file__).parent
 
@@ -113,3 +114,75 @@ class TestHocr(TestCase):
             }
         )
         file.close()
+
+
+class TestCompactHocr(TestCase):
+    def test_same_output_as_hocr(self):
+        hocr_file = os.path.join(
+            BASE_DIR,
+            "data",
+            "page-1.hocr"
+        )
+        hocr = Hocr(hocr_file_path=hocr_file)
+        compact_hocr = CompactHocr(hocr_file_path=hocr_file)
+
+        self.assertEqual(
+            compact_hocr.good_json_words(),
+            hocr.good_json_words()
+        )
+        self.assertEqual(
+            compact_hocr.get_meta(),
+            hocr.get_meta()
+        )
+        self.assertEqual(
+            (compact_hocr.width, compact_hocr.height),
+            (1240, 1754)
+        )
+
+    def test_ocrx_words(self):
+        words = OcrxWords()
+        words.append(
+            el_id="word_1_218",
+            title="bbox 102 448 120 457; x_wconf 38",
+            text="Dder"
+        )
+        words.append(
+            el_id="word_1_219",
+            title="bbox 1 2 3 4; x_wconf 90",
+            text="Dder"
+        )
+        words.append(
+            el_id="word_1_220",
+            title="invalid title",
+            text=None
+        )
+
+        self.assertEqual(len(words), 3)
+        # same text is stored only once
+        self.assertEqual(len(words.texts), 2)
+        self.assertEqual(
+            words.to_hash(0),
+            OcrxWord(
+                el_class="ocrx_word",
+                el_id="word_1_218",
+                title="bbox 102 448 120 457; x_wconf 38",
+                text="Dder"
+            ).to_hash()
+        )
+        self.assertEqual(words.to_hash(2)['wconf'], 0)
+        self.assertIsNone(words.to_hash(2)['text'])
+
+    def test_empty_file_hocr(self):
+        file = tempfile.NamedTemporaryFile(mode="r+t")
+        hocr = Hocr(hocr_file_path=file.name)
+        compact_hocr = CompactHocr(hocr_file_path=file.name)
+
+        self.assertEqual(
+            compact_hocr.good_json_words(),
+            []
+        )
+        self.assertEqual(
+            compact_hocr.get_meta(),
+            hocr.get_meta()
+        )
+        file.close()
@@ -0,0 +1,63 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase
+
+from papermerge.core.lib.hocr import Hocr
+from papermerge.viewer.sidecar import (
+    get_sidecar,
+    is_fresh,
+    sidecar_path
+)
+
+BASE_DIR = Path(__file__).parent
+
+
+class TestHocrSidecar(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.hocr_file = os.path.join(self.temp_dir, "page_1.hocr")
+        shutil.copy(
+            os.path.join(BASE_DIR, "data", "page-1.hocr"),
+            self.hocr_file
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_sidecar_content(self):
+        path = get_sidecar(self.hocr_file)
+
+        self.assertEqual(path, sidecar_path(self.hocr_file))
+        self.assertTrue(is_fresh(self.hocr_file))
+
+        hocr = Hocr(hocr_file_path=self.hocr_file)
+        with gzip.open(path, "rb") as f:
+            self.assertEqual(
+                json.loads(f.read()),
+                {
+                    'hocr': hocr.good_json_words(),
+                    'hocr_meta': hocr.get_meta()
+                }
+            )
+
+    def test_stale_sidecar_is_rebuilt(self):
+        self.assertFalse(is_fresh(self.hocr_file))
+
+        path = get_sidecar(self.hocr_file)
+        sidecar_mtime = os.stat(path).st_mtime_ns
+
+        # hocr file was updated (e.g. page was OCRed once again)
+        os.utime(
+            self.hocr_file,
+            ns=(sidecar_mtime + 10**9, sidecar_mtime + 10**9)
+        )
+        self.assertFalse(is_fresh(self.hocr_file))
+
+        get_sidecar(self.hocr_file)
+        self.assertTrue(is_fresh(self.hocr_file))
@@ -0,0 +1,201 @@
+import base64
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from imapclient.exceptions import IMAPClientError
+from imapclient.response_types import BodyData
+
+from papermerge.core.models import Document
+from papermerge.importers.imap import (
+    HEADER_FETCH,
+    HEADER_FIELDS,
+    Checkpoint,
+    MailboxConsumer,
+    UidTracker,
+    attachment_parts,
+    text_part
+)
+
+from .utils import create_root_user
+
+BASE_DIR = os.path.dirname(__file__)
+
+TEXT_PART = (
+    b'text', b'plain', (b'charset', b'utf-8'), None, None,
+    b'quoted-printable', 20, 1, None, None, None, None
+)
+PDF_PART = (
+    b'application', b'pdf', (b'name', b'berlin.pdf'), None, None,
+    b'base64', 100, None, (b'attachment', (b'filename', b'berlin.pdf')),
+    None, None
+)
+WITH_ATTACHMENT = BodyData.create(
+    (TEXT_PART, PDF_PART, b'mixed', (b'boundary', b'xyz'), None, None, None)
+)
+WITHOUT_ATTACHMENT = BodyData.create(TEXT_PART)
+
+
+class FakeIMAPClient:
+
+    def __init__(self, uids, pdf):
+        self.uids = uids
+        self.pdf = pdf
+        self.fetched = []
+        self.flagged = []
+
+    def search(self, criteria):
+        return self.uids
+
+    def fetch(self, uids, items):
+        self.fetched.append(items)
+        response = {}
+        for uid in uids:
+            data = {}
+            for item in items:
+                if item == 'BODYSTRUCTURE':
+                    data[b'BODYSTRUCTURE'] = (
+                        WITH_ATTACHMENT if uid % 2 else WITHOUT_ATTACHMENT
+                    )
+                elif item == HEADER_FETCH:
+                    data[HEADER_FIELDS] = b"From: bob@example.com\r\n\r\n"
+                elif item == b'BODY.PEEK[2]':
+                    data[b'BODY[2]'] = base64.encodebytes(self.pdf)
+            response[uid] = data
+
+        return response
+
+    def add_flags(self, uids, flags):
+        self.flagged.extend(uids)
+
+
+class FailingIMAPClient(FakeIMAPClient):
+    """
+    Connection fails while attachments are fetched.
+    """
+
+    def fetch(self, uids, items):
+        if b'BODY.PEEK[2]' in items:
+            raise IMAPClientError("connection reset")
+
+        return super().fetch(uids, items)
+
+
+class TestIMAPConsumer(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmp_dir, "checkpoint.json")
+        with open(os.path.join(BASE_DIR, "data", "berlin.pdf"), 'rb') as f:
+            self.pdf = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_attachment_parts(self):
+        self.assertEqual(
+            attachment_parts(WITH_ATTACHMENT),
+            [('2', 'berlin.pdf', b'base64')]
+        )
+        self.assertEqual(attachment_parts(WITHOUT_ATTACHMENT), [])
+        self.assertEqual(
+            text_part(WITH_ATTACHMENT),
+            ('1', b'quoted-printable')
+        )
+
+    def test_uid_tracker(self):
+        tracker = UidTracker(last_uid=10)
+        for uid in (11, 12, 13):
+            tracker.start(uid)
+
+        self.assertIsNone(tracker.finish(12))
+        self.assertEqual(tracker.finish(11), 12)
+        self.assertEqual(tracker.finish(13), 13)
+        self.assertEqual(tracker.fetched_uid, 13)
+
+    def test_uid_tracker_rewind(self):
+        tracker = UidTracker(last_uid=10)
+        tracker.start(11)
+        tracker.start(13)
+        tracker.finish(13)
+        # e.g. UID 14 was fetched, but not handed over
+        tracker.fetched_uid = 14
+
+        tracker.rewind()
+
+        self.assertEqual(tracker.fetched_uid, 13)
+
+    def test_checkpoint(self):
+        Checkpoint(self.checkpoint_path).set("INBOX", 1, 42)
+
+        checkpoint = Checkpoint(self.checkpoint_path)
+        self.assertEqual(checkpoint.get("INBOX", 1), 42)
+        # UIDVALIDITY changed, UIDs are not valid anymore
+        self.assertEqual(checkpoint.get("INBOX", 2), 0)
+
+    def test_import_attachments(self):
+        consumer = MailboxConsumer(
+            "imap.example.com",
+            "scanner",
+            "secret",
+            self.checkpoint_path,
+            workers=1,
+            skip_ocr=True
+        )
+        consumer.client = FakeIMAPClient([3, 4, 5], self.pdf)
+        consumer.uidvalidity = 1
+        consumer.tracker = UidTracker()
+        # pipelines run in the test's database connection
+        consumer.executor = mock.Mock()
+        consumer.executor.submit.side_effect = lambda f, *args: f(*args)
+
+        with mock.patch('papermerge.importers.imap.connection'):
+            self.assertEqual(consumer.process_new(), 3)
+        consumer.flag_processed()
+
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(consumer.client.flagged, [3, 5])
+        # whole messages are never fetched
+        for items in consumer.client.fetched:
+            self.assertNotIn('RFC822', items)
+        self.assertEqual(
+            Checkpoint(self.checkpoint_path).get(consumer.mailbox, 1),
+            5
+        )
+
+    def test_message_is_fetched_again_after_failure(self):
+        consumer = MailboxConsumer(
+            "imap.example.com",
+            "scanner",
+            "secret",
+            self.checkpoint_path,
+            workers=1,
+            skip_ocr=True
+        )
+        consumer.client = FailingIMAPClient([3, 4, 5], self.pdf)
+        consumer.uidvalidity = 1
+        consumer.tracker = UidTracker()
+        consumer.executor = mock.Mock()
+        consumer.executor.submit.side_effect = lambda f, *args: f(*args)
+
+        with self.assertRaises(IMAPClientError):
+            consumer.process_new()
+
+        # message 3 was not handed over: it is neither in flight
+        # nor skipped by next search
+        self.assertEqual(consumer.tracker.fetched_uid, 0)
+        consumer.client = FakeIMAPClient([3, 4, 5], self.pdf)
+        consumer.tracker.rewind()
+
+        self.assertEqual(consumer.new_uids(), [3, 4, 5])
+        with mock.patch('papermerge.importers.imap.connection'):
+            consumer.process_new()
+
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(
+            Checkpoint(self.checkpoint_path).get(consumer.mailbox, 1),
+            5
+        )
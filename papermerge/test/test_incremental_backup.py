@@ -0,0 +1,134 @@
+import os
+import shutil
+import tarfile
+import tempfile
+
+from django.test import TestCase
+
+from papermerge.core.models import Document, Folder
+from papermerge.backups.models import DeletedNode
+from papermerge.backups.restore import (
+    BackupChain,
+    BackupChainError,
+    restore_chain
+)
+from papermerge.backups.stream import StreamingBackup, read_header
+from papermerge.test.utils import (
+    create_berlin_doc,
+    create_margaret_user,
+    create_root_user
+)
+
+
+class TestIncrementalBackup(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _backup(self, name, since=None):
+        path = os.path.join(self.tmp_dir, name)
+        backup = StreamingBackup(user=self.user, since=since)
+        with open(path, 'wb') as f:
+            stats = backup.write(f)
+
+        with tarfile.open(path) as archive:
+            watermark = read_header(archive)['watermark']
+
+        return path, watermark, stats
+
+    def test_delta_contains_only_changes(self):
+        folder = Folder.objects.create(title="Invoices", user=self.user)
+        doc_1 = create_berlin_doc(self.user, "doc_1.pdf", parent_id=folder.id)
+        doc_2 = create_berlin_doc(self.user, "doc_2.pdf", parent_id=folder.id)
+        doc_3 = create_berlin_doc(self.user, "doc_3.pdf")
+
+        full, watermark, stats = self._backup("full.tar")
+        self.assertEqual(stats['documents'], 3)
+
+        doc_1.delete()
+        self.assertTrue(
+            DeletedNode.objects.filter(node_id=doc_1.id).exists()
+        )
+        doc_2.title = "renamed.pdf"
+        doc_2.save()
+        folder.title = "Bills"
+        folder.save()
+        doc_4 = create_berlin_doc(self.user, "doc_4.pdf", parent_id=folder.id)
+
+        delta, _, stats = self._backup("delta.tar", since=watermark)
+        self.assertEqual(stats['documents'], 2)
+
+        chain = BackupChain()
+        chain.add(full)
+        chain.add(delta)
+
+        self.assertEqual(
+            sorted(chain.documents),
+            [doc_2.id, doc_3.id, doc_4.id]
+        )
+        self.assertEqual(chain.folders[folder.id]['title'], "Bills")
+        path, entry = chain.documents[doc_2.id]
+        self.assertEqual(path, delta)
+        self.assertEqual(entry['title'], "renamed.pdf")
+
+    def test_restore_chain(self):
+        folder = Folder.objects.create(title="Invoices", user=self.user)
+        doc_1 = create_berlin_doc(self.user, "doc_1.pdf", parent_id=folder.id)
+        create_berlin_doc(self.user, "doc_2.pdf", parent_id=folder.id)
+
+        full, watermark, _ = self._backup("full.tar")
+        doc_1.delete()
+        create_berlin_doc(self.user, "doc_3.pdf")
+        delta, _, _ = self._backup("delta.tar", since=watermark)
+
+        margaret = create_margaret_user()
+        count = restore_chain([full, delta], user=margaret, skip_ocr=True)
+
+        self.assertEqual(count, 2)
+        restored = Document.objects.filter(user=margaret)
+        self.assertEqual(
+            sorted(doc.title for doc in restored),
+            ["doc_2.pdf", "doc_3.pdf"]
+        )
+        self.assertEqual(
+            restored.get(title="doc_2.pdf").parent.title,
+            "Invoices"
+        )
+
+    def test_tag_changes_are_in_delta(self):
+        doc_1 = create_berlin_doc(self.user, "doc_1.pdf")
+        doc_2 = create_berlin_doc(self.user, "doc_2.pdf")
+        doc_2.tags.add("paid", tag_kwargs={'user': self.user})
+
+        full, watermark, _ = self._backup("full.tar")
+        doc_1.tags.set("important", "paid", tag_kwargs={'user': self.user})
+        doc_2.tags.clear()
+        delta, _, stats = self._backup("delta.tar", since=watermark)
+
+        self.assertEqual(stats['documents'], 2)
+        margaret = create_margaret_user()
+        restore_chain([full, delta], user=margaret, skip_ocr=True)
+        restored = Document.objects.filter(user=margaret)
+        self.assertEqual(
+            sorted(
+                tag.name for tag in restored.get(title="doc_1.pdf").tags.all()
+            ),
+            ["important", "paid"]
+        )
+        self.assertFalse(restored.get(title="doc_2.pdf").tags.exists())
+
+    def test_broken_chain(self):
+        create_berlin_doc(self.user, "doc_1.pdf")
+        full, watermark, _ = self._backup("full.tar")
+        delta_1, watermark_1, _ = self._backup("delta_1.tar", since=watermark)
+        delta_2, _, _ = self._backup("delta_2.tar", since=watermark_1)
+
+        with self.assertRaises(BackupChainError):
+            restore_chain([full, delta_2])
+
+        with self.assertRaises(BackupChainError):
+            restore_chain([delta_1, delta_2])
@@ -0,0 +1,210 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from papermerge.core.models import (
+    KV,
+    Document,
+    Folder,
+    KVStoreNode,
+    KVStorePage,
+    Page
+)
+from papermerge.core.models.kvstore import MONEY, TEXT
+from papermerge.metadata.propagation import (
+    apply_to_node,
+    propagate_kv,
+    update_kv
+)
+from papermerge.metadata.tasks import propagate_kv_task
+from papermerge.test.utils import create_root_user
+
+
+class TestKVPropagation(TestCase):
+
+    def setUp(self):
+        """
+        F1 -> doc_a (2 pages)
+        F1 -> L1 -> doc_b (3 pages)
+        F1 -> L1 -> L2
+        """
+        self.user = create_root_user()
+        self.F1 = Folder.objects.create(title="F1", user=self.user)
+        L1 = Folder.objects.create(title="L1", user=self.user, parent=self.F1)
+        Folder.objects.create(title="L2", user=self.user, parent=L1)
+        self.doc_a = self._doc("doc_a", self.F1, page_count=2)
+        self.doc_b = self._doc("doc_b", L1, page_count=3)
+        self.F1.refresh_from_db()
+
+    def _doc(self, title, parent, page_count):
+        return Document.objects.create_document(
+            title=title,
+            file_name=f"{title}.pdf",
+            size='1989',
+            lang='DEU',
+            user=self.user,
+            parent_id=parent.id,
+            page_count=page_count,
+        )
+
+    def node_keys(self, key):
+        return KVStoreNode.objects.filter(key=key)
+
+    def page_keys(self, key):
+        return KVStorePage.objects.filter(key=key)
+
+    def test_add(self):
+        progress = []
+
+        changes = apply_to_node(
+            self.F1,
+            [{'key': 'price', 'kv_type': MONEY, 'kv_format': 'dd,cc'}]
+        )
+        done = propagate_kv(
+            self.F1,
+            changes,
+            chunk_size=2,
+            progress=lambda done, total: progress.append((done, total))
+        )
+
+        self.assertEqual(done, 4)
+        self.assertEqual(progress, [(2, 4), (4, 4)])
+        # F1, L1, L2, doc_a, doc_b
+        self.assertEqual(self.node_keys('price').count(), 5)
+        self.assertEqual(
+            self.node_keys('price').filter(kv_inherited=True).count(),
+            4
+        )
+        # 2 pages of doc_a and 3 pages of doc_b
+        self.assertEqual(self.page_keys('price').count(), 5)
+        for kvstore in self.page_keys('price'):
+            self.assertEqual(kvstore.kv_type, MONEY)
+            self.assertEqual(kvstore.kv_format, 'dd,cc')
+
+    def test_add_preserves_existing_values(self):
+        update_kv(self.F1, [{'key': 'x', 'kv_type': TEXT}])
+        self.doc_b.assign_kv_values({'x': '10'})
+
+        update_kv(
+            self.F1,
+            [{'key': 'y', 'kv_type': TEXT}, {'key': 'x', 'kv_type': TEXT}]
+        )
+
+        self.assertEqual(self.node_keys('x').count(), 5)
+        self.assertEqual(self.node_keys('y').count(), 5)
+        self.assertEqual(self.doc_b.kv['x'], '10')
+        self.assertIsNone(self.doc_b.kv['y'])
+        page = Page.objects.get(document=self.doc_b, number=1)
+        self.assertEqual(page.kv['x'], '10')
+
+    def test_update_and_remove(self):
+        update_kv(self.F1, [{'key': 'price', 'kv_type': TEXT}])
+        kvstore = self.F1.kvstore.get(key='price')
+
+        update_kv(
+            self.F1,
+            [{
+                'id': kvstore.id,
+                'key': 'amount',
+                'kv_type': MONEY,
+                'kv_format': 'dd.cc'
+            }]
+        )
+
+        self.assertFalse(self.node_keys('price'))
+        self.assertFalse(self.page_keys('price'))
+        self.assertEqual(
+            self.node_keys('amount').filter(kv_type=MONEY).count(),
+            5
+        )
+        self.assertEqual(
+            self.page_keys('amount').filter(kv_format='dd.cc').count(),
+            5
+        )
+
+        update_kv(self.F1, [{'key': 'shop', 'kv_type': TEXT}])
+
+        # 'amount' is not in data anymore => it is removed
+        self.assertFalse(self.node_keys('amount'))
+        self.assertEqual(self.node_keys('shop').count(), 5)
+
+    def test_pages_of_document_itself(self):
+        update_kv(self.doc_a, [{'key': 'shop', 'kv_type': TEXT}])
+
+        self.assertEqual(self.node_keys('shop').count(), 1)
+        self.assertEqual(
+            self.page_keys('shop').filter(
+                page__document=self.doc_a
+            ).count(),
+            2
+        )
+
+    @override_settings(PAPERMERGE_METADATA_PROPAGATION_ASYNC_MIN_NODES=2)
+    @mock.patch('papermerge.metadata.tasks.propagate_kv_task.apply_async')
+    def test_large_subtree_is_propagated_in_background(self, apply_async):
+        done = update_kv(
+            self.F1,
+            [{'key': 'shop', 'kv_type': TEXT}],
+            user=self.user
+        )
+
+        self.assertFalse(done)
+        apply_async.assert_called_once_with(
+            kwargs={
+                'node_id': self.F1.id,
+                'changes': {
+                    KV.UPDATE: [],
+                    KV.ADD: [
+                        {'key': 'shop', 'kv_type': TEXT, 'kv_format': None}
+                    ],
+                    KV.REMOVE: [],
+                },
+                'user_id': self.user.id,
+            }
+        )
+        # node itself is changed right away
+        self.assertEqual(self.F1.kv.keys(), ['shop'])
+        self.assertEqual(self.node_keys('shop').count(), 1)
+
+    @mock.patch('papermerge.metadata.tasks.notify_progress')
+    def test_task_reports_progress(self, notify_progress):
+        changes = apply_to_node(self.F1, [{'key': 'shop', 'kv_type': TEXT}])
+
+        propagate_kv_task(self.F1.id, changes, user_id=self.user.id)
+
+        notify_progress.assert_called_with(
+            'metadata.propagation',
+            self.user.id,
+            self.F1.id,
+            4,
+            4
+        )
+        self.assertEqual(self.node_keys('shop').count(), 5)
+
+    @override_settings(PAPERMERGE_METADATA_PROPAGATION_ASYNC_MIN_NODES=2)
+    @mock.patch('papermerge.metadata.tasks.propagate_kv_task.apply_async')
+    def test_views_propagate_in_background(self, apply_async):
+        self.client.login(testcase_user=self.user)
+        data = json.dumps({'kvstore': [{'key': 'shop', 'kv_type': TEXT}]})
+
+        for url in (
+            reverse('core:metadata', args=('node', self.F1.id)),
+            reverse('core:node', args=(self.F1.id,)),
+        ):
+            resp = self.client.post(
+                url,
+                data,
+                content_type="application/json",
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+            self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(
+            apply_async.call_args.kwargs['kwargs']['user_id'],
+            self.user.id
+        )
+        self.assertEqual(self.node_keys('shop').count(), 1)
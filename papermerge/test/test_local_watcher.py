@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from papermerge.core.models import Document
+from papermerge.importers import inotify
+from papermerge.importers.journal import IMPORTED, IMPORTING, Journal
+from papermerge.importers.local import LocalWatcher, file_digest
+
+from .utils import create_root_user
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+class TestLocalWatcher(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.import_dir = tempfile.mkdtemp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.journal_dir, "journal.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.import_dir)
+        shutil.rmtree(self.journal_dir)
+
+    def _watcher(self):
+        return LocalWatcher(
+            self.import_dir,
+            self.journal_path,
+            workers=1,
+            min_unmodified=0,
+            skip_ocr=True
+        )
+
+    def _copy(self, name):
+        return shutil.copy(
+            os.path.join(BASE_DIR, "data", name),
+            self.import_dir
+        )
+
+    def test_import_file(self):
+        path = self._copy("berlin.pdf")
+        watcher = self._watcher()
+
+        watcher._import_file(path)
+
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(watcher.journal.in_flight(), [])
+
+    def test_unsupported_file_is_kept(self):
+        path = self._copy("testdata.tar")
+        watcher = self._watcher()
+
+        watcher._import_file(path)
+
+        self.assertEqual(Document.objects.count(), 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(watcher.journal.in_flight(), [])
+
+    def test_file_is_ready_once_closed(self):
+        path = os.path.join(self.import_dir, "berlin.pdf")
+        watcher = self._watcher()
+        watcher.executor = mock.Mock()
+
+        watcher.handle_event(inotify.IN_MODIFY, path)
+        watcher.submit_ready()
+        watcher.executor.submit.assert_not_called()
+
+        watcher.handle_event(inotify.IN_CLOSE_WRITE, path)
+        watcher.submit_ready()
+        watcher.executor.submit.assert_called_once_with(
+            watcher.import_file, path
+        )
+
+    def test_recover_removes_imported_file(self):
+        path = self._copy("berlin.pdf")
+        journal = Journal(self.journal_path)
+        journal.write(path, IMPORTED, digest=file_digest(path))
+        journal.close()
+
+        watcher = self._watcher()
+        watcher.recover()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(watcher.journal.in_flight(), [])
+
+    def test_recover_keeps_interrupted_file(self):
+        path = self._copy("berlin.pdf")
+        journal = Journal(self.journal_path)
+        journal.write(path, IMPORTING, digest=file_digest(path))
+        journal.close()
+
+        watcher = self._watcher()
+        watcher.recover()
+        watcher.scan()
+
+        # no document was created, file is imported again
+        self.assertTrue(os.path.exists(path))
+        self.assertIn(path, watcher.pending)
@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from papermerge.test.utils import create_root_user, create_some_doc
+from papermerge.wsignals.pipelines import OcrChordPipeline
+from papermerge.wsignals.tasks import (
+    check_chords,
+    page_chunks,
+    ocr_document,
+    ocr_pages,
+    ocr_document_complete
+)
+
+
+class TestOcrChord(TestCase):
+
+    def test_page_chunks(self):
+        self.assertEqual(
+            page_chunks(5, 2),
+            [[1, 2], [3, 4], [5]]
+        )
+        self.assertEqual(
+            page_chunks(3, 10),
+            [[1, 2, 3]]
+        )
+        self.assertEqual(
+            page_chunks(2, 0),
+            [[1], [2]]
+        )
+        self.assertEqual(
+            page_chunks(0, 4),
+            []
+        )
+
+    @mock.patch('papermerge.wsignals.tasks.ocr_page')
+    def test_ocr_pages_ocrs_every_page_of_the_chunk(self, ocr_page):
+        result = ocr_pages(
+            user_id=1,
+            document_id=2,
+            file_name="berlin.pdf",
+            page_nums=[3, 4],
+            lang="deu"
+        )
+
+        self.assertEqual(result, [3, 4])
+        self.assertEqual(
+            [call.kwargs['page_num'] for call in ocr_page.call_args_list],
+            [3, 4]
+        )
+
+    def test_ocr_document_complete_for_deleted_document(self):
+        self.assertIsNone(
+            ocr_document_complete([[1, 2]], document_id=-1)
+        )
+
+    @mock.patch('papermerge.wsignals.tasks.chord')
+    def test_ocr_document_schedules_chord(self, chord):
+        doc = create_some_doc(create_root_user(), page_count=5)
+
+        ocr_document(
+            document=doc,
+            lang="deu",
+            pages_per_task=2,
+            processor="LOCAL",
+            queue="bulk"
+        )
+
+        header = chord.call_args.args[0]
+        self.assertEqual(
+            [task.task for task in header],
+            [ocr_pages.name] * 3
+        )
+        self.assertEqual(
+            [task.kwargs['page_nums'] for task in header],
+            [[1, 2], [3, 4], [5]]
+        )
+        self.assertTrue(all(task.immutable for task in header))
+        self.assertEqual(header[0].options['queue'], "bulk")
+        self.assertEqual(header[0].kwargs['document_id'], doc.id)
+        self.assertEqual(header[0].kwargs['processor'], "LOCAL")
+
+        callback = chord.return_value.call_args.args[0]
+        self.assertEqual(callback.task, ocr_document_complete.name)
+        self.assertEqual(
+            callback.kwargs,
+            {'document_id': doc.id, 'processor': "LOCAL"}
+        )
+        self.assertEqual(callback.options['queue'], "bulk")
+
+    @override_settings(PAPERMERGE_OCR_PAGES_PER_TASK=2)
+    @mock.patch('papermerge.wsignals.pipelines.ocr_document')
+    def test_pipeline_schedules_ocr_of_document(self, ocr_document):
+        doc = create_some_doc(create_root_user(), page_count=3)
+        pipeline = mock.Mock(processor="LOCAL")
+
+        OcrChordPipeline.ocr_document(pipeline, doc, 3, "deu")
+
+        ocr_document.assert_called_once_with(
+            document=doc,
+            lang="deu",
+            processor="LOCAL"
+        )
+
+    def test_check_chords(self):
+        with override_settings(
+            PAPERMERGE_OCR_PAGES_PER_TASK=2,
+            CELERY_RESULT_BACKEND='rpc://'
+        ):
+            errors = check_chords(None)
+        self.assertEqual([error.id for error in errors], ['wsignals.E001'])
+
+        with override_settings(
+            PAPERMERGE_OCR_PAGES_PER_TASK=2,
+            CELERY_RESULT_BACKEND='redis://localhost:6379/1'
+        ):
+            self.assertEqual(check_chords(None), [])
+
+        with override_settings(
+            PAPERMERGE_OCR_PAGES_PER_TASK=0,
+            CELERY_RESULT_BACKEND='rpc://'
+        ):
+            self.assertEqual(check_chords(None), [])
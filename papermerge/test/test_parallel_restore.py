@@ -0,0 +1,196 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from papermerge.core.models import Access, Document, Folder
+from papermerge.core.storage import default_storage
+from papermerge.backups.restore import (
+    BackupChain,
+    BackupChainError,
+    RestoreEngine,
+    tree_layout
+)
+from papermerge.backups.stream import StreamingBackup, results_dirname
+from papermerge.test.utils import (
+    create_berlin_doc,
+    create_margaret_user,
+    create_root_user,
+    create_user
+)
+
+
+class TestParallelRestore(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.margaret = create_margaret_user()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _chain(self, user=None):
+        path = os.path.join(self.tmp_dir, "backup.tar")
+        with open(path, 'wb') as f:
+            StreamingBackup(user=user or self.user).write(f)
+
+        chain = BackupChain()
+        chain.add(path)
+
+        return chain
+
+    def test_tree_layout(self):
+        layout = tree_layout({1: None, 2: 1, 3: 2, 4: 1, 5: 99}, 7)
+
+        self.assertEqual(layout[1], (7, 1, 8, 0))
+        self.assertEqual(layout[2], (7, 2, 5, 1))
+        self.assertEqual(layout[3], (7, 3, 4, 2))
+        self.assertEqual(layout[4], (7, 6, 7, 1))
+        # parent is not restored
+        self.assertEqual(layout[5], (8, 1, 2, 0))
+
+    def test_restore_builds_tree(self):
+        folder_a = Folder.objects.create(title="A", user=self.user)
+        folder_b = Folder.objects.create(
+            title="B",
+            parent=folder_a,
+            user=self.user
+        )
+        create_berlin_doc(self.user, "doc_1.pdf", parent_id=folder_b.id)
+        create_berlin_doc(self.user, "doc_2.pdf", parent_id=folder_a.id)
+        create_berlin_doc(self.user, "doc_3.pdf")
+
+        engine = RestoreEngine(
+            self._chain(),
+            user=self.margaret,
+            skip_ocr=True,
+            workers=2,
+            batch_size=2
+        )
+        stats = engine.run()
+
+        self.assertEqual(stats['folders'], 2)
+        self.assertEqual(stats['documents'], 3)
+        restored_a = Folder.objects.get(title="A", user=self.margaret)
+        self.assertEqual(
+            sorted(node.title for node in restored_a.get_descendants()),
+            ["B", "doc_1.pdf", "doc_2.pdf"]
+        )
+        restored_1 = Document.objects.get(
+            title="doc_1.pdf",
+            user=self.margaret
+        )
+        self.assertEqual(
+            [node.title for node in restored_1.get_ancestors()],
+            ["A", "B"]
+        )
+        self.assertTrue(os.path.exists(restored_1.absfilepath))
+        self.assertEqual(
+            restored_a.get_descendant_count(),
+            restored_a.get_descendants().count()
+        )
+        self.assertTrue(
+            Access.objects.filter(
+                node=restored_a,
+                user=self.margaret
+            ).exists()
+        )
+
+    @override_settings(PAPERMERGE_CREATE_SPECIAL_FOLDERS=True)
+    def test_existing_folders_are_reused(self):
+        john = create_user("john", [])
+        jane = create_user("jane", [])
+        inbox = Folder.objects.get(title=Folder.INBOX_NAME, user=john)
+        invoices = Folder.objects.create(
+            title="Invoices",
+            parent=inbox,
+            user=john
+        )
+        create_berlin_doc(john, "doc_1.pdf", parent_id=inbox.id)
+        create_berlin_doc(john, "doc_2.pdf", parent_id=invoices.id)
+        jane_inbox = Folder.objects.get(title=Folder.INBOX_NAME, user=jane)
+        other = Folder.objects.create(
+            title="Other",
+            parent=jane_inbox,
+            user=jane
+        )
+        create_berlin_doc(jane, "doc_0.pdf", parent_id=other.id)
+
+        stats = RestoreEngine(
+            self._chain(john),
+            user=jane,
+            skip_ocr=True,
+            batch_size=1
+        ).run()
+
+        self.assertEqual(stats['folders'], 1)
+        self.assertEqual(stats['documents'], 2)
+        # core looks up inbox of the user on login and on each upload
+        jane_inbox, created = Folder.objects.get_or_create(
+            title=Folder.INBOX_NAME,
+            parent=None,
+            user=jane
+        )
+        self.assertFalse(created)
+        self.assertEqual(
+            sorted(node.title for node in jane_inbox.get_descendants()),
+            ["Invoices", "Other", "doc_0.pdf", "doc_1.pdf", "doc_2.pdf"]
+        )
+        self.assertEqual(
+            jane_inbox.get_descendant_count(),
+            jane_inbox.get_descendants().count()
+        )
+        for node in jane_inbox.get_descendants():
+            self.assertEqual(
+                [ancestor.id for ancestor in node.get_ancestors()][-1],
+                node.parent_id
+            )
+        restored_2 = Document.objects.get(title="doc_2.pdf", user=jane)
+        self.assertEqual(
+            [node.title for node in restored_2.get_ancestors()],
+            [Folder.INBOX_NAME, "Invoices"]
+        )
+
+    def test_archived_text_is_not_ocred(self):
+        doc = create_berlin_doc(self.user, "doc_1.pdf")
+        dirname = default_storage.abspath(results_dirname(doc))
+        os.makedirs(dirname, exist_ok=True)
+        for page_num in (1, 2):
+            with open(os.path.join(dirname, f"page_{page_num}.txt"), 'w') as f:
+                f.write(f"text of page {page_num}")
+
+        engine = RestoreEngine(self._chain(), user=self.margaret)
+        with mock.patch('papermerge.backups.restore.ocr_page') as ocr_page:
+            stats = engine.run()
+
+        ocr_page.apply_async.assert_not_called()
+        self.assertEqual(stats['ocr_pages'], 0)
+        restored = Document.objects.get(user=self.margaret)
+        self.assertEqual(
+            restored.pages.get(number=1).text,
+            "text of page 1"
+        )
+
+    def test_compressed_archive_is_rejected(self):
+        create_berlin_doc(self.user, "doc_1.pdf")
+        path = os.path.join(self.tmp_dir, "backup.tar.gz")
+        with gzip.open(path, 'wb') as f:
+            StreamingBackup(user=self.user).write(f)
+
+        with self.assertRaisesRegex(BackupChainError, "compressed"):
+            BackupChain().add(path)
+
+    def test_dry_run(self):
+        create_berlin_doc(self.user, "doc_1.pdf")
+        create_berlin_doc(self.user, "doc_2.pdf")
+
+        stats = RestoreEngine(self._chain(), user=self.margaret).estimate()
+
+        self.assertEqual(stats['documents'], 2)
+        self.assertEqual(stats['ocr_pages'], 4)
+        self.assertGreater(stats['estimated_seconds'], 0)
+        self.assertFalse(Document.objects.filter(user=self.margaret).exists())
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.wsignals.progress import (
+    ProgressNotifier,
+    check_cache,
+    snapshot,
+    update_progress
+)
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TestProgress(TestCase):
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_progress_snapshot(self):
+        update_progress(1, 10, "invoice.pdf", total=4)
+        update_progress(1, 11, "receipt.pdf", total=2, pages={1})
+        update_progress(1, 10, "invoice.pdf", total=4, pages={1, 2, 4})
+        update_progress(2, 12, "contract.pdf", total=1)
+
+        documents = snapshot(1)
+
+        self.assertEqual(
+            [
+                (doc['document_id'], doc['done'], doc['total'])
+                for doc in documents
+            ],
+            [(10, 3, 4), (11, 1, 2)]
+        )
+        self.assertIsNotNone(documents[0]['eta'])
+        self.assertEqual(len(snapshot(2)), 1)
+        self.assertEqual(snapshot(3), [])
+
+    @mock.patch('papermerge.wsignals.progress.cache.touch')
+    def test_completed_document_expires(self, touch):
+        update_progress(1, 10, "invoice.pdf", total=2, pages={1})
+        touch.assert_not_called()
+
+        update_progress(1, 10, "invoice.pdf", total=2, pages={2})
+
+        touch.assert_called_once_with('progress_10', 60)
+        self.assertEqual(snapshot(1)[0]['done'], 2)
+
+    def test_pages_are_counted_once(self):
+        # e.g. event sinks of two workers reporting the same pages
+        update_progress(1, 10, "invoice.pdf", total=3, pages={1, 2})
+        update_progress(1, 10, "invoice.pdf", total=3, pages={2})
+        self.assertEqual(snapshot(1)[0]['done'], 2)
+
+        update_progress(1, 10, "invoice.pdf", total=3, pages={1, 3})
+        self.assertEqual(snapshot(1)[0]['done'], 3)
+
+    @mock.patch('papermerge.wsignals.progress.time.monotonic')
+    @mock.patch.object(ProgressNotifier, 'send')
+    def test_notifications_are_rate_limited(self, send, monotonic):
+        notifier = ProgressNotifier(interval=60)
+        monotonic.return_value = 1000
+
+        for _ in range(100):
+            notifier.notify({1, 2})
+
+        self.assertEqual(send.call_count, 2)
+
+        notifier.send_pending()
+        self.assertEqual(send.call_count, 2)
+
+        monotonic.return_value = 1060
+        notifier.send_pending()
+        self.assertEqual(send.call_count, 4)
+
+        notifier.send_pending()
+        self.assertEqual(send.call_count, 4)
+
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual(
+            [warning.id for warning in check_cache(None)],
+            ['wsignals.W001']
+        )
+
+        file_cache = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                'FileBasedCache',
+                'LOCATION': '/tmp/papermerge_cache',
+            }
+        }
+        with override_settings(CACHES=file_cache):
+            self.assertEqual(check_cache(None), [])
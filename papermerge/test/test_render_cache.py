@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase
+
+from papermerge.viewer.cache import RenderCache, RenderError
+
+
+def render_bytes(size, delay=0, calls=None):
+    def render(output_path):
+        if calls is not None:
+            calls.append(output_path)
+        time.sleep(delay)
+        with open(output_path, "wb") as f:
+            f.write(b"x" * size)
+
+    return render
+
+
+class TestRenderCache(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_hit_and_miss(self):
+        cache = RenderCache(root=self.root, max_size=1000)
+        calls = []
+
+        path, hit = cache.get_or_render(
+            (1, 0, 1, 1),
+            render_bytes(10, calls=calls)
+        )
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(hit)
+        _, hit = cache.get_or_render(
+            (1, 0, 1, 1),
+            render_bytes(10, calls=calls)
+        )
+
+        self.assertTrue(hit)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        cache = RenderCache(root=self.root, max_size=1000)
+        calls = []
+
+        threads = [
+            threading.Thread(
+                target=cache.get_or_render,
+                args=((1, 0, 2, 1), render_bytes(10, 0.1, calls))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 4)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = RenderCache(root=self.root, max_size=250)
+
+        first, _ = cache.get_or_render((1, 0, 1, 1), render_bytes(100))
+        second, _ = cache.get_or_render((1, 0, 2, 1), render_bytes(100))
+        # second becomes least recently used (mtimes may not differ
+        # between two quick writes)
+        os.utime(second, ns=(1, 1))
+        cache.get_or_render((1, 0, 1, 1), render_bytes(100))
+
+        third, _ = cache.get_or_render((1, 0, 3, 1), render_bytes(100))
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 200)
+
+    def test_failed_render(self):
+        cache = RenderCache(root=self.root, max_size=1000)
+
+        with self.assertRaises(RenderError):
+            cache.get_or_render((1, 0, 1, 1), render_bytes(0))
+
+        self.assertFalse(
+            os.path.exists(cache.path((1, 0, 1, 1)))
+        )
+
+    def test_open_renders_evicted_image_again(self):
+        cache = RenderCache(root=self.root, max_size=1000)
+        calls = []
+        get_or_render = cache.get_or_render
+
+        def evicting_get_or_render(key, render):
+            path, hit = get_or_render(key, render)
+            if len(calls) == 1:
+                # evicted by concurrent request right after lookup
+                os.remove(path)
+            return path, hit
+
+        with mock.patch.object(
+            cache,
+            'get_or_render',
+            side_effect=evicting_get_or_render
+        ):
+            img_file, hit = cache.open(
+                (1, 0, 1, 1),
+                render_bytes(10, calls=calls)
+            )
+
+        with img_file:
+            self.assertEqual(img_file.read(), b"x" * 10)
+        self.assertFalse(hit)
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+
+from config.routing import (
+    route_task,
+    weighted_schedule,
+    WeightedCycle
+)
+
+QUEUE_WEIGHTS = {
+    'papermerge': 3,
+    'papermerge_bulk': 1
+}
+
+
+class TestRouting(TestCase):
+
+    def test_bulk_processors_are_routed_to_bulk_queue(self):
+        for processor in ['LOCAL', 'IMAP']:
+            route = route_task(
+                'papermerge.wsignals.tasks.ocr_pages',
+                args=(),
+                kwargs={'processor': processor},
+                options={}
+            )
+            self.assertEqual(route['queue'], 'papermerge_bulk')
+
+    def test_interactive_work_is_routed_to_interactive_queue(self):
+        route = route_task(
+            'papermerge.wsignals.tasks.ocr_pages',
+            args=(),
+            kwargs={'processor': 'WEB'},
+            options={}
+        )
+        self.assertEqual(route['queue'], 'papermerge')
+
+        # e.g. core.tasks.ocr_page sent by upload/run OCR views
+        route = route_task(
+            'papermerge.core.tasks.ocr_page',
+            args=(),
+            kwargs={'page_num': 1},
+            options={}
+        )
+        self.assertEqual(route['queue'], 'papermerge')
+
+    def test_weighted_schedule(self):
+        self.assertEqual(
+            weighted_schedule({'a': 3, 'b': 1}),
+            ['a', 'a', 'b', 'a']
+        )
+        self.assertEqual(
+            weighted_schedule({'a': 1, 'b': 0}),
+            ['a']
+        )
+
+    @override_settings(PAPERMERGE_QUEUE_WEIGHTS=QUEUE_WEIGHTS)
+    def test_weighted_cycle(self):
+        cycle = WeightedCycle()
+        cycle.update(['papermerge_bulk', 'papermerge'])
+
+        first_queues = []
+        for _ in range(8):
+            queues = cycle.consume(2)
+            # all consumed queues are always present
+            self.assertEqual(
+                set(queues),
+                {'papermerge', 'papermerge_bulk'}
+            )
+            first_queues.append(queues[0])
+            cycle.rotate(queues[0])
+
+        self.assertEqual(first_queues.count('papermerge'), 6)
+        self.assertEqual(first_queues.count('papermerge_bulk'), 2)
@@ -0,0 +1,210 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.core.auth import create_access
+from papermerge.core.models import Access, Document, Folder, Page
+from papermerge.fulltext.search import (
+    decode_cursor,
+    encode_cursor,
+    filter_readable,
+    search
+)
+from papermerge.test.utils import (
+    create_margaret_user,
+    create_uploader_user
+)
+
+INDEX_BACKEND = "papermerge.fulltext.index_backend.SearchBackend"
+
+
+class TestSearchAccess(TestCase):
+
+    def setUp(self):
+        self.uploader_user = create_uploader_user()
+        self.margaret_user = create_margaret_user()
+
+    def _create_doc(self, title, text, parent=None):
+        doc = Document.objects.create_document(
+            title=title,
+            file_name=f"{title}.pdf",
+            size='1212',
+            lang='deu',
+            user=self.uploader_user,
+            parent_id=parent.id if parent else None,
+            page_count=1,
+        )
+        page = doc.pages.first()
+        page.text = text
+        page.save()
+
+        return doc
+
+    def test_cursor(self):
+        self.assertEqual(decode_cursor(encode_cursor(0.25, 7)), (0.25, 7))
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+
+    def test_only_readable_pages_are_found(self):
+        self._create_doc("doc_a", "invoice")
+        folder = Folder.objects.create(
+            title="for margaret",
+            user=self.uploader_user
+        )
+        create_access(
+            node=folder,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={Access.PERM_READ: True}
+        )
+        self._create_doc("doc_b", "invoice", parent=folder)
+
+        found = search(self.margaret_user, "invoice", Page)
+
+        self.assertEqual(
+            [page.document.title for page in found.results],
+            ["doc_b"]
+        )
+
+        found = search(self.uploader_user, "invoice", Page)
+
+        self.assertEqual(len(found.results), 2)
+
+    def test_only_readable_folders_are_found(self):
+        Folder.objects.create(title="invoices", user=self.uploader_user)
+        folder = Folder.objects.create(
+            title="invoices 2020",
+            user=self.uploader_user
+        )
+        create_access(
+            node=folder,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={Access.PERM_READ: True}
+        )
+
+        found = search(self.margaret_user, "invoices", Folder)
+
+        self.assertEqual(
+            [folder.title for folder in found.results],
+            ["invoices 2020"]
+        )
+        self.assertIsNone(found.next_cursor)
+
+    def test_empty_query(self):
+        self._create_doc("doc_a", "invoice")
+
+        found = search(self.uploader_user, "", Page)
+
+        self.assertEqual(found.results, [])
+        self.assertIsNone(found.next_cursor)
+
+    def test_deny_overrides_group_allow(self):
+        doc = self._create_doc("doc_a", "invoice")
+        group = Group.objects.create(name="accounting")
+        self.margaret_user.groups.add(group)
+        create_access(
+            node=doc,
+            model_type=Access.MODEL_GROUP,
+            name=group.name,
+            access_type=Access.ALLOW,
+            access_inherited=False,
+            permissions={Access.PERM_READ: True}
+        )
+        pages = Page.objects.filter(document=doc)
+
+        self.assertEqual(
+            filter_readable(pages, self.margaret_user, 'document_id').count(),
+            1
+        )
+
+        create_access(
+            node=doc,
+            model_type=Access.MODEL_USER,
+            name=self.margaret_user.username,
+            access_type=Access.DENY,
+            access_inherited=False,
+            permissions={Access.PERM_READ: True}
+        )
+
+        self.assertEqual(
+            filter_readable(pages, self.margaret_user, 'document_id').count(),
+            0
+        )
+
+    def test_keyset_pagination(self):
+        for index in range(5):
+            self._create_doc(f"doc_{index}", "invoice")
+
+        titles = []
+        cursor = None
+        while True:
+            found = search(
+                self.uploader_user,
+                "invoice",
+                Page,
+                cursor=cursor,
+                limit=2
+            )
+            titles.extend(page.document.title for page in found.results)
+            cursor = found.next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(
+            titles,
+            [f"doc_{index}" for index in range(5)]
+        )
+
+
+class TestIndexSearchAccess(TestSearchAccess):
+
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            PAPERMERGE_SEARCH_BACKEND=INDEX_BACKEND,
+            PAPERMERGE_SEARCH_INDEX_DIR=self.root
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.root)
+
+    def test_keyset_pagination_by_relevance(self):
+        for index in range(1, 6):
+            self._create_doc(f"doc_{index}", "invoice " * index)
+
+        first = search(
+            self.uploader_user,
+            "invoice",
+            Page,
+            limit=3
+        )
+        second = search(
+            self.uploader_user,
+            "invoice",
+            Page,
+            cursor=first.next_cursor,
+            limit=3
+        )
+
+        self.assertEqual(
+            [page.document.title for page in first.results],
+            ["doc_5", "doc_4", "doc_3"]
+        )
+        self.assertEqual(
+            [page.document.title for page in second.results],
+            ["doc_2", "doc_1"]
+        )
+        self.assertIsNone(second.next_cursor)
@@ -0,0 +1,204 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from papermerge.core.models import Document, Page
+from papermerge.fulltext.index import InvertedIndex, parse_query
+from papermerge.fulltext.index_backend import SearchBackend, search_index
+
+User = get_user_model()
+
+INDEX_BACKEND = "papermerge.fulltext.index_backend.SearchBackend"
+
+
+class TestInvertedIndex(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.index = InvertedIndex(os.path.join(self.root, "index.sqlite3"))
+        self.index.add_pages([
+            (1, ["Doc A", "their power are weak, slavish"]),
+            (2, ["Doc B", "power is weak; are they slavish"]),
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_parse_query(self):
+        self.assertEqual(
+            parse_query('"power are weak" Slavish'),
+            [('power', 'are', 'weak'), ('slavish',)]
+        )
+        self.assertEqual(parse_query('" " !'), [])
+
+    def test_phrase_query(self):
+        self.assertEqual(
+            list(self.index.search('"power are weak"')),
+            [1]
+        )
+        self.assertEqual(
+            sorted(self.index.search('power weak')),
+            [1, 2]
+        )
+
+    def test_phrase_does_not_match_across_fields(self):
+        self.assertEqual(self.index.search('"doc a their"'), {})
+
+    def test_prefix_match(self):
+        self.assertEqual(sorted(self.index.search('slav')), [1, 2])
+        self.assertEqual(self.index.search('slav', prefix=False), {})
+
+    def test_operators(self):
+        self.assertEqual(list(self.index.search('their they')), [])
+        self.assertEqual(
+            sorted(self.index.search('their they', operator='or')),
+            [1, 2]
+        )
+
+    def test_update_and_delete(self):
+        self.index.add_pages([(1, ["Doc A", "completely new text"])])
+
+        self.assertEqual(list(self.index.search('power')), [2])
+        self.assertEqual(list(self.index.search('completely')), [1])
+
+        self.index.delete_pages([2])
+
+        self.assertEqual(self.index.search('power'), {})
+        self.assertEqual(self.index.page_count(), 1)
+
+    def test_unchanged_pages_are_skipped(self):
+        pages = [(1, ["Doc A", "their power are weak, slavish"])]
+
+        self.assertEqual(self.index.add_pages(pages), 0)
+
+    def test_match_offsets(self):
+        # offsets are in "\n".join(fields)
+        text = "Doc A\ntheir power are weak, slavish"
+
+        matches = self.index.match_offsets('"power are weak" slav', 1)
+
+        self.assertEqual(
+            [text[start:last_start] for start, last_start in matches],
+            ["power are ", ""]
+        )
+        self.assertEqual(
+            [text[last_start:last_start + 4] for _, last_start in matches],
+            ["weak", "slav"]
+        )
+
+    def test_rebuild(self):
+        count = self.index.rebuild(
+            (page_id, ["", f"word{page_id} common"])
+            for page_id in range(1, 1201)
+        )
+
+        self.assertEqual(count, 1200)
+        self.assertEqual(len(self.index.search('common')), 1200)
+        self.assertEqual(list(self.index.search('word7', prefix=False)), [7])
+        self.assertEqual(self.index.search('power'), {})
+
+
+class TestIndexSearchBackend(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            PAPERMERGE_SEARCH_BACKEND=INDEX_BACKEND,
+            PAPERMERGE_SEARCH_INDEX_DIR=self.root
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='test')
+        self.backend = SearchBackend()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.root)
+
+    def _create_doc(self, title, texts):
+        doc = Document.objects.create_document(
+            title=title,
+            file_name=f"{title}.pdf",
+            size='1212',
+            lang='deu',
+            user=self.user,
+            page_count=len(texts),
+        )
+        for page, text in zip(doc.pages.all(), texts):
+            page.text = text
+            page.save()
+
+        return doc
+
+    def test_search_is_not_case_sensitive(self):
+        self._create_doc("document_c", ["search for TESTX text", "", ""])
+
+        self.assertEqual(self.backend.search("TESTX", Page).count(), 1)
+        self.assertEqual(self.backend.search("testX", Page).count(), 1)
+        self.assertEqual(self.backend.search("tst", Page).count(), 0)
+
+    def test_results_are_ranked(self):
+        self._create_doc("doc_x", ["apple banana cherry"])
+        self._create_doc("doc_y", ["apple apple banana apple"])
+
+        results = list(
+            self.backend.search("apple", Page).annotate_score('score')
+        )
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].document.title, "doc_y")
+        self.assertGreater(results[0].score, results[1].score)
+
+    def test_phrase_query(self):
+        self._create_doc("doc_x", ["total amount due"])
+        self._create_doc("doc_y", ["amount total"])
+
+        results = self.backend.search('"total amount"', Page)
+
+        self.assertEqual(
+            [page.document.title for page in results],
+            ["doc_x"]
+        )
+
+    def test_annotate_offsets(self):
+        self._create_doc("doc_x", ["their power are weak, slavish"])
+
+        page = self.backend.search(
+            '"power are"', Page
+        ).annotate_offsets('offsets')[0]
+
+        self.assertEqual(page.offsets, [(6, 15)])
+        self.assertEqual(page.text[6:15], "power are")
+
+    def test_queryset_restricts_results(self):
+        doc = self._create_doc("doc_x", ["apple"])
+        self._create_doc("doc_y", ["apple"])
+
+        results = self.backend.search(
+            "apple",
+            Page.objects.filter(document=doc)
+        )
+
+        self.assertEqual(results.count(), 1)
+
+    def test_deleted_pages_are_removed_from_index(self):
+        doc = self._create_doc("doc_x", ["apple"])
+        self.assertEqual(search_index().page_count(), 1)
+
+        doc.delete()
+
+        self.assertEqual(search_index().page_count(), 0)
+        self.assertEqual(self.backend.search("apple", Page).count(), 0)
+
+    def test_rebuild_command(self):
+        self._create_doc("doc_x", ["apple"])
+        search_index().clear()
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        self.assertEqual(self.backend.search("apple", Page).count(), 1)
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+
+from django.test import TestCase
+
+from papermerge.core.models import Folder
+from papermerge.backups.stream import (
+    HEADER_NAME,
+    BackupCheckpoint,
+    StreamingBackup
+)
+from papermerge.test.utils import create_berlin_doc, create_root_user
+
+
+def read_archive(data):
+    archive = tarfile.open(fileobj=io.BytesIO(data), mode='r|')
+    members = {}
+    for member in archive:
+        members[member.name] = archive.extractfile(member).read()
+
+    return members
+
+
+def manifest_entries(members):
+    entries = []
+    for name in sorted(members):
+        if name.endswith('.ndjson'):
+            entries.extend(
+                json.loads(line)
+                for line in members[name].decode('utf-8').splitlines()
+            )
+
+    return entries
+
+
+class TestStreamingBackup(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmp_dir, "checkpoint.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_backup_is_streamed(self):
+        folder = Folder.objects.create(title="Invoices", user=self.user)
+        doc = create_berlin_doc(self.user, "berlin.pdf", parent_id=folder.id)
+
+        backup = StreamingBackup(user=self.user, checkpoint=self.checkpoint)
+        out = io.BytesIO()
+        stats = backup.write(out)
+
+        members = read_archive(out.getvalue())
+        header = json.loads(members[HEADER_NAME])
+        self.assertEqual(header['format'], 'ndjson')
+        self.assertEqual(header['part'], 1)
+
+        path = f"Invoices/berlin.pdf__{doc.id}"
+        with open(doc.absfilepath, 'rb') as f:
+            self.assertEqual(members[path], f.read())
+
+        entries = manifest_entries(members)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['path'], path)
+        self.assertEqual(entries[0]['title'], "berlin.pdf")
+
+        self.assertEqual(stats['documents'], 1)
+        self.assertEqual(stats['bytes'], len(out.getvalue()))
+        self.assertTrue(BackupCheckpoint(self.checkpoint).load().complete)
+
+    def test_backup_of_all_users(self):
+        doc = create_berlin_doc(self.user, "berlin.pdf")
+
+        members = read_archive(b''.join(StreamingBackup()))
+
+        entries = manifest_entries(members)
+        self.assertEqual(entries[0]['type'], 'user')
+        self.assertEqual(entries[0]['username'], self.user.username)
+        self.assertEqual(entries[1]['path'], f"admin/berlin.pdf__{doc.id}")
+        self.assertEqual(entries[1]['user'], self.user.username)
+
+    def test_interrupted_backup_is_resumed(self):
+        docs = [
+            create_berlin_doc(self.user, f"doc_{index}.pdf")
+            for index in range(3)
+        ]
+
+        backup = StreamingBackup(
+            user=self.user,
+            checkpoint=self.checkpoint,
+            chunk_size=1
+        )
+        chunks = iter(backup)
+        while BackupCheckpoint(self.checkpoint).load().last_id == 0:
+            next(chunks)
+        # connection is lost
+        chunks.close()
+
+        checkpoint = BackupCheckpoint(self.checkpoint).load()
+        self.assertEqual(checkpoint.last_id, docs[0].id)
+        self.assertFalse(checkpoint.complete)
+
+        resumed = StreamingBackup(
+            user=self.user,
+            checkpoint=self.checkpoint,
+            resume=True,
+            chunk_size=1
+        )
+        members = read_archive(b''.join(resumed))
+
+        self.assertEqual(json.loads(members[HEADER_NAME])['part'], 2)
+        self.assertEqual(
+            [entry['id'] for entry in manifest_entries(members)],
+            [docs[1].id, docs[2].id]
+        )
+        checkpoint = BackupCheckpoint(self.checkpoint).load()
+        self.assertTrue(checkpoint.complete)
+        self.assertEqual(checkpoint.documents, 3)
@@ -0,0 +1,142 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from papermerge.core.import_pipeline import LOCAL, go_through_pipelines
+from papermerge.core.models import Document, Folder
+from papermerge.core.storage import default_storage
+from papermerge.importers import pipelines
+from papermerge.importers.pipelines import StreamingPipeline, accepts_files
+
+from .utils import create_root_user
+
+BASE_DIR = os.path.dirname(__file__)
+
+PAPERMERGE_STREAMING_PIPELINE = [
+    'papermerge.importers.pipelines.StreamingPipeline'
+]
+PAPERMERGE_MIXED_PIPELINE = [
+    'papermerge.test.test_import_pipelines.PipelineOne',
+    'papermerge.importers.pipelines.StreamingPipeline',
+]
+
+
+@override_settings(PAPERMERGE_PIPELINES=PAPERMERGE_STREAMING_PIPELINE)
+class TestStreamingPipeline(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = shutil.copy(
+            os.path.join(BASE_DIR, "data", "berlin.pdf"),
+            self.tmp_dir
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _import(self, payload):
+        return go_through_pipelines(
+            {'payload': payload, 'processor': LOCAL},
+            {'skip_ocr': True, 'name': "berlin.pdf"}
+        )
+
+    def _assert_stored(self, doc):
+        self.assertIsNotNone(doc)
+        self.assertEqual(doc.page_count, 2)
+        with open(default_storage.abspath(doc.path()), 'rb') as stored:
+            with open(self.file_path, 'rb') as original:
+                self.assertEqual(stored.read(), original.read())
+
+    def test_path_payload(self):
+        doc = self._import(self.file_path)
+
+        self._assert_stored(doc)
+        # file of the caller is left in place
+        self.assertTrue(os.path.exists(self.file_path))
+
+    def test_file_object_payload(self):
+        with open(self.file_path, 'rb') as f:
+            doc = self._import(f)
+
+        self._assert_stored(doc)
+
+    def test_file_object_is_copied(self):
+        with open(self.file_path, 'rb') as f:
+            doc = self._import(f)
+
+        stored = os.stat(default_storage.abspath(doc.path()))
+        self.assertNotEqual(stored.st_ino, os.stat(self.file_path).st_ino)
+
+    def test_linked_file_mode(self):
+        with open(self.file_path, 'rb') as f:
+            payload = f.read()
+
+        doc = self._import(payload)
+
+        stored = os.stat(default_storage.abspath(doc.path()))
+        # same as of copied files, not 0600 of the temporary file
+        self.assertEqual(
+            stored.st_mode & 0o777,
+            0o666 & ~pipelines.current_umask()
+        )
+
+    def test_in_memory_file_object_payload(self):
+        with open(self.file_path, 'rb') as f:
+            payload = io.BytesIO(f.read())
+
+        self._assert_stored(self._import(payload))
+
+    def test_bytes_payload(self):
+        with open(self.file_path, 'rb') as f:
+            payload = f.read()
+
+        self._assert_stored(self._import(payload))
+
+    def test_unsupported_path_payload(self):
+        path = os.path.join(self.tmp_dir, "notes.txt")
+        with open(path, 'w') as f:
+            f.write("just text")
+
+        self.assertIsNone(self._import(path))
+
+    def test_accepts_files(self):
+        self.assertTrue(accepts_files())
+
+        with override_settings(PAPERMERGE_PIPELINES=PAPERMERGE_MIXED_PIPELINE):
+            self.assertFalse(accepts_files())
+
+    def test_only_document_creation_is_serialized(self):
+        create_document = Document.objects.create_document
+        # whether creation lock was held: [create, OCR]
+        locked = []
+
+        def create(*args, **kwargs):
+            locked.append(pipelines._create_lock.locked())
+            return create_document(*args, **kwargs)
+
+        def ocr_document(**kwargs):
+            locked.append(pipelines._create_lock.locked())
+
+        with mock.patch.object(
+            Document.objects,
+            'create_document',
+            side_effect=create
+        ), mock.patch.object(
+            StreamingPipeline,
+            'ocr_document',
+            side_effect=ocr_document
+        ):
+            doc = go_through_pipelines(
+                {'payload': self.file_path, 'processor': LOCAL},
+                {'skip_ocr': False, 'name': "berlin.pdf"}
+            )
+
+        self.assertEqual(locked, [True, False])
+        inbox = Folder.objects.get(title=Folder.INBOX_NAME, user=self.user)
+        self.assertEqual(doc.parent_id, inbox.id)
+        self.assertEqual(inbox.get_descendant_count(), 1)
@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+
+from django.test import TestCase
+
+from papermerge.viewer.tiles import jpeg_size, level_info
+
+BASE_DIR = Path(__file__).parent
+
+
+class TestTiles(TestCase):
+
+    def test_jpeg_size(self):
+        self.assertEqual(
+            jpeg_size(os.path.join(BASE_DIR, "data", "page-1.jpg")),
+            (1240, 1754)
+        )
+
+    def test_jpeg_size_of_non_jpeg_file(self):
+        with self.assertRaises(ValueError):
+            jpeg_size(os.path.join(BASE_DIR, "data", "berlin.pdf"))
+
+    def test_level_info(self):
+        self.assertEqual(
+            level_info(0, 256, 1754 / 1240),
+            {
+                'level': 0,
+                'width': 256,
+                'height': 363,
+                'columns': 1,
+                'rows': 2
+            }
+        )
+        self.assertEqual(
+            level_info(2, 256, 1754 / 1240),
+            {
+                'level': 2,
+                'width': 1024,
+                'height': 1449,
+                'columns': 4,
+                'rows': 6
+            }
+        )
@@ -0,0 +1,222 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from papermerge.core.models import Document, Folder, Page
+from papermerge.core.models.kvstore import (
+    DATE,
+    MONEY,
+    NUMERIC,
+    TEXT,
+    TypedKey
+)
+from papermerge.metadata.models import (
+    NodeTypedValue,
+    PageTypedValue,
+    filter_by_kv,
+    typed_value
+)
+from papermerge.metadata.propagation import update_kv
+from papermerge.test.utils import create_root_user
+
+
+class TestTypedValue(TestCase):
+
+    def test_date(self):
+        self.assertEqual(
+            typed_value(TypedKey('date', DATE, 'dd.mm.yyyy'), '03.06.2020'),
+            {'value_date': date(2020, 6, 3)}
+        )
+        self.assertEqual(
+            typed_value(TypedKey('date', DATE, 'dd.mm.yy'), '03.06.20'),
+            {'value_date': date(2020, 6, 3)}
+        )
+        self.assertIsNone(
+            typed_value(TypedKey('date', DATE, 'dd.mm.yy'), 'June 3rd')
+        )
+
+    def test_money(self):
+        self.assertEqual(
+            typed_value(TypedKey('price', MONEY, 'dd,cc'), '1.234,50'),
+            {'value_decimal': Decimal('1234.50')}
+        )
+        self.assertEqual(
+            typed_value(TypedKey('price', MONEY, 'dd.cc'), '1,234.50'),
+            {'value_decimal': Decimal('1234.50')}
+        )
+        self.assertIsNone(
+            typed_value(TypedKey('price', MONEY, 'dd.cc'), 'n/a')
+        )
+
+    def test_out_of_range(self):
+        price = TypedKey('price', MONEY, 'dd.cc')
+        self.assertEqual(
+            typed_value(price, '9999999999999999.9999'),
+            {'value_decimal': Decimal('9999999999999999.9999')}
+        )
+        for value in (
+            '10000000000000000',
+            '9999999999999999.99999',
+            '1e30',
+            'NaN',
+            'Infinity',
+        ):
+            self.assertIsNone(typed_value(price, value), value)
+
+        count = TypedKey('count', NUMERIC, 'dddd')
+        self.assertEqual(
+            typed_value(count, str(2 ** 63 - 1)),
+            {'value_int': 2 ** 63 - 1}
+        )
+        self.assertIsNone(typed_value(count, str(2 ** 63)))
+        self.assertIsNone(typed_value(count, str(-2 ** 63 - 1)))
+
+    def test_numeric_and_text(self):
+        self.assertEqual(
+            typed_value(TypedKey('count', NUMERIC, 'd.ddd'), '1.200'),
+            {'value_int': 1200}
+        )
+        self.assertIsNone(
+            typed_value(TypedKey('shop', TEXT, None), 'lidl')
+        )
+        self.assertIsNone(
+            typed_value(TypedKey('count', NUMERIC, 'dddd'), '')
+        )
+
+
+class TestFilterByKV(TestCase):
+
+    def setUp(self):
+        self.user = create_root_user()
+        self.folder = Folder.objects.create(title="invoices", user=self.user)
+        update_kv(
+            self.folder,
+            [
+                {'key': 'price', 'kv_type': MONEY, 'kv_format': 'dd,cc'},
+                {'key': 'date', 'kv_type': DATE, 'kv_format': 'dd.mm.yyyy'},
+                {'key': 'shop', 'kv_type': TEXT},
+            ]
+        )
+        self.folder.refresh_from_db()
+        self.doc_a = self._doc("doc_a", "999,99", "01.07.2020", "lidl")
+        self.doc_b = self._doc("doc_b", "1.500,00", "15.08.2020", "aldi")
+        self.doc_c = self._doc("doc_c", "2.000,00", "01.10.2020", "lidl")
+
+    def _doc(self, title, price, date_value, shop):
+        doc = Document.objects.create_document(
+            title=title,
+            file_name=f"{title}.pdf",
+            size='1989',
+            lang='DEU',
+            user=self.user,
+            parent_id=self.folder.id,
+            page_count=1,
+        )
+        doc.assign_kv_values({
+            'price': price,
+            'date': date_value,
+            'shop': shop
+        })
+
+        return doc
+
+    def titles(self, key, **lookups):
+        return set(
+            filter_by_kv(
+                Document.objects.all(),
+                key,
+                **lookups
+            ).values_list('title', flat=True)
+        )
+
+    def test_range_queries(self):
+        self.assertEqual(
+            self.titles('price', gt=1000),
+            {"doc_b", "doc_c"}
+        )
+        self.assertEqual(
+            self.titles(
+                'date',
+                range=(date(2020, 7, 1), date(2020, 9, 30))
+            ),
+            {"doc_a", "doc_b"}
+        )
+        self.assertEqual(
+            self.titles('price', gte=Decimal('1500'), lt=2000),
+            {"doc_b"}
+        )
+
+    def test_equality_queries(self):
+        self.assertEqual(
+            self.titles('shop', exact='lidl'),
+            {"doc_a", "doc_c"}
+        )
+        self.assertEqual(
+            self.titles('date', exact=date(2020, 10, 1)),
+            {"doc_c"}
+        )
+
+    def test_pages(self):
+        pages = filter_by_kv(Page.objects.all(), 'price', lte=1000)
+
+        self.assertEqual(
+            [page.document.title for page in pages],
+            ["doc_a"]
+        )
+
+    def test_typed_values_follow_changes(self):
+        self.doc_a.kv['price'] = '1.999,00'
+
+        self.assertEqual(
+            self.titles('price', gt=1000),
+            {"doc_a", "doc_b", "doc_c"}
+        )
+
+        kvstore = self.folder.kvstore.get(key='price')
+        update_kv(
+            self.folder,
+            [
+                {
+                    'id': kvstore.id,
+                    'key': 'amount',
+                    'kv_type': MONEY,
+                    'kv_format': 'dd,cc'
+                },
+                {'key': 'date', 'kv_type': DATE, 'kv_format': 'dd.mm.yyyy'},
+                {'key': 'shop', 'kv_type': TEXT},
+            ]
+        )
+
+        self.assertEqual(self.titles('price', gt=1000), set())
+        self.assertEqual(
+            self.titles('amount', gt=1000),
+            {"doc_a", "doc_b", "doc_c"}
+        )
+
+    def test_out_of_range_values_are_kept_as_text(self):
+        self.doc_a.kv['price'] = '12.345.678.901.234.567,00'
+
+        self.assertEqual(
+            self.doc_a.kv['price'],
+            '12.345.678.901.234.567,00'
+        )
+        self.assertEqual(self.titles('price', gt=1000), {"doc_b", "doc_c"})
+
+    def test_rebuild_command(self):
+        NodeTypedValue.objects.all().delete()
+        PageTypedValue.objects.all().delete()
+
+        call_command('rebuild_typed_values', stdout=io.StringIO())
+
+        self.assertEqual(
+            self.titles('price', gt=1000),
+            {"doc_b", "doc_c"}
+        )
+        self.assertEqual(PageTypedValue.objects.count(), 6)
+
+    def test_unsupported_lookup(self):
+        with self.assertRaises(ValueError):
+            self.titles('price', contains=1000)
@@ -1,3 +1,5 @@
+import os
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import (
     Permission
@@ -7,9 +9,12 @@ from papermerge.core.models import (
     Document,
     Role
 )
+from papermerge.core.storage import default_storage
 
 User = get_user_model()
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
 
 def create_root_user():
     user = User.objects.create_user(
@@ -110,3 +115,26 @@ def create_some_doc(
     )
 
     return doc
+
+
+def create_berlin_doc(user, title, parent_id=None):
+    """
+    Returns a (newly created) two pages document instance with
+    berlin.pdf as its file.
+    """
+    document_path = os.path.join(DATA_DIR, "berlin.pdf")
+    doc = Document.objects.create_document(
+        user=user,
+        title=title,
+        size=os.path.getsize(document_path),
+        lang='deu',
+        file_name=title,
+        parent_id=parent_id,
+        page_count=2
+    )
+    default_storage.copy_doc(
+        src=document_path,
+        dst=doc.path().url(),
+    )
+
+    return doc
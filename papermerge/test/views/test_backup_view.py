@@ -0,0 +1,37 @@
+import io
+import tarfile
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from papermerge.backups.stream import HEADER_NAME
+from papermerge.test.utils import create_margaret_user, create_root_user
+
+
+class TestBackupView(TestCase):
+
+    def setUp(self):
+        self.testcase_user = create_root_user()
+        self.client = Client()
+
+    def test_download_is_streamed(self):
+        self.client.login(testcase_user=self.testcase_user)
+
+        ret = self.client.get(reverse('backups:download'), {'all': 1})
+
+        self.assertEqual(ret.status_code, 200)
+        self.assertTrue(ret.streaming)
+        archive = tarfile.open(
+            fileobj=io.BytesIO(b''.join(ret.streaming_content))
+        )
+        self.assertIn(HEADER_NAME, archive.getnames())
+
+    def test_only_superuser_can_download_all_users(self):
+        margaret = create_margaret_user()
+        self.client.login(testcase_user=margaret)
+
+        ret = self.client.get(reverse('backups:download'), {'all': 1})
+        self.assertEqual(ret.status_code, 403)
+
+        ret = self.client.get(reverse('backups:download'), {'after': "x"})
+        self.assertEqual(ret.status_code, 400)
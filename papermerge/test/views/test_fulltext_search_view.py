@@ -0,0 +1,69 @@
+from django.test import TestCase
+from django.test import Client
+from django.urls import reverse
+
+from papermerge.core.models import Document, Folder
+from papermerge.test.utils import create_root_user
+
+
+class TestFulltextSearchView(TestCase):
+
+    def setUp(self):
+        self.testcase_user = create_root_user()
+        self.client = Client()
+        self.client.login(testcase_user=self.testcase_user)
+
+    def _create_doc(self, title, text):
+        doc = Document.objects.create_document(
+            title=title,
+            user=self.testcase_user,
+            lang="ENG",
+            file_name=f"{title}.pdf",
+            size=1222,
+            page_count=1
+        )
+        page = doc.pages.first()
+        page.text = text
+        page.save()
+
+        return doc
+
+    def test_search_is_paginated(self):
+        for index in range(3):
+            self._create_doc(f"doc_{index}", "total amount due")
+        Folder.objects.create(user=self.testcase_user, title="amount")
+
+        ret = self.client.get(
+            reverse('fulltext:search'),
+            {'q': "amount", 'limit': 2}
+        )
+
+        self.assertEqual(ret.status_code, 200)
+        first = ret.json()
+        self.assertEqual(len(first['pages']), 2)
+        self.assertEqual(
+            [folder['title'] for folder in first['folders']],
+            ["amount"]
+        )
+        self.assertIsNotNone(first['next'])
+
+        ret = self.client.get(
+            reverse('fulltext:search'),
+            {'q': "amount", 'limit': 2, 'cursor': first['next']}
+        )
+
+        second = ret.json()
+        self.assertEqual(
+            [page['title'] for page in second['pages']],
+            ["doc_2"]
+        )
+        self.assertEqual(second['folders'], [])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor(self):
+        ret = self.client.get(
+            reverse('fulltext:search'),
+            {'q': "amount", 'cursor': "xyz"}
+        )
+
+        self.assertEqual(ret.status_code, 400)
@@ -0,0 +1,96 @@
+import os
+import gzip
+import json
+
+from django.test import TestCase
+from django.test import Client
+from django.urls import reverse
+
+from papermerge.core.models import Document
+from papermerge.core.storage import default_storage
+from papermerge.viewer.sidecar import sidecar_path
+from papermerge.test.utils import create_root_user
+
+BASE_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        ".."
+    )
+)
+
+
+class TestHocrView(TestCase):
+
+    def setUp(self):
+        self.testcase_user = create_root_user()
+        self.client = Client()
+        self.client.login(testcase_user=self.testcase_user)
+        self.doc = Document.objects.create_document(
+            title="berlin.pdf",
+            user=self.testcase_user,
+            lang="ENG",
+            file_name="berlin.pdf",
+            size=1222,
+            page_count=3
+        )
+        self.page_path = self.doc.page_paths()[1]
+        self.hocr_abs_path = default_storage.abspath(
+            self.page_path.hocr_url()
+        )
+
+    def tearDown(self):
+        for path in (
+            self.hocr_abs_path,
+            sidecar_path(self.hocr_abs_path)
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def copy_hocr(self):
+        default_storage.copy_doc(
+            src=os.path.join(
+                BASE_DIR, "data", "page-1.hocr"
+            ),
+            dst=self.hocr_abs_path
+        )
+
+    def test_hocr_gzip(self):
+        self.copy_hocr()
+        ret = self.client.get(
+            reverse('viewer:hocr', args=(self.doc.id, 1, 1)),
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(ret['Content-Encoding'], 'gzip')
+        data = json.loads(
+            gzip.decompress(b''.join(ret.streaming_content))
+        )
+        self.assertEqual(
+            data['hocr_meta']['width'],
+            1240
+        )
+        # sidecar was built on first request
+        self.assertTrue(
+            os.path.exists(sidecar_path(self.hocr_abs_path))
+        )
+
+    def test_hocr_not_modified(self):
+        self.copy_hocr()
+        ret = self.client.get(
+            reverse('viewer:hocr', args=(self.doc.id, 1, 1)),
+        )
+        self.assertEqual(ret.status_code, 200)
+        data = json.loads(b''.join(ret.streaming_content))
+        self.assertTrue(len(data['hocr']) > 0)
+
+        ret = self.client.get(
+            reverse('viewer:hocr', args=(self.doc.id, 1, 1)),
+            HTTP_IF_NONE_MATCH=ret['ETag']
+        )
+        self.assertEqual(ret.status_code, 304)
+
+    def test_hocr_which_does_not_exists(self):
+        ret = self.client.get(
+            reverse('viewer:hocr', args=(self.doc.id, 1, 1))
+        )
+        self.assertEqual(ret.status_code, 404)
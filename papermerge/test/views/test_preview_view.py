@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.test import Client
+from django.urls import reverse
+
+from papermerge.core.models import Document
+from papermerge.core.storage import default_storage
+from papermerge.test.utils import create_root_user
+
+BASE_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        ".."
+    )
+)
+
+PREVIEW_CACHE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PAPERMERGE_PREVIEW_CACHE_DIR=PREVIEW_CACHE_DIR)
+class TestPreviewView(TestCase):
+
+    def setUp(self):
+        self.testcase_user = create_root_user()
+        self.client = Client()
+        self.client.login(testcase_user=self.testcase_user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PREVIEW_CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_preview_is_rendered_once(self):
+        doc = Document.objects.create_document(
+            title="berlin.pdf",
+            user=self.testcase_user,
+            lang="ENG",
+            file_name="berlin.pdf",
+            size=1222,
+            page_count=3
+        )
+        default_storage.copy_doc(
+            src=os.path.join(
+                BASE_DIR, "data", "berlin.pdf"
+            ),
+            dst=doc.path().url(),
+        )
+        url = reverse('viewer:preview', args=(doc.id, 1, 2))
+
+        ret = self.client.get(url)
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(ret['Content-Type'], 'image/jpeg')
+        self.assertEqual(ret['X-Preview-Cache'], 'miss')
+
+        ret = self.client.get(url)
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(ret['X-Preview-Cache'], 'hit')
+
+    def test_invalid_version(self):
+        doc = Document.objects.create_document(
+            title="berlin.pdf",
+            user=self.testcase_user,
+            lang="ENG",
+            file_name="berlin.pdf",
+            size=1222,
+            page_count=3
+        )
+        url = reverse('viewer:preview', args=(doc.id, 1, 2))
+
+        ret = self.client.get(url, {'version': 'latest'})
+        self.assertEqual(ret.status_code, 400)
+
+    def test_tiles(self):
+        doc = Document.objects.create_document(
+            title="berlin.pdf",
+            user=self.testcase_user,
+            lang="ENG",
+            file_name="berlin.pdf",
+            size=1222,
+            page_count=3
+        )
+        default_storage.copy_doc(
+            src=os.path.join(
+                BASE_DIR, "data", "berlin.pdf"
+            ),
+            dst=doc.path().url(),
+        )
+
+        ret = self.client.get(
+            reverse('viewer:tiles', args=(doc.id, 1))
+        )
+        self.assertEqual(ret.status_code, 200)
+        levels = ret.json()['levels']
+        self.assertEqual(levels[1]['width'], 512)
+        self.assertEqual(levels[1]['columns'], 2)
+
+        # level, x, y, page
+        ret = self.client.get(
+            reverse('viewer:tile', args=(doc.id, 1, 1, 0, 1))
+        )
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(ret['Content-Type'], 'image/jpeg')
+
+        # there are only 2 columns at level 1
+        ret = self.client.get(
+            reverse('viewer:tile', args=(doc.id, 1, 2, 0, 1))
+        )
+        self.assertEqual(ret.status_code, 404)
+
+    def test_preview_document_does_not_exist(self):
+        ret = self.client.get(
+            reverse('viewer:preview', args=(1, 1))
+        )
+        self.assertEqual(ret.status_code, 404)
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ViewerConfig(AppConfig):
+    # Serves data for the document viewer (hOCR, page images)
+    name = 'papermerge.viewer'
+    label = 'viewer'
@@ -0,0 +1,220 @@
+"""
+Size bounded LRU disk cache for rendered page images.
+
+Images are rendered only on first request. Concurrent requests
+for the same image (from threads or processes sharing the cache
+directory) are coalesced: only one of them renders the image, others
+wait for it and then read it from the cache.
+
+Recency of a cached image is tracked via its modification time, which is
+bumped on each hit. When total size of cached images goes over the
+configured budget, least recently used images are evicted.
+"""
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+LOCKS_DIRNAME = ".locks"
+LOCKS_COUNT = 64
+# after eviction, cache is filled at most to this fraction of its budget
+LOW_WATERMARK = 0.9
+# times cached image is rendered again if evicted before it was opened
+OPEN_ATTEMPTS = 3
+
+
+class RenderError(Exception):
+    pass
+
+
+class FileLock:
+    """
+    Exclusive lock held via flock(2). Blocks both other
+    processes and other threads of the current process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+
+class RenderCache:
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # total size of cached files; None = unknown, scan needed
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': self._size,
+            'max_size': self.max_size,
+        }
+
+    def path(self, key):
+        """
+        Key is a tuple e.g. (doc_id, version, page_num, step)
+        """
+        *dirs, name = [str(item) for item in key]
+
+        return os.path.join(self.root, *dirs, f"{name}.jpg")
+
+    def _lock(self, key):
+        locks_dir = os.path.join(self.root, LOCKS_DIRNAME)
+        os.makedirs(locks_dir, exist_ok=True)
+        index = zlib.crc32(repr(key).encode('utf-8')) % LOCKS_COUNT
+
+        return FileLock(os.path.join(locks_dir, f"{index}.lock"))
+
+    def _hit(self, path):
+        try:
+            # bump recency
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted in meantime
+            return False
+
+        self.hits += 1
+        return True
+
+    def get_or_render(self, key, render):
+        """
+        Returns (path, hit) tuple: path to cached image for given key and
+        whether the image was already in the cache. If image is not in the
+        cache, ``render(output_path)`` is called to create it. ``render``
+        is called at most once even if the same key is requested
+        concurrently.
+        """
+        path = self.path(key)
+
+        if self._hit(path):
+            return path, True
+
+        with self._lock(key):
+            # rendered by concurrent request while we were waiting?
+            if self._hit(path):
+                return path, True
+
+            self.misses += 1
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path),
+                suffix=".tmp"
+            )
+            os.close(fd)
+            try:
+                render(temp_path)
+                if not os.path.getsize(temp_path):
+                    raise RenderError(f"Failed to render {key}")
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        self._add_size(os.path.getsize(path))
+
+        return path, False
+
+    def open(self, key, render):
+        """
+        Same as ``get_or_render``, but returns (file, hit) tuple with
+        cached image opened for reading. Image evicted before it was
+        opened is rendered again.
+        """
+        for attempt in range(OPEN_ATTEMPTS):
+            path, hit = self.get_or_render(key, render)
+            try:
+                return open(path, "rb"), hit
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                logger.debug(f"{path} evicted before it was opened")
+
+    def _add_size(self, size):
+        with self._size_lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def _cached_files(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if LOCKS_DIRNAME in dirnames:
+                dirnames.remove(LOCKS_DIRNAME)
+            for filename in filenames:
+                if not filename.endswith(".jpg"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime_ns, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._cached_files())
+
+    def _evict(self):
+        """
+        Removes least recently used images until cache size is under
+        its low watermark. Rescans the cache directory as other
+        processes may have added/removed images in meantime.
+        """
+        files = sorted(self._cached_files())
+        total = sum(size for _, size, _ in files)
+        limit = self.max_size * LOW_WATERMARK
+
+        for _, size, path in files:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+        self._size = total
+        logger.info(f"Preview cache eviction: {self.stats()}")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_render_cache(root, max_size):
+    """
+    Returns (per process) shared RenderCache instance for given
+    directory and budget.
+    """
+    with _caches_lock:
+        key = (root, max_size)
+        if key not in _caches:
+            _caches[key] = RenderCache(root=root, max_size=max_size)
+
+        return _caches[key]
@@ -0,0 +1,236 @@
+"""
+Incremental hOCR parser with compact word storage.
+
+Drop in replacement for ``papermerge.core.lib.hocr.Hocr``:
+``good_json_words()`` and ``get_meta()`` return exactly the same
+structures, but the hOCR file is parsed element by element (words are
+discarded from the parse tree as soon as they were read) and words are
+kept in parallel integer arrays instead of one python object per word.
+"""
+import logging
+import re
+from array import array
+
+import lxml.etree
+
+logger = logging.getLogger(__name__)
+
+OCRX_WORD = 'ocrx_word'
+OCR_PAGE = 'ocr_page'
+
+BOX_RE = re.compile(
+    r'.*; bbox (?P<x1>\d+) (?P<y1>\d+) (?P<x2>\d+) (?P<y2>\d+);.*'
+)
+WORD_BOX_RE = re.compile(
+    r'bbox (?P<x1>\d+) (?P<y1>\d+)'
+    r' (?P<x2>\d+) (?P<y2>\d+); x_wconf (?P<wconf>\d+)'
+)
+
+
+def extract_size(title):
+    width = None
+    height = None
+    matched_obj = BOX_RE.match(title)
+    if matched_obj:
+        width = int(matched_obj['x2'])
+        height = int(matched_obj['y2'])
+
+    return width, height
+
+
+class StringTable:
+    """
+    Stores each distinct string only once. Strings are referenced by
+    their integer index. ``None`` is stored as well (span without text).
+    """
+    __slots__ = ('strings', '_index')
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def add(self, value):
+        index = self._index.get(value, None)
+        if index is None:
+            index = len(self.strings)
+            self._index[value] = index
+            self.strings.append(value)
+
+        return index
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class OcrxWords:
+    """
+    Column oriented storage of ocrx words: bounding box and word confidence
+    are kept in parallel arrays of integers, word texts in a string table.
+    """
+    __slots__ = (
+        'x1', 'y1', 'x2', 'y2', 'wconf',
+        'ids', 'titles', 'text_refs', 'texts'
+    )
+
+    def __init__(self):
+        self.x1 = array('l')
+        self.y1 = array('l')
+        self.x2 = array('l')
+        self.y2 = array('l')
+        self.wconf = array('l')
+        self.ids = []
+        self.titles = []
+        self.text_refs = array('l')
+        self.texts = StringTable()
+
+    def append(self, el_id, title, text):
+        """
+        Adds a word. Bounding box and word confidence are parsed from
+        title string e.g. 'bbox 102 448 120 457; x_wconf 38'.
+        """
+        x1 = y1 = x2 = y2 = wconf = 0
+        matched_obj = WORD_BOX_RE.match(title)
+        if matched_obj:
+            x1 = int(matched_obj['x1'])
+            y1 = int(matched_obj['y1'])
+            x2 = int(matched_obj['x2'])
+            y2 = int(matched_obj['y2'])
+            wconf = int(matched_obj['wconf'])
+        else:
+            logger.info(
+                f"Word title mismatch.title={title}, el_id={el_id}."
+            )
+
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.x2.append(x2)
+        self.y2.append(y2)
+        self.wconf.append(wconf)
+        self.ids.append(el_id)
+        self.titles.append(title)
+        self.text_refs.append(self.texts.add(text))
+
+    def to_hash(self, index):
+        return {
+            'x1': self.x1[index],
+            'y1': self.y1[index],
+            'x2': self.x2[index],
+            'y2': self.y2[index],
+            'wconf': self.wconf[index],
+            'id': self.ids[index],
+            'title': self.titles[index],
+            'text': self.texts[self.text_refs[index]],
+            'class': OCRX_WORD
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class CompactHocr:
+    """Manages ocrx words from hocr file.
+
+    Same interface as ``papermerge.core.lib.hocr.Hocr``.
+    """
+
+    def __init__(self, hocr_file_path, min_wconf=30):
+        self.hocr_file_path = hocr_file_path
+        self.ocrx_words = OcrxWords()
+        self.min_wconf = min_wconf
+        self._width = 0
+        self._height = 0
+        try:
+            self.extract()
+        except lxml.etree.LxmlError:
+            logger.warning(
+                f"Hocr file {hocr_file_path}"
+                " is either empty of not of HOCR format"
+            )
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    def extract(self):
+        page_found = False
+        context = lxml.etree.iterparse(
+            self.hocr_file_path,
+            events=('start', 'end'),
+            html=True
+        )
+
+        for event, elem in context:
+            el_class = elem.get('class')
+
+            if event == 'start':
+                if el_class == OCR_PAGE and not page_found:
+                    page_found = True
+                    self._width, self._height = extract_size(
+                        elem.get('title', '')
+                    )
+                continue
+
+            if el_class != OCRX_WORD or elem.tag != 'span':
+                continue
+
+            self.ocrx_words.append(
+                el_id=elem.get('id'),
+                title=elem.get('title', ''),
+                text=elem.text
+            )
+            # word was read, free memory taken by it
+            # and by its already processed siblings
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        return self.ocrx_words
+
+    def good_json_words(self):
+        """Return only:
+            * ocrx words with non empty text
+            * ocrx words with w_conf > min_w_conf
+        """
+        return [
+            self.ocrx_words.to_hash(index)
+            for index in self._good_indexes()
+        ]
+
+    def _good_indexes(self):
+        wconf = self.ocrx_words.wconf
+        min_wconf = self.min_wconf
+
+        return [
+            index for index in range(len(self.ocrx_words))
+            if wconf[index] >= min_wconf
+        ]
+
+    def get_meta(self):
+        words = self.ocrx_words
+        bad_words = [
+            words.to_hash(index)
+            for index in range(len(words))
+            if words.wconf[index] < self.min_wconf
+        ]
+        count_all = len(words)
+
+        return {
+            'width': self.width,
+            'height': self.height,
+            'count_all': count_all,
+            'count_bad': len(bad_words),
+            'count_good': count_all - len(bad_words),
+            # words with empty text are not counted as bad
+            # (same as papermerge.core.lib.hocr.Hocr does)
+            'count_non_empty': 0,
+            'count_low_wconf': len(bad_words),
+            'bad_words': bad_words,
+            'min_wconf': self.min_wconf
+        }
@@ -0,0 +1,48 @@
+import logging
+import os
+
+from mglib.conf import settings as mglib_settings
+from mglib.mime import Mime
+from mglib.runcmd import run
+
+logger = logging.getLogger(__name__)
+
+
+def render_page(doc_abs_path, page_num, width, output_path, quality=90):
+    """
+    Renders one page of the document as jpeg image of given width
+    (height is adjusted according to page's aspect ratio) and writes
+    it to ``output_path``.
+    """
+    if Mime(doc_abs_path).is_pdf():
+        output_root, _ = os.path.splitext(output_path)
+        run((
+            mglib_settings.BINARY_PDFTOPPM,
+            "-jpeg",
+            "-jpegopt",
+            f"quality={quality}",
+            "-f",
+            str(page_num),
+            "-l",  # render only one page
+            str(page_num),
+            "-scale-to-x",
+            str(width),
+            "-scale-to-y",
+            "-1",  # it will adjust height according to img ratio
+            "-singlefile",
+            doc_abs_path,
+            output_root
+        ))
+        # pdftoppm always adds .jpg extension
+        os.replace(f"{output_root}.jpg", output_path)
+    else:
+        # jpeg, png or (multi page) tiff
+        run((
+            mglib_settings.BINARY_CONVERT,
+            f"{doc_abs_path}[{page_num - 1}]",
+            "-resize",
+            f"{width}x",
+            "-quality",
+            str(quality),
+            f"jpeg:{output_path}"
+        ))
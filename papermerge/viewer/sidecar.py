@@ -0,0 +1,83 @@
+"""
+Precomputed hOCR JSON sidecar files.
+
+Sidecar file is stored next to the .hocr file (same name with
+``.json.gz`` suffix) and contains gzip compressed JSON with exactly
+the same content as returned by the hocr view:
+
+    {"hocr": hocr.good_json_words(), "hocr_meta": hocr.get_meta()}
+
+Sidecar is stale if it is older than its .hocr file.
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+
+from .hocr import CompactHocr
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".json.gz"
+
+
+def sidecar_path(hocr_abs_path):
+    return f"{hocr_abs_path}{SIDECAR_SUFFIX}"
+
+
+def is_fresh(hocr_abs_path):
+    """
+    Returns True if sidecar of given .hocr file exists and
+    is not older than the .hocr file itself.
+    """
+    try:
+        sidecar_mtime = os.stat(sidecar_path(hocr_abs_path)).st_mtime_ns
+        hocr_mtime = os.stat(hocr_abs_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+    return sidecar_mtime >= hocr_mtime
+
+
+def write_sidecar(hocr_abs_path, min_wconf=30):
+    """
+    Parses .hocr file and (atomically) writes its sidecar.
+    Returns path to the sidecar.
+    """
+    hocr = CompactHocr(
+        hocr_file_path=hocr_abs_path,
+        min_wconf=min_wconf
+    )
+    data = json.dumps({
+        'hocr': hocr.good_json_words(),
+        'hocr_meta': hocr.get_meta()
+    }).encode('utf-8')
+
+    path = sidecar_path(hocr_abs_path)
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path),
+        suffix=SIDECAR_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(data))
+        os.replace(temp_path, path)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+    logger.debug(f"hOCR sidecar {path} written.")
+
+    return path
+
+
+def get_sidecar(hocr_abs_path):
+    """
+    Returns path to up to date sidecar of given .hocr file.
+    Sidecar is (re)built only if it is missing or stale.
+    """
+    if is_fresh(hocr_abs_path):
+        return sidecar_path(hocr_abs_path)
+
+    return write_sidecar(hocr_abs_path)
@@ -0,0 +1,88 @@
+"""
+Tiled, multi-resolution page images (image pyramid).
+
+At zoom level ``n`` page is rendered ``tile_size * 2**n`` pixels wide and
+cut into square tiles of ``tile_size`` pixels (tiles in last column/row
+may be smaller). Level 0 is the whole page in one tile column. Viewer
+fetches only visible tiles of current zoom level, thus transferred
+bytes scale with the viewport, not with page size.
+"""
+import math
+import struct
+
+from mglib.conf import settings as mglib_settings
+from mglib.runcmd import run
+
+# Start Of Frame markers (they contain image size).
+# DHT (0xC4), JPG (0xC8) and DAC (0xCC) use same range, but are not SOF.
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without length/payload
+STANDALONE_MARKERS = set(range(0xD0, 0xDA)) | {0x01}
+
+
+def jpeg_size(path):
+    """
+    Returns (width, height) of jpeg image. Reads only jpeg headers.
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != b'\xff\xd8':
+            raise ValueError(f"{path} is not a jpeg file")
+
+        while True:
+            byte = f.read(1)
+            if byte != b'\xff':
+                raise ValueError(f"{path}: invalid jpeg marker")
+            marker = f.read(1)
+            # skip fill bytes
+            while marker == b'\xff':
+                marker = f.read(1)
+            if not marker:
+                raise ValueError(f"{path}: no SOF marker found")
+
+            code = marker[0]
+            if code in STANDALONE_MARKERS:
+                continue
+
+            length, = struct.unpack('>H', f.read(2))
+            if code in SOF_MARKERS:
+                # skip sample precision byte
+                f.read(1)
+                height, width = struct.unpack('>HH', f.read(4))
+                return width, height
+
+            f.seek(length - 2, 1)
+
+
+def level_width(level, tile_size):
+    return tile_size * 2 ** level
+
+
+def level_info(level, tile_size, aspect_ratio):
+    """
+    Returns dimensions and tile grid of given zoom level.
+    ``aspect_ratio`` is page's height / width.
+    """
+    width = level_width(level, tile_size)
+    height = math.ceil(width * aspect_ratio)
+
+    return {
+        'level': level,
+        'width': width,
+        'height': height,
+        'columns': math.ceil(width / tile_size),
+        'rows': math.ceil(height / tile_size),
+    }
+
+
+def crop_tile(level_img_path, x, y, tile_size, output_path):
+    """
+    Cuts tile (column ``x``, row ``y``) out of the zoom level image.
+    """
+    run((
+        mglib_settings.BINARY_CONVERT,
+        level_img_path,
+        "-crop",
+        f"{tile_size}x{tile_size}+{x * tile_size}+{y * tile_size}",
+        "+repage",
+        f"jpeg:{output_path}"
+    ))
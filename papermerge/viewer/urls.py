@@ -0,0 +1,41 @@
+from django.urls import include, path
+
+from .views import hocr as hocr_views
+from .views import preview as preview_views
+from .views import tiles as tiles_views
+
+document_patterns = [
+    path(
+        '<int:id>/preview/page/<int:page>',
+        preview_views.preview,
+        name="preview"
+    ),
+    path(
+        '<int:id>/preview/<int:step>/page/<int:page>',
+        preview_views.preview,
+        name="preview"
+    ),
+    path(
+        '<int:id>/tiles/page/<int:page>',
+        tiles_views.tiles,
+        name="tiles"
+    ),
+    path(
+        '<int:id>/tile/<int:level>/<int:x>/<int:y>/page/<int:page>',
+        tiles_views.tile,
+        name="tile"
+    ),
+    path(
+        '<int:id>/hocr/<int:step>/page/<int:page>',
+        hocr_views.hocr,
+        name="hocr"
+    ),
+]
+
+app_name = 'viewer'
+
+urlpatterns = [
+    path(
+        'document/', include(document_patterns)
+    ),
+]
@@ -0,0 +1,115 @@
+import gzip
+import logging
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import (
+    FileResponse,
+    StreamingHttpResponse,
+    HttpResponseForbidden,
+    Http404
+)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from mglib.step import Step
+
+from papermerge.core.models import Access, Document
+from papermerge.core.storage import default_storage
+
+from papermerge.viewer.sidecar import get_sidecar
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def gunzip_chunks(path):
+    with gzip.open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def sidecar_response(request, path):
+    """
+    Streams sidecar file. Gzip compressed content is sent as is to the
+    clients which accept it. Supports conditional requests
+    (ETag/Last-Modified).
+    """
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+
+    if response is None:
+        if accepts_gzip(request):
+            response = FileResponse(
+                open(path, "rb"),
+                content_type="application/json"
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(
+                gunzip_chunks(path),
+                content_type="application/json"
+            )
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    return response
+
+
+@login_required
+def hocr(request, id, step=None, page=1):
+    """
+    Same as ``core:hocr`` view, but serves precomputed hOCR sidecar
+    (see ``papermerge.viewer.sidecar``). hOCR file is parsed only if
+    sidecar is missing or stale.
+    """
+    logger.debug(f"hocr for doc_id={id}, step={step}, page={page}")
+    try:
+        doc = Document.objects.get(id=id)
+    except Document.DoesNotExist:
+        raise Http404("Document does not exists")
+
+    if not request.user.has_perm(Access.PERM_READ, doc):
+        return HttpResponseForbidden()
+
+    if page > doc.page_count or page <= 0:
+        raise Http404("Page does not exists")
+
+    version = request.GET.get('version', None)
+    # same as core:hocr view, hOCR of Step(1) is served for all steps
+    page_path = doc.get_page_path(
+        page_num=page,
+        step=Step(1),
+        version=version
+    )
+    hocr_abs_path = default_storage.abspath(page_path.hocr_url())
+
+    if not os.path.exists(hocr_abs_path):
+        default_storage.download(
+            page_path.hocr_url()
+        )
+
+    if not os.path.exists(hocr_abs_path):
+        raise Http404("HOCR data not yet ready.")
+
+    return sidecar_response(
+        request,
+        get_sidecar(hocr_abs_path)
+    )
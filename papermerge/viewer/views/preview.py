@@ -0,0 +1,127 @@
+import logging
+import os
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.contrib.staticfiles import finders
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.http import (
+    FileResponse,
+    Http404
+)
+
+from mglib.step import Step
+
+from papermerge.core.models import Access, Document
+from papermerge.core.storage import default_storage
+
+from papermerge.viewer.cache import RenderError, get_render_cache
+from papermerge.viewer.render import render_page
+
+logger = logging.getLogger(__name__)
+
+
+def preview_cache():
+    root = settings.PAPERMERGE_PREVIEW_CACHE_DIR or os.path.join(
+        settings.MEDIA_ROOT,
+        "preview_cache"
+    )
+
+    return get_render_cache(
+        root=root,
+        max_size=settings.PAPERMERGE_PREVIEW_CACHE_MAX_SIZE
+    )
+
+
+def generic_preview(step):
+    generic_file = "admin/img/document.png"
+    if step.is_thumbnail:
+        generic_file = "admin/img/document_thumbnail.png"
+
+    file_path = finders.find(generic_file)
+    if not file_path:
+        raise Http404("Preview not available")
+
+    return FileResponse(open(file_path, "rb"), content_type="image/png")
+
+
+def get_document(request, id, page):
+    """
+    Returns document with given id if requesting user may read it and
+    it has given page.
+    """
+    try:
+        doc = Document.objects.get(id=id)
+    except Document.DoesNotExist:
+        raise Http404("Document does not exists")
+
+    if not request.user.has_perm(Access.PERM_READ, doc):
+        raise PermissionDenied()
+
+    if page > doc.page_count or page <= 0:
+        raise Http404("Page does not exists")
+
+    return doc
+
+
+def get_version(request, doc):
+    """
+    Returns document version requested via ``version`` query parameter
+    (current version of the document by default).
+    """
+    try:
+        return int(request.GET.get('version', doc.version))
+    except ValueError:
+        raise BadRequest("Invalid document version")
+
+
+def page_renderer(doc, version, page, width):
+    """
+    Returns function which renders given page as jpeg image of given
+    width into its ``output_path`` argument.
+    """
+    doc_path = doc.path(version=version)
+    doc_abs_path = default_storage.abspath(doc_path.url())
+
+    def render(output_path):
+        if not os.path.exists(doc_abs_path):
+            logger.debug(f"Downloading to {doc_abs_path}.")
+            default_storage.download(doc_path.url())
+
+        render_page(
+            doc_abs_path,
+            page_num=page,
+            width=width,
+            output_path=output_path,
+            quality=settings.PDFTOPPM_JPEG_QUALITY
+        )
+
+    return render
+
+
+@login_required
+def preview(request, id, step=1, page=1):
+    """
+    Same as ``core:preview`` view, but page images are rendered on first
+    request and kept in size bounded LRU disk cache (see
+    ``papermerge.viewer.cache``).
+    """
+    doc = get_document(request, id, page)
+    version = get_version(request, doc)
+    step = Step(step)
+
+    try:
+        img_file, hit = preview_cache().open(
+            key=(doc.id, version, page, step.current),
+            render=page_renderer(doc, version, page, step.width)
+        )
+    except (RenderError, OSError) as e:
+        logger.warning(
+            f"Preview of doc_id={doc.id} page={page} failed: {e}"
+        )
+        return generic_preview(step)
+
+    response = FileResponse(img_file, content_type="image/jpeg")
+    response['X-Preview-Cache'] = "hit" if hit else "miss"
+
+    return response
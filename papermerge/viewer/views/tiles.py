@@ -0,0 +1,104 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import (
+    FileResponse,
+    JsonResponse,
+    Http404
+)
+
+from papermerge.viewer.cache import RenderError
+from papermerge.viewer.tiles import (
+    crop_tile,
+    jpeg_size,
+    level_info,
+    level_width
+)
+from .preview import (
+    get_document,
+    get_version,
+    page_renderer,
+    preview_cache
+)
+
+logger = logging.getLogger(__name__)
+
+
+def level_image(doc, version, page, level):
+    """
+    Returns path to (cached) image of the whole page at given zoom level.
+    """
+    path, _ = preview_cache().get_or_render(
+        key=(doc.id, version, page, 'levels', level),
+        render=page_renderer(
+            doc,
+            version,
+            page,
+            level_width(level, settings.PAPERMERGE_TILE_SIZE)
+        )
+    )
+
+    return path
+
+
+@login_required
+def tiles(request, id, page):
+    """
+    Describes tile pyramid of the page: page dimensions and tile grid
+    of each zoom level.
+    """
+    doc = get_document(request, id, page)
+    version = get_version(request, doc)
+    tile_size = settings.PAPERMERGE_TILE_SIZE
+
+    try:
+        width, height = jpeg_size(level_image(doc, version, page, 0))
+    except (RenderError, OSError, ValueError) as e:
+        logger.warning(
+            f"Tiles of doc_id={doc.id} page={page} failed: {e}"
+        )
+        raise Http404("Page image not available")
+
+    return JsonResponse({
+        'tile_size': tile_size,
+        'levels': [
+            level_info(level, tile_size, height / width)
+            for level in range(settings.PAPERMERGE_TILE_MAX_LEVEL + 1)
+        ]
+    })
+
+
+@login_required
+def tile(request, id, page, level, x, y):
+    """
+    Returns one tile (column ``x``, row ``y``) of the page
+    at given zoom level.
+    """
+    doc = get_document(request, id, page)
+    version = get_version(request, doc)
+    tile_size = settings.PAPERMERGE_TILE_SIZE
+
+    if level > settings.PAPERMERGE_TILE_MAX_LEVEL:
+        raise Http404("Zoom level does not exists")
+
+    try:
+        level_img_path = level_image(doc, version, page, level)
+        width, height = jpeg_size(level_img_path)
+        if x * tile_size >= width or y * tile_size >= height:
+            raise Http404("Tile does not exists")
+
+        tile_file, _ = preview_cache().open(
+            key=(doc.id, version, page, 'tiles', level, f"{x}_{y}"),
+            render=lambda output_path: crop_tile(
+                level_img_path, x, y, tile_size, output_path
+            )
+        )
+    except (RenderError, OSError, ValueError) as e:
+        logger.warning(
+            f"Tile {level}/{x}/{y} of doc_id={doc.id} page={page}"
+            f" failed: {e}"
+        )
+        raise Http404("Tile not available")
+
+    return FileResponse(tile_file, content_type="image/jpeg")
@@ -7,4 +7,11 @@ class WsignalsConfig(AppConfig):
     label = 'wsignals'
 
     def ready(self):
+        from django.core import checks
+
         from papermerge.wsignals import signals  # noqa
+        from papermerge.wsignals.progress import check_cache
+        from papermerge.wsignals.tasks import check_chords
+
+        checks.register(check_cache)
+        checks.register(check_chords)
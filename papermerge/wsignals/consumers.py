@@ -0,0 +1,46 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .groups import user_group_name
+from .progress import snapshot
+
+
+class ProgressConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Sends progress of user's background work: OCR of documents
+    (``papermerge.wsignals.progress``), access and metadata
+    propagation. Right after connecting, client receives a snapshot of
+    OCR progress, so it does not wait for the next update.
+    """
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({
+            'type': 'wsignals.progress',
+            'documents': await database_sync_to_async(snapshot)(user.id),
+        })
+
+    async def disconnect(self, code):
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def wsignals_progress(self, event):
+        await self.send_json(event)
+
+    async def access_propagation(self, event):
+        await self.send_json(event)
+
+    async def metadata_propagation(self, event):
+        await self.send_json(event)
@@ -0,0 +1,82 @@
+"""
+State shared by signal handlers within one worker task.
+
+OCR of a page sends several signals (``page_ocr`` STARTED/COMPLETE,
+``post_page_hocr``, ``automates_matching``) and each handler used to
+look up the document on its own. While a task runs (see celery
+``task_prerun``/``task_postrun`` handlers in
+``papermerge.wsignals.signals``) documents are looked up once and
+shared by all handlers.
+"""
+import threading
+from contextlib import contextmanager
+
+from papermerge.core.models import Document
+
+_local = threading.local()
+
+
+def begin_task():
+    _local.depth = getattr(_local, 'depth', 0) + 1
+    if _local.depth == 1:
+        _local.documents = {}
+
+
+def end_task():
+    _local.depth = max(getattr(_local, 'depth', 0) - 1, 0)
+    if _local.depth == 0:
+        _local.documents = None
+
+
+@contextmanager
+def task_context():
+    begin_task()
+    try:
+        yield
+    finally:
+        end_task()
+
+
+def get_document(document_id):
+    """
+    Same as ``Document.objects.get(id=document_id)``, but within a
+    task the document is fetched from database only once.
+
+    Raises ``Document.DoesNotExist``.
+    """
+    documents = getattr(_local, 'documents', None)
+    if documents is None:
+        return Document.objects.get(id=document_id)
+
+    if document_id not in documents:
+        try:
+            documents[document_id] = Document.objects.get(id=document_id)
+        except Document.DoesNotExist:
+            documents[document_id] = None
+
+    if documents[document_id] is None:
+        raise Document.DoesNotExist(
+            f"Document id={document_id} does not exist"
+        )
+
+    return documents[document_id]
+
+
+@contextmanager
+def whole_document_ocr():
+    """
+    Marks OCR of all pages of a document, which is followed by one
+    chord callback (``ocr_document_complete``); with
+    ``PAPERMERGE_AUTOMATES_PER_DOCUMENT`` automates run there, once
+    per document, instead of once per page.
+    """
+    previous = getattr(_local, 'whole_document', False)
+    _local.whole_document = True
+    try:
+        yield
+    finally:
+        _local.whole_document = previous
+
+
+def is_whole_document_ocr():
+    return getattr(_local, 'whole_document', False)
@@ -0,0 +1,41 @@
+"""
+Channel layer groups of users' websocket connections
+(``papermerge.wsignals.consumers.ProgressConsumer``) and messages sent
+to them by background tasks.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def user_group_name(user_id):
+    # channel layer group of user's websocket connections
+    return f"user_{user_id}"
+
+
+def notify_progress(message_type, user_id, node_id, done, total):
+    """
+    Sends progress of background work on the node (e.g. access or
+    metadata propagation, as ``message_type`` ``access.propagation``
+    or ``metadata.propagation``) to user's websocket connections.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or user_id is None:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(
+            user_group_name(user_id),
+            {
+                'type': message_type,
+                'node_id': node_id,
+                'done': done,
+                'total': total,
+            }
+        )
+    except Exception as e:
+        # progress is informative only, do not fail the work
+        logger.warning(f"Failed to send {message_type} progress: {e}")
@@ -0,0 +1,40 @@
+import logging
+
+from papermerge.importers.pipelines import StreamingPipeline
+
+from .tasks import ocr_document
+
+logger = logging.getLogger(__name__)
+
+
+class OcrChordPipeline(StreamingPipeline):
+    """
+    Same as ``StreamingPipeline``, but OCR of imported document is split
+    into per-chunk subtasks which run in parallel on the workers
+    (see ``papermerge.wsignals.tasks.ocr_document``).
+
+    Enabled by setting ``OCR_PAGES_PER_TASK`` in papermerge.conf.py.
+    """
+
+    def apply(self, apply_async=False, **kwargs):
+        # ``ocr_document`` below is asynchronous on its own; make sure
+        # StreamingPipeline always delegates OCR scheduling to it instead
+        # of sending one ``ocr_page`` task per page.
+        return super().apply(apply_async=False, **kwargs)
+
+    def ocr_document(
+        self,
+        document,
+        page_count,
+        lang
+    ):
+        logger.debug(
+            f"{self.processor} importer: "
+            f"scheduling OCR of document {document.id}"
+            f" with {page_count} pages."
+        )
+        ocr_document(
+            document=document,
+            lang=lang,
+            processor=self.processor
+        )
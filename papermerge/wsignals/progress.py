@@ -0,0 +1,235 @@
+"""
+OCR progress of documents, coalesced per user.
+
+Instead of one websocket message per OCRed page, progress of all
+documents of a user being OCRed (pages done/total, ETA) is sent as one
+``wsignals.progress`` message, at most once per
+``PAPERMERGE_PROGRESS_INTERVAL`` seconds per user and worker process.
+Channel layer load thus depends on number of users with documents in
+progress, not on number of pages.
+
+Progress is kept in django cache, so that clients connecting later get
+a snapshot of it (see ``papermerge.wsignals.consumers``). Progress is
+updated by workers and read by the ASGI server, so the cache must be
+shared by all processes (see CACHES in settings and ``check_cache``):
+
+    progress_{document_id}                 -- title, total pages, start time
+    progress_page_{document_id}_{page_num} -- set when the page is OCRed
+    progress_user_{user_id}                -- ids of user's documents
+                                              in progress
+
+Pages done are counted from per page keys instead of a counter: setting
+a key is idempotent, while ``cache.incr`` is a non-atomic get and set
+with most backends (e.g. FileBasedCache), which loses increments of
+concurrent workers.
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+from .groups import user_group_name
+
+logger = logging.getLogger(__name__)
+
+# seconds for which completed documents stay in progress snapshot
+COMPLETED_TIMEOUT = 60
+
+# cache backends which are not shared by processes
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def document_key(document_id):
+    return f"progress_{document_id}"
+
+
+def page_key(document_id, page_num):
+    return f"progress_page_{document_id}_{page_num}"
+
+
+def count_done(document_id, total):
+    """
+    Returns number of OCRed pages of the document.
+    """
+    return len(cache.get_many(
+        [page_key(document_id, page_num) for page_num in range(1, total + 1)]
+    ))
+
+
+def user_key(user_id):
+    return f"progress_user_{user_id}"
+
+
+def check_cache(app_configs, **kwargs):
+    """
+    System check: progress (and versions of automates and email
+    routing preferences) is lost between processes with process
+    local cache.
+    """
+    backend = settings.CACHES.get('default', {}).get(
+        'BACKEND',
+        LOCAL_CACHE_BACKENDS[0]
+    )
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+
+    return [
+        checks.Warning(
+            f"Cache backend {backend} is not shared by webapp, ASGI"
+            " server and worker processes.",
+            hint="OCR progress is not available to clients connecting"
+            " later and changed automates and email routing preferences"
+            " are not noticed until restart. Set CACHE_BACKEND and"
+            " CACHE_LOCATION in papermerge.conf.py.",
+            id='wsignals.W001',
+        )
+    ]
+
+
+def update_progress(user_id, document_id, title, total, pages=()):
+    """
+    Records that ``pages`` (page numbers) of the document are OCRed.
+    Pages recorded more than once are counted once. Completed documents
+    are dropped from progress after ``COMPLETED_TIMEOUT`` seconds.
+    """
+    timeout = settings.PAPERMERGE_PROGRESS_TIMEOUT
+    # only first update of the document sets its start time
+    cache.add(
+        document_key(document_id),
+        {
+            'document_id': document_id,
+            'title': title,
+            'total': total,
+            'started': time.time(),
+        },
+        timeout
+    )
+    if pages:
+        cache.set_many(
+            {page_key(document_id, page_num): True for page_num in pages},
+            timeout
+        )
+        if count_done(document_id, total) >= total:
+            # page keys expire later, they are not read without
+            # the document key
+            cache.touch(document_key(document_id), COMPLETED_TIMEOUT)
+
+    document_ids = cache.get(user_key(user_id)) or []
+    if document_id not in document_ids:
+        # drop documents which are not in progress anymore; concurrent
+        # updates may drop an id, it is added back by next update of
+        # that document
+        in_progress = cache.get_many(
+            [document_key(pk) for pk in document_ids]
+        )
+        document_ids = [
+            pk for pk in document_ids if document_key(pk) in in_progress
+        ]
+        cache.set(user_key(user_id), document_ids + [document_id], timeout)
+
+
+def snapshot(user_id):
+    """
+    Returns list of progress of user's documents, in order in which
+    their OCR started:
+
+        {'document_id', 'title', 'done', 'total', 'eta'}
+
+    ``eta`` is estimated number of seconds until all pages of the
+    document are OCRed (None until first page is OCRed).
+    """
+    document_ids = cache.get(user_key(user_id)) or []
+    values = cache.get_many(
+        [document_key(document_id) for document_id in document_ids]
+    )
+    now = time.time()
+    documents = []
+    for document_id in document_ids:
+        document = values.get(document_key(document_id))
+        if document is None:
+            continue
+        done = count_done(document_id, document['total'])
+        eta = None
+        if done:
+            elapsed = now - document['started']
+            eta = round(elapsed / done * (document['total'] - done))
+        documents.append({
+            'document_id': document_id,
+            'title': document['title'],
+            'done': done,
+            'total': document['total'],
+            'eta': eta,
+        })
+
+    return documents
+
+
+class ProgressNotifier:
+    """
+    Sends progress of user's documents to user's websocket connections,
+    at most once per ``interval`` seconds per user. Notifications of
+    users updated meanwhile are sent by ``send_pending``.
+    """
+
+    def __init__(self, interval=None):
+        self._interval = interval
+        self._lock = threading.Lock()
+        # user_id -> time of last message
+        self._sent = {}
+        self._pending = set()
+
+    @property
+    def interval(self):
+        if self._interval is None:
+            return settings.PAPERMERGE_PROGRESS_INTERVAL
+        return self._interval
+
+    def notify(self, user_ids):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for user_id in user_ids:
+                last = self._sent.get(user_id)
+                if last is None or now - last >= self.interval:
+                    self._sent[user_id] = now
+                    self._pending.discard(user_id)
+                    due.append(user_id)
+                else:
+                    self._pending.add(user_id)
+
+        for user_id in due:
+            self.send(user_id)
+
+    def send_pending(self):
+        with self._lock:
+            user_ids = list(self._pending)
+        if user_ids:
+            self.notify(user_ids)
+
+    def send(self, user_id):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        try:
+            async_to_sync(channel_layer.group_send)(
+                user_group_name(user_id),
+                {
+                    'type': 'wsignals.progress',
+                    'documents': snapshot(user_id),
+                }
+            )
+        except Exception as e:
+            # progress is informative only
+            logger.warning(f"Failed to send OCR progress: {e}")
+
+
+notifier = ProgressNotifier()
@@ -1,15 +1,34 @@
 import logging
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_process_init,
+    worker_process_shutdown
+)
+from django.conf import settings
 from django.dispatch import receiver
-from django.utils.translation import gettext as _
+
+from mglib.step import Step
 
 from papermerge.core.signal_definitions import (
     page_ocr,
+    post_page_hocr,
     automates_matching,
     WORKER
 )
 from papermerge.core.models import Document
 from papermerge.core.ocr import COMPLETE
-from papermerge.core.automate import apply_automates
+from papermerge.core.storage import default_storage
+from papermerge.automates.run import apply_automates
+from papermerge.viewer.sidecar import get_sidecar
+
+from .context import (
+    begin_task,
+    end_task,
+    get_document,
+    is_whole_document_ocr
+)
+from .sink import AUTOMATES, PAGE_OCR, Event, sink
 
 
 logger = logging.getLogger(__name__)
@@ -19,6 +38,30 @@ logger = logging.getLogger(__name__)
 # which might not always be the case
 
 
+@task_prerun.connect
+def task_prerun_handler(**kwargs):
+    # documents looked up by handlers are shared within the task
+    begin_task()
+
+
+@task_postrun.connect
+def task_postrun_handler(**kwargs):
+    end_task()
+    if not sink.is_running:
+        # no background thread (e.g. tasks run eagerly)
+        sink.flush()
+
+
+@worker_process_init.connect
+def worker_process_init_handler(**kwargs):
+    sink.start()
+
+
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(**kwargs):
+    sink.stop()
+
+
 @receiver(page_ocr, sender=WORKER)
 def apply_automates_handler(sender, **kwargs):
     """
@@ -37,62 +80,37 @@ def apply_automates_handler(sender, **kwargs):
         logger.debug(
             f"Page hocr ready: document_id={document_id} page_num={page_num}"
         )
+        if settings.PAPERMERGE_AUTOMATES_PER_DOCUMENT and (
+            is_whole_document_ocr()
+        ):
+            # automates run once all pages are OCRed,
+            # see papermerge.wsignals.tasks.ocr_document_complete
+            return
         try:
-            # will hit the database
+            # document is shared within the task, automates are
+            # fetched from database only if they match
             apply_automates(
                 document_id=document_id,
                 page_num=page_num
             )
         except Exception as e:
+            # automates must not fail OCR of the page
             logger.error(f"Exception {e} in apply_automates_handler.")
-            raise
 
 
 @receiver(automates_matching)
 def automates_matching_handler(sender, **kwargs):
-    user_id = kwargs.get('user_id')
-    level = kwargs.get('level')
-    doc_id = kwargs.get('document_id')
-    message = kwargs.get('message')
-    page_num = kwargs.get('page_num')
-    text = kwargs.get('text')
-
-    try:
-        # will hit the database
-        doc = Document.objects.get(id=doc_id)
-    except Document.DoesNotExist:
-        try:
-            # documment was not found, add this logging
-            # information to UI logs as well.
-            msg = _(
-                "Running automates for doc_id=%(doc_id)s,"
-                " page %(page_num)s."
-                "But in meantime document probably was deleted."
-            ) % {
-                'doc_id': doc_id,
-                'page_num': page_num
-            }
-            logger.warning(msg)
-            return
-        except Exception as e:
-            logger.error(
-                f"Exception {e} in during automates_matching_handler. "
-            )
-            raise
-
-    document_title = doc.title
-
-    log_entry_message = _(
-        "Running automates for document %(document_title)s, page=%(page_num)s,"
-        " doc_id=%(doc_id)s. text=%(text)s"
-    ) % {
-        'document_title': document_title,
-        'page_num': page_num,
-        'doc_id': doc_id,
-        'text': text
-    }
-
-    log_entry_message += message
+    # message is built and saved when the sink is flushed
+    sink.emit(
+        Event(
+            kind=AUTOMATES,
+            user_id=kwargs.get('user_id'),
+            level=kwargs.get('level'),
+            document_id=kwargs.get('document_id'),
+            page_num=kwargs.get('page_num'),
+            message=kwargs.get('message') or ''
+        )
+    )
 
 
 @receiver(page_ocr)
@@ -100,40 +118,55 @@ def page_ocr_handler(sender, **kwargs):
     """
     Nicely log starting/completion of OCRing of each page
     """
-    user_id = kwargs.get('user_id')
-    level = kwargs.get('level')
+    sink.emit(
+        Event(
+            kind=PAGE_OCR,
+            user_id=kwargs.get('user_id'),
+            level=kwargs.get('level'),
+            document_id=kwargs.get('document_id'),
+            page_num=kwargs.get('page_num'),
+            status=kwargs.get('status')
+        )
+    )
+
+
+@receiver(post_page_hocr, sender=WORKER)
+def hocr_sidecar_handler(sender, **kwargs):
+    """
+    Precomputes hOCR JSON sidecar as soon as .hocr file of the page
+    is ready, so that document viewer does not parse .hocr file
+    on each request.
+
+    Sidecar is an optimization only: failing to write it must not
+    fail OCR of the page (viewer will build it on first request).
+    """
     doc_id = kwargs.get('document_id')
-    message = kwargs.get('message')
     page_num = kwargs.get('page_num')
-    lang = kwargs.get('lang')
-    status = kwargs.get('status')
-
-    if status == COMPLETE:
-        human_status = _("COMPLETE")
-    else:
-        human_status = _("STARTED")
+    version = kwargs.get('version', None)
 
     try:
-        # will hit the database
-        doc = Document.objects.get(id=doc_id)
+        # hits the database once per task
+        doc = get_document(doc_id)
     except Document.DoesNotExist:
-        try:
-            msg = _(
-                "%(human_status)s OCR for doc_id=%(doc_id)s,"
-                " page %(page_num)s."
-                "But in meantime document probably was deleted."
-            ) % {
-                'human_status': human_status,
-                'doc_id': doc_id,
-                'page_num': page_num
-            }
-            logger.warning(msg)
-            return
-        except Exception as e:
-            logger.error(
-                f"Exception {e} during handling of page_ocr_handler"
-            )
-            raise
-
-    document_title = doc.title
-
+        logger.warning(
+            f"hOCR ready for doc_id={doc_id}, page {page_num}."
+            " But in meantime document probably was deleted."
+        )
+        return
+
+    # .hocr is extracted for Step(1) only, no matter which step
+    # is reported by the signal
+    page_path = doc.get_page_path(
+        page_num=page_num,
+        step=Step(1),
+        version=version
+    )
+    try:
+        get_sidecar(
+            default_storage.abspath(page_path.hocr_url())
+        )
+    except OSError as e:
+        logger.error(
+            f"Exception {e} while writing hOCR sidecar"
+            f" for doc_id={doc_id}, page {page_num}."
+        )
@@ -0,0 +1,285 @@
+"""
+Buffered sink of page events sent by the worker.
+
+``page_ocr`` and ``automates_matching`` handlers used to look up the
+document and build log messages while the page was being OCRed. Now
+they only put an ``Event`` into the sink, which is flushed in batches:
+
+    * titles of all documents in the batch are fetched with one query
+    * log entries (UI logs) are inserted with one bulk query
+    * OCR progress of documents is updated and sent to websocket
+      connections of users at a bounded rate
+      (see ``papermerge.wsignals.progress``)
+
+Within celery worker processes, events are flushed by a background
+thread (started by ``worker_process_init`` handler in
+``papermerge.wsignals.signals``), so a slow database does not slow
+down OCR. Elsewhere (webapp, tests) events are flushed when batch is
+full, at the end of each task and on ``flush()``.
+
+Failures while flushing are logged and never propagated to the
+sender of the signal.
+"""
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from papermerge.contrib.admin.models import LogEntry
+from papermerge.core.models import Document
+from papermerge.core.ocr import COMPLETE
+
+from .progress import notifier, update_progress
+
+logger = logging.getLogger(__name__)
+
+PAGE_OCR = 'page_ocr'
+AUTOMATES = 'automates'
+
+
+@dataclass
+class Event:
+    kind: str
+    user_id: int = None
+    level: int = None
+    document_id: int = None
+    page_num: int = None
+    status: str = None
+    message: str = ''
+    # time of the signal, not of the flush
+    action_time: object = field(default_factory=timezone.now)
+
+
+def event_message(event, document_title):
+    """
+    Human readable (translated) message of the event. ``document_title``
+    is None if document was deleted in meantime.
+    """
+    if event.kind == PAGE_OCR:
+        if event.status == COMPLETE:
+            human_status = _("COMPLETE")
+        else:
+            human_status = _("STARTED")
+
+        if document_title is None:
+            return _(
+                "%(human_status)s OCR for doc_id=%(doc_id)s,"
+                " page %(page_num)s."
+                " But in meantime document probably was deleted."
+            ) % {
+                'human_status': human_status,
+                'doc_id': event.document_id,
+                'page_num': event.page_num
+            }
+
+        return _(
+            "%(human_status)s OCR for %(document_title)s,"
+            " page %(page_num)s."
+        ) % {
+            'human_status': human_status,
+            'document_title': document_title,
+            'page_num': event.page_num
+        }
+
+    if document_title is None:
+        return _(
+            "Running automates for doc_id=%(doc_id)s,"
+            " page %(page_num)s."
+            " But in meantime document probably was deleted."
+        ) % {
+            'doc_id': event.document_id,
+            'page_num': event.page_num
+        }
+
+    return _(
+        "Running automates for document %(document_title)s,"
+        " page=%(page_num)s, doc_id=%(doc_id)s. "
+    ) % {
+        'document_title': document_title,
+        'page_num': event.page_num,
+        'doc_id': event.document_id
+    } + (event.message or '')
+
+
+class EventSink:
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue = queue.Queue()
+        # serializes writing of batches (background thread vs flush())
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    @property
+    def batch_size(self):
+        if self._batch_size is None:
+            return settings.PAPERMERGE_EVENTS_BATCH_SIZE
+        return self._batch_size
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is None:
+            return settings.PAPERMERGE_EVENTS_FLUSH_INTERVAL
+        return self._flush_interval
+
+    @property
+    def is_running(self):
+        return (
+            self._thread is not None and self._thread.is_alive() and
+            self._pid == os.getpid()
+        )
+
+    def emit(self, event):
+        """
+        Adds the event to the sink. Never hits the database unless the
+        background thread is not running and batch is full.
+        """
+        self._queue.put(event)
+        if not self.is_running and self._queue.qsize() >= self.batch_size:
+            self.flush()
+
+    def start(self):
+        """
+        Starts background thread which flushes events at least once
+        per ``flush_interval`` seconds. Must be called after fork
+        (thread of parent process does not exist in the child).
+        """
+        if self.is_running:
+            return
+
+        self._stopping.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="wsignals-event-sink",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self.is_running:
+            self._stopping.set()
+            self._thread.join(timeout=self.flush_interval * 2)
+        self._thread = None
+        self.flush()
+
+    def flush(self):
+        """
+        Writes all pending events, in batches of ``batch_size``.
+        Returns number of written events.
+        """
+        written = 0
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                break
+            self._write(batch)
+            written += len(batch)
+
+        notifier.send_pending()
+
+        return written
+
+    def _take(self, block):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take(block=True)
+            if batch:
+                close_old_connections()
+                self._write(batch)
+            # progress of users which was not sent due to rate limit
+            notifier.send_pending()
+            if 0 < len(batch) < self.batch_size:
+                # let more events accumulate, one batch per interval
+                self._stopping.wait(self.flush_interval)
+
+        connection.close()
+
+    def _write(self, events):
+        with self._write_lock:
+            try:
+                documents = {
+                    pk: (title, page_count)
+                    for pk, title, page_count in Document.objects.filter(
+                        id__in={event.document_id for event in events}
+                    ).values_list('id', 'title', 'page_count')
+                }
+                messages = [
+                    event_message(
+                        event,
+                        documents.get(event.document_id, (None, 0))[0]
+                    )
+                    for event in events
+                ]
+            except Exception as e:
+                logger.error(f"Exception {e} while flushing page events")
+                return
+
+            self._save_log_entries(events, messages)
+            self._update_progress(events, documents)
+
+    def _save_log_entries(self, events, messages):
+        entries = []
+        for event, message in zip(events, messages):
+            kwargs = {
+                'user_id': event.user_id,
+                'message': message,
+                'action_time': event.action_time,
+            }
+            if event.level is not None:
+                kwargs['level'] = event.level
+            entries.append(LogEntry(**kwargs))
+
+        try:
+            LogEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(
+                f"Exception {e} while saving {len(entries)} log entries"
+            )
+
+    def _update_progress(self, events, documents):
+        done = {}
+        for event in events:
+            if event.kind != PAGE_OCR or event.user_id is None:
+                continue
+            if event.document_id not in documents:
+                continue
+            pages = done.setdefault((event.user_id, event.document_id), set())
+            if event.status == COMPLETE:
+                pages.add(event.page_num)
+
+        try:
+            for (user_id, document_id), pages in done.items():
+                title, page_count = documents[document_id]
+                update_progress(
+                    user_id, document_id, title, page_count, pages=pages
+                )
+        except Exception as e:
+            # progress is informative only
+            logger.warning(f"Failed to update OCR progress: {e}")
+            return
+
+        notifier.notify({user_id for user_id, _doc_id in done})
+
+
+sink = EventSink()
@@ -0,0 +1,179 @@
+import logging
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.core import checks
+
+from papermerge.automates.run import apply_document_automates
+from papermerge.core.models import Document
+from papermerge.core.storage import default_storage
+from papermerge.core.tasks import ocr_page
+
+from .context import get_document, whole_document_ocr
+
+logger = logging.getLogger(__name__)
+
+# result backends (URL schemes) which do not support chords
+CHORDLESS_RESULT_BACKENDS = ('rpc', 'amqp', 'disabled')
+
+
+def check_chords(app_configs, **kwargs):
+    """
+    System check: with ``PAPERMERGE_OCR_PAGES_PER_TASK`` OCR of each
+    document is scheduled as a chord, which fails right away with
+    result backend not supporting chords.
+    """
+    if not settings.PAPERMERGE_OCR_PAGES_PER_TASK:
+        return []
+
+    backend = getattr(settings, 'CELERY_RESULT_BACKEND', None) or 'disabled'
+    scheme = backend.split(':', 1)[0].split('+', 1)[0]
+    if scheme not in CHORDLESS_RESULT_BACKENDS:
+        return []
+
+    return [
+        checks.Error(
+            f"Result backend {backend} does not support chords, which are"
+            " used to schedule OCR with OCR_PAGES_PER_TASK.",
+            hint="Set RESULT_BACKEND in papermerge.conf.py to a backend"
+            " which supports chords (e.g. redis) or unset"
+            " OCR_PAGES_PER_TASK.",
+            id='wsignals.E001',
+        )
+    ]
+
+
+def page_chunks(page_count, pages_per_task):
+    """
+    Splits page numbers 1..page_count into lists of at most
+    ``pages_per_task`` consecutive page numbers.
+
+    Example:
+
+        page_chunks(5, 2) -> [[1, 2], [3, 4], [5]]
+    """
+    pages_per_task = max(int(pages_per_task), 1)
+    page_nums = list(range(1, page_count + 1))
+
+    return [
+        page_nums[index:index + pages_per_task]
+        for index in range(0, page_count, pages_per_task)
+    ]
+
+
+@shared_task
+def ocr_pages(
+    user_id,
+    document_id,
+    file_name,
+    page_nums,
+    lang,
+    version=0,
+    namespace=None,
+    processor=None
+):
+    """
+    OCRs a chunk of pages of the same document.
+
+    Pages are processed by ``papermerge.core.tasks.ocr_page``
+    in the current worker process, thus ``page_ocr`` signal is still
+    sent with STARTED/COMPLETE status for every single page.
+
+    ``processor`` is the importer on whose behalf OCR runs;
+    used by ``config.routing.route_task`` to pick the queue.
+    """
+    with whole_document_ocr():
+        for page_num in page_nums:
+            ocr_page(
+                user_id=user_id,
+                document_id=document_id,
+                file_name=file_name,
+                page_num=page_num,
+                lang=lang,
+                version=version,
+                namespace=namespace
+            )
+
+    return page_nums
+
+
+@shared_task
+def ocr_document_complete(results, document_id, processor=None):
+    """
+    Chord callback. Runs exactly once, after all pages of the
+    document were OCRed.
+
+    Moves OCRed text of all pages into the database in one go and,
+    with ``PAPERMERGE_AUTOMATES_PER_DOCUMENT``, runs automates over
+    the whole document.
+    """
+    try:
+        doc = get_document(document_id)
+    except Document.DoesNotExist:
+        logger.warning(
+            f"OCR complete for doc_id={document_id}, but in meantime"
+            " document was deleted."
+        )
+        return None
+
+    doc.update_text_field()
+    if settings.PAPERMERGE_AUTOMATES_PER_DOCUMENT:
+        apply_document_automates(document_id)
+    logger.debug(
+        f"OCR complete for doc_id={document_id},"
+        f" chunks={len(results)}"
+    )
+
+    return document_id
+
+
+def ocr_document(
+    document,
+    lang,
+    version=None,
+    namespace=None,
+    pages_per_task=None,
+    processor=None,
+    **options
+):
+    """
+    Schedules OCR of the whole document as a chord:
+    one ``ocr_pages`` subtask per chunk of pages, joined by
+    ``ocr_document_complete``.
+
+    Subtasks are picked up by whatever worker processes (and nodes)
+    are free, so multi-page documents are OCRed in parallel.
+    Chords require a result backend which supports them
+    (e.g. redis), see ``CELERY_RESULT_BACKEND`` and ``check_chords``.
+
+    Extra ``options`` are passed as is to ``apply_async``
+    of every subtask.
+    """
+    if version is None:
+        version = document.version
+
+    if namespace is None:
+        namespace = getattr(default_storage, 'namespace', None)
+
+    if pages_per_task is None:
+        pages_per_task = settings.PAPERMERGE_OCR_PAGES_PER_TASK
+
+    header = [
+        ocr_pages.si(
+            user_id=document.user.id,
+            document_id=document.id,
+            file_name=document.file_name,
+            page_nums=page_nums,
+            lang=lang,
+            version=version,
+            namespace=namespace,
+            processor=processor
+        ).set(**options)
+        for page_nums in page_chunks(document.page_count, pages_per_task)
+    ]
+    callback = ocr_document_complete.s(
+        document_id=document.id,
+        processor=processor
+    ).set(**options)
+
+    return chord(header)(callback)